@@ -0,0 +1,129 @@
+# BSD-3-Clause License
+#
+# Copyright 2017 Orange
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+
+"""
+Benchmark of the `heur_comhost` distribution method on random graphs.
+
+Each computation graph has the given number of computations, with an average
+degree of 6, and is distributed on 100 agents with random routes and hosting
+costs and enough capacity for 1.2 times the total footprint of the
+computations. Instances are generated with a fixed seed, so that timings can
+be compared between versions.
+
+Usage::
+
+  python benchmarks/heur_comhost.py 1000 10000 50000
+
+"""
+
+import argparse
+import random
+import time
+
+from pydcop.computations_graph.objects import ComputationGraph, \
+    ComputationNode
+from pydcop.dcop.objects import AgentDef
+from pydcop.distribution import heur_comhost
+
+
+def random_instance(computations_count: int, agents_count: int=100,
+                    degree: int=6, seed: int=0):
+    """
+    A random distribution problem.
+
+    Returns
+    -------
+    a tuple (computation graph, agents, computation_memory,
+    communication_load)
+    """
+    rnd = random.Random(seed)
+    neighbors = {i: set() for i in range(computations_count)}
+    for i in range(computations_count):
+        for _ in range(degree // 2):
+            j = rnd.randrange(computations_count)
+            if j != i:
+                neighbors[i].add(j)
+                neighbors[j].add(i)
+    nodes = [ComputationNode('c{}'.format(i), 'benchmark',
+                             neighbors=['c{}'.format(j)
+                                        for j in sorted(neighbors[i])])
+             for i in range(computations_count)]
+    cg = ComputationGraph(graph_type='benchmark', nodes=nodes)
+
+    def cost():
+        return rnd.randint(1, 5)
+    names = ['a{}'.format(k) for k in range(agents_count)]
+    # The average footprint is 5
+    capacity = 1.2 * computations_count * 5 / agents_count
+    agents = [AgentDef(name, capacity=capacity,
+                       default_route=cost(),
+                       routes={other: cost()
+                               for other in rnd.sample(names, 3)},
+                       default_hosting_cost=cost(),
+                       hosting_costs={
+                           'c{}'.format(rnd.randrange(computations_count)):
+                               cost()
+                           for _ in range(computations_count // 10)})
+              for name in names]
+    footprints = {n.name: rnd.randint(1, 9) for n in nodes}
+
+    def computation_memory(computation):
+        return footprints[computation.name]
+
+    def communication_load(computation, neighbor):
+        return (len(computation.name) + len(neighbor)) % 3 + 1
+
+    return cg, agents, computation_memory, communication_load
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Benchmark heur_comhost distribution on random graphs')
+    parser.add_argument('sizes', type=int, nargs='+',
+                        help='numbers of computations')
+    parser.add_argument('--agents', type=int, default=100,
+                        help='number of agents')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='seed used to generate the instances')
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        cg, agents, memory, load = random_instance(size, args.agents,
+                                                   seed=args.seed)
+        start = time.perf_counter()
+        heur_comhost.distribute(cg, agents, computation_memory=memory,
+                                communication_load=load)
+        print('{} computations: {:.2f}s'.format(
+            size, time.perf_counter() - start))
+
+
+if __name__ == '__main__':
+    main()
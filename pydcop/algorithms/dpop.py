@@ -31,13 +31,15 @@
 
 import logging
 
-from typing import Iterable
+from typing import Iterable, Dict, Any
 
 from pydcop.algorithms import generate_assignment, generate_assignment_as_dict,\
     find_arg_optimal, DEFAULT_TYPE, \
     ALGO_STOP, ALGO_CONTINUE, filter_assignment_dict, ComputationDef
+from pydcop.algorithms.objects import AlgoDef
 from pydcop.infrastructure.computations import Message, VariableComputation
-from pydcop.computations_graph.pseudotree import PseudoTreeNode
+from pydcop.computations_graph.pseudotree import PseudoTreeNode, \
+    PSEUDOTREE_HEURISTICS, OPTIMIZE_TIME_BUDGET
 from pydcop.dcop.objects import Variable
 from pydcop.dcop.relations import NAryMatrixRelation, RelationProtocol, \
     Constraint
@@ -57,6 +59,61 @@ def algo_name() -> str:
     return __name__.split('.')[-1]
 
 
+def algo_params(params: Dict[str, str]):
+    """
+    Returns the parameters for the algorithm.
+
+    If a value for parameter is given in `params` it is used, otherwise a
+    default value is used instead.
+
+    DPOP supports two parameters:
+
+    * 'pseudotree': the heuristic used to build the pseudo-tree (see
+      `pydcop.computations_graph.pseudotree`). With 'optimized', several
+      pseudo-trees are built and the one with the smallest UTIL messages is
+      used.
+    * 'time_budget': the time budget, in seconds, for building pseudo-trees
+      with the 'optimized' heuristic.
+
+    :param params: a dict containing name and values for parameters
+    :return:
+    """
+    dpop_params = {
+        'pseudotree': 'most_connected',
+        'time_budget': OPTIMIZE_TIME_BUDGET,
+    }
+    if 'pseudotree' in params:
+        heuristics = PSEUDOTREE_HEURISTICS + ['optimized']
+        if params['pseudotree'] not in heuristics:
+            raise ValueError("'pseudotree' parameter for DPOP must be one "
+                             "of {}".format(heuristics))
+        dpop_params['pseudotree'] = params['pseudotree']
+    if 'time_budget' in params:
+        try:
+            dpop_params['time_budget'] = float(params['time_budget'])
+        except ValueError:
+            raise TypeError("'time_budget' parameter for DPOP must be a "
+                            "float")
+
+    remaining_params = set(params) - {'pseudotree', 'time_budget'}
+    if remaining_params:
+        raise ValueError('Unknown parameter(s) for DPOP : {}'
+                         .format(remaining_params))
+    return dpop_params
+
+
+def graph_params(algo_def: AlgoDef) -> Dict[str, Any]:
+    """
+    Returns the parameters used to build the pseudo-tree for the algorithm.
+
+    :param algo_def: the definition of the algorithm, with its parameters
+    :return: keyword arguments for `pseudotree.build_computation_graph`
+    """
+    params = algo_def.params
+    return {'heuristic': params.get('pseudotree', 'most_connected'),
+            'time_budget': params.get('time_budget', OPTIMIZE_TIME_BUDGET)}
+
+
 def build_computation(comp_def: ComputationDef):
 
     parent = None
@@ -167,6 +224,13 @@ def join_utils(u1: Constraint, u2: Constraint) -> Constraint:
     return u_j
 
 
+def _table_size(rel: Constraint) -> int:
+    size = 1
+    for v in rel.dimensions:
+        size *= len(v.domain)
+    return size
+
+
 def projection(a_rel, a_var, mode='max'):
     """
 
@@ -339,6 +403,10 @@ class DpopAlgo(VariableComputation):
             # before us
             self._waited_children = self._children[:]
 
+        # Number of logic operations (utility table entries computed) in the
+        # current step, reported in the stats returned by the message handlers
+        self._op_count = 0
+
         self.logger = logging.getLogger('pydcop.algo.dpop.' + variable.name)
 
     def footprint(self):
@@ -358,6 +426,7 @@ class DpopAlgo(VariableComputation):
 
     def on_start(self):
         msg_count, msg_size = 0, 0
+        self._op_count = 0
 
         if self.is_leaf and not self.is_root:
             # If we are a leaf in the DFS Tree we can immediately compute
@@ -377,16 +446,18 @@ class DpopAlgo(VariableComputation):
             # we are both root and leaf : means we are a isolated variable we
             #  can select our own value alone:
             for r in self._constraints:
-                self._joined_utils = join_utils(self._joined_utils, r)
+                self._join(r)
 
             values, current_cost = find_arg_optimal(
                 self._variable, self._joined_utils, self._mode)
+            self._op_count += len(self._variable.domain)
             self.value_selection(values[0], float(current_cost))
             self.logger.info('Value selected at %s : %s - %s', self.name,
                              self.current_value, self.current_cost)
         return {
             'num_msg_out': msg_count,
             'size_msg_out': msg_size,
+            'op_count': self._op_count,
             'current_value': self.current_value
         }
 
@@ -402,9 +473,10 @@ class DpopAlgo(VariableComputation):
                           variable_name, recv_msg.content)
         utils = recv_msg.content
         msg_count, msg_size = 0, 0
+        self._op_count = 0
 
         # accumulate util messages until we got the UTIL from all our children
-        self._joined_utils = join_utils(self._joined_utils, utils)
+        self._join(utils)
         try:
             self._waited_children.remove(variable_name)
         except ValueError as e:
@@ -424,10 +496,11 @@ class DpopAlgo(VariableComputation):
                 # The root obviously has no parent nor pseudo parent, yet it
                 # may have unary relations (with it-self!)
                 for r in self._constraints:
-                    self._joined_utils = join_utils(self._joined_utils, r)
+                    self._join(r)
 
                 values, current_cost = find_arg_optimal(
                     self._variable, self._joined_utils, self._mode)
+                self._op_count += len(self._variable.domain)
                 self.value_selection(values[0], float(current_cost))
                 self.logger.info('Value selected : %s - %s',
                                  self.current_value, self.current_cost)
@@ -457,25 +530,32 @@ class DpopAlgo(VariableComputation):
         return {
             'num_msg_out': msg_count,
             'size_msg_out': msg_size,
+            'op_count': self._op_count,
             'current_value': self.current_value
         }
 
     def _compute_utils_msg(self):
 
         for r in self._constraints:
-            self._joined_utils = join_utils(self._joined_utils, r)
+            self._join(r)
 
         # use projection to eliminate self out of the message to our parent
         util = projection(self._joined_utils, self._variable, self._mode)
+        self._op_count += _table_size(self._joined_utils)
 
         return util
 
+    def _join(self, relation):
+        self._joined_utils = join_utils(self._joined_utils, relation)
+        self._op_count += _table_size(self._joined_utils)
+
     def _on_value_message(self, variable_name, recv_msg, t):
         self.logger.debug('{}: on value message from {} : "{}"'
                           .format(self.name, variable_name, recv_msg))
 
         value = recv_msg.content
         msg_count, msg_size = 0, 0
+        self._op_count = 0
 
         # Value msg contains the optimal assignment for all variables in our
         # separator : sep_vars, sep_values = value
@@ -490,6 +570,7 @@ class DpopAlgo(VariableComputation):
         self.logger.debug('Relation after slicing %s', rel)
 
         values, current_cost = find_arg_optimal(self._variable, rel, self._mode)
+        self._op_count += len(self._variable.domain)
         self.value_selection(values[0], float(current_cost))
         self.logger.info('on VALUE msg from %s, %s select value %s cost=%s',
                          variable_name, self.name, self.current_value,
@@ -517,6 +598,7 @@ class DpopAlgo(VariableComputation):
         return {
             'num_msg_out': msg_count,
             'size_msg_out': msg_size,
+            'op_count': self._op_count,
             'current_value': self.current_value
         }
 
@@ -230,6 +230,12 @@ class MaxSumMessage(Message):
         # Max sum messages are dictionaries from values to costs:
         return len(self._costs) * 2
 
+    @property
+    def coalescable(self):
+        # Only the latest costs received from a neighbor are used when
+        # computing our own costs.
+        return True
+
     def __str__(self):
         return 'MaxSumMessage({})'.format(self._costs)
 
@@ -337,7 +343,12 @@ class FactorAlgo(DcopComputation):
             self._is_stable = False
 
         self._valid_assignments_cache = None
-        self._valid_assignments()
+        if not hasattr(self._factor, 'min_costs_for_var'):
+            self._valid_assignments()
+
+        # Number of logic operations (assignments evaluated) in the current
+        # step, reported in the stats returned by the message handlers.
+        self._op_count = 0
 
     @property
     def name(self):
@@ -363,6 +374,7 @@ class FactorAlgo(DcopComputation):
 
     def on_start(self):
         msg_count, msg_size = 0, 0
+        self._op_count = 0
 
         # Only unary factors (leaf in the graph) needs to send their costs at
         # init.Each leaf factor sends his costs to its only variable.
@@ -376,6 +388,7 @@ class FactorAlgo(DcopComputation):
         return {
             'num_msg_out': msg_count,
             'size_msg_out': msg_size,
+            'op_count': self._op_count,
         }
 
     def _init_msg(self):
@@ -420,6 +433,7 @@ class FactorAlgo(DcopComputation):
         send, no_send = [], []
         debug = ''
         msg_count, msg_size = 0, 0
+        self._op_count = 0
 
         # Wait until we received costs from all our variables before sending
         # our own costs
@@ -456,6 +470,7 @@ class FactorAlgo(DcopComputation):
         return {
             'num_msg_out': msg_count,
             'size_msg_out': msg_size,
+            'op_count': self._op_count,
         }
 
     def _costs_for_var(self, variable):
@@ -472,7 +487,18 @@ class FactorAlgo(DcopComputation):
         where value is all the values from the domain of 'variable'
         costs is the cost when 'variable'  == 'value'
 
+        Factors that know how to compute these min-marginals without
+        enumerating all their assignments (see
+        `pydcop.dcop.relations.BinarySumRelation`) provide a
+        `min_costs_for_var` method, which is used instead.
+
         """
+        if hasattr(self._factor, 'min_costs_for_var'):
+            costs = self._factor.min_costs_for_var(variable, self._costs,
+                                                   INFINITY)
+            self._op_count += len(variable.domain) * len(self.variables)
+            return {d: c for d, c in costs.items() if c < INFINITY}
+
         costs = {}
         for d in variable.domain:
             # for each value d in the domain of v, calculate min cost (a)
@@ -484,8 +510,9 @@ class FactorAlgo(DcopComputation):
             for assignment in self._valid_assignments():
                 if assignment[variable.name] != d:
                     continue
+                self._op_count += 1
                 f_val = self._factor(**assignment)
-                if f_val == INFINITY:
+                if f_val >= INFINITY:
                     continue
 
                 sum_cost = 0
@@ -509,7 +536,7 @@ class FactorAlgo(DcopComputation):
                 if min_val > current_val:
                     min_val = current_val
 
-            if min_val != INFINITY:
+            if min_val < INFINITY:
                 costs[d] = min_val
 
         return costs
@@ -525,7 +552,7 @@ class FactorAlgo(DcopComputation):
             self._valid_assignments_cache = []
             all_vars = self._factor.dimensions[:]
             for assignment in generate_assignment_as_dict(all_vars):
-                if self._factor(**assignment) != INFINITY:
+                if self._factor(**assignment) < INFINITY:
                     self._valid_assignments_cache.append(assignment)
         return self._valid_assignments_cache
 
@@ -608,6 +635,10 @@ class VariableAlgo(VariableComputation):
         self._is_stable = False
         self._prev_messages = defaultdict(lambda: (None, 0))
 
+        # Number of logic operations (costs added) in the current step,
+        # reported in the stats returned by the message handlers.
+        self._op_count = 0
+
     @property
     def domain(self):
         # Return a copy of the domain to make sure nobody modifies it.
@@ -645,6 +676,7 @@ class VariableAlgo(VariableComputation):
         # which depends on it.
         # A variable with no integrated costs simply sends neutral costs
         msg_count, msg_size = 0, 0
+        self._op_count = 0
 
         # select our value
         if self.var_with_cost:
@@ -690,6 +722,7 @@ class VariableAlgo(VariableComputation):
         return {
             'num_msg_out': msg_count,
             'size_msg_out': msg_size,
+            'op_count': self._op_count,
             'current_value': self.current_value
         }
 
@@ -703,6 +736,7 @@ class VariableAlgo(VariableComputation):
          * cost if the minimum cost of the factor when taking value d
         """
         self._costs[factor_name] = msg.costs
+        self._op_count = 0
 
         # select our value
         self.value_selection(*self._select_value())
@@ -723,6 +757,7 @@ class VariableAlgo(VariableComputation):
         return {
             'num_msg_out': msg_count,
             'size_msg_out': msg_size,
+            'op_count': self._op_count,
             'current_value': self.current_value
         }
 
@@ -802,6 +837,7 @@ class VariableAlgo(VariableComputation):
                     d_costs[d] = INFINITY
                     break
                 d_costs[d] += f_costs[d]
+                self._op_count += 1
 
         from operator import itemgetter
 
@@ -854,6 +890,7 @@ class VariableAlgo(VariableComputation):
                 c = f_costs[d]
                 sum_cost += c
                 msg_costs[d] += c
+                self._op_count += 1
 
         # Experimentally, when we do not normalize costs the algorithm takes
         # more cycles to stabilize
@@ -38,9 +38,15 @@ from importlib import import_module
 
 import sys
 from queue import Queue, Empty
-from typing import List
+from typing import List, Callable, Dict, Any
 
 from pydcop.algorithms.objects import AlgoDef
+from pydcop.computations_graph.objects import ComputationGraph
+from pydcop.dcop.binarydcop import write_dcop_binary
+from pydcop.dcop.dcop import DCOP
+from pydcop.dcop.yamldcop import write_dcop_yaml
+from pydcop.distribution.cache import DistributionCache, is_cacheable
+from pydcop.distribution.objects import Distribution
 
 logger = logging.getLogger('pydcop')
 
@@ -82,6 +88,28 @@ def build_algo_def(algo_module, algo_name: str, objective,
 
 
 
+def build_computation_graph(graph_module, dcop: DCOP, algo_module=None,
+                            algo_def: AlgoDef=None) -> ComputationGraph:
+    """
+    Build the computation graph for a dcop.
+
+    Algorithms may define a `graph_params(algo_def)` function, which gives
+    the keyword arguments for the `build_computation_graph` function of
+    their graph model (e.g. the heuristic used by dpop to build its
+    pseudo-tree).
+
+    :param graph_module: the computation graph model module
+    :param dcop: the dcop
+    :param algo_module: the algorithm module, if any
+    :param algo_def: the algorithm definition, if any
+    :return: the computation graph
+    """
+    params = {}
+    if algo_def is not None and hasattr(algo_module, 'graph_params'):
+        params = algo_module.graph_params(algo_def)
+    return graph_module.build_computation_graph(dcop, **params)
+
+
 # Files for logging metrics
 columns = {
     'cycle_change': ['cycle', 'time', 'cost', 'violation', 'msg_count',
@@ -130,7 +158,9 @@ def prepare_metrics_files(run, end, mode):
     return csv_cb
 
 def add_csvline(file, mode, metrics):
-    data = [metrics[c] for c in columns[mode]]
+    # Use get, as some metrics (e.g. messages metrics) may not be available
+    # yet when the first lines are written.
+    data = [metrics.get(c) for c in columns[mode]]
     line = ','.join([str(d) for d in data])
 
     with open(file, mode='at', encoding='utf-8') as f:
@@ -147,6 +177,70 @@ def _error(msg, e=None):
     sys.exit(2)
 
 
+def write_dcop(dcop: DCOP, output: str=None, dcop_format: str='yaml'):
+    """
+    Write a dcop in a file or on the standard output.
+
+    Parameters
+    ----------
+    dcop: DCOP
+        the dcop to write
+    output: str
+        the output file (or directory, for the binary format). If None,
+        the dcop is written on the standard output, which is only
+        supported for the yaml format.
+    dcop_format: str
+        'yaml' or 'binary'
+    """
+    if dcop_format == 'binary':
+        if output is None:
+            _error('An output directory is required for binary dcops')
+        write_dcop_binary(dcop, output)
+    elif output is None:
+        write_dcop_yaml(dcop, sys.stdout)
+    else:
+        path = os.path.dirname(output)
+        if path:
+            os.makedirs(path, exist_ok=True)
+        with open(output, 'w', encoding='utf-8') as f:
+            write_dcop_yaml(dcop, f)
+
+
+def cached_distribution(compute: Callable[[], Distribution],
+                        use_cache: bool, dcop_files: List[str],
+                        cg: ComputationGraph, dist: str, dcop: DCOP,
+                        algo_module=None,
+                        dist_params: Dict[str, Any]=None) -> Distribution:
+    """
+    Get a distribution from the on-disk cache, or compute it with `compute`
+    and store it in the cache.
+
+    See Also
+    --------
+    pydcop.distribution.cache.DistributionCache
+    """
+    if not use_cache or not is_cacheable(dist, dist_params):
+        return compute()
+    cache = DistributionCache()
+    memory = getattr(algo_module, 'computation_memory', None)
+    load = getattr(algo_module, 'communication_load', None)
+    # Pseudo-trees built with different heuristics have different links
+    graph = cg.type if getattr(cg, 'heuristic', None) is None \
+        else '{}:{}'.format(cg.type, cg.heuristic)
+    key = cache.key(dcop_files, graph, dist,
+                    algo_module.__name__ if algo_module else None,
+                    memory, load, dist_params, dcop.agents.values())
+    distribution = cache.get(key)
+    if distribution is None:
+        distribution = compute()
+        try:
+            cache.put(key, distribution)
+        except OSError as e:
+            logger.warning('Could not store distribution in cache %s : %s',
+                           cache.directory, e)
+    return distribution
+
+
 def _load_modules(dist, algo):
     dist_module, algo_module, graph_module = None, None, None
     if dist is not None:
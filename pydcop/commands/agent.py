@@ -47,6 +47,9 @@ Synopsis
                --orchestrator <orchestrator_address>
                [--uiport <start_uiport>]
                [--restart]
+               [--msg_metrics]
+               [--profile <directory>]
+               [--nccc]
 
 
 Description
@@ -99,6 +102,24 @@ Options
   When setting this flag, agent(s) will restarted when when they have all
   stopped. Useful when running `pydcop agent` as daemon on a remote machine.
 
+``--msg_metrics``
+  When setting this flag, agent(s) collect histograms of the time
+  messages wait in their queue, of the time spent handling them and of the
+  time needed to send them. These histograms are sent to the orchestrator with
+  the other metrics.
+
+``--profile <directory>``
+  Profile the messages handled by the agent(s). When an agent stops,
+  cProfile statistics (``<agent>.pstats``), sampled stacks in the collapsed
+  format used by flamegraph tools (``<agent>.collapsed``) and cumulative
+  timers for each message handler (``<agent>_handlers.csv``) are written in
+  this directory.
+
+``--nccc``
+  When setting this flag, computations deployed on the agent(s) count their
+  constraint checks and non-concurrent constraint checks, which are sent to
+  the orchestrator with the other metrics.
+
 
 Examples
 --------
@@ -157,6 +178,15 @@ def set_parser(subparsers):
                              'when when they have all stopped. Useful when '
                              'running `pydcop agent` as daemon on a remote '
                              'machine.')
+    parser.add_argument('--msg_metrics', action='store_true', default=False,
+                        help='Collect histograms on messages queue wait, '
+                             'handling and sending times.')
+    parser.add_argument('--profile', type=str, default=None,
+                        help='profile message handling and write results in '
+                             'this directory')
+    parser.add_argument('--nccc', action='store_true', default=False,
+                        help='Count constraint checks and non-concurrent '
+                             'constraint checks.')
 
 
 def run_cmd(args):
@@ -166,7 +196,8 @@ def run_cmd(args):
     if args.restart:
         while not force_stopped:
             agents = start_agents(names, o_addr, int(o_port),
-                                  args.uiport, args.port)
+                                  args.uiport, args.port, args.msg_metrics,
+                                  args.profile, args.nccc)
 
             # block until all agents have finished
             for agent in agents:
@@ -179,7 +210,8 @@ def run_cmd(args):
 
     else:
         agents = start_agents(names, o_addr, int(o_port),
-                              args.uiport, args.port)
+                              args.uiport, args.port, args.msg_metrics,
+                              args.profile, args.nccc)
 
 
 def on_force_exit(_, __):
@@ -190,7 +222,8 @@ def on_force_exit(_, __):
         agent.stop()
 
 
-def start_agents(names: List[str], o_addr, o_port, u_port, a_port):
+def start_agents(names: List[str], o_addr, o_port, u_port, a_port,
+                 msg_metrics=False, profile=None, nccc=False):
     """
     Start orchestrated agents.
 
@@ -210,6 +243,13 @@ def start_agents(names: List[str], o_addr, o_port, u_port, a_port):
         orchestrator address
     o_port
         orchestrator port
+    msg_metrics: bool
+        if True, agents collect histograms on messages handling.
+    profile: str
+        if given, agents are profiled and results are written in this
+        directory.
+    nccc: bool
+        if True, agents count constraint checks and NCCC.
 
     Returns
     -------
@@ -231,7 +271,8 @@ def start_agents(names: List[str], o_addr, o_port, u_port, a_port):
         comm = HttpCommunicationLayer(('127.0.0.1', a_port))
         agt_def = AgentDef(a)
         agent = OrchestratedAgent(agt_def, comm, (o_addr, o_port),
-                                  ui_port=u_port)
+                                  ui_port=u_port, msg_metrics=msg_metrics,
+                                  profile=profile, nccc=nccc)
 
         agent.start()
         started_agents.append(agent)
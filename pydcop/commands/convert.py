@@ -0,0 +1,138 @@
+# BSD-3-Clause License
+#
+# Copyright 2017 Orange
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+
+"""
+.. _pydcop_commands_convert:
+
+pydcop convert
+==============
+
+``pydcop convert`` converts yaml dcop files into a binary dcop.
+
+Synopsis
+--------
+::
+
+  pydcop convert --binary <directory> <dcop_files>
+
+
+Description
+-----------
+
+For large extensional constraints, yaml dcop files are slow to load and
+huge. A binary dcop is a directory containing the definition of the dcop in
+a json file and the tables of all extensional constraints in a numpy array
+file, which is memory-mapped when loading the dcop (see
+:mod:`pydcop.dcop.binarydcop`).
+
+A binary dcop can be used with all ``pydcop`` commands, instead of the yaml
+files. Other yaml files can be given after the binary dcop, their content
+is then merged in the definition of the dcop. For example::
+
+  pydcop solve --algo dpop dcop_binary_dir agents.yaml
+
+Outputs the number of variables, constraints and tables of the converted
+dcop, on the standard output and in the file given with the global
+``--output`` option, if any.
+
+Options
+-------
+
+``--binary <directory>`` / ``-b <directory>``
+  The directory of the binary dcop, created if needed.
+
+``<dcop-files>``
+  One or several paths to the files containing the dcop. If several paths are
+  given, their content is concatenated as used a the yaml definition for the
+  DCOP.
+
+
+Example
+-------
+
+::
+
+  pydcop convert --binary graph_coloring1 graph_coloring1.yaml
+
+Example output::
+
+  constraints_count: 3
+  status: OK
+  tables_count: 2
+  variables_count: 3
+
+"""
+
+import logging
+
+import yaml
+
+from pydcop.commands._utils import _error
+from pydcop.dcop.binarydcop import yaml_to_binary
+from pydcop.dcop.relations import NAryMatrixRelation
+
+logger = logging.getLogger('pydcop.cli.convert')
+
+
+def set_parser(subparsers):
+
+    parser = subparsers.add_parser('convert',
+                                   help='Convert yaml dcop files into a '
+                                        'binary dcop')
+    parser.set_defaults(func=run_cmd)
+
+    parser.add_argument('dcop_files', type=str, nargs='+',
+                        help="dcop file(s)")
+    parser.add_argument('-b', '--binary', type=str, required=True,
+                        help='directory of the binary dcop')
+
+
+def run_cmd(args):
+    logger.debug('dcop command "convert" with arguments {} '.format(args))
+
+    logger.info('converting dcop from {} into {}'
+                .format(args.dcop_files, args.binary))
+    try:
+        dcop = yaml_to_binary(args.dcop_files, args.binary)
+    except (OSError, ValueError) as e:
+        _error('Could not convert dcop: {}'.format(e))
+
+    result = {
+        'status': 'OK',
+        'variables_count': len(dcop.variables),
+        'constraints_count': len(dcop.constraints),
+        'tables_count': sum(1 for c in dcop.constraints.values()
+                            if isinstance(c, NAryMatrixRelation)),
+    }
+    if args.output is not None:
+        with open(args.output, encoding='utf-8', mode='w') as fo:
+            fo.write(yaml.dump(result, default_flow_style=False))
+    print(yaml.dump(result, default_flow_style=False))
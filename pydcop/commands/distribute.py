@@ -44,6 +44,7 @@ Synopsis
 ::
 
     pydcop distribute --dist <distribution_method>
+                      [--dist_params <params>] [--no-cache]
                       [--graph <graph_model>]
                       [--algo <dcop_algorithm>] <dcop-files>
 
@@ -73,6 +74,28 @@ Options
   The distribution algorithm (``oneagent``, ``adhoc``, ``ilp_fgdp``, etc.,
   see :ref:`concepts_distribution`).
 
+``--dist_params <params>`` / ``-p <params>``
+  Optional parameters for the distribution method, given as ``name:value``.
+  Several parameters can be given. The ilp-based methods (``ilp_fgdp`` and
+  ``ilp_compref``) accept ``solver`` (``glpk`` or ``cbc``, the solver bundled
+  with PuLP, which is used by default when ``glpsol`` is not installed),
+  ``time_limit`` (in seconds), ``mip_gap`` (relative gap at which the solver
+  stops) and ``warm_start`` (``0`` or ``1``, use the ``heur_comhost``
+  solution as a starting point, enabled by default). When the solver stops on
+  the time limit, the best feasible distribution found is used.
+  The ``portfolio`` method accepts ``methods`` (comma-separated list of
+  distribution methods), ``time_budget`` (in seconds, 60 by default) and
+  ``max_workers`` (number of methods run in parallel, the number of cpus
+  by default).
+
+``--no-cache``
+  Do not use the on-disk cache of distributions. By default, distributions
+  computed by a distribution algorithm are stored in a cache (in
+  ``$PYDCOP_CACHE_DIR``, or ``~/.cache/pydcop``) and reused when the
+  same dcop files are distributed again with the same parameters.
+  Distributions computed within a time budget (with the ``portfolio``
+  method or a ``time_limit`` parameter) are never cached.
+
 ``--algo <dcop_algorithm>`` / ``-a <dcop_algorithm>``
   The (optional) algorithm whose computations will be distributed. It is needed
   when the distribution depends on the computation's characteristics (which
@@ -117,6 +140,22 @@ graph model, as maxsum works on a factor graph::
   dcop.py distribute --algo maxsum \\
                      --dist oneagent graph_coloring1.yaml
 
+Distributing a DCOP with ``ilp_fgdp``, using the CBC solver for at most
+60 seconds::
+
+  pydcop distribute -d ilp_fgdp -p solver:cbc time_limit:60 \\
+                    -a maxsum graph_coloring_10_4_15_0.1_capa_costs.yml
+
+Running several distribution methods in parallel for at most 30 seconds,
+and keeping the best distribution. The output contains, under the
+``portfolio`` key, the best method and the status, time and cost of each
+method (unless the distribution is found in the cache)::
+
+  pydcop distribute -d portfolio \\
+                    -p methods:heur_comhost,partition,ilp_compref \\
+                       time_budget:30 \\
+                    -a dsa graph_coloring_10_4_15_0.1_capa_costs.yml
+
 Example output::
 
   cost: 0
@@ -138,10 +177,11 @@ Example output::
 import logging
 from importlib import import_module
 import sys
+from typing import List
 import yaml
 
 from pydcop.algorithms import list_available_algorithms
-from pydcop.commands._utils import _error
+from pydcop.commands._utils import _error, cached_distribution
 from pydcop.dcop.yamldcop import load_dcop_from_file
 from pydcop.distribution.objects import ImpossibleDistributionException
 
@@ -167,10 +207,19 @@ def set_parser(subparsers):
 
     parser.add_argument('-d', '--dist',
                         choices=['oneagent', 'adhoc', 'ilp_fgdp',
-                                 'ilp_compref', 'heur_comhost'],
+                                 'ilp_compref', 'heur_comhost', 'partition',
+                                 'portfolio'],
                         required=True,
                         help='algorithm for distributing the computation '
                              'graph')
+    parser.add_argument('-p', '--dist_params',
+                        type=str, nargs='*',
+                        help='Optional parameters for the distribution '
+                             'method, given as name:value. Several '
+                             'parameters can be given.')
+    parser.add_argument('--no-cache', dest='no_cache', action='store_true',
+                        default=False,
+                        help='do not use the on-disk cache of distributions')
 
     parser.add_argument('-a', '--algo',
                         choices=algorithms,
@@ -189,6 +238,7 @@ def run_cmd(args):
     dcop = load_dcop_from_file(dcop_yaml_files)
 
     dist_module = load_distribution_module(args.dist)
+    dist_params = build_dist_params(dist_module, args.dist, args.dist_params)
 
     algo_module, graph_module = None, None
     if args.algo is not None:
@@ -219,12 +269,33 @@ def run_cmd(args):
         computation_memory = algo_module.computation_memory
         communication_load = algo_module.communication_load
 
-    try:
-        distribution = dist_module\
+    portfolio = {}
+
+    def compute_distribution():
+        if args.dist == 'portfolio':
+            best, methods_results = dist_module\
+                .run_portfolio(cg, dcop.agents.values(),
+                               hints=dcop.dist_hints,
+                               computation_memory=computation_memory,
+                               communication_load=communication_load,
+                               **dist_params)
+            portfolio['best'] = best.method
+            portfolio['methods'] = {r.method: {'status': r.status,
+                                               'time': round(r.time, 3),
+                                               'cost': r.cost}
+                                    for r in methods_results}
+            return best.distribution
+        return dist_module\
             .distribute(cg, dcop.agents.values(),
                         hints=dcop.dist_hints,
                         computation_memory=computation_memory,
-                        communication_load=communication_load)
+                        communication_load=communication_load,
+                        **dist_params)
+
+    try:
+        distribution = cached_distribution(
+            compute_distribution, not args.no_cache, dcop_yaml_files, cg,
+            args.dist, dcop, algo_module, dist_params)
         dist = distribution.mapping()
 
         if hasattr(dist_module, 'distribution_cost'):
@@ -245,6 +316,8 @@ def run_cmd(args):
             'distribution': dist,
             'cost': cost
         }
+        if portfolio:
+            result['portfolio'] = portfolio
         if args.output is not None:
             with open(args.output, encoding='utf-8', mode='w') as fo:
                 fo.write(yaml.dump(result))
@@ -269,6 +342,22 @@ def load_distribution_module(dist):
     return dist_module
 
 
+def build_dist_params(dist_module, dist: str, cli_params: List[str]):
+    if not hasattr(dist_module, 'dist_params'):
+        if cli_params:
+            _error('Distribution method {} does not support any parameter'
+                   .format(dist))
+        return {}
+    params = {}
+    for p in cli_params or []:
+        p, v = p.split(':')
+        params[p] = v
+    try:
+        return dist_module.dist_params(params)
+    except Exception as e:
+        _error(e)
+
+
 def load_graph_module(graph):
     graph_module = None
     try:
@@ -41,7 +41,7 @@ Synopsis
 --------
 ::
 
-    pydcop generate [--output <file>] <problem-type> ...
+    pydcop [--output <file>] generate [--format <format>] <problem-type> ...
 
 Description
 -----------
@@ -59,7 +59,13 @@ Documentation will be added once the command is more stable
 Options
 -------
 
-TODO
+``-f <format>`` / ``--format <format>``
+  Format of the generated dcop: ``yaml`` (the default) or ``binary``, which
+  is much faster to write and to load for large dcops. The binary format
+  requires the ``--output`` global option, which gives the directory the
+  binary dcop is written in.
+
+Other options are specific to each type of problem.
 
 
 
@@ -67,6 +73,8 @@ Examples
 --------
 
     pydcop generate --output dcop.yaml ising_soft --size 10 --range 10
+    pydcop --output gc_dcop generate --format binary graph_coloring \\
+        -n 1000000 -c 3 -d 0.000002 --allow_subgraph
 
 
 
@@ -95,15 +103,14 @@ from typing import Dict, List
 from typing import Tuple
 
 import networkx as nx
-import os
 
 #from numpy.random import random
+from pydcop.commands._utils import write_dcop
 from pydcop.commands.generators.iot import generate_iot
 from pydcop.commands.generators.smallworld import generate_small_world
 from pydcop.dcop.objects import VariableDomain, Variable, AgentDef
 from pydcop.dcop.dcop import DCOP
 from pydcop.dcop.relations import relation_from_str
-from pydcop.dcop.yamldcop import dcop_yaml
 
 logger = logging.getLogger('pydcop.cli.generate')
 
@@ -121,6 +128,11 @@ def set_parser(main_subparsers):
                              'if the generated graph has a different density.'
                              'However this rounds density to 1 decimal.'
                         )
+    parser.add_argument('-f', '--format', choices=['yaml', 'binary'],
+                        default='yaml',
+                        help='format of the generated dcop. The binary '
+                             'format requires an output directory, '
+                             'given with the global --output option.')
     # parser.add_argument('-o', '--output', nargs=1, default=None,
     #                     help='Determines if  the output is printed in console '
     #                          'or returned in the code. If not used, '
@@ -262,47 +274,47 @@ def generate_graph_coloring(args):
                 '%s colors, target density %s and %s agents', node_count,
                 color_count, args.density, agents_count)
 
-    # First a random graph
-    is_connected = False
+    # First a random graph, fast_gnp_random_graph runs in O(n+m) instead of
+    # O(n^2) for gnp_random_graph.
+    graph = nx.fast_gnp_random_graph(node_count, density)
+    is_connected = nx.is_connected(graph)
     if not args.allow_subgraph:
         while not is_connected:
-            graph = nx.gnp_random_graph(args.node_count, density)
+            graph = nx.fast_gnp_random_graph(node_count, density)
             is_connected = nx.is_connected(graph)
-    else:
-        graph = nx.gnp_random_graph(args.node_count, density)
-        is_connected = nx.is_connected(graph)
 
     real_density = nx.density(graph)
     logger.info(nx.info(graph))
-    logger.info('Connected : %s', nx.is_connected(graph))
-    logger.info('Density %s', nx.density(graph))
+    logger.info('Connected : %s', is_connected)
+    logger.info('Density %s', real_density)
 
     # Now create a DCOP from the graph
     d = VariableDomain('colors', 'color', range(color_count))
     variables = {}
     agents = {}
-    for i, node in enumerate(graph.nodes_iter()):
+    for i, node in enumerate(graph.nodes):
         logger.debug('node %s - %s', node, i)
         name = 'v' + str(i)
         variables[name] = Variable(name, d)
         if auto_agents:
             a_name = 'a' + str(i)
-            agents[a_name] = AgentDef(a_name, capacity)
+            agents[a_name] = AgentDef(a_name, capacity=capacity)
 
     if not auto_agents:
         for i in range(agents_count):
             a_name = 'a' + str(i)
-            agents[a_name] = AgentDef(a_name, capacity)
+            agents[a_name] = AgentDef(a_name, capacity=capacity)
 
     constraints = {}
-    for i, edge in enumerate(graph.edges_iter()):
+    for i, edge in enumerate(graph.edges):
         logger.debug('edge %s - %s', edge, i)
         name = 'c' + str(i)
         u, v = edge
         expression = '1000 if v{} == v{} else 0'.format(u, v)
-        constraints[name] = relation_from_str(name, expression,
-                                              variables.values())
-        logger.debug(repr(constraints[name]))
+        constraints[name] = relation_from_str(name, expression, variables)
+        logger.debug('%r', constraints[name])
+    # Free the memory used by the graph before writing large dcops
+    del graph
 
     dcop = DCOP('graph coloring', 'min',
                 domains={'colors': d},
@@ -310,13 +322,10 @@ def generate_graph_coloring(args):
                 agents=agents,
                 constraints=constraints)
 
-    if args.output:
-        outputfile = args.output[0]
-        if args.correct_density:
-            outputfile = correct_density(outputfile, real_density)
-        write_in_file(outputfile, dcop_yaml(dcop))
-    else:
-        print(dcop_yaml(dcop))
+    outputfile = args.output
+    if outputfile and args.correct_density:
+        outputfile = correct_density(outputfile, real_density)
+    write_dcop(dcop, outputfile, args.format)
 
 
 # We do not use networkx bipartite generator because, if there are nodes
@@ -382,11 +391,10 @@ def generate_mixed_problem(args):
         constraints_list = [("c{}".format(i+1),'hard') if i < hard_count else
                        ("c{}".format(i+1), 'soft') for i in range(
             constraint_count)]
+        random.shuffle(constraints_list)
         variables = {}
         constraints = {}
-        while len(nodes) != 0:
-            n = nodes.pop()
-            c = constraints_list.pop(random.randint(0,len(constraints_list)-1))
+        for n, c in zip(nodes, constraints_list):
             w = choose_weight()
             hard = c[1] == 'hard'
             objective = find_objective([w], domain_range - 1, hard)
@@ -402,12 +410,12 @@ def generate_mixed_problem(args):
 
             if auto_agents:
                 a_name = 'a' + str(n)
-                agents[a_name] = AgentDef(a_name, capacity)
+                agents[a_name] = AgentDef(a_name, capacity=capacity)
 
         if not auto_agents:
             for i in range(agents_count):
                 a_name = 'a' + str(i)
-                agents[a_name] = AgentDef(a_name, capacity)
+                agents[a_name] = AgentDef(a_name, capacity=capacity)
 
     elif arity == 2:
         edges_count = int(variable_count * (variable_count-1) * density /2)
@@ -420,7 +428,7 @@ def generate_mixed_problem(args):
                                                          density))
         is_connected = False
         while not is_connected:
-            graph = nx.gnp_random_graph(variable_count, density)
+            graph = nx.fast_gnp_random_graph(variable_count, density)
             is_connected = nx.is_connected(graph)
 
         # Compute nb of hard constraints regarding the true density
@@ -428,21 +436,21 @@ def generate_mixed_problem(args):
         hard_count = args.hard_constraint * real_density * args.variable_count\
                      * (args.variable_count + 1) / 2
 
-        for i, node in enumerate(graph.nodes_iter()):
+        for i, node in enumerate(graph.nodes):
             logger.debug('node %s - %s', node, i)
             name = 'v' + str(i)
             variables[name] = Variable(name, d)
             if auto_agents:
                 a_name = 'a' + str(i)
-                agents[a_name] = AgentDef(a_name, capacity)
+                agents[a_name] = AgentDef(a_name, capacity=capacity)
 
         if not auto_agents:
             for i in range(agents_count):
                 a_name = 'a' + str(i)
-                agents[a_name] = AgentDef(a_name, capacity)
+                agents[a_name] = AgentDef(a_name, capacity=capacity)
 
         constraints = {}
-        for i, edge in enumerate(graph.edges_iter()):
+        for i, edge in enumerate(graph.edges):
             logger.debug('edge %s - %s', edge, i)
             name = 'c' + str(i)
             u, v = edge
@@ -460,8 +468,8 @@ def generate_mixed_problem(args):
                     .format(u, v, round(random.uniform(0, max_val), 2))
 
             constraints[name] = relation_from_str(name, expression,
-                                                  variables.values())
-            logger.debug(repr(constraints[name]))
+                                                  variables)
+            logger.debug('%r', constraints[name])
 
     else:
         if edges_count < constraint_count and arity != 1:
@@ -475,31 +483,34 @@ def generate_mixed_problem(args):
                        ("c{}".format(i), "soft") for i in
                        list(range(constraint_count))]
         # Randomly add edges
-        edges = defaultdict(lambda: [])  # final set of edges
+        available_edges = AvailableEdges(nodes, constraints, arity)
+        edges = available_edges.edges  # final set of edges
 
-        # Available edges at a given run
-        available_edges = {n: constraints.copy() for n in nodes}
         # First, make sure each variable has one constraint
+        random.shuffle(constraints)
         for n in nodes:
             if constraints:
-                node = n
-                c = constraints.pop(random.randint(0, len(constraints) - 1))
+                c = constraints.pop()
             else:
-                node, c = choose_in_available_edges(available_edges, n)
-            add_edge(node, c, available_edges, edges, arity)
+                _, c = available_edges.choose(n)
+                if c is None:
+                    logger.warning('Variable %s is not used in any '
+                                   'constraint', n)
+                    continue
+            available_edges.add(n, c)
             logger.debug('Add edge (%s, %s)', n, c)
         edges_count -= variable_count
 
         # Second, make sure each constraint is used
         for c in constraints:
             n = random.choice(nodes)
-            add_edge(n, c, available_edges, edges, arity)
+            available_edges.add(n, c)
             edges_count -= 1
             logger.debug('Add edge (%s, %s)', n, c)
 
         # Third, randomly add remaining constraints
-        while edges_count != 0:
-            n, c = choose_in_available_edges(available_edges)
+        while edges_count > 0:
+            n, c = available_edges.choose()
             if (n, c) == (None, None):
                 # If more edges than possible are asked, returns just the maximum
                 # edges (regarding nodes number and constraints arity)
@@ -511,7 +522,7 @@ def generate_mixed_problem(args):
                     args.arity)
                 break
             else:
-                add_edge(n, c, available_edges, edges, arity)
+                available_edges.add(n, c)
                 edges_count -= 1
 
         # Now create a DCOP from the graph
@@ -520,12 +531,12 @@ def generate_mixed_problem(args):
             variables[name] = Variable(name, d)
             if auto_agents:
                 a_name = 'a' + str(i)
-                agents[a_name] = AgentDef(a_name, capacity)
+                agents[a_name] = AgentDef(a_name, capacity=capacity)
 
         if not auto_agents:
             for i in range(agents_count):
                 a_name = 'a' + str(i)
-                agents[a_name] = AgentDef(a_name, capacity)
+                agents[a_name] = AgentDef(a_name, capacity=capacity)
 
         constraints = {}
         for c, neighbors in edges.items():
@@ -567,40 +578,16 @@ def generate_mixed_problem(args):
                     expression = addition_string
 
             constraints[name] = relation_from_str(name, expression, c_variables)
-            logger.debug(repr(constraints[name]))
+            logger.debug('%r', constraints[name])
 
     dcop = DCOP('mixed constraints problem', 'min',
                 domains={'levels': d}, variables=variables,
                 constraints= constraints, agents= agents)
 
-    if args.output is not None:
-        outputfile = args.output[0]
-        if args.correct_density:
-            outputfile = correct_density(outputfile, real_density)
-        write_in_file(outputfile, dcop_yaml(dcop))
-    else:
-        print(dcop_yaml(dcop))
-
-
-def choose_in_available_edges(available_edges, n=None):
-    """
-    Randomly choose an edge among available edges (ie not already existing)
-    :param n: A node to be in the edge
-    :param available_edges: The dictionary of available_edges for each node {
-    node: list of constraints}
-    :return: the chosen edge as a couplt (variable node, constraint node)
-    """
-    if not available_edges:
-        return (None, None)
-    if n is not None:
-        node = n
-        c = random.choice(available_edges[n])
-    else:
-        node, available_constraints = random.choice(list(
-            available_edges.items()))
-        c = random.choice(available_constraints)
-
-    return (node, c)
+    outputfile = args.output
+    if outputfile and args.correct_density:
+        outputfile = correct_density(outputfile, real_density)
+    write_dcop(dcop, outputfile, args.format)
 
 
 def choose_weight() -> float:
@@ -611,39 +598,85 @@ def choose_weight() -> float:
     return w
 
 
-def add_edge(n: int, c: Tuple[str, str],
-             available: Dict[int, List[Tuple[str, str]]],
-             edges: Dict[Tuple[str, str], List[int]],
-             arity: int):
-    edges[c].append(n)
-    available[n].remove(c)
-    # if a constraint has reached the max arity, it can't be chosen anymore
-    if len(edges[c]) == arity:
-        to_be_removed = list()
-        for node, l in available.items():
-            if node != n and c in l:
-                l.remove(c)
-            if not l:
-                # Can't remove it while iterating
-                to_be_removed.append(node)
-        for n in to_be_removed:
-            available.pop(n)
-
-    # In case a node has removed the last constraint from its available
-    # constraints, but this constraint has not maximum arity, we still have
-    # to remove this node from the possible future edges
-    if n in available and not available[n]:
-        available.pop(n)
-
-
-def write_in_file(filename: str, dcop_str: str):
-    path = '/'.join(filename.split('/')[:-1])
-
-    if (path != '') and (not os.path.exists(path)):
-        os.makedirs(path)
+class AvailableEdges(object):
+    """
+    Edges of a random bipartite graph between variables and constraints.
+
+    Keeps the constraints which have not reached the maximum arity, which
+    can still be used for new edges, in a list where they can be
+    randomly chosen and removed in O(1).
+
+    Parameters
+    ----------
+    nodes: list of int
+        the variables nodes
+    constraints: list of (str, str) tuples
+        the constraints nodes
+    arity: int
+        the maximum arity of the constraints
+    """
 
-    with open(filename, 'w', encoding='utf-8') as f:
-        f.write(dcop_str)
+    def __init__(self, nodes: List[int], constraints: List[Tuple[str, str]],
+                 arity: int):
+        self.nodes = nodes
+        self.arity = arity
+        # constraint -> variables of the constraint
+        self.edges = defaultdict(lambda: [])  \
+            # type: Dict[Tuple[str, str], List[int]]
+        self._open = list(constraints)
+        self._positions = {c: i for i, c in enumerate(self._open)}
+
+    def add(self, n: int, c: Tuple[str, str]):
+        self.edges[c].append(n)
+        # if a constraint has reached the max arity, it can't be chosen
+        # anymore: swap it with the last open constraint and remove it.
+        if len(self.edges[c]) == self.arity and c in self._positions:
+            i = self._positions.pop(c)
+            last = self._open.pop()
+            if last != c:
+                self._open[i] = last
+                self._positions[last] = i
+
+    def choose(self, n: int=None):
+        """
+        Randomly choose an edge among available edges (ie not already
+        existing).
+
+        Parameters
+        ----------
+        n: int
+            A node to be in the edge
+
+        Returns
+        -------
+        the chosen edge as a couple (variable node, constraint node),
+        or (None, None) if there is no available edge.
+        """
+        if not self._open:
+            return None, None
+        if n is not None:
+            # A node is only used in a few constraints, try random
+            # constraints before looking for the ones not using it.
+            for _ in range(10):
+                c = random.choice(self._open)
+                if n not in self.edges.get(c, ()):
+                    return n, c
+            candidates = [c for c in self._open
+                          if n not in self.edges.get(c, ())]
+            if not candidates:
+                return None, None
+            return n, random.choice(candidates)
+
+        c = random.choice(self._open)
+        used = self.edges.get(c, ())
+        if 2 * len(used) < len(self.nodes):
+            # Rejection sampling is fast when the constraint is far from
+            # using all variables
+            while True:
+                n = random.choice(self.nodes)
+                if n not in used:
+                    return n, c
+        return random.choice([n for n in self.nodes if n not in used]), c
 
 
 def find_objective(weights: List[float], n: int, is_hard: bool):
@@ -696,11 +729,7 @@ def generate_ising(args):
     for c in constraints.values():
         dcop.add_constraint(c)
 
-    if args.output:
-        outputfile = args.output[0]
-        write_in_file(outputfile, dcop_yaml(dcop))
-    else:
-        print(dcop_yaml(dcop))
+    write_dcop(dcop, args.output, args.format)
 
 
 def _create_ising_constraint(i, j, i1, j1, domain_size, variables):
@@ -37,10 +37,10 @@ This generator generates both a dcop and its initial distribution.
 
 import logging, os
 from importlib import import_module
-from random import randint
 from typing import List, Tuple, Dict, Callable
 
 import networkx as nx
+import numpy as np
 from collections import defaultdict
 
 import yaml
@@ -48,14 +48,14 @@ from pulp.constants import LpBinary, LpMinimize, LpStatusOptimal
 from pulp.pulp import LpVariable, LpProblem, lpSum, value, LpAffineExpression
 from pulp.solvers import GLPK_CMD
 
+from pydcop.commands._utils import write_dcop
 from pydcop.computations_graph.factor_graph import VariableComputationNode, \
     FactorComputationNode
 from pydcop.computations_graph.objects import ComputationGraph, ComputationNode
 from pydcop.dcop.dcop import DCOP
 from pydcop.dcop.objects import Variable, Domain, AgentDef
 from pydcop.dcop.relations import NAryMatrixRelation, assignment_matrix, \
-    random_assignment_matrix, Constraint
-from pydcop.dcop.yamldcop import dcop_yaml
+    random_assignment_matrices, Constraint
 from pydcop.distribution import ilp_compref
 from pydcop.distribution.objects import Distribution, \
     ImpossibleDistributionException
@@ -66,7 +66,7 @@ RATIO_HOST_COMM = 0.5
 
 
 def generate_iot(args):
-    print('generate iot ', args.output)
+    logger.info('generate iot %s', args.output)
 
     # Constraints and variables with a power-law constraint graph:
     variables, constraints, domain = generate_powerlaw_var_constraints(
@@ -120,10 +120,8 @@ def generate_iot(args):
 
     distribution = Distribution(mapping)
 
+    write_dcop(dcop, args.output, args.format)
     if args.output:
-        outputfile = args.output
-        write_in_file(outputfile, dcop_yaml(dcop))
-
         dist = distribution.mapping()
         cost = ilp_compref.distribution_cost(
             distribution, cg, dcop.agents.values(),
@@ -142,8 +140,6 @@ def generate_iot(args):
         }
         outputfile = 'dist_' + args.output
         write_in_file(outputfile, yaml.dump(result))
-    else:
-        print(dcop_yaml(dcop))
 
 
 def generate_powerlaw_var_constraints(
@@ -187,11 +183,15 @@ def generate_powerlaw_var_constraints(
         logger.debug('Create var for node %s : %s', n, v)
 
     constraints = {}
-    for i, (n1, n2) in enumerate(graph.edges):
+    # All matrices are generated at once, which is much faster than
+    # generating them one by one.
+    edges = list(graph.edges)
+    matrices = random_assignment_matrices([domain, domain],
+                                          range(constraint_range), len(edges))
+    for i, (n1, n2) in enumerate(edges):
         v1 = variables[var_name(n1)]
         v2 = variables[var_name(n2)]
-        values = random_assignment_matrix([v1, v2], range(constraint_range))
-        c = NAryMatrixRelation([v1, v2], values, name=c_name(n1, n2))
+        c = NAryMatrixRelation([v1, v2], matrices[i], name=c_name(n1, n2))
         logger.debug('Create constraints for edge (%s, %s) : %s', v1, v2, c)
         constraints[c.name] = c
 
@@ -250,7 +250,9 @@ def agt_hosting_costs(var_comp: ComputationNode, cg: ComputationGraph) \
     a dict {computation_name: float} representing the hosting cost for each
     computation on this agent.
     """
-    hosting_costs = {c.name: randint(0, 10) for c in cg.nodes}
+    names = [c.name for c in cg.nodes]
+    hosting_costs = dict(zip(names,
+                             np.random.randint(0, 11, len(names)).tolist()))
     hosting_costs[var_comp.name] = 0
     return hosting_costs
 
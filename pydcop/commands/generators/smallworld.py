@@ -29,16 +29,16 @@
 # POSSIBILITY OF SUCH DAMAGE.
 
 
-import logging, os
+import logging
 from importlib import import_module
 
 import networkx as nx
 
+from pydcop.commands._utils import write_dcop
 from pydcop.dcop.dcop import DCOP
 from pydcop.dcop.objects import Variable, Domain, AgentDef
 from pydcop.dcop.relations import NAryMatrixRelation, assignment_matrix, \
-    random_assignment_matrix
-from pydcop.dcop.yamldcop import dcop_yaml
+    random_assignment_matrices
 
 logger = logging.getLogger('pydcop.generate')
 
@@ -63,11 +63,15 @@ def generate_small_world(args):
         logger.debug('Create var for node %s : %s', n, v)
 
     constraints = {}
-    for i, (n1, n2) in enumerate(graph.edges):
+    # All matrices are generated at once, which is much faster than
+    # generating them one by one.
+    edges = list(graph.edges)
+    matrices = random_assignment_matrices([domain, domain],
+                                          range(args.range), len(edges))
+    for i, (n1, n2) in enumerate(edges):
         v1 = variables[var_name(n1)]
         v2 = variables[var_name(n2)]
-        values = random_assignment_matrix([v1, v2], range(args.range))
-        c = NAryMatrixRelation([v1, v2], values, name= c_name(n1, n2))
+        c = NAryMatrixRelation([v1, v2], matrices[i], name= c_name(n1, n2))
         logger.debug('Create constraints for edge (%s, %s) : %s', v1, v2, c)
         constraints[c.name] = c
 
@@ -93,21 +97,27 @@ def generate_small_world(args):
     big_agents = [agt_name(i) for i in range(95, 100)]
     hosting_factor = 10
 
+    # Hosting costs only depend on the kind of the agent, all agents of the
+    # same kind share the same dict.
+    small_hosting_costs = {}
+    avg_hosting_costs = {}
+    big_hosting_costs = {}
+    for n in cg.nodes:
+        # small_hosting_costs[n.name] = hosting_factor * \
+        #                         abs(small_capa -footprints[n.name])
+        small_hosting_costs[n.name] = footprints[n.name] / small_capa
+        avg_hosting_costs[n.name] = footprints[n.name] / avg_capa
+        big_hosting_costs[n.name] = footprints[n.name] / big_capa
+
     for a in small_agents:
         # communication costs with all other agents
         comm_costs = {other: 6 for other in small_agents
                       if other!=a}
         comm_costs.update({other: 8 for other in avg_agents})
         comm_costs.update({other: 10 for other in big_agents})
-        # hosting cost for all computations
-        hosting_costs = {}
-        for n in cg.nodes:
-            # hosting_costs[n.name] = hosting_factor * \
-            #                         abs(small_capa -footprints[n.name])
-            hosting_costs[n.name] = footprints[n.name] / small_capa
 
         agt = AgentDef(a, default_hosting_cost=default_hosting_cost,
-                       hosting_costs = hosting_costs,
+                       hosting_costs = small_hosting_costs,
                        default_route = 10, routes= comm_costs,
                        capacity=small_capa)
         agents[agt.name] = agt
@@ -119,15 +129,9 @@ def generate_small_world(args):
         comm_costs.update({other: 2 for other in avg_agents
                            if other != a})
         comm_costs.update({other: 4 for other in big_agents})
-        # hosting cost for all computations
-        hosting_costs = {}
-        for n in cg.nodes:
-            # hosting_costs[n.name] = hosting_factor * \
-            #                         abs(avg_capa - footprints[n.name])
-            hosting_costs[n.name] = footprints[n.name] / avg_capa
 
         agt = AgentDef(a, default_hosting_cost=default_hosting_cost,
-                       hosting_costs = hosting_costs,
+                       hosting_costs = avg_hosting_costs,
                        default_route = 10, routes= comm_costs,
                        capacity=avg_capa)
         agents[agt.name] = agt
@@ -139,13 +143,9 @@ def generate_small_world(args):
         comm_costs.update({other: 4 for other in avg_agents})
         comm_costs.update({other: 1 for other in big_agents
                            if other != a})
-        # hosting cost for all computations
-        hosting_costs = {}
-        for n in cg.nodes:
-            hosting_costs[n.name] = footprints[n.name] / big_capa
 
         agt = AgentDef(a, default_hosting_cost=default_hosting_cost,
-                       hosting_costs = hosting_costs,
+                       hosting_costs = big_hosting_costs,
                        default_route = 10, routes= comm_costs,
                        capacity=big_capa)
         agents[agt.name] = agt
@@ -157,11 +157,7 @@ def generate_small_world(args):
                 agents=agents,
                 constraints=constraints)
 
-    if args.output:
-        outputfile = args.output[0]
-        write_in_file(outputfile, dcop_yaml(dcop))
-    else:
-        print(dcop_yaml(dcop))
+    write_dcop(dcop, args.output, args.format)
 
 
 def agt_name(i:int):
@@ -175,12 +171,3 @@ def var_name(i:int):
 def c_name(i: int, j: int):
     return 'c{:03d}_{:03d}'.format(i, j)
 
-
-def write_in_file(filename: str, dcop_str: str):
-    path = '/'.join(filename.split('/')[:-1])
-
-    if (path != '') and (not os.path.exists(path)):
-        os.makedirs(path)
-
-    with open(filename, 'w', encoding='utf-8') as f:
-        f.write(dcop_str)
\ No newline at end of file
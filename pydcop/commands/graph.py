@@ -40,7 +40,8 @@ Synopsis
 --------
 ::
 
-  pydcop graph --graph <graph_model> <dcop_files>
+  pydcop graph --graph <graph_model> [--heuristic <heuristic>]
+               [--util_memory] [--time_budget <seconds>] <dcop_files>
 
 
 Description
@@ -53,6 +54,15 @@ Outputs some metrics for a graph model for a DCOP:
 * density
 * edges_count
 * nodes_count
+* induced_width, only for the ``pseudotree`` graph model: the size of the
+  largest separator in the pseudo-tree, which determines the size of DPOP
+  UTIL messages
+* pseudotree_candidates, only for the ``pseudotree`` graph model and when
+  ``--util_memory`` is used: for each candidate pseudo-tree, the heuristic
+  used to build it, its induced width, the number of entries of its largest
+  UTIL message (``max_util_size``) and an estimation of the memory needed
+  for all its UTIL messages, in bytes (``util_memory``). Candidates are
+  sorted from the best to the worst, i.e. by ``max_util_size``.
 
 
 Options
@@ -65,6 +75,22 @@ Options
   The set of computation to distribute depends on the graph model used to
   represent the DCOP.
 
+``--heuristic <heuristic>``
+  Only for the ``pseudotree`` graph model. The heuristic used to build the
+  pseudo-tree, one of ``most_connected`` (the default), ``max_degree``,
+  ``min_degree``, ``min_fill`` and ``optimized`` (the best candidate
+  pseudo-tree found within the time budget). The same heuristic can be used
+  when solving a DCOP with dpop, with its ``pseudotree`` parameter.
+
+``--util_memory``
+  Only for the ``pseudotree`` graph model. Build several candidate
+  pseudo-trees, with different heuristics and randomized restarts, and
+  output the estimated DPOP UTIL memory for each of them.
+
+``--time_budget <seconds>``
+  Time budget for building candidate pseudo-trees with ``--util_memory``
+  or ``--heuristic optimized``, defaults to 1 second.
+
 ``<dcop-files>``
   One or several paths to the files containing the dcop. If several paths are
   given, their content is concatenated as used a the yaml definition for the
@@ -119,6 +145,19 @@ def set_parser(subparsers):
                                  'constraints_hypergraph'],
                         help='graphical model for dcop computations')
 
+    parser.add_argument('--heuristic', type=str, default=None,
+                        help='for pseudotree, the heuristic used to build '
+                             'the pseudo-tree')
+    parser.add_argument('--util_memory', action='store_true',
+                        default=False,
+                        help='for pseudotree, output the estimated DPOP '
+                             'UTIL memory for several candidate '
+                             'pseudo-trees')
+    parser.add_argument('--time_budget', type=float, default=1,
+                        help='time budget, in seconds, for building '
+                             'candidate pseudo-trees with --util_memory '
+                             'or --heuristic optimized')
+
 
 def run_cmd(args):
     logger.debug('dcop command "graph" with arguments {} '.format(args))
@@ -127,21 +166,40 @@ def run_cmd(args):
     logger.info('loading dcop from {}'.format(dcop_yaml_file))
     dcop = load_dcop_from_file(dcop_yaml_file)
 
+    if args.util_memory and args.graph != 'pseudotree':
+        _error('--util_memory can only be used with the pseudotree graph '
+               'model')
+    if args.heuristic is not None and args.graph != 'pseudotree':
+        _error('--heuristic can only be used with the pseudotree graph '
+               'model')
+
     try:
         graph_module = import_module('pydcop.computations_graph.{}'.
                                      format(args.graph))
-        graph_stats(dcop, graph_module)
     except ImportError:
         _error('Could not find computation graph type: {}'.format(
             args.graph))
+    graph_params = {}
+    if args.heuristic is not None:
+        graph_params['heuristic'] = args.heuristic
+        if args.heuristic == 'optimized':
+            graph_params['time_budget'] = args.time_budget
+    graph_stats(dcop, graph_module,
+                args.time_budget if args.util_memory else None,
+                graph_params)
 
 
-def graph_stats(dcop, graph_module):
+def graph_stats(dcop, graph_module, candidates_budget=None,
+                graph_params=None):
 
     # Build factor-graph computation graph
     logger.info('Building computation graph for dcop {}'
                 .format(dcop.name))
-    cg = graph_module.build_computation_graph(dcop)
+    try:
+        cg = graph_module.build_computation_graph(dcop,
+                                                  **(graph_params or {}))
+    except ValueError as e:
+        _error(e)
 
     edges_count = len(list(cg.links))
     nodes_count = len(list(cg.nodes))
@@ -165,6 +223,18 @@ def graph_stats(dcop, graph_module):
         'edges_count':  edges_count,
         'density': density
     }
+    if hasattr(cg, 'induced_width'):
+        result['induced_width'] = cg.induced_width
+    if candidates_budget is not None:
+        candidates = graph_module.pseudotree_candidates(
+            dcop, time_budget=candidates_budget)
+        candidates.sort(key=lambda c: (c.max_util_size, c.util_memory))
+        result['pseudotree_candidates'] = [
+            {'heuristic': c.heuristic,
+             'induced_width': c.induced_width,
+             'max_util_size': c.max_util_size,
+             'util_memory': c.util_memory}
+            for c in candidates]
     print(yaml.dump(result, default_flow_style=False))
 
 
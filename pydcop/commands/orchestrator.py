@@ -43,7 +43,8 @@ Synopsis
 ::
 
   pydcop orchestrator --algo <algo> [--algo_params <params>]
-                      --distribution <distribution>
+                      --distribution <distribution> [--no-cache]
+                      [--profile <directory>]
                       <dcop_files>
 
 
@@ -82,6 +83,19 @@ Options
   Either a distribution algorithm ('oneagent', 'adhoc', 'ilp_fgdp', etc.) or
   the path to a yaml file containing the distribution
 
+``--no-cache``
+  Do not use the on-disk cache of distributions. By default, distributions
+  computed by a distribution algorithm are stored in a cache (in
+  ``$PYDCOP_CACHE_DIR``, or ``~/.cache/pydcop``) and reused when the
+  same dcop files are distributed again with the same parameters.
+
+``--profile <directory>``
+  Profile the messages handled by the orchestrator. When it stops, cProfile
+  statistics (``orchestrator.pstats``), sampled stacks in the collapsed
+  format used by flamegraph tools (``orchestrator.collapsed``) and
+  cumulative timers for each message handler
+  (``orchestrator_handlers.csv``) are written in this directory.
+
 ``<dcop_files>``
   One or several paths to the files containing the dcop. If several paths are
   given, their content is concatenated as used a the yaml definition for the
@@ -103,11 +117,13 @@ import logging
 import sys
 
 import multiprocessing
+from functools import partial
 from importlib import import_module
 from time import time
 
 from pydcop.algorithms import list_available_algorithms
-from pydcop.commands._utils import build_algo_def
+from pydcop.commands._utils import build_algo_def, cached_distribution, \
+    build_computation_graph
 from pydcop.dcop.yamldcop import load_dcop_from_file
 from pydcop.distribution.yamlformat import load_dist_from_file
 from pydcop.infrastructure.communication import HttpCommunicationLayer
@@ -141,6 +157,12 @@ def set_parser(subparsers):
                         choices=['oneagent', 'adhoc', 'ilp_fgdp'],
                         help='algorithm for distributing the computation '
                              'graph')
+    parser.add_argument('--no-cache', dest='no_cache', action='store_true',
+                        default=False,
+                        help='do not use the on-disk cache of distributions')
+    parser.add_argument('--profile', type=str, default=None,
+                        help='profile message handling and write results in '
+                             'this directory')
 
 
 orchestrator = None
@@ -162,27 +184,29 @@ def run_cmd(args):
     logger.info('loading dcop from {}'.format(dcop_yaml_files))
     dcop = load_dcop_from_file(dcop_yaml_files)
 
+    algo = build_algo_def(algo_module, args.algo, dcop.objective,
+                            args.algo_params)
+
     # Build factor-graph computation graph
     logger.info('Building computation graph for dcop {}'
                 .format(dcop_yaml_files))
-    cg = graph_module.build_computation_graph(dcop)
+    cg = build_computation_graph(graph_module, dcop, algo_module, algo)
 
     logger.info('Distributing computation graph ')
     if dist_module is not None:
-        distribution = dist_module.distribute(
-            cg, dcop.agents.values(),
-            hints=dcop.dist_hints,
-            computation_memory=algo_module.computation_memory,
-            communication_load=algo_module.communication_load)
+        distribution = cached_distribution(
+            partial(dist_module.distribute, cg, dcop.agents.values(),
+                    hints=dcop.dist_hints,
+                    computation_memory=algo_module.computation_memory,
+                    communication_load=algo_module.communication_load),
+            not args.no_cache, dcop_yaml_files, cg, args.distribution, dcop,
+            algo_module)
     else:
         distribution = load_dist_from_file(args.distribution)
         logger.debug('Distribution Computation graph: %s ', distribution)
 
     logger.info('Dcop distribution : {}'.format(distribution))
 
-    algo = build_algo_def(algo_module, args.algo, dcop.objective,
-                            args.algo_params)
-
     # When using the (default) 'fork' start method, http servers on agent's
     # processes do not work (why ?)
     multiprocessing.set_start_method('spawn')
@@ -194,7 +218,7 @@ def run_cmd(args):
     port = 9000
     comm = HttpCommunicationLayer(('127.0.0.1', port))
     orchestrator = Orchestrator(algo, cg, distribution, comm, dcop,
-                                infinity)
+                                infinity, profile=args.profile)
 
     start_time = time()
     orchestrator.start()
@@ -64,6 +64,11 @@ To distribute computations' replicas, one need :
 * route costs & agents preferences
   => these are given in the dcop definition yaml file
 
+Each agent replicates all the computations it hosts at once: a single
+uniform-cost search, whose requests carry the whole batch of computations,
+places the replicas of all these computations, each host accepting the
+replicas that fit in its capacity.
+
 
 Options
 -------
@@ -95,7 +100,7 @@ from threading import Timer
 import yaml
 
 from pydcop.algorithms import list_available_algorithms
-from pydcop.commands._utils import build_algo_def
+from pydcop.commands._utils import build_algo_def, build_computation_graph
 from pydcop.dcop.yamldcop import load_dcop_from_file
 from pydcop.distribution.yamlformat import load_dist_from_file
 from pydcop.infrastructure.run import run_local_thread_dcop, \
@@ -161,7 +166,7 @@ def run_cmd(args, timer: Timer):
         graph_module = import_module('pydcop.computations_graph.{}'.
                                      format(algo_module.GRAPH_TYPE))
         logger.info('Building computation graph ')
-        cg = graph_module.build_computation_graph(dcop)
+        cg = build_computation_graph(graph_module, dcop, algo_module, algo)
         logger.info('Computation graph : %s', cg)
 
     except ImportError:
@@ -86,11 +86,13 @@ import sys
 
 from pydcop.algorithms import list_available_algorithms
 from pydcop.commands._utils import _error, prepare_metrics_files, \
-    _load_modules, build_algo_def, collect_tread, add_csvline
+    _load_modules, build_algo_def, collect_tread, add_csvline, columns, \
+    build_computation_graph
 from pydcop.dcop.yamldcop import load_dcop_from_file, load_scenario_from_file
 from pydcop.distribution.yamlformat import load_dist_from_file
 from pydcop.infrastructure.run import run_local_thread_dcop, \
     run_local_process_dcop
+from pydcop.infrastructure.stats import msg_metrics_columns, nccc_columns
 from pydcop.replication.yamlformat import load_replica_dist, \
     load_replica_dist_from_file
 
@@ -136,6 +138,11 @@ def set_parser(subparsers):
 
     parser.add_argument('-s', '--scenario', required=True,
                         help='scenario file')
+    parser.add_argument('--repair', default='dcop',
+                        choices=['dcop', 'incremental'],
+                        help='method used to repair the distribution when '
+                             'agents leave: a repair dcop or a centralized '
+                             'incremental redistribution')
 
     parser.add_argument('-m', '--mode',
                         default='thread',
@@ -160,6 +167,12 @@ def set_parser(subparsers):
                         default=None,
                         help="Use this option to append the metrics of the "
                              "end of the run to a csv file.")
+    parser.add_argument('--msg_metrics', action='store_true', default=False,
+                        help='Collect histograms on messages queue wait, '
+                             'handling and sending times.')
+    parser.add_argument('--nccc', action='store_true', default=False,
+                        help='Count constraint checks and non-concurrent '
+                             'constraint checks.')
 
     # TODO : remove, this should no be at this level
     parser.add_argument('--infinity', '-i', default=float('inf'),
@@ -195,6 +208,13 @@ def run_cmd(args, timer):
             _error('Cannot use "period" argument when collect_on is not '
                    '"period"')
 
+    if args.msg_metrics:
+        for mode in columns:
+            columns[mode] = columns[mode] + msg_metrics_columns
+    if args.nccc:
+        for mode in columns:
+            columns[mode] = columns[mode] + nccc_columns
+
     csv_cb = prepare_metrics_files(args.run_metrics, args.end_metrics,
                                    collect_on)
 
@@ -216,12 +236,12 @@ def run_cmd(args, timer):
     logger.info('loading scenario from {}'.format(args.scenario))
     scenario = load_scenario_from_file(args.scenario)
 
-    logger.info('Building computation graph ')
-    cg = graph_module.build_computation_graph(dcop)
-
     algo = build_algo_def(algo_module, args.algo, dcop.objective,
                          args.algo_params)
 
+    logger.info('Building computation graph ')
+    cg = build_computation_graph(graph_module, dcop, algo_module, algo)
+
     # Setup metrics collection
     collector_queue = Queue()
     collect_t = Thread(target=collect_tread,
@@ -236,7 +256,10 @@ def run_cmd(args, timer):
                                              collector=collector_queue,
                                              collect_moment=args.collect_on,
                                              period=period,
-                                             replication=args.replication_method)
+                                             replication=args.replication_method,
+                                             msg_metrics=args.msg_metrics,
+                                             nccc=args.nccc,
+                                             repair=args.repair)
     elif args.mode == 'process':
 
         # Disable logs from agents, they are in other processes anyway
@@ -250,7 +273,10 @@ def run_cmd(args, timer):
                                               INFINITY,
                                               collector=collector_queue,
                                               collect_moment=args.collect_on,
-                                              period=period)
+                                              period=period,
+                                              msg_metrics=args.msg_metrics,
+                                              nccc=args.nccc,
+                                              repair=args.repair)
 
     orchestrator.set_error_handler(_orchestrator_error)
 
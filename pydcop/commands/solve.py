@@ -43,12 +43,17 @@ Synopsis
 ::
 
   pydcop solve --algo <algo> [--algo_params <params>]
-               [--distribution <distribution>]
+               [--distribution <distribution>] [--no-cache]
                [--mode <mode>]
                [--collect_on <collect_mode>]
                [--period <p>]
+               [--max_metrics_rate <rate>]
                [--run_metrics <file>]
                [--end_metrics <file>]
+               [--msg_metrics]
+               [--profile <directory>]
+               [--trace <file>]
+               [--nccc]
                <dcop_files>
 
 
@@ -94,6 +99,14 @@ Options
   Either a distribution algorithm ('oneagent', 'adhoc', 'ilp_fgdp', etc.) or
   the path to a yaml file containing the distribution
 
+``--no-cache``
+  Do not use the on-disk cache of distributions. By default, distributions
+  computed by a distribution algorithm are stored in a cache (in
+  ``$PYDCOP_CACHE_DIR``, or ``~/.cache/pydcop``) and reused when the
+  same dcop files are distributed again with the same parameters.
+  Distributions computed within a time budget (with the ``portfolio``
+  method or a ``time_limit`` parameter) are never cached.
+
 ``--mode <mode>`` / ``-m``
     Indicated if agents must be run as threads (default) or processes.
     either ``'thread'`` or ``'process'``
@@ -106,6 +119,13 @@ Options
     When using ``--collect_on period``, the period in second for metrics
     collection.
 
+``--max_metrics_rate <rate>``
+    Maximum number of metrics per second collected when using
+    ``--collect_on value_change`` or ``--collect_on period``. With many
+    agents, value changes can be much more frequent than what is needed for
+    the run metrics: metrics are then only collected at this rate and the
+    last metrics are always collected. Not limited by default.
+
 ``--run_metrics <file>``
     File to store store metrics.
 
@@ -113,6 +133,39 @@ Options
     End metrics (i.e. when the solve process stops) will be appended to this
     file.
 
+``--msg_metrics``
+    Collect histograms of the time messages wait in the agents' queues,
+    of the time spent handling them (by message type and by computation) and
+    of the time needed to send them. These histograms are aggregated in the
+    ``msg_metrics`` entry of the results and their mean and 99th percentile
+    are added to the metrics csv files. Disabled by default.
+
+``--profile <directory>``
+    Profile the messages handled by the agents and the orchestrator. When
+    they stop, each agent writes in this directory its cProfile statistics
+    (``<agent>.pstats``), its sampled stacks in the collapsed format used by
+    flamegraph tools (``<agent>.collapsed``) and cumulative timers for each
+    of its message handlers (``<agent>_handlers.csv``). Unlike running the
+    whole command under cProfile, this also works with thread agents.
+
+``--trace <file>``
+    Write a record in this file for each step performed by the computations
+    (i.e. for each message they handle), with the statistics returned by the
+    algorithm (number and size of messages sent, number of logic
+    operations, etc.) and, with
+    ``--nccc``, the constraint checks and NCCC counts. The file is
+    written as Parquet if its name ends with ``.parquet`` and pyarrow is
+    installed, and as CSV otherwise. In ``process`` mode, each agent writes
+    its own file, whose name is suffixed with the agent's name.
+
+``--nccc``
+    Count the constraint checks performed by the computations. Messages
+    carry the logical clock of their sender, which gives the number of
+    non-concurrent constraint checks (NCCC), the standard measure of the
+    computational effort of DCOP algorithms. ``nccc`` and
+    ``constraint_checks`` are added to the results and to the metrics csv
+    files. Disabled by default, as it slows down constraints evaluation.
+
 ``<dcop_files>``
   One or several paths to the files containing the dcop. If several paths are
   given, their content is concatenated as used a the yaml definition for the
@@ -141,11 +194,13 @@ from threading import Thread
 import multiprocessing
 
 from pydcop.algorithms import list_available_algorithms
-from pydcop.commands._utils import build_algo_def, _error, _load_modules
+from pydcop.commands._utils import build_algo_def, _error, _load_modules, \
+    cached_distribution, build_computation_graph
 from pydcop.dcop.yamldcop import load_dcop_from_file
 from pydcop.distribution.yamlformat import load_dist_from_file
 from pydcop.infrastructure.run import run_local_thread_dcop, \
     run_local_process_dcop
+from pydcop.infrastructure.stats import msg_metrics_columns, nccc_columns
 
 
 logger = logging.getLogger('pydcop.cli.solve')
@@ -179,6 +234,9 @@ def set_parser(subparsers):
                              'for distributing the computation graph, if not '
                              'given the `oneagent` will be used (one '
                              'computation for each agent)')
+    parser.add_argument('--no-cache', dest='no_cache', action='store_true',
+                        default=False,
+                        help='do not use the on-disk cache of distributions')
     parser.add_argument('-m', '--mode',
                         default='thread',
                         choices=['thread', 'process'],
@@ -188,13 +246,17 @@ def set_parser(subparsers):
                         choices=['value_change', 'cycle_change', 'period'],
                         default='value_change',
                         help='When should a "new" assignment be observed')
-
     parser.add_argument('--period', type=float,
                         default=None,
                         help='Period for collecting metrics. only available '
                              'when using --collect_on period. Defaults to 1 '
                              'second if not specified')
 
+    parser.add_argument('--max_metrics_rate', type=float,
+                        default=None,
+                        help='Maximum number of metrics per second, when '
+                             'using --collect_on value_change or period.')
+
     parser.add_argument('--run_metrics', type=str,
                         default=None,
                         help="Use this option to regularly store the data "
@@ -205,6 +267,22 @@ def set_parser(subparsers):
                         help="Use this option to append the metrics of the "
                              "end of the run to a csv file.")
 
+    parser.add_argument('--msg_metrics', action='store_true', default=False,
+                        help='Collect histograms on messages queue wait, '
+                             'handling and sending times.')
+
+    parser.add_argument('--profile', type=str, default=None,
+                        help='profile message handling and write results in '
+                             'this directory')
+
+    parser.add_argument('--trace', type=str, default=None,
+                        help='write a record for each computation step in '
+                             'this file')
+
+    parser.add_argument('--nccc', action='store_true', default=False,
+                        help='Count constraint checks and non-concurrent '
+                             'constraint checks.')
+
     parser.add_argument('--infinity', '-i', default=float('inf'),
                         type=float,
                         help='Argument to determine the value used for '
@@ -234,7 +312,9 @@ end_metrics = None
 
 
 def add_csvline(file, mode, metrics):
-    data = [metrics[c] for c in columns[mode]]
+    # Use get, as some metrics (e.g. messages metrics) may not be available
+    # yet when the first lines are written.
+    data = [metrics.get(c) for c in columns[mode]]
     line = ','.join([str(d) for d in data])
 
     with open(file, mode='at', encoding='utf-8') as f:
@@ -308,6 +388,18 @@ def run_cmd(args, timer=None):
             _error('Cannot use "period" argument when collect_on is not '
                    '"period"')
 
+    max_rate = args.max_metrics_rate
+    if max_rate is not None and args.collect_on == 'cycle_change':
+        _error('Cannot use "max_metrics_rate" argument with '
+               '"cycle_change" collect_on')
+
+    if args.msg_metrics:
+        for mode in columns:
+            columns[mode] = columns[mode] + msg_metrics_columns
+    if args.nccc:
+        for mode in columns:
+            columns[mode] = columns[mode] + nccc_columns
+
     csv_cb = prepare_metrics_files(args.run_metrics, args.end_metrics,
                                    collect_on)
 
@@ -322,27 +414,29 @@ def run_cmd(args, timer=None):
     logger.info('loading dcop from {}'.format(args.dcop_files))
     dcop = load_dcop_from_file(args.dcop_files)
 
+    algo = build_algo_def(algo_module, args.algo, dcop.objective,
+                            args.algo_params)
+
     # Build factor-graph computation graph
     logger.info('Building computation graph ')
-    cg = graph_module.build_computation_graph(dcop)
+    cg = build_computation_graph(graph_module, dcop, algo_module, algo)
     logger.debug('Computation graph: %s ', cg)
 
     logger.info('Distributing computation graph ')
     if dist_module is not None:
-        distribution = dist_module.\
-            distribute(cg, dcop.agents.values(),
-                       hints=dcop.dist_hints,
-                       computation_memory=algo_module.computation_memory,
-                       communication_load=algo_module.communication_load)
+        distribution = cached_distribution(
+            partial(dist_module.distribute, cg, dcop.agents.values(),
+                    hints=dcop.dist_hints,
+                    computation_memory=algo_module.computation_memory,
+                    communication_load=algo_module.communication_load),
+            not args.no_cache, args.dcop_files, cg, args.distribution, dcop,
+            algo_module)
     else:
         distribution = load_dist_from_file(args.distribution)
     logger.debug('Distribution Computation graph: %s ', distribution)
 
     logger.info('Dcop distribution : {}'.format(distribution))
 
-    algo = build_algo_def(algo_module, args.algo, dcop.objective,
-                            args.algo_params)
-
     # Setup metrics collection
     collector_queue = Queue()
     collect_t = Thread(target=collect_tread,
@@ -356,7 +450,12 @@ def run_cmd(args, timer=None):
                                              INFINITY,
                                              collector=collector_queue,
                                              collect_moment=args.collect_on,
-                                             period=period)
+                                             period=period,
+                                             msg_metrics=args.msg_metrics,
+                                             profile=args.profile,
+                                             trace=args.trace,
+                                             nccc=args.nccc,
+                                             metrics_max_rate=max_rate)
     elif args.mode == 'process':
 
         # Disable logs from agents, they are in other processes anyway
@@ -370,7 +469,12 @@ def run_cmd(args, timer=None):
                                               INFINITY,
                                               collector=collector_queue,
                                               collect_moment=args.collect_on,
-                                              period=period)
+                                              period=period,
+                                              msg_metrics=args.msg_metrics,
+                                              profile=args.profile,
+                                              trace=args.trace,
+                                              nccc=args.nccc,
+                                              metrics_max_rate=max_rate)
 
     try:
         orchestrator.deploy_computations()
@@ -34,7 +34,7 @@ from typing import Iterable
 from pydcop.computations_graph.objects import ComputationNode, \
     ComputationGraph, Link
 from pydcop.dcop.dcop import DCOP, Variable
-from pydcop.dcop.relations import find_dependent_relations, Constraint
+from pydcop.dcop.relations import dependent_relations_index, Constraint
 
 """
 This module implements the classical constraint graph model.
@@ -213,17 +213,16 @@ def build_computation_graph(dcop: DCOP=None,
         if constraints or variables is not None:
             raise ValueError('Cannot use both dcop and constraints / '
                              'variables parameters')
-        for v in dcop.variables.values():
-            var_constraints = find_dependent_relations(
-                v, dcop.constraints.values())
-            computations.append(VariableComputationNode(v, var_constraints))
-    else:
-        if constraints is None or variables is None:
-            raise ValueError('Constraints AND variables parameters must be '
-                             'provided wgen not building the graph from a dcop')
-        for v in variables:
-            var_constraints = find_dependent_relations(v, constraints)
-            computations.append(VariableComputationNode(v, var_constraints))
+        variables = dcop.variables.values()
+        constraints = dcop.constraints.values()
+    elif constraints is None or variables is None:
+        raise ValueError('Constraints AND variables parameters must be '
+                         'provided wgen not building the graph from a dcop')
+
+    index = dependent_relations_index(constraints)
+    for v in variables:
+        var_constraints = index.get(v.name, [])
+        computations.append(VariableComputationNode(v, var_constraints))
 
     # links = []
     # for r in dcop.constraints.values():
@@ -38,7 +38,7 @@ from pydcop.computations_graph.objects import ComputationNode, Link,\
     ComputationGraph
 from pydcop.dcop.dcop import DCOP
 from pydcop.dcop.objects import Variable
-from pydcop.dcop.relations import Constraint, find_dependent_relations
+from pydcop.dcop.relations import Constraint, dependent_relations_index
 from pydcop.utils.simple_repr import SimpleRepr, simple_repr, from_repr
 
 
@@ -273,9 +273,11 @@ def build_computation_graph(dcop: DCOP,
             raise ValueError('Constraints AND variables parameters must be '
                              'provided wgen not building the graph from a dcop')
 
+    constraints = list(constraints)
+    var_constraints = dependent_relations_index(constraints)
     var_nodes = []
     for v in variables:
-        dep = find_dependent_relations(v, constraints)
+        dep = var_constraints.get(v.name, [])
         var_nodes.append(VariableComputationNode(
             v, constraints_names=[d.name for d in dep]))
 
@@ -29,7 +29,7 @@
 # POSSIBILITY OF SUCH DAMAGE.
 
 
-from typing import Iterable
+from typing import Iterable, List, Dict
 
 from pydcop.utils.simple_repr import SimpleRepr
 
@@ -194,6 +194,59 @@ class Link(SimpleRepr):
         return hash((self.type, self.nodes))
 
 
+class _NodesList(list):
+    """
+    The list of nodes of a `ComputationGraph`.
+
+    `version` is incremented each time the list is modified, which tells
+    the graph that its nodes index must be rebuilt.
+    """
+
+    def __init__(self, nodes: Iterable[ComputationNode]=()):
+        super().__init__(nodes)
+        self.version = 0
+
+    def __setitem__(self, key, value):
+        self.version += 1
+        super().__setitem__(key, value)
+
+    def __delitem__(self, key):
+        self.version += 1
+        super().__delitem__(key)
+
+    def __iadd__(self, other):
+        self.version += 1
+        return super().__iadd__(other)
+
+    def __imul__(self, n):
+        self.version += 1
+        return super().__imul__(n)
+
+    def append(self, node):
+        self.version += 1
+        super().append(node)
+
+    def extend(self, nodes):
+        self.version += 1
+        super().extend(nodes)
+
+    def insert(self, index, node):
+        self.version += 1
+        super().insert(index, node)
+
+    def pop(self, index=-1):
+        self.version += 1
+        return super().pop(index)
+
+    def remove(self, node):
+        self.version += 1
+        super().remove(node)
+
+    def clear(self):
+        self.version += 1
+        super().clear()
+
+
 class ComputationGraph(object):
     """
     A ComputationGraph represents a graph of computation for a dcop.
@@ -209,6 +262,11 @@ class ComputationGraph(object):
     properties) that return respectively the list of `ComputationNode`s and
     the list of  `Link`s of the graph
 
+    Nodes are indexed by name and the set of links is cached, so that
+    looking up a computation, its links or its neighbors does not require
+    scanning all nodes. The index and the cache are rebuilt when `nodes`
+    is assigned or when the list of nodes is modified.
+
     Parameters
     ----------
     graph_type:
@@ -230,14 +288,40 @@ class ComputationGraph(object):
     def __init__(self, graph_type: str=None,
                  nodes: Iterable[ComputationNode]=None)-> None:
         self.type = graph_type
-        self.nodes = [] if nodes is None else list(nodes)
+        self.nodes = [] if nodes is None else nodes
+
+    @property
+    def nodes(self) -> List[ComputationNode]:
+        return self._nodes
+
+    @nodes.setter
+    def nodes(self, nodes: Iterable[ComputationNode]):
+        self._nodes = _NodesList(nodes)
+        self._node_index = None
+        self._links = None
+
+    def _index(self) -> Dict[str, ComputationNode]:
+        # The node list may also have been modified in place, which is
+        # detected with its version.
+        if self._node_index is None or \
+                self._indexed_version != self._nodes.version:
+            index = {}
+            for n in self._nodes:
+                index.setdefault(n.name, n)
+            self._node_index = index
+            self._indexed_version = self._nodes.version
+            self._links = None
+        return self._node_index
 
     @property
     def links(self):
-        links = set()
-        for n in self.nodes:
-            links.update(l for l in n.links)
-        return links
+        self._index()
+        if self._links is None:
+            links = set()
+            for n in self._nodes:
+                links.update(n.links)
+            self._links = frozenset(links)
+        return self._links
 
     def computation(self, node_name: str)-> ComputationNode:
         """Return a computation node from its name.
@@ -263,10 +347,10 @@ class ComputationGraph(object):
         ComputationNode(a1)
 
         """
-        for n in self.nodes:
-            if node_name == n.name:
-                return n
-        raise KeyError('no computation named {} found'.format(node_name))
+        try:
+            return self._index()[node_name]
+        except KeyError:
+            raise KeyError('no computation named {} found'.format(node_name))
 
     def links_for_node(self, node_name: str) -> Iterable[Link]:
         """Return the links involving a given computation.
@@ -288,10 +372,10 @@ class ComputationGraph(object):
         >>> Link({'a1', 'a2'}) in cg.links_for_node('a1')
         True
         """
-        for n in self.nodes:
-            if n.name == node_name:
-                return n.links
-        raise KeyError('No node named '+node_name)
+        try:
+            return self._index()[node_name].links
+        except KeyError:
+            raise KeyError('No node named '+node_name)
 
     def neighbors(self, node_name: str) -> Iterable[str]:
         """Return the neighbors of a computation node.
@@ -317,10 +401,10 @@ class ComputationGraph(object):
         ['a2']
 
         """
-        for n in self.nodes:
-            if n.name == node_name:
-                return n.neighbors
-        raise KeyError('No node named '+node_name)
+        try:
+            return self._index()[node_name].neighbors
+        except KeyError:
+            raise KeyError('No node named '+node_name)
 
     def density(self):
         raise NotImplementedError('Abstract class')
@@ -36,17 +36,21 @@ where pseudo-parent and pseudo-children links are added to the tree.
  
  This model is typically used for the dpop algorithm.
 """
+import heapq
+import random
+from time import perf_counter
 from typing import Dict
 from typing import Iterable
 
 from collections import defaultdict
-from typing import List
+from typing import List, Set, Tuple
 
 from pydcop.computations_graph.objects import ComputationNode, \
     ComputationGraph, Link
 from pydcop.dcop.objects import Variable
 from pydcop.dcop.dcop import DCOP
-from pydcop.dcop.relations import RelationProtocol, Constraint
+from pydcop.dcop.relations import RelationProtocol, Constraint, \
+    dependent_relations_index
 from pydcop.utils.simple_repr import from_repr, simple_repr
 
 
@@ -181,12 +185,9 @@ class _BuildingNode(object):
     """
     This class is only used when building the pseudo tree and should never be
     used outside this module.
-
-     It should probably be refactored ...
     """
 
     def __init__(self, variable):
-        # super().__init__(variable.name, 'PseudoTreeComputation')
         self._variable = variable
         self._neighbors = []
         self.relations = []
@@ -194,7 +195,6 @@ class _BuildingNode(object):
         self.pseudo_parents = []
         self.pseudo_children = []
         self.children = []
-        self._visited = []
         self.root = False
 
     @property
@@ -209,55 +209,6 @@ class _BuildingNode(object):
     def variable(self):
         return self._variable
 
-    def handle_token(self, sender, token):
-        token = token[:]
-        self._visited.append(sender)
-        if sender is None:
-            # root
-            self.root = True
-            self._propagate(token)
-
-        elif self.parent is None and not self.root:
-            self.parent = sender
-            self.pseudo_parents = [n for n in self._neighbors if n in token
-                                   and n != sender]
-            self._neighbors.sort(
-                key=lambda x: x.count_neighbors_in_token(token),
-                reverse=True)
-            self._propagate(token)
-
-        else:
-            if sender in self.children:
-                pass
-            else:
-                self.pseudo_children.append(sender)
-
-    def _propagate(self, token):
-        token.append(self)
-
-        # heuristic :
-        # sort our neighbors based on the number of their neighbors are
-        # already in the token
-        self._neighbors.sort(key=lambda x: x.count_neighbors_in_token(token),
-                             reverse=True)
-
-        for n in self._neighbors:
-            if n not in self._visited:
-                if n not in self.pseudo_parents:
-                    self.children.append(n)
-                n.handle_token(self, token)
-
-    def count_neighbors_in_token(self, token):
-        """
-        Count the number of our neighbors that are in the token.
-        Used for DFS heuristic
-        """
-        c = 0
-        for n in self._neighbors:
-            if n in token:
-                c += 1
-        return c
-
     def neighbors_count(self):
         return len(self._neighbors)
 
@@ -268,68 +219,321 @@ class _BuildingNode(object):
         return 'Node ' + self.variable.name
 
 
-def _find_neighbors_relations(node, relations, nodes):
+# Heuristics available for building the pseudo-tree:
+#
+# * 'most_connected' : DFS tree, the root is the node with the highest number
+#   of neighbors, the neighbors of a node are visited by decreasing number of
+#   their neighbors that are already in the path from the root to the node.
+# * 'max_degree' : DFS tree, the root is the node with the highest number of
+#   neighbors, the neighbors of a node are visited by decreasing number of
+#   neighbors.
+# * 'min_fill': the variables are ordered with the greedy min-fill
+#   elimination heuristic and the pseudo-tree is built from this order: the
+#   parent of a variable is the first variable eliminated after it among its
+#   neighbors in the induced graph. The induced width of the pseudo-tree is
+#   the one of the elimination order, which is usually smaller than with
+#   DFS trees, but a parent is not always a neighbor of its children.
+#   Computing the order is expensive for graphs with a large induced width.
+# * 'min_degree': same as 'min_fill', with the greedy min-degree elimination
+#   heuristic, which is cheaper but usually gives a larger induced width.
+PSEUDOTREE_HEURISTICS = ['most_connected', 'max_degree', 'min_degree',
+                         'min_fill']
+_ELIMINATION_HEURISTICS = ['min_degree', 'min_fill']
+
+# Estimated size, in bytes, of one entry of a DPOP UTIL message, used to
+# estimate the memory needed to solve a DCOP with a pseudo-tree.
+UTIL_ENTRY_SIZE = 8
+
+# Default time budget, in seconds, when searching for the best pseudo-tree
+# with the 'optimized' heuristic.
+OPTIMIZE_TIME_BUDGET = 1
+
+
+class _BudgetExhausted(Exception):
+    pass
+
+
+def _find_neighbors_relations(node, relations, nodes,
+                              var_relations=None, nodes_position=None):
     """
     Find all neighbors and relation for this node.
 
     :param node: the node we search the neighbors and relations for
     :param relations: a list of all relations
     :param nodes: a list of all nodes
+    :param var_relations: optional dict var_name -> relations depending on
+      this variable, as returned by `dependent_relations_index(relations)`.
+      When searching for the neighbors of many nodes, it should be computed
+      once and given here.
+    :param nodes_position: optional dict var_name -> (position, node) for
+      all nodes, position being the position of the node in `nodes`.
     :return: a pair (neighbors, relations)
     """
+    if var_relations is None:
+        var_relations = dependent_relations_index(relations)
+    if nodes_position is None:
+        nodes_position = {n.variable.name: (i, n)
+                          for i, n in enumerate(nodes)}
     node_neighbors = []
-    node_relations = []
-    for r in relations:
-        if node.variable in r.dimensions:
-            node_relations.append(r)
-            dim_vars = list(r.dimensions)
-            dim_vars.remove(node.variable)
-            for n in nodes:
-                if n.variable in dim_vars and n not in node_neighbors:
-                    node_neighbors.append(n)
-    return node_neighbors, node_relations
-
-
-def _generate_dfs_tree(variables, relations, root=None):
+    seen = {node.variable.name}
+    node_relations = var_relations.get(node.variable.name, [])
+    for r in node_relations:
+        # neighbors are added in the order of the nodes list, for each
+        # relation
+        r_neighbors = []
+        for v in r.dimensions:
+            if v.name not in seen and v.name in nodes_position:
+                seen.add(v.name)
+                r_neighbors.append(nodes_position[v.name])
+        r_neighbors.sort(key=lambda p: p[0])
+        node_neighbors.extend(n for _, n in r_neighbors)
+    return node_neighbors, list(node_relations)
+
+
+def _build_nodes(variables, relations) -> List[_BuildingNode]:
+    """
+    Build a node, with its neighbors and relations, for each variable.
+    """
+    nodes = [_BuildingNode(v) for v in variables]
+    var_relations = dependent_relations_index(relations)
+    nodes_position = {n.variable.name: (i, n) for i, n in enumerate(nodes)}
+    for n in nodes:
+        neighbors, rels = _find_neighbors_relations(
+            n, relations, nodes, var_relations, nodes_position)
+        n._neighbors = neighbors
+        n.relations = rels
+    return nodes
+
+
+def _elimination_order(nodes: List[_BuildingNode], last: str=None,
+                       criterion: str='min_fill', deadline: float=None) \
+        -> Tuple[List[str], Dict[str, Set[str]]]:
+    """
+    Order nodes using the greedy min-fill or min-degree heuristic.
+
+    With min-fill, at each step, the node whose elimination adds the
+    smallest number of edges between its (remaining) neighbors is
+    eliminated, ties being broken by the number of neighbors and then by
+    the position in `nodes`. With min-degree, the node with the smallest
+    number of (remaining) neighbors is eliminated, ties being broken by
+    the position in `nodes`.
+
+    :param nodes: the nodes to order
+    :param last: optional name of a node that must be eliminated last.
+    :param criterion: 'min_fill' or 'min_degree'
+    :param deadline: optional value of `perf_counter()` after which the
+      computation is aborted by raising `_BudgetExhausted`.
+    :return: the names of the nodes, in elimination order, and for each
+      node the set of its neighbors in the induced graph when it was
+      eliminated.
+    """
+    position = {n.name: i for i, n in enumerate(nodes)}
+    adjacency = {n.name: {m.name for m in n._neighbors} for n in nodes}
+
+    def score(name):
+        if criterion == 'min_degree':
+            return name == last, len(adjacency[name]), position[name]
+        neighbors = list(adjacency[name])
+        fill = 0
+        for i, a in enumerate(neighbors):
+            a_neighbors = adjacency[a]
+            for b in neighbors[i+1:]:
+                if b not in a_neighbors:
+                    fill += 1
+        return name == last, fill, len(neighbors), position[name]
+
+    scores = {n.name: score(n.name) for n in nodes}
+    heap = list(scores.values())
+    heapq.heapify(heap)
+    names = [n.name for n in nodes]
+    order = []
+    induced = {}
+    while heap:
+        s = heapq.heappop(heap)
+        name = names[s[-1]]
+        if name not in scores or scores[name] != s:
+            # stale entry, the node has already been eliminated or its score
+            # has changed since this entry was pushed.
+            continue
+        if deadline is not None and perf_counter() > deadline:
+            raise _BudgetExhausted()
+        del scores[name]
+        order.append(name)
+        neighbors = adjacency.pop(name)
+        induced[name] = neighbors
+        for a in neighbors:
+            adjacency[a].discard(name)
+            adjacency[a].update(neighbors - {a})
+        # Eliminating the node changes the scores of its neighbors and,
+        # for min-fill, of their neighbors
+        impacted = set(neighbors)
+        if criterion == 'min_fill':
+            for a in neighbors:
+                impacted.update(adjacency[a])
+        for a in impacted:
+            new_score = score(a)
+            if new_score != scores[a]:
+                scores[a] = new_score
+                heapq.heappush(heap, new_score)
+
+    return order, induced
+
+
+def _elimination_pseudotrees(nodes: List[_BuildingNode], last: str=None,
+                             criterion: str='min_fill',
+                             deadline: float=None) -> List[_BuildingNode]:
+    """
+    Build pseudo-trees from a min-fill or min-degree elimination order.
+
+    :param nodes: the nodes, which are all included in the pseudo-trees.
+    :param last: optional name of a node that must be the root of its tree.
+    :param criterion: 'min_fill' or 'min_degree'
+    :param deadline: see `_elimination_order`
+    :return: the roots of the trees
+    """
+    order, induced = _elimination_order(nodes, last, criterion, deadline)
+    rank = {name: i for i, name in enumerate(order)}
+    nodes_by_name = {n.name: n for n in nodes}
+
+    roots = []
+    for name in reversed(order):
+        node = nodes_by_name[name]
+        if induced[name]:
+            # All induced neighbors are eliminated later and are thus
+            # ancestors of the node, the parent is the closest one.
+            node.parent = nodes_by_name[min(induced[name],
+                                            key=rank.__getitem__)]
+            node.parent.children.append(node)
+        else:
+            node.root = True
+            roots.append(node)
+    for node in nodes:
+        # Neighbors eliminated after a node are its ancestors, those
+        # eliminated before are its descendants.
+        node.pseudo_parents = [n for n in node._neighbors
+                               if rank[n.name] > rank[node.name]
+                               and n is not node.parent]
+        node.pseudo_children = [n for n in node._neighbors
+                                if rank[n.name] < rank[node.name]
+                                and n.parent is not node]
+    return roots
+
+
+def _dfs(root: _BuildingNode, heuristic: str, visited: Set[str]=None):
+    """
+    Build a DFS pseudo-tree from `root`.
+
+    The DFS uses an explicit stack, and sets for membership tests, and
+    can thus be used with very large graphs.
+
+    :param root: the root of the tree
+    :param heuristic: the heuristic used to order the neighbors of each node,
+      'most_connected' or 'max_degree', see `PSEUDOTREE_HEURISTICS`
+    :param visited: set of the names of the nodes already in a tree,
+      updated with the nodes of this tree.
+    """
+    visited = set() if visited is None else visited
+    # names of the nodes in the path from the root to the current node
+    path = set()
+
+    def enter(node, parent):
+        node.parent = parent
+        node.pseudo_parents = [n for n in node._neighbors
+                               if n.name in path and n is not parent]
+        for pp in node.pseudo_parents:
+            pp.pseudo_children.append(node)
+        visited.add(node.name)
+        path.add(node.name)
+        if heuristic == 'most_connected':
+            node._neighbors.sort(
+                key=lambda x: sum(1 for m in x._neighbors if m.name in path),
+                reverse=True)
+        elif heuristic == 'max_degree':
+            node._neighbors.sort(key=lambda x: len(x._neighbors),
+                                 reverse=True)
+        else:
+            raise ValueError('Invalid DFS heuristic {}'.format(heuristic))
+        return [node, iter(node._neighbors)]
+
+    root.root = True
+    stack = [enter(root, None)]
+    while stack:
+        node, neighbors = stack[-1]
+        for n in neighbors:
+            if n.name not in visited:
+                node.children.append(n)
+                stack.append(enter(n, node))
+                break
+        else:
+            stack.pop()
+            path.discard(node.name)
+
+
+def _generate_dfs_tree(variables, relations, root=None,
+                       heuristic: str='most_connected'):
     """
-    Generate a DFS tree for these variables connected by these relations.
+    Generate a pseudo-tree for these variables connected by these relations.
     If the 'root' is argument is not None, it is used as the root of the
-    tree, otherwise a random root is picked from the set of variables
+    tree, otherwise the root is selected with the heuristic.
 
+    Only the variables connected to the root are part of the tree.
 
     :param variables:
     :param relations:
     :param root:
+    :param heuristic: see `PSEUDOTREE_HEURISTICS`
     :return: the root of the pseudo-tree
     """
-
-    # build a node for each of the variables
-    nodes = []
-    for v in variables:
-        n = _BuildingNode(v)
-        nodes.append(n)
-    for n in nodes:
-        neighbors, rels = _find_neighbors_relations(n, relations, nodes)
-        n._neighbors = neighbors
-        n.relations = rels
-
-    # Root selection with heuristic : choose the Node with the highest number
-    #  of neighbors
+    nodes = _build_nodes(variables, relations)
+    if heuristic in _ELIMINATION_HEURISTICS:
+        roots = _elimination_pseudotrees(
+            nodes, root.name if root is not None else None, heuristic)
+        if root is None:
+            # The biggest tree
+            return roots[0] if len(roots) == 1 else max(
+                roots, key=lambda r: sum(1 for _ in _visit_tree(r)))
+        return next(r for r in roots if r.variable == root)
     if root is None:
-        # heuristic :
-        # root = random.choice(variables)
-        nodes.sort(key=lambda a: n.neighbors_count())
-        root = nodes[0]
+        root = _max_degree_nodes(nodes)[0]
     else:
-        for n in nodes:
-            if n.variable == root:
-                root = n
-                break
+        root = next(n for n in nodes if n.variable == root)
+    _dfs(root, heuristic)
+    return root
 
-    token = []
-    root.handle_token(None, token)
 
-    return root
+def _generate_pseudotrees(variables, relations,
+                          heuristic: str='most_connected',
+                          rnd: random.Random=None,
+                          deadline: float=None) -> List[_BuildingNode]:
+    """
+    Generate pseudo-trees covering all the variables, one for each connected
+    component of the constraints graph.
+
+    :param rnd: optional random generator. When given, the variables are
+      shuffled, which randomly breaks ties in the heuristic, and the roots
+      of DFS trees are selected randomly.
+    :param deadline: see `_elimination_order`
+    :return: the roots of the trees
+    """
+    if rnd is not None:
+        variables = list(variables)
+        rnd.shuffle(variables)
+    nodes = _build_nodes(variables, relations)
+    if heuristic in _ELIMINATION_HEURISTICS:
+        return _elimination_pseudotrees(nodes, None, heuristic, deadline)
+    roots = []
+    visited = set()
+    for root in nodes if rnd is not None else _max_degree_nodes(nodes):
+        if root.name not in visited:
+            _dfs(root, heuristic, visited)
+            roots.append(root)
+    return roots
+
+
+def _max_degree_nodes(nodes):
+    # Nodes sorted by decreasing number of neighbors, sorted is stable so
+    # ties are broken by the order of the variables.
+    return sorted(nodes, key=lambda x: len(x._neighbors), reverse=True)
 
 
 def _visit_tree(root):
@@ -338,12 +542,49 @@ def _visit_tree(root):
 
     :param root: the root node of the tree.
     """
-    yield root
-    for c in root.children:
-        # Using 'yield from would be nicer, but is only available with python
-        #  >= 3.3
-        for n in _visit_tree(c):
-            yield n
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        yield node
+        stack.extend(reversed(node.children))
+
+
+def _filter_relation_to_lowest_node(dfs_root):
+    """"
+    Filter the relations on all the nodes of the DFS tree to only keep the
+    relation on the on the lowest node in the tree that is involved in the
+    relation.
+
+    """
+    for n in _visit_tree(dfs_root):
+        # filter out all relations that depends on one of our children or
+        #  pseudo children
+        below = {c.name for c in n.pseudo_children + n.children}
+        n.relations = [r for r in n.relations
+                       if not any(v.name in below for v in r.dimensions)]
+
+
+def _separators(roots: Iterable[_BuildingNode]) -> Dict[str, Set[str]]:
+    """
+    Compute the separator of each node in the pseudo-trees.
+
+    The separator of a node is the set of its ancestors that are connected to
+    it or to one of its descendants: these are the dimensions of the UTIL
+    message it sends to its parent in DPOP.
+    """
+    separators = {}
+    for root in roots:
+        # Visiting nodes in reverse pre-order ensures that children are
+        # handled before their parent.
+        for n in reversed(list(_visit_tree(root))):
+            sep = {pp.name for pp in n.pseudo_parents}
+            if n.parent is not None:
+                sep.add(n.parent.name)
+            for c in n.children:
+                sep.update(separators[c.name])
+            sep.discard(n.name)
+            separators[n.name] = sep
+    return separators
 
 
 def tree_str_desc(root, indent_num=0):
@@ -354,13 +595,15 @@ def tree_str_desc(root, indent_num=0):
     :return:
     """
     desc = ''
-    indent = ' '*indent_num
-    pp = ', '.join([p.variable.name for p in root.pseudo_parents])
-    pc = ', '.join([c.variable.name for c in root.pseudo_children])
-    desc += indent + '* ' + root.variable.name \
-        + ' - PP : [' + pp + '] - PC: [' + pc + ']\n'
-    for n in root.children:
-        desc += tree_str_desc(n, indent_num=(indent_num+2))
+    stack = [(root, indent_num)]
+    while stack:
+        node, indent_num = stack.pop()
+        indent = ' '*indent_num
+        pp = ', '.join([p.variable.name for p in node.pseudo_parents])
+        pc = ', '.join([c.variable.name for c in node.pseudo_children])
+        desc += indent + '* ' + node.variable.name \
+            + ' - PP : [' + pp + '] - PC: [' + pc + ']\n'
+        stack.extend((c, indent_num + 2) for c in reversed(node.children))
     return desc
 
 
@@ -372,9 +615,11 @@ class ComputationPseudoTree(ComputationGraph):
 
     """
 
-    def __init__(self, roots: Iterable[_BuildingNode])-> None:
+    def __init__(self, roots: Iterable[_BuildingNode],
+                 heuristic: str=None)-> None:
         super().__init__('PseudoTree')
         self._roots = list(roots)
+        self.heuristic = heuristic
 
         # build the list of links
         links = defaultdict(lambda: [])  # type: Dict[str, List]
@@ -399,11 +644,76 @@ class ComputationPseudoTree(ComputationGraph):
                                                 links[n.name])
 
         self.nodes = list(_nodes.values())
+        self._separators = _separators(self._roots)
+        domain_sizes = {n.name: len(n.variable.domain)
+                        for n in self.nodes}
+        self._util_sizes = {}
+        for name, separator in self._separators.items():
+            size = 1
+            for v in separator:
+                size *= domain_sizes[v]
+            self._util_sizes[name] = size
 
     @property
     def roots(self):
         return self._roots
 
+    @property
+    def separators(self) -> Dict[str, Set[str]]:
+        """
+        The separator of each node.
+
+        The separator of a node is the set of the names of its ancestors
+        that are connected to the node or to one of its descendants. With
+        DPOP, these are the variables of the UTIL message sent by the node
+        to its parent.
+
+        Returns
+        -------
+        dict
+            a dict node name -> set of node names
+        """
+        return self._separators
+
+    @property
+    def induced_width(self) -> int:
+        """
+        The induced width of the pseudo-tree, i.e. the size of its largest
+        separator.
+        """
+        return max((len(s) for s in self._separators.values()), default=0)
+
+    @property
+    def util_sizes(self) -> Dict[str, int]:
+        """
+        The number of entries in the UTIL message of each node.
+
+        This is the product of the sizes of the domains of the variables in
+        the separator of the node.
+
+        Returns
+        -------
+        dict
+            a dict node name -> number of entries
+        """
+        return self._util_sizes
+
+    @property
+    def max_util_size(self) -> int:
+        """
+        The number of entries in the largest UTIL message.
+        """
+        return max(self._util_sizes.values(), default=0)
+
+    @property
+    def util_memory(self) -> int:
+        """
+        Estimation of the memory, in bytes, needed for all the UTIL messages
+        when solving the DCOP with DPOP on this pseudo-tree, assuming
+        `UTIL_ENTRY_SIZE` bytes per entry.
+        """
+        return sum(self._util_sizes.values()) * UTIL_ENTRY_SIZE
+
     def density(self):
         # pseudo tree are directed graph, so density is e / (v - (v - 1)).
         e = len(self.links)
@@ -411,29 +721,11 @@ class ComputationPseudoTree(ComputationGraph):
         return e / (v * (v - 1))
 
 
-def _filter_relation_to_lowest_node(dfs_root):
-    """"
-    Filter the relations on all the nodes of the DFS tree to only keep the
-    relation on the on the lowest node in the tree that is involved in the
-    relation.
-
-    """
-    for n in _visit_tree(dfs_root):
-
-        keep_rel = n.relations[:]
-        for r in n.relations:
-            # filter out all relations that depends on one of our children or
-            #  pseudo children
-            for pc in n.pseudo_children + n.children:
-                if pc.variable in r.dimensions:
-                    keep_rel.remove(r)
-                    break
-        n.relations = keep_rel
-
-
 def build_computation_graph(dcop: DCOP,
                             variables: Iterable[Variable] = None,
                             constraints: Iterable[Constraint] = None,
+                            heuristic: str = 'most_connected',
+                            time_budget: float = OPTIMIZE_TIME_BUDGET
                             )-> ComputationPseudoTree:
     """
     Build a computation pseudo-tree graph for the DCOP.
@@ -458,6 +750,16 @@ def build_computation_graph(dcop: DCOP,
     constraints: iterable of Constraints objects
         The constraints to build the computation graph from. When this
         parameter is used, the `variables` parameter MUST also be given.
+    heuristic: str
+        The heuristic used to build the pseudo-tree, one of
+        'most_connected' (the default), 'max_degree', 'min_degree' and
+        'min_fill', see `PSEUDOTREE_HEURISTICS`. The induced width of the
+        pseudo-tree, and thus the size of DPOP UTIL messages, depends on
+        this heuristic. With 'optimized', several pseudo-trees are built
+        with `pseudotree_candidates` and the one with the smallest
+        `max_util_size` is returned.
+    time_budget: float
+        Time budget, in seconds, for the 'optimized' heuristic.
 
     Returns
     -------
@@ -468,10 +770,102 @@ def build_computation_graph(dcop: DCOP,
     ------
     ValueError
         If both `dcop` and one of the `variables` or `constraints` arguments
-        have been used.
+        have been used, or if the heuristic is not valid.
 
     """
+    if heuristic not in PSEUDOTREE_HEURISTICS + ['optimized']:
+        raise ValueError('Invalid pseudo-tree heuristic {}, must be one of {}'
+                         .format(heuristic,
+                                 PSEUDOTREE_HEURISTICS + ['optimized']))
+
+    variables, constraints = _variables_constraints(
+        dcop, variables, constraints)
+
+    if heuristic == 'optimized':
+        candidates = pseudotree_candidates(
+            None, variables, constraints, time_budget=time_budget)
+        return min(candidates,
+                   key=lambda cg: (cg.max_util_size, cg.util_memory))
+    return _build_pseudotree(variables, constraints, heuristic)
+
+
+def pseudotree_candidates(dcop: DCOP,
+                          variables: Iterable[Variable] = None,
+                          constraints: Iterable[Constraint] = None,
+                          time_budget: float = OPTIMIZE_TIME_BUDGET,
+                          restarts: int = None,
+                          seed: int = None) -> List[ComputationPseudoTree]:
+    """
+    Build several candidate pseudo-trees for a DCOP.
+
+    A pseudo-tree is first built with each heuristic in
+    `PSEUDOTREE_HEURISTICS`, then randomized restarts are performed, cycling
+    through these heuristics, until the time budget is exhausted. For a
+    restart, ties in the heuristic are broken randomly and the roots of DFS
+    trees are selected randomly.
+
+    As computing an elimination order can be very long on graphs with a
+    large induced width, 'min_fill' and 'min_degree' candidates are
+    abandoned when the time budget is exhausted. DFS-based candidates are
+    always built, in linear time.
+
+    Parameters
+    ----------
+    dcop: DCOP
+        DCOP object to build the pseudo-trees from, see
+        `build_computation_graph`.
+    variables: iterable of Variables objects
+        The variables to build the pseudo-trees from.
+    constraints: iterable of Constraints objects
+        The constraints to build the pseudo-trees from.
+    time_budget: float
+        time budget, in seconds.
+    restarts: int
+        Optional maximum number of randomized restarts.
+    seed: int
+        Optional seed for randomized restarts.
 
+    Returns
+    -------
+    list of ComputationPseudoTree
+        The distinct candidate pseudo-trees, in the order they were built.
+        The `heuristic` attribute of each tree gives the heuristic used to
+        build it, followed by '#<restart index>' for randomized restarts.
+    """
+    variables, constraints = _variables_constraints(
+        dcop, variables, constraints)
+    deadline = perf_counter() + time_budget
+    rnd = random.Random(seed)
+
+    candidates = []
+    # A pseudo-tree is fully defined by the parent of each node, used to
+    # detect duplicates.
+    seen = set()
+
+    def add_candidate(heuristic, rnd=None, name=None):
+        try:
+            cg = _build_pseudotree(variables, constraints, heuristic, rnd,
+                                   deadline, name)
+        except _BudgetExhausted:
+            return
+        tree = frozenset((n.name, n.parent.name if n.parent else None)
+                         for root in cg.roots for n in _visit_tree(root))
+        if tree not in seen:
+            seen.add(tree)
+            candidates.append(cg)
+
+    for heuristic in PSEUDOTREE_HEURISTICS:
+        add_candidate(heuristic)
+    restart = 0
+    while perf_counter() < deadline and \
+            (restarts is None or restart < restarts):
+        heuristic = PSEUDOTREE_HEURISTICS[restart % len(PSEUDOTREE_HEURISTICS)]
+        restart += 1
+        add_candidate(heuristic, rnd, '{}#{}'.format(heuristic, restart))
+    return candidates
+
+
+def _variables_constraints(dcop, variables, constraints):
     if dcop is not None:
         if constraints or variables is not None:
             raise ValueError('Cannot use both dcop and constraints / '
@@ -484,15 +878,15 @@ def build_computation_graph(dcop: DCOP,
                              'provided wgen not building the graph from a dcop')
         variables = list(variables)
         constraints = list(constraints)
+    return variables, constraints
 
-    roots = []
-    while len(variables) != 0:
-        root = _generate_dfs_tree(variables, constraints)
+
+def _build_pseudotree(variables, constraints, heuristic, rnd=None,
+                      deadline=None, name=None) -> ComputationPseudoTree:
+    # Build one tree for each connected component
+    roots = _generate_pseudotrees(variables, constraints, heuristic, rnd,
+                                  deadline)
+    for root in roots:
         _filter_relation_to_lowest_node(root)
-        roots.append(root)
-        # Remove variables that are part of the tree and build another tree
-        # until there is no variable left.
-        for node in _visit_tree(root):
-            variables.remove(node.variable)
 
-    return ComputationPseudoTree(roots)
+    return ComputationPseudoTree(roots, name if name else heuristic)
@@ -52,6 +52,7 @@ from pydcop.commands import distribute
 from pydcop.commands import graph
 from pydcop.commands import generate
 from pydcop.commands import run
+from pydcop.commands import convert
 
 timer = None
 
@@ -88,6 +89,7 @@ def main():
     generate.set_parser(subparsers)
     replica_dist.set_parser(subparsers)
     run.set_parser(subparsers)
+    convert.set_parser(subparsers)
 
     # parse command line options
     args = parser.parse_args()
@@ -0,0 +1,308 @@
+# BSD-3-Clause License
+#
+# Copyright 2017 Orange
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+
+"""
+Binary format for DCOPs.
+
+With the yaml format, large extensional constraints are both slow to load
+and huge, as each assignment is written as a string. A binary dcop is a
+directory containing:
+
+* ``header.json`` : the definition of the dcop, with the same structure as
+  the yaml format, except for extensional constraints, which have a
+  ``table`` entry (the index of the table of the constraint) instead of
+  their ``values`` and ``default`` entries. The ``binary`` entry gives the
+  version of the format and, for each table, its offset in the tables file
+  for its dtype, its shape, its dtype and whether it has assignments with
+  no value.
+* ``tables_<dtype>.npy`` (e.g. ``tables_int64.npy``) : the tables of
+  extensional constraints with this dtype, flattened and concatenated in a
+  single numpy array.
+
+Tables keep their dtype, and must be numeric. Tables with assignments with
+no value (i.e. a `None` cost) are stored as float64 with NaN for these
+assignments, and converted back to object arrays with `None` when loaded.
+
+When loading a binary dcop, tables files are memory-mapped and
+extensional constraints are `NAryMatrixRelation` on read-only views of
+these mappings: tables are only read from the disk when used, and their
+memory is shared between all the processes using the same dcop. Tables with
+assignments with no value are the exception, as object arrays cannot be
+memory-mapped.
+
+A yaml dcop can be converted with `yaml_to_binary` or with the ``pydcop
+convert`` command, a DCOP object can be written with `write_dcop_binary`
+and binary dcops can be used with all ``pydcop``
+commands instead of yaml files.
+
+"""
+import json
+import os
+from collections import defaultdict
+from typing import Iterable, Tuple
+
+import numpy as np
+import yaml
+
+from pydcop.dcop.dcop import DCOP
+from pydcop.dcop.relations import NAryMatrixRelation
+from pydcop.dcop.yamldcop import YamlLoader, read_files, dcop_from_dict, \
+    _dict_domains, _dict_variables, _dict_agents
+
+HEADER_FILE = 'header.json'
+TABLES_FILE = 'tables_{}.npy'
+FORMAT_VERSION = 2
+
+
+def is_binary_dcop(path: str) -> bool:
+    """
+    Check if `path` is a binary dcop.
+    """
+    return os.path.isfile(os.path.join(path, HEADER_FILE))
+
+
+def load_dcop_from_binary(path: str, yaml_files: Iterable[str]=None,
+                          mmap: bool=True) -> DCOP:
+    """
+    Load a binary dcop.
+
+    Parameters
+    ----------
+    path: str
+        path of the binary dcop directory
+    yaml_files: iterable of str
+        optional yaml files, whose content is merged into the definition of
+        the dcop. This can be used to give the agents in a separate file.
+    mmap: bool
+        if True (the default), tables are memory-mapped, otherwise they are
+        loaded in memory.
+
+    Returns
+    -------
+    A DCOP object
+    """
+    with open(os.path.join(path, HEADER_FILE), encoding='utf-8') as f:
+        header = json.load(f)
+    binary = header.pop('binary')
+    if binary['version'] != FORMAT_VERSION:
+        raise ValueError('Unsupported binary dcop format version {}'
+                         .format(binary['version']))
+
+    if yaml_files:
+        content = read_files(yaml_files)
+        if content:
+            for key, value in yaml.load(content, Loader=YamlLoader).items():
+                if isinstance(value, dict) and \
+                        isinstance(header.get(key), dict):
+                    header[key].update(value)
+                else:
+                    header[key] = value
+
+    tables = []
+    data = {}
+    for offset, shape, dtype, missing in binary['tables']:
+        if dtype not in data:
+            data[dtype] = np.load(
+                os.path.join(path, TABLES_FILE.format(dtype)),
+                mmap_mode='r' if mmap else None)
+        size = int(np.prod(shape))
+        # Plain ndarray views on the mapping, not np.memmap objects,
+        # to avoid propagating the memmap subclass to computations
+        table = np.asarray(data[dtype][offset:offset+size]).reshape(shape)
+        if missing:
+            values = table.astype(object)
+            values[np.isnan(table)] = None
+            table = values
+        tables.append(table)
+
+    return dcop_from_dict(header, tables)
+
+
+def yaml_to_binary(yaml_files: Iterable[str], path: str) -> DCOP:
+    """
+    Convert a yaml dcop into a binary dcop.
+
+    Parameters
+    ----------
+    yaml_files: iterable of str
+        the yaml files defining the dcop, as for `load_dcop_from_file`
+    path: str
+        path of the binary dcop directory, created if needed
+
+    Returns
+    -------
+    The converted DCOP object
+    """
+    loaded = yaml.load(read_files(yaml_files), Loader=YamlLoader)
+    dcop = dcop_from_dict(loaded)
+
+    header = dict(loaded)
+    header['constraints'] = {}
+    matrices = []
+    for c_name, c in loaded.get('constraints', {}).items():
+        if c['type'] == 'extensional':
+            c = {k: v for k, v in c.items() if k not in ['values', 'default']}
+            c['table'] = len(matrices)
+            matrices.append((c_name, dcop.constraint(c_name)._m))
+        header['constraints'][c_name] = c
+
+    _write_binary(header, matrices, path)
+    return dcop
+
+
+def write_dcop_binary(dcop: DCOP, path: str):
+    """
+    Write a DCOP object as a binary dcop.
+
+    Intentional constraints are written with their expression and all other
+    constraints are written as tables. As with the yaml format, external
+    variables and distribution hints are not written.
+
+    Parameters
+    ----------
+    dcop: DCOP
+        the dcop to write
+    path: str
+        path of the binary dcop directory, created if needed
+    """
+    header = {
+        'name': dcop.name,
+        'objective': dcop.objective,
+        'description': dcop.description,
+        'domains': _dict_domains(dcop.domains.values()),
+        'variables': _dict_variables(dcop.variables.values()),
+        'constraints': {},
+    }
+    header.update(_dict_agents(dcop.agents.values()))
+
+    matrices = []
+    for c in dcop.constraints.values():
+        if hasattr(c, 'expression'):
+            header['constraints'][c.name] = {'type': 'intention',
+                                             'function': c.expression}
+            continue
+        header['constraints'][c.name] = {
+            'type': 'extensional',
+            'variables': [v.name for v in c.dimensions],
+            'table': len(matrices)
+        }
+        if not isinstance(c, NAryMatrixRelation):
+            c = NAryMatrixRelation.from_func_relation(c)
+        matrices.append((c.name, c._m))
+
+    _write_binary(header, matrices, path)
+
+
+def _write_binary(header, matrices, path):
+    os.makedirs(path, exist_ok=True)
+    tables = []
+    arrays = []
+    sizes = defaultdict(int)
+    for name, m in matrices:
+        m, missing = _numeric_table(name, m)
+        dtype = m.dtype.name
+        tables.append([sizes[dtype], list(m.shape), dtype, missing])
+        arrays.append(m)
+        sizes[dtype] += m.size
+    header['binary'] = {'version': FORMAT_VERSION, 'tables': tables}
+
+    for dtype, size in sizes.items():
+        # Tables are written directly to the file, without building the
+        # concatenated array in memory.
+        data = np.lib.format.open_memmap(
+            os.path.join(path, TABLES_FILE.format(dtype)), mode='w+',
+            dtype=dtype, shape=(size,))
+        for (offset, _, t_dtype, _), m in zip(tables, arrays):
+            if t_dtype == dtype:
+                data[offset:offset+m.size] = m.ravel()
+        data.flush()
+        del data
+
+    with open(os.path.join(path, HEADER_FILE), 'w', encoding='utf-8') as f:
+        _write_json(header, f)
+
+
+def _numeric_table(name: str, m: np.ndarray) -> Tuple[np.ndarray, bool]:
+    # The numeric array used to store a table, and whether the table has
+    # assignments with no value, stored as NaN.
+    missing = False
+    if m.dtype == object:
+        none = m == None  # noqa: E711
+        missing = bool(none.any())
+        try:
+            if missing:
+                values = np.where(none, np.nan, m).astype(np.float64)
+                if np.isnan(values[~none]).any():
+                    raise ValueError('both NaN and None values')
+            else:
+                values = np.array(m.tolist())
+        except (TypeError, ValueError) as e:
+            raise ValueError('Cannot write the table of constraint {} in a '
+                             'binary dcop, it must be numeric: {}'
+                             .format(name, e))
+        m = values
+    if m.dtype.kind not in 'biuf':
+        raise ValueError('Cannot write the table of constraint {} in a '
+                         'binary dcop, it must be numeric, not {}'
+                         .format(name, m.dtype))
+    return m, missing
+
+
+def _write_json(header, f):
+    # The header is written entry by entry, to avoid building a huge string
+    # for large dcops. json.dump is not used as, unlike json.dumps, it does
+    # not use the C encoder.
+    f.write('{')
+    for i, (key, section) in enumerate(header.items()):
+        if i:
+            f.write(',')
+        f.write(json.dumps(key) + ':')
+        if isinstance(section, dict):
+            f.write('{')
+            for j, (name, value) in enumerate(section.items()):
+                if j:
+                    f.write(',')
+                f.write(json.dumps(str(name)) + ':' + _dumps(value))
+            f.write('}')
+        else:
+            f.write(_dumps(section))
+    f.write('}')
+
+
+def _dumps(value) -> str:
+    return json.dumps(value, separators=(',', ':'), default=_json_default)
+
+
+def _json_default(obj):
+    # numpy scalars, e.g. costs or capacities computed with numpy
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError('Cannot serialize {!r} in a binary dcop'.format(obj))
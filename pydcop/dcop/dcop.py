@@ -30,9 +30,12 @@
 
 
 import collections
+import itertools
+from operator import itemgetter
 from typing import List, Tuple, Dict, Iterable, Union, Mapping
 
-from pydcop.algorithms import filter_assignment_dict
+import numpy as np
+
 from pydcop.dcop.objects import AgentDef, Variable, VariableDomain, \
     ExternalVariable, Domain
 from pydcop.dcop.relations import RelationProtocol, constraint_from_str, \
@@ -71,6 +74,8 @@ class DCOP(object):
         self._agents_def = {} if agents is None else agents
         self.external_variables = {}
         self.dist_hints = None
+        self._evaluator = None
+        self._evaluator_key = None
 
     @property
     def all_variables(self):
@@ -114,6 +119,7 @@ class DCOP(object):
 
     def add_variable(self, v: Variable):
         self.variables[v.name] = v
+        self._evaluator = None
         return v
 
     def add_constraint(self, constraint: RelationProtocol):
@@ -141,6 +147,7 @@ class DCOP(object):
 
         """
         self._constraints[constraint.name] = constraint
+        self._evaluator = None
         for v in constraint.dimensions:
             current = self.variables.get(v.name, None)
             if current is not None and v != current:
@@ -304,9 +311,40 @@ class DCOP(object):
         """
         return self.constraints[c_name]
 
+    @property
+    def evaluator(self) -> 'CompiledEvaluator':
+        """
+        A `CompiledEvaluator` for the cost of assignments on this DCOP.
+
+        The evaluator is built on first access and cached until the DCOP is
+        modified.
+        """
+        # Variables and constraints dicts may also be replaced or modified
+        # directly (e.g. when loading a yaml file), the evaluator is rebuilt
+        # if any of their objects changed.
+        key = list(self._constraints.values()) + self.all_variables
+        if self._evaluator is None \
+                or not _same_objects(key, self._evaluator_key):
+            self._evaluator = CompiledEvaluator(self.constraints.values(),
+                                                self.all_variables)
+            self._evaluator_key = key
+        return self._evaluator
+
     def solution_cost(self, assignment, infinity):
-        return solution_cost(self.constraints.values(),
-                             self.all_variables, assignment, infinity)
+        return self.evaluator.cost(assignment, infinity)
+
+    def solutions_costs(self, assignments, infinity):
+        """
+        Cost of several assignments, evaluated in batch.
+
+        See `CompiledEvaluator.batch_cost`.
+        """
+        return self.evaluator.batch_cost(assignments, infinity)
+
+
+def _same_objects(objects1: List, objects2: List) -> bool:
+    return len(objects1) == len(objects2) and \
+        all(o1 is o2 for o1, o2 in zip(objects1, objects2))
 
 
 def solution_cost(relations, variables, assignment, infinity):
@@ -330,16 +368,9 @@ def solution_cost(relations, variables, assignment, infinity):
                          .format(set(variables) - set(assignment)))
 
     for r in relations:
-        # values = filter_assignment_dict(assignment, r.dimensions)
-        # values = {k: v for k, v in values.items() if v is not None}
-        # # If we do not yet have a value for all variables, we ignore this
-        # # relation in the cost.
-        # if len(values) != len(r.dimensions):
-        #     raise ValueError('Incomplete assignment')
-        # else:
         try:
-            r_cost = r(**filter_assignment_dict(assignment, r.dimensions))
-        except NameError as ne:
+            r_cost = r(**{v.name: assignment[v.name] for v in r.dimensions})
+        except (NameError, KeyError) as ne:
             raise ValueError('Cannot compute solution cost : incomplete '
                              'assignment ' + str(ne))
         # logging.debug('Cost for relation %s : %s ', r.name, r_cost)
@@ -358,3 +389,438 @@ def solution_cost(relations, variables, assignment, infinity):
             else:
                 cost_hard += 1
     return cost_hard, cost_soft
+
+
+class SolutionCostTracker(object):
+    """
+    Incrementally maintains the cost of an assignment.
+
+    The cost of each constraint (and of each variable with integrated costs)
+    is kept and, when the value of a variable changes, only the constraints
+    depending on this variable are evaluated again, using a
+    variable -> constraints index. This is much cheaper than `solution_cost`
+    when values change one at a time, e.g. for the orchestrator.
+
+    Costs are computed like in `solution_cost`: a cost equal to `infinity`
+    is counted as a violated hard constraint, other costs are summed.
+
+    Parameters
+    ----------
+    relations: iterable of relations
+        the relations giving costs
+    variables: iterable of Variable
+        the variables of the problem. The cost is only available once all of
+        these variables have a value.
+    infinity: float
+        the value used to represent infinity
+
+    Examples
+    --------
+
+    >>> from pydcop.dcop.relations import constraint_from_str
+    >>> d = Domain('d', '', [0, 1, 2])
+    >>> v1, v2, v3 = Variable('v1', d), Variable('v2', d), Variable('v3', d)
+    >>> c1 = constraint_from_str('c1', 'v1 + v2', [v1, v2])
+    >>> c2 = constraint_from_str('c2', 'v2 * v3', [v2, v3])
+    >>> tracker = SolutionCostTracker([c1, c2], [v1, v2, v3], float('inf'))
+    >>> tracker.update({'v1': 1, 'v2': 2, 'v3': 2})
+    >>> tracker.cost
+    (0, 7)
+    >>> tracker.set_value('v3', 0)
+    >>> tracker.cost
+    (0, 3)
+    """
+
+    def __init__(self, relations: Iterable[RelationProtocol],
+                 variables: Iterable[Variable], infinity):
+        self._infinity = infinity
+        self._relations = list(relations)
+        self._variables = {v.name: v for v in variables}
+        self._var_relations = collections.defaultdict(list)
+        for r in self._relations:
+            for v in r.dimensions:
+                self._var_relations[v.name].append(r)
+
+        self._assignment = {}
+        self._missing = set(self._variables)
+        # cost of each relation and variable, only for those whose cost
+        # could be evaluated (i.e. with a value for all their variables)
+        self._relation_costs = {}
+        self._variable_costs = {}
+        self._cost_hard, self._cost_soft = 0, 0
+        # Soft costs are summed incrementally, they are re-summed
+        # periodically to avoid accumulating rounding errors.
+        self._updates = 0
+
+    @property
+    def assignment(self) -> Dict[str, object]:
+        return dict(self._assignment)
+
+    @property
+    def cost(self) -> Tuple[int, float]:
+        """
+        Cost of the current assignment.
+
+        Returns
+        -------
+        tuple:
+            the number of violated hard constraints and the sum of soft costs,
+            like `solution_cost`.
+
+        Raises
+        ------
+        ValueError:
+            if some variables have no value yet.
+        """
+        if self._missing:
+            raise ValueError('Cannot compute solution cost : incomplete '
+                             'assignment, missing values for vars {}'
+                             .format(self._missing))
+        return self._cost_hard, self._cost_soft
+
+    def update(self, assignment: Mapping[str, object]):
+        """
+        Set the values of several variables.
+
+        Parameters
+        ----------
+        assignment: dict
+            a dict var_name -> value. Values for names that are not variables
+            of the tracked problem are ignored.
+        """
+        for var_name, value in assignment.items():
+            self.set_value(var_name, value)
+
+    def set_value(self, var_name: str, value):
+        """
+        Set the value of a variable and update the cost.
+
+        Only the relations depending on this variable are evaluated.
+
+        Parameters
+        ----------
+        var_name: str
+            name of the variable, ignored if not a variable of the tracked
+            problem.
+        value:
+            the new value of the variable
+        """
+        try:
+            variable = self._variables[var_name]
+        except KeyError:
+            return
+        if var_name in self._assignment \
+                and self._assignment[var_name] == value:
+            return
+        self._assignment[var_name] = value
+        self._missing.discard(var_name)
+
+        if hasattr(variable, 'cost_for_val'):
+            self._set_cost(self._variable_costs, var_name,
+                           variable.cost_for_val(value)
+                           if value is not None else None)
+        for r in self._var_relations[var_name]:
+            try:
+                r_values = {v.name: self._assignment[v.name]
+                            for v in r.dimensions}
+                r_cost = r(**r_values)
+            except (KeyError, NameError):
+                # not all variables of this relation have a value yet
+                continue
+            self._set_cost(self._relation_costs, r.name, r_cost)
+
+        self._updates += 1
+        if self._updates > len(self._relations) + len(self._variables):
+            self._resum()
+
+    def _set_cost(self, costs: Dict[str, float], name: str, cost):
+        previous = costs.get(name)
+        if previous is not None:
+            if previous == self._infinity:
+                self._cost_hard -= 1
+            else:
+                self._cost_soft -= previous
+        if cost is None:
+            costs.pop(name, None)
+        elif cost == self._infinity:
+            self._cost_hard += 1
+        else:
+            self._cost_soft += cost
+        if cost is not None:
+            costs[name] = cost
+
+    def _resum(self):
+        self._updates = 0
+        self._cost_hard, self._cost_soft = 0, 0
+        for costs in (self._relation_costs, self._variable_costs):
+            for cost in costs.values():
+                if cost == self._infinity:
+                    self._cost_hard += 1
+                else:
+                    self._cost_soft += cost
+
+
+# Relations whose table would have more entries than this are not tabulated
+# by CompiledEvaluator but evaluated directly.
+MAX_TABLE_SIZE = 10000
+
+
+class CompiledEvaluator(object):
+    """
+    Fast evaluation of the cost of assignments.
+
+    All the variables are numbered, and an assignment is converted to an
+    array containing, for each variable, the index of its value in its
+    domain. Relations defined by a matrix (and variables with integrated
+    costs) are tabulated in a numpy array, with one dimension for each
+    variable in its scope, and are associated with the indexes of these
+    variables. The cost of a relation is then obtained by indexing its table
+    with the value indexes of its variables, in a single pass over relations,
+    without building any intermediate dict.
+
+    Several assignments can also be evaluated at once with `batch_cost`,
+    using numpy fancy indexing, which is useful when checking many candidate
+    solutions. Other relations are tabulated on the first call to
+    `batch_cost`, as evaluating them for all the assignments of their
+    variables is only worth it when evaluating many assignments.
+
+    Relations with a table larger than `max_table_size`, and relations that
+    cannot be evaluated for some of the assignments of their variables (e.g.
+    `10 / v` when `v` can be 0), are not tabulated and are evaluated directly
+    by calling them.
+
+    Parameters
+    ----------
+    relations: iterable of relations
+        the relations giving costs
+    variables: iterable of Variable
+        the variables of the problem, an assignment must give a value to each
+        of these variables.
+    max_table_size: int
+        maximum number of entries in the table of a relation.
+
+    Examples
+    --------
+
+    >>> from pydcop.dcop.relations import constraint_from_str
+    >>> d = Domain('d', '', [0, 1, 2])
+    >>> v1, v2 = Variable('v1', d), Variable('v2', d)
+    >>> c1 = constraint_from_str('c1', '10 if v1 == v2 else v1 + v2', [v1, v2])
+    >>> evaluator = CompiledEvaluator([c1], [v1, v2])
+    >>> evaluator.cost({'v1': 1, 'v2': 2}, 10)
+    (0, 3)
+    >>> hard, soft = evaluator.batch_cost([{'v1': 1, 'v2': 1},
+    ...                                    {'v1': 0, 'v2': 2}], 10)
+    >>> hard.tolist(), soft.tolist()
+    ([1, 0], [0.0, 2.0])
+    """
+
+    def __init__(self, relations: Iterable[RelationProtocol],
+                 variables: Iterable[Variable],
+                 max_table_size: int=MAX_TABLE_SIZE):
+        self._variables = list(variables)
+        self._relations = list(relations)
+        self._var_index = {v.name: i for i, v in enumerate(self._variables)}
+        self._value_index = [{val: j for j, val in enumerate(v.domain)}
+                             for v in self._variables]
+
+        # List of (table, scope, getter) where scope is the tuple of the
+        # indexes of the variables and getter extracts from a list of value
+        # indexes the index in the table.
+        self._tables = []
+        # Relations that are not tabulated, with their scope.
+        self._direct = []
+        # Relations that will be tabulated by batch_cost, with their scope.
+        self._pending = []
+        for r in self._relations:
+            scope = tuple(self._var_index[v.name] for v in r.dimensions)
+            size = 1
+            for v in r.dimensions:
+                size *= len(v.domain)
+            if hasattr(r, '_m') and isinstance(r._m, np.ndarray):
+                self._add_table(r._m, scope)
+            elif size > max_table_size:
+                self._direct.append((r, scope))
+            else:
+                self._pending.append((r, scope))
+        for i, v in enumerate(self._variables):
+            if hasattr(v, 'cost_for_val'):
+                self._add_table(
+                    np.array([v.cost_for_val(val) for val in v.domain]), (i,))
+
+    def _add_table(self, table, scope):
+        if scope:
+            getter = itemgetter(*scope)
+        else:
+            getter = _empty_index
+        self._tables.append((table, scope, getter))
+
+    @property
+    def variables(self) -> List[str]:
+        """Names of the variables, in the order used for value indexes"""
+        return [v.name for v in self._variables]
+
+    def value_indexes(self, assignment: Mapping[str, object]) -> List[int]:
+        """
+        Convert an assignment to a list of value indexes.
+
+        Parameters
+        ----------
+        assignment: dict
+            a dict var_name => value
+
+        Returns
+        -------
+        list:
+            for each variable, in the order given by `variables`, the
+            index of its value in its domain.
+
+        Raises
+        ------
+        ValueError:
+            if the assignment has no value for some variables, or a value
+            which is not in the domain of its variable.
+        """
+        try:
+            return [value_index[assignment[v.name]] for v, value_index
+                    in zip(self._variables, self._value_index)]
+        except (KeyError, TypeError):
+            missing = set(v.name for v in self._variables) - set(assignment)
+            if missing:
+                raise ValueError('Cannot compute solution cost : incomplete '
+                                 'assignment, missing values for vars {}'
+                                 .format(missing))
+            raise ValueError('Value not in domain in assignment {}'
+                             .format(assignment))
+
+    def cost(self, assignment: Mapping[str, object], infinity):
+        """
+        Return the cost of an assignment, like `solution_cost`.
+
+        Parameters
+        ----------
+        assignment: dict
+            a dict var_name => value, with a value for all variables.
+        infinity:
+            the value representing infinity, a relation with this cost is
+            counted as a violated hard constraint.
+
+        Returns
+        -------
+        tuple:
+            the number of violated hard constraints and the sum of soft costs
+
+        Raises
+        ------
+        ValueError:
+            if the assignment has no value for some variables.
+        """
+        try:
+            indexes = self.value_indexes(assignment)
+        except ValueError:
+            if any(v not in assignment for v in self._var_index):
+                raise
+            # Some values are not in their domain: they can still be valid
+            # for relations defined with an expression.
+            return solution_cost(self._relations, self._variables,
+                                 assignment, infinity)
+
+        cost_hard, cost_soft = 0, 0
+        for table, _, getter in self._tables:
+            # item() is much faster than indexing for a single element and
+            # returns a python scalar.
+            r_cost = table.item(getter(indexes))
+            if r_cost != infinity:
+                cost_soft += r_cost
+            else:
+                cost_hard += 1
+        for relations in (self._pending, self._direct):
+            for r, scope in relations:
+                r_cost = r(*[assignment[self._variables[i].name]
+                             for i in scope])
+                if r_cost != infinity:
+                    cost_soft += r_cost
+                else:
+                    cost_hard += 1
+        return cost_hard, cost_soft
+
+    def batch_cost(self,
+                   assignments: Union[Iterable[Mapping[str, object]],
+                                      np.ndarray],
+                   infinity) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Return the costs of several assignments.
+
+        Parameters
+        ----------
+        assignments:
+            either an iterable of dict var_name => value, or a 2D integer
+            array of value indexes with one row per assignment and one column
+            per variable, in the order given by `variables`.
+        infinity:
+            the value representing infinity.
+
+        Returns
+        -------
+        tuple:
+            two arrays with the number of violated hard constraints and the
+            sum of soft costs for each assignment.
+
+        Raises
+        ------
+        ValueError:
+            if an assignment has no value for some variables, or a value
+            which is not in the domain of its variable.
+        """
+        if isinstance(assignments, np.ndarray):
+            indexes = assignments
+        else:
+            indexes = np.array([self.value_indexes(a) for a in assignments],
+                               dtype=np.intp)
+        indexes = indexes.reshape((-1, len(self._variables)))
+        count = indexes.shape[0]
+        self._tabulate_pending()
+
+        cost_hard = np.zeros(count, dtype=np.int64)
+        cost_soft = np.zeros(count)
+        for table, scope, _ in self._tables:
+            r_costs = table[tuple(indexes[:, i] for i in scope)]
+            hard = r_costs == infinity
+            cost_hard += hard
+            cost_soft += np.where(hard, 0, r_costs)
+        for r, scope in self._direct:
+            domains = [self._variables[i].domain for i in scope]
+            for k in range(count):
+                r_cost = r(*[d[j] for d, j in zip(domains,
+                                                   indexes[k, scope])])
+                if r_cost != infinity:
+                    cost_soft[k] += r_cost
+                else:
+                    cost_hard[k] += 1
+        return cost_hard, cost_soft
+
+
+    def _tabulate_pending(self):
+        for r, scope in self._pending:
+            try:
+                table = _tabulate(r)
+            except Exception:
+                # The relation may not be defined for some assignments that
+                # are never evaluated, e.g. when dividing by a variable.
+                self._direct.append((r, scope))
+            else:
+                self._add_table(table, scope)
+        self._pending = []
+
+
+def _tabulate(relation: RelationProtocol) -> np.ndarray:
+    # Table of all the values of the relation, with one dimension for each
+    # variable of the relation, in the same order as its dimensions.
+    variables = relation.dimensions
+    costs = [relation(*values) for values in
+             itertools.product(*[v.domain.values for v in variables])]
+    return np.array(costs).reshape([len(v.domain) for v in variables])
+
+
+def _empty_index(_):
+    return ()
@@ -31,6 +31,8 @@
 
 import functools
 import random
+from collections import defaultdict
+from collections.abc import Mapping
 from copy import deepcopy
 
 import numpy as np
@@ -38,8 +40,8 @@ from typing import Dict, Iterable, Any, Tuple, Callable, List, Union
 
 from pydcop.algorithms import  \
     filter_assignment_dict, generate_assignment_as_dict
-from pydcop.dcop.objects import Variable
-from pydcop.utils.simple_repr import SimpleRepr
+from pydcop.dcop.objects import Variable, VariableDomain
+from pydcop.utils.simple_repr import SimpleRepr, simple_repr
 from pydcop.utils.various import func_args
 from pydcop.utils.expressionfunction import ExpressionFunction
 
@@ -675,7 +677,9 @@ class NAryMatrixRelation(AbstractBaseRelation, SimpleRepr):
             self._m = np.zeros(shape=shape, dtype=np.float64)
 
         else:
-            if not isinstance(matrix, np.array.__class__):
+            if not isinstance(matrix, np.ndarray):
+                # numpy arrays are not copied, which allows using read-only
+                # memory-mapped matrices
                 matrix = np.array(matrix)
             if shape != matrix.shape:
                 raise AttributeError('Invalid dimension when building util '
@@ -1062,6 +1066,487 @@ class ConditionalRelation(RelationProtocol, SimpleRepr):
                      self.condition, self._return_neutral))
 
 
+class CountingRelation(RelationProtocol):
+    """
+    A wrapper around a relation, which counts its evaluations.
+
+    Each call to `get_value_for_assignment` or `__call__` is counted as a
+    constraint check on `counter`, by calling `counter.check()`. All other
+    attributes are those of the wrapped relation and relations obtained by
+    slicing a CountingRelation also count their evaluations on `counter`.
+
+    A CountingRelation has the same simple representation as the wrapped
+    relation: counting is not transmitted when sending the relation to
+    another agent.
+
+    Parameters
+    ----------
+    relation: RelationProtocol
+        the wrapped relation
+    counter:
+        an object with a `check()` method, called for each evaluation of the
+        relation.
+    """
+
+    def __init__(self, relation: RelationProtocol, counter) -> None:
+        self._relation = relation
+        self._counter = counter
+
+    @property
+    def relation(self) -> RelationProtocol:
+        return self._relation
+
+    @property
+    def name(self) -> str:
+        return self._relation.name
+
+    @property
+    def dimensions(self) -> List[Variable]:
+        return self._relation.dimensions
+
+    @property
+    def arity(self) -> int:
+        return self._relation.arity
+
+    @property
+    def shape(self) -> Tuple:
+        return self._relation.shape
+
+    def slice(self, partial_assignment: Dict[str, object]) \
+            -> RelationProtocol:
+        return CountingRelation(self._relation.slice(partial_assignment),
+                                self._counter)
+
+    def set_value_for_assignment(self, assignment, relation_value) \
+            -> RelationProtocol:
+        return CountingRelation(
+            self._relation.set_value_for_assignment(assignment,
+                                                    relation_value),
+            self._counter)
+
+    def get_value_for_assignment(self, assignment):
+        self._counter.check()
+        return self._relation.get_value_for_assignment(assignment)
+
+    def __call__(self, *args, **kwargs):
+        self._counter.check()
+        return self._relation(*args, **kwargs)
+
+    def __getattr__(self, item):
+        # Only called for attributes not defined on CountingRelation
+        if item in ('_relation', '_counter'):
+            raise AttributeError(item)
+        return getattr(self._relation, item)
+
+    def _simple_repr(self):
+        return simple_repr(self._relation)
+
+    def __str__(self):
+        return str(self._relation)
+
+    def __repr__(self):
+        return 'CountingRelation({})'.format(repr(self._relation))
+
+    def __eq__(self, other):
+        if isinstance(other, CountingRelation):
+            other = other.relation
+        return self._relation == other
+
+    def __hash__(self):
+        return hash(self._relation)
+
+
+class BinarySumRelation(AbstractBaseRelation, SimpleRepr):
+    """
+    Base class for relations over binary variables whose value only depends
+    on the weighted sum s = sum_i w_i * x_i of their variables.
+
+    Such relations can be evaluated in O(k) for k variables and, more
+    importantly, their min-marginals (as used in max-sum factor messages)
+    can be computed without enumerating the 2^k assignments of their
+    variables, see `min_costs_for_var`.
+
+    Sub-classes must implement `_value_for_sum`, `_sliced` and
+    `_min_costs`.
+
+    Parameters
+    ----------
+    variables: iterable of Variable
+        the binary variables this relation depends on.
+    weights: list of numbers
+        one weight for each variable, in the same order.
+    name: str
+        the name of the relation.
+    """
+
+    def __init__(self, variables: Iterable[Variable], weights,
+                 name: str=None) -> None:
+        super().__init__(name)
+        self._variables = list(variables)
+        for v in self._variables:
+            if not set(v.domain) <= {0, 1}:
+                raise ValueError('{} only supports binary variables, {} '
+                                 'has domain {}'.format(
+                                    self.__class__.__name__, v.name,
+                                    v.domain))
+        self._weights = list(weights)
+        if len(self._weights) != len(self._variables):
+            raise ValueError('{} : {} weights for {} variables'.format(
+                self._name, len(self._weights), len(self._variables)))
+        self._var_weights = {v.name: w for v, w in
+                             zip(self._variables, self._weights)}
+
+    @property
+    def weights(self):
+        return self._weights
+
+    def _value_for_sum(self, s):
+        raise NotImplementedError()
+
+    def _sliced(self, variables, weights, fixed_sum) -> RelationProtocol:
+        raise NotImplementedError()
+
+    def _min_costs(self, weight, base, forced_sum, free, infinity):
+        raise NotImplementedError()
+
+    def slice(self, partial_assignment: Dict[str, object]) \
+            -> RelationProtocol:
+        if not partial_assignment:
+            return self
+        for v in partial_assignment:
+            if v not in self._var_weights:
+                raise ValueError('Unknown variable "{}" when slicing '
+                                 'relation {}'.format(v, self._name))
+        fixed_sum = sum(self._var_weights[v] * val
+                        for v, val in partial_assignment.items())
+        remaining = [(v, w) for v, w in zip(self._variables, self._weights)
+                     if v.name not in partial_assignment]
+        variables = [v for v, _ in remaining]
+        weights = [w for _, w in remaining]
+        return self._sliced(variables, weights, fixed_sum)
+
+    def set_value_for_assignment(self, assignment, relation_value):
+        raise NotImplementedError('set_value_for_assignment is not '
+                                  'implemented for {}'.format(
+                                    self.__class__.__name__))
+
+    def get_value_for_assignment(self, assignment):
+        if isinstance(assignment, list):
+            s = sum(w * val for w, val in zip(self._weights, assignment))
+        elif isinstance(assignment, dict):
+            s = sum(self._var_weights[v] * val
+                    for v, val in assignment.items())
+        else:
+            raise ValueError('Assignment must be list or dict')
+        return self._value_for_sum(s)
+
+    def __call__(self, *args, **kwargs):
+        if not kwargs:
+            if len(args) == 1 and type(args[0]) is dict:
+                return self.get_value_for_assignment(args[0])
+            return self.get_value_for_assignment(list(args))
+        else:
+            return self.get_value_for_assignment(kwargs)
+
+    def min_costs_for_var(self, variable: Variable,
+                          costs: Dict[str, Dict[Any, float]],
+                          infinity=float('inf')) \
+            -> Dict[Any, float]:
+        """
+        Min-marginals of the relation for one of its variables.
+
+        For each value d of `variable`, computes the minimum, over all
+        assignments where `variable` takes the value d, of the value of the
+        relation plus the costs of the other variables for this assignment.
+        This is the content of a max-sum message from a factor to one of its
+        variables.
+
+        Parameters
+        ----------
+        variable: Variable
+            one of the variables of the relation
+        costs: dict
+            a dict { var_name -> { value -> cost } } of costs for the
+            variables of the relation. Costs for `variable` are ignored,
+            variables missing in `costs` have a zero cost for all values and
+            a missing value in the costs of a variable means an infinite cost.
+        infinity:
+            the value from which a value of the relation is considered as
+            infinite: assignments where the relation has such a value are
+            ignored, like in max-sum, which uses a finite infinity.
+
+        Returns
+        -------
+        dict:
+            a dict { value -> min cost } for all values of `variable`. The
+            cost is `float('inf')` when no assignment is possible for that
+            value.
+        """
+        base, forced_sum = 0, 0
+        free = []
+        inf = float('inf')
+        for v, w in zip(self._variables, self._weights):
+            if v.name == variable.name:
+                continue
+            v_costs = costs.get(v.name)
+            if v_costs is None:
+                free.append((w, 0))
+                continue
+            c0, c1 = v_costs.get(0, inf), v_costs.get(1, inf)
+            if c0 == inf and c1 == inf:
+                return {0: inf, 1: inf}
+            elif c0 == inf:
+                base += c1
+                forced_sum += w
+            elif c1 == inf:
+                base += c0
+            else:
+                base += c0
+                free.append((w, c1 - c0))
+
+        return self._min_costs(self._var_weights[variable.name],
+                               base, forced_sum, free, infinity)
+
+    def __str__(self):
+        return '{}({})'.format(self.__class__.__name__, self._name)
+
+    def __repr__(self):
+        return '{}({}, {})'.format(self.__class__.__name__, self._name,
+                                   [v.name for v in self._variables])
+
+    def __eq__(self, other):
+        if type(other) != type(self):
+            return False
+        return self._simple_repr() == other._simple_repr()
+
+    def __hash__(self):
+        return hash((self._name, tuple(self._variables),
+                     tuple(self._weights)))
+
+
+class _CardinalityRelation(BinarySumRelation):
+    """
+    Base class for relations depending on the number of variables set to 1.
+
+    Min-marginals only depend on the number j of free variables set to 1,
+    and the cheapest way of setting j variables to 1 is to pick the j
+    smallest cost differences: sorting these differences and using their
+    prefix sums gives all min-marginals in O(k log k).
+    """
+
+    def __init__(self, variables: Iterable[Variable], k: int, penalty,
+                 name: str=None) -> None:
+        variables = list(variables)
+        super().__init__(variables, [1] * len(variables), name)
+        self._k = k
+        self._penalty = penalty
+
+    @property
+    def k(self):
+        return self._k
+
+    @property
+    def penalty(self):
+        return self._penalty
+
+    def _sliced(self, variables, weights, fixed_sum) -> RelationProtocol:
+        return type(self)(variables, self._k - fixed_sum, self._penalty,
+                          name=self._name)
+
+    def _min_costs(self, weight, base, forced_sum, free, infinity):
+        deltas = sorted(d for _, d in free)
+        prefix = [0]
+        for d in deltas:
+            prefix.append(prefix[-1] + d)
+        costs = {}
+        for value in (0, 1):
+            count = forced_sum + weight * value
+            costs[value] = base + min(
+                (self._value_for_sum(count + j) + prefix[j]
+                 for j in range(len(prefix))
+                 if self._value_for_sum(count + j) < infinity),
+                default=float('inf'))
+        return costs
+
+
+class ExactlyKRelation(_CardinalityRelation):
+    """
+    Relation over binary variables that is satisfied when exactly k of its
+    variables are set to 1.
+
+    The relation returns 0 when satisfied and `penalty` otherwise.
+
+    Parameters
+    ----------
+    variables: iterable of Variable
+        the binary variables this relation depends on.
+    k: int
+        the required number of variables set to 1.
+    penalty:
+        the value of the relation when it is not satisfied.
+    name: str
+        the name of the relation.
+    """
+
+    def _value_for_sum(self, s):
+        return 0 if s == self._k else self._penalty
+
+
+class AtMostKRelation(_CardinalityRelation):
+    """
+    Relation over binary variables that is satisfied when at most k of its
+    variables are set to 1.
+
+    The relation returns 0 when satisfied and `penalty` otherwise.
+
+    Parameters
+    ----------
+    variables: iterable of Variable
+        the binary variables this relation depends on.
+    k: int
+        the maximum number of variables set to 1.
+    penalty:
+        the value of the relation when it is not satisfied.
+    name: str
+        the name of the relation.
+    """
+
+    def _value_for_sum(self, s):
+        return 0 if s <= self._k else self._penalty
+
+
+class LinearSumRelation(BinarySumRelation):
+    """
+    Relation over binary variables whose value is `offset + sum_i w_i * x_i`.
+
+    The relation is separable: each variable can be minimized independently
+    and min-marginals are computed in O(k).
+
+    Parameters
+    ----------
+    variables: iterable of Variable
+        the binary variables this relation depends on.
+    weights: list of numbers
+        one weight for each variable, in the same order.
+    offset:
+        a constant added to the weighted sum.
+    name: str
+        the name of the relation.
+    """
+
+    def __init__(self, variables: Iterable[Variable], weights, offset=0,
+                 name: str=None) -> None:
+        super().__init__(variables, weights, name)
+        self._offset = offset
+
+    @property
+    def offset(self):
+        return self._offset
+
+    def _value_for_sum(self, s):
+        return self._offset + s
+
+    def _sliced(self, variables, weights, fixed_sum) -> RelationProtocol:
+        return LinearSumRelation(variables, weights,
+                                 self._offset + fixed_sum, name=self._name)
+
+    def _min_costs(self, weight, base, forced_sum, free, infinity):
+        # The values of a linear sum are assumed to be below infinity.
+        others = self._offset + base + forced_sum + \
+            sum(min(0, w + d) for w, d in free)
+        return {0: others, 1: others + weight}
+
+
+class KnapsackThresholdRelation(BinarySumRelation):
+    """
+    Relation over binary variables that is satisfied when the weighted sum
+    of its variables `sum_i w_i * x_i` does not exceed a capacity.
+
+    The relation returns 0 when satisfied and `penalty` otherwise. Weights
+    must be non-negative.
+
+    Min-marginals are obtained by solving a 0/1 knapsack over the free
+    variables with a negative cost difference, using a dynamic programming
+    over reachable weights. The number of states is bounded by the number of
+    distinct reachable weights below the capacity (at most capacity + 1 with
+    integer weights).
+
+    Parameters
+    ----------
+    variables: iterable of Variable
+        the binary variables this relation depends on.
+    weights: list of numbers
+        one non-negative weight for each variable, in the same order.
+    capacity:
+        the maximum weighted sum for the relation to be satisfied.
+    penalty:
+        the value of the relation when it is not satisfied.
+    name: str
+        the name of the relation.
+    """
+
+    def __init__(self, variables: Iterable[Variable], weights, capacity,
+                 penalty, name: str=None) -> None:
+        super().__init__(variables, weights, name)
+        if any(w < 0 for w in self._weights):
+            raise ValueError('Negative weight in knapsack relation {} : '
+                             '{}'.format(self._name, self._weights))
+        self._capacity = capacity
+        self._penalty = penalty
+
+    @property
+    def capacity(self):
+        return self._capacity
+
+    @property
+    def penalty(self):
+        return self._penalty
+
+    def _value_for_sum(self, s):
+        return 0 if s <= self._capacity else self._penalty
+
+    def _sliced(self, variables, weights, fixed_sum) -> RelationProtocol:
+        return KnapsackThresholdRelation(
+            variables, weights, self._capacity - fixed_sum, self._penalty,
+            name=self._name)
+
+    def _min_costs(self, weight, base, forced_sum, free, infinity):
+        # Only variables that lower the cost when set to 1 are worth it.
+        items = [(w, -d) for w, d in free if d < 0]
+        unconstrained = base - sum(g for _, g in items)
+        costs = {}
+        for value in (0, 1):
+            room = self._capacity - forced_sum - weight * value
+            best = unconstrained + self._penalty \
+                if self._penalty < infinity else float('inf')
+            if room >= 0:
+                best = min(best, base - self._knapsack_gain(items, room))
+            costs[value] = best
+        return costs
+
+    @staticmethod
+    def _knapsack_gain(items, room):
+        """
+        Maximum total gain of a subset of items (weight, gain) whose total
+        weight does not exceed room.
+        """
+        if sum(w for w, _ in items) <= room:
+            # Common case: everything fits, no need to search.
+            return sum(g for _, g in items)
+        # Pareto frontier of (weight, gain), sorted by increasing weight and
+        # gain: dominated states are dropped.
+        frontier = [(0, 0)]
+        for w, g in items:
+            extended = [(fw + w, fg + g) for fw, fg in frontier
+                        if fw + w <= room]
+            merged = sorted(frontier + extended, key=lambda x: (x[0], -x[1]))
+            frontier = []
+            for fw, fg in merged:
+                if not frontier or fg > frontier[-1][1]:
+                    frontier.append((fw, fg))
+        return frontier[-1][1]
+
+
 def count_var_match(var_names, relation):
     """
     Count the number of common variables between agt_vars and the dimensions
@@ -1144,6 +1629,34 @@ def random_assignment_matrix(variables: List[Variable], values: List,
     return matrix
 
 
+def random_assignment_matrices(domains: List[VariableDomain], values: List,
+                               count: int) -> np.ndarray:
+    """
+    Generate several random matrices at once.
+
+    This is much faster than calling `random_assignment_matrix` for each
+    matrix when generating a large number of constraints whose variables
+    have the same domains.
+
+    Parameters
+    ----------
+    domains: list of VariableDomain
+        the domains of the variables of the constraints, which give the
+        shape of the matrices.
+    values: list
+        the values in the matrices are uniformly chosen among these values.
+    count: int
+        number of matrices to generate.
+
+    Returns
+    -------
+    An array with one more dimension than the matrices, which can be
+    used to build `count` NAryMatrixRelation: the i-th matrix is
+    `matrices[i]`.
+    """
+    shape = (count,) + tuple(len(d) for d in domains)
+    return np.random.choice(list(values), size=shape)
+
 def find_dependent_relations(variable: Variable,
                              constraints: Iterable[Constraint],
                              ext_var_assignment: Dict[str, Any]=None)\
@@ -1182,6 +1695,46 @@ def find_dependent_relations(variable: Variable,
     return dependent_relations
 
 
+def dependent_relations_index(constraints: Iterable[Constraint]) \
+        -> Dict[str, List[Constraint]]:
+    """Index constraints by the variables they depend on.
+
+    This builds, in a single pass over the constraints, the same information
+    as calling `find_dependent_relations` for every variable, which is much
+    faster when the constraints of many variables are needed (e.g. when
+    building a computation graph).
+
+    Parameters
+    ----------
+    constraints: iterable of Constraints
+        set of constraints to index
+
+    Returns
+    -------
+    dict
+        a dict { variable name: list of constraints }. For each variable,
+        constraints are given in the same order as in `constraints`.
+        Variables that do not appear in any constraint are not in the dict.
+
+    Examples
+    --------
+    >>> v1, v2 = Variable('v1', [0, 1]), Variable('v2', [0, 1])
+    >>> v3 = Variable('v3', [0, 1])
+    >>> c1 = constraint_from_str('c1', 'v1 + v2', [v1, v2])
+    >>> c2 = constraint_from_str('c2', 'v1 * v3', [v1, v3])
+    >>> index = dependent_relations_index([c1, c2])
+    >>> [c.name for c in index['v1']]
+    ['c1', 'c2']
+    >>> [c.name for c in index['v3']]
+    ['c2']
+    """
+    index = defaultdict(list)
+    for r in constraints:
+        for v in r.dimensions:
+            index[v.name].append(r)
+    return dict(index)
+
+
 def is_compatible(assignment1: Dict[str, Any], assignment2: Dict[str, Any]):
     """
     Check if two (potentially partial) assignments are compatible.
@@ -1201,7 +1754,8 @@ def is_compatible(assignment1: Dict[str, Any], assignment2: Dict[str, Any]):
 
 
 def constraint_from_str(name: str, expression: str,
-                        all_variables: Iterable[Variable]):
+                        all_variables: Union[Iterable[Variable],
+                                             Mapping]):
     """
     Generate a relation object from a string expression and a list of
     available variable objects.
@@ -1215,19 +1769,20 @@ def constraint_from_str(name: str, expression: str,
     :param all_variables: list of all available variable objects the relation
     could depend on. The exact scope of the relation depends on the content of
     the expression, but any variable used in the expression must be in this
-    list.
+    list. When building many relations, a dict name -> variable should be
+    given instead of a list, to avoid scanning all variables for each
+    relation.
 
     :return: a relation object whose function implements the expression
     """
+    if not isinstance(all_variables, Mapping):
+        all_variables = {v.name: v for v in all_variables}
     f_exp = ExpressionFunction(expression)
     relation_variables = []
     for v in f_exp.variable_names:
-        found = False
-        for s in all_variables:
-            if s.name == v:
-                relation_variables.append(s)
-                found = True
-        if not found:
+        try:
+            relation_variables.append(all_variables[v])
+        except KeyError:
             raise Exception('Missing variable {} for string-based function '
                             '"{}"'.format(v, expression))
 
@@ -29,10 +29,17 @@
 # POSSIBILITY OF SUCH DAMAGE.
 
 
+import json
+import math
+import re
 from collections import defaultdict
 from collections import Iterable as CollectionIterable
-from typing import Dict, Iterable, Union
+from functools import lru_cache
+from io import StringIO
+from itertools import product
+from typing import Dict, Iterable, Union, List, Sequence, TextIO
 
+import numpy as np
 import yaml
 
 from pydcop.algorithms import generate_assignment_as_dict
@@ -41,10 +48,20 @@ from pydcop.dcop.objects import VariableDomain, Variable, \
 from pydcop.dcop.scenario import EventAction, DcopEvent, Scenario
 from pydcop.dcop.dcop import DCOP
 from pydcop.dcop.relations import relation_from_str, RelationProtocol, \
-    NAryMatrixRelation, assignment_matrix
+    NAryMatrixRelation
 from pydcop.utils.expressionfunction import ExpressionFunction
 from pydcop.distribution.objects import DistributionHints
 
+try:
+    # The libyaml-based loader and dumper are much faster than the pure
+    # python ones
+    from yaml import CSafeLoader as YamlLoader, CDumper as YamlDumper
+except ImportError:
+    from yaml import SafeLoader as YamlLoader, Dumper as YamlDumper
+
+_PLAIN_NAME = re.compile(r'[A-Za-z_][A-Za-z0-9_.\-]*$')
+_resolver = yaml.resolver.Resolver()
+
 
 class DcopInvalidFormatError(Exception):
     pass
@@ -60,29 +77,63 @@ def load_dcop_from_file(filenames: Union[str, Iterable[str]]):
         The dcop can the given as a single file or as several files. When
         passing an iterable of file names, their content is concatenated
         before parsing. This can be usefull when you want to define the
-        agents in a separate file.
+        agents in a separate file. The first file can also be a binary dcop
+        (see `pydcop.dcop.binarydcop`), the content of the other files is
+        then merged into its definition.
 
     Returns
     -------
     A DCOP object built by parsing the files
 
     """
-    content = ''
-    if isinstance(filenames, CollectionIterable):
-        for filename in filenames:
-            with open(filename, mode='r', encoding='utf-8') as f:
-                content += f.read()
-    else:
-        with open(filenames, mode='r', encoding='utf-8') as f:
-            content += f.read()
+    if isinstance(filenames, str) or \
+            not isinstance(filenames, CollectionIterable):
+        filenames = [filenames]
+    filenames = list(filenames)
 
+    # Imported here as binarydcop depends on this module
+    from pydcop.dcop.binarydcop import is_binary_dcop, load_dcop_from_binary
+    if filenames and is_binary_dcop(filenames[0]):
+        return load_dcop_from_binary(filenames[0], filenames[1:])
+
+    content = read_files(filenames)
     if content:
         return load_dcop(content)
 
 
+def read_files(filenames: Iterable[str]) -> str:
+    """
+    Concatenate the content of several yaml files.
+    """
+    contents = []
+    for filename in filenames:
+        with open(filename, mode='r', encoding='utf-8') as f:
+            contents.append(f.read())
+    return ''.join(contents)
+
+
 def load_dcop(dcop_str: str) -> DCOP :
-    loaded = yaml.load(dcop_str)
+    loaded = yaml.load(dcop_str, Loader=YamlLoader)
+    return dcop_from_dict(loaded)
+
 
+def dcop_from_dict(loaded: Dict, tables: Sequence[np.ndarray]=None) -> DCOP:
+    """
+    Build a DCOP from its definition, as loaded from a yaml string.
+
+    Parameters
+    ----------
+    loaded: dict
+        the definition of the dcop
+    tables: sequence of numpy arrays
+        matrices for the extensional constraints defined with a `table`
+        entry, which is an index in `tables`, instead of their `values`.
+        This is used for binary dcops.
+
+    Returns
+    -------
+    A DCOP object
+    """
     if 'name' not in loaded:
         raise ValueError('Missing name in dcop string')
     if 'objective' not in loaded or loaded['objective'] not in ['min', 'max']:
@@ -95,39 +146,120 @@ def load_dcop(dcop_str: str) -> DCOP :
     dcop.domains = _build_domains(loaded)
     dcop.variables = _build_variables(loaded, dcop)
     dcop.external_variables = _build_external_variables(loaded, dcop)
-    dcop._constraints = _build_constraints(loaded, dcop)
+    dcop._constraints = _build_constraints(loaded, dcop, tables)
     dcop._agents_def= _build_agents(loaded)
     dcop.dist_hints = _build_dist_hints(loaded, dcop)
     return dcop
 
 
 def dcop_yaml(dcop: DCOP) -> str:
+    stream = StringIO()
+    write_dcop_yaml(dcop, stream)
+    return stream.getvalue()
 
+
+def write_dcop_yaml(dcop: DCOP, stream: TextIO):
+    """
+    Write a dcop in yaml.
+
+    Constraints are written one by one, without building the yaml string
+    for the whole dcop, which can be very large.
+
+    Parameters
+    ----------
+    dcop: DCOP
+        the dcop to write
+    stream:
+        a text stream, e.g. a file opened in text mode.
+    """
     dcop_dict = {
         'name': dcop.name,
         'objective': dcop.objective
     }
-    dcop_str = yaml.dump(dcop_dict, default_flow_style=False)
-    dcop_str += '\n'
-    dcop_str += _yaml_domains(dcop.domains.values())
-    dcop_str += '\n'
-    dcop_str += _yaml_variables(dcop.variables.values())
-    dcop_str += '\n'
-    dcop_str += _yaml_constraints(dcop.constraints.values())
-    dcop_str += '\n'
-    dcop_str += _yaml_agents(dcop.agents.values())
+    stream.write(yaml.dump(dcop_dict, default_flow_style=False))
+    stream.write('\n')
+    _write_yaml_mapping({'domains': _dict_domains(dcop.domains.values())},
+                        stream)
+    stream.write('\n')
+    _write_yaml_mapping(
+        {'variables': _dict_variables(dcop.variables.values())}, stream)
+    stream.write('\n')
+    _write_yaml_constraints(dcop.constraints.values(), stream)
+    stream.write('\n')
+    _write_yaml_mapping(_dict_agents(dcop.agents.values()), stream)
+
+
+def _write_yaml_mapping(mapping: Dict, stream: TextIO, level: int=0):
+    """
+    Write a mapping in yaml, in block style.
 
-    return  dcop_str
+    Even with libyaml, yaml.dump is slow for large dcops as the
+    representation of objects is done in python. Mappings are written
+    directly instead, only values with no simple representation (see
+    `_yaml_scalar`) are written with yaml.dump.
+    """
+    prefix = '  ' * level
+    for key, value in mapping.items():
+        if isinstance(value, dict) and value:
+            stream.write('{}{}:\n'.format(prefix, _yaml_scalar(key)))
+            _write_yaml_mapping(value, stream, level + 1)
+        else:
+            stream.write('{}{}: {}\n'.format(prefix, _yaml_scalar(key),
+                                             _yaml_scalar(value)))
 
 
-def _yaml_domains(domains):
+def _yaml_scalar(value) -> str:
+    """
+    A value as a yaml flow node.
+    """
+    value_type = type(value)
+    if value_type == str:
+        return _yaml_str(value)
+    if value_type == int:
+        return str(value)
+    if value_type == float and math.isfinite(value):
+        r = repr(value)
+        # yaml floats must have a dot, e.g. 1e+16 would be read as a string
+        if '.' not in r and 'e' in r:
+            r = r.replace('e', '.0e', 1)
+        return r
+    if isinstance(value, np.generic):
+        return _yaml_scalar(value.item())
+    if isinstance(value, (list, tuple)):
+        return '[{}]'.format(', '.join(_yaml_scalar(v) for v in value))
+    if isinstance(value, dict) and not value:
+        return '{}'
+    # Other values (None, bool, inf, etc.) are rare, use yaml.dump
+    return yaml.dump([value], Dumper=YamlDumper,
+                     default_flow_style=True)[1:-2]
+
+
+# Names (of variables, computations, agents...) are often repeated, e.g. in
+# hosting costs and routes
+@lru_cache(maxsize=2**16)
+def _yaml_str(value: str) -> str:
+    """
+    A string as a yaml scalar.
+
+    Simple names are written as plain scalars, unless they would be read as
+    another type (e.g. `yes` or `null`), other strings are double-quoted,
+    using the json syntax which is valid in yaml.
+    """
+    if _PLAIN_NAME.match(value) and \
+            _resolver.resolve(yaml.ScalarNode, value, (True, False)) == \
+            'tag:yaml.org,2002:str':
+        return value
+    return json.dumps(value, ensure_ascii=False)
+
+
+def _dict_domains(domains) -> Dict:
     d_dict = {}
     for domain in domains:
         d_dict[domain.name] = {
             'values': list(domain.values),
             'type': domain.type
         }
-    return yaml.dump({'domains': d_dict}) #  , default_flow_style=False)
+    return d_dict
 
 
 def _build_domains(loaded) -> Dict[str, VariableDomain]:
@@ -144,14 +276,13 @@ def _build_domains(loaded) -> Dict[str, VariableDomain]:
     return domains
 
 
-def _yaml_variables(variables):
+def _dict_variables(variables) -> Dict:
     var_dict = {}
     for v in variables:
         var_dict[v.name] = {'domain': v.domain.name}
         if v.initial_value is not None:
             var_dict[v.name]['initial_value'] = v.initial_value
-
-    return yaml.dump({'variables': var_dict}, default_flow_style=False)
+    return var_dict
 
 
 def _build_variables(loaded, dcop) -> Dict[str, Variable] :
@@ -200,9 +331,11 @@ def _build_external_variables(loaded, dcop) -> Dict[str, ExternalVariable]:
     return ext_vars
 
 
-def _build_constraints(loaded, dcop) -> Dict[str, RelationProtocol]:
+def _build_constraints(loaded, dcop, tables=None) \
+        -> Dict[str, RelationProtocol]:
     constraints = {}
     if 'constraints' in loaded:
+        all_variables = {v.name: v for v in dcop.all_variables}
         for c_name in loaded['constraints']:
             c = loaded['constraints'][c_name]
             if 'type' not in c:
@@ -211,49 +344,18 @@ def _build_constraints(loaded, dcop) -> Dict[str, RelationProtocol]:
                                  'supported for now'.format(c_name))
             elif c['type'] == 'intention':
                 constraints[c_name] = relation_from_str(c_name, c['function'],
-                                                    dcop.all_variables)
+                                                        all_variables)
             elif c['type'] == 'extensional':
-                values_def = c['values']
                 default = None if 'default' not in c else  c['default']
                 if type(c['variables']) != list:
                     # specific case for constraint with a single variable
-                    v = dcop.variable(c['variables'].strip())
-                    values = [default] * len(v.domain)
-                    for value, assignments_def in values_def.items():
-                        if isinstance(assignments_def, str):
-                            for ass_def in assignments_def.split('|'):
-                                iv, _ = v.domain.to_domain_value(
-                                    ass_def.strip())
-                                values[iv] = value
-                        else:
-                            values[v.domain.index(assignments_def)] = value
-
-                    constraints[c_name] = NAryMatrixRelation([v], values,
-                                                             name=c_name)
-                    continue
-
-                # For constraints that depends on several variables
-                vars = [dcop.variable(v) for v in c['variables']]
-                values = assignment_matrix(vars, default)
-
-
-                for value, assignments_def in values_def.items():
-                    # can be a str like "1 2 3" or "1 2 3 | 1 3 4"
-                    # several assignment for the same value are separated with |
-                    assignments_def = assignments_def.split('|')
-                    for ass_def in assignments_def:
-                        val_position = values
-                        vals_def = ass_def.split()
-                        for i, val_def in enumerate(vals_def[:-1]):
-                            iv, _ = vars[i].domain.to_domain_value(
-                                val_def.strip())
-                            val_position = val_position[iv]
-                        # value for the last variable of the assignment
-                        val_def = vals_def[-1]
-                        iv, _ = vars[-1].domain.to_domain_value(
-                            val_def.strip())
-                        val_position[iv] = value
-
+                    vars = [dcop.variable(c['variables'].strip())]
+                else:
+                    vars = [dcop.variable(v) for v in c['variables']]
+                if 'table' in c:
+                    values = tables[c['table']]
+                else:
+                    values = _extensional_matrix(vars, c['values'], default)
                 constraints[c_name] = NAryMatrixRelation(vars, values,
                                                          name=c_name)
 
@@ -265,32 +367,187 @@ def _build_constraints(loaded, dcop) -> Dict[str, RelationProtocol]:
     return constraints
 
 
+def _extensional_matrix(variables: List[Variable], values_def,
+                        default) -> np.ndarray:
+    """
+    Build the matrix of an extensional constraint.
+
+    Parameters
+    ----------
+    variables: list of Variable
+        the variables of the constraint
+    values_def: dict
+        map each value of the constraint to its assignments, given as a str
+        like "1 2 3" or "1 2 3 | 1 3 4" (several assignments for the same
+        value are separated with |). For a constraint with a single
+        variable, the value of the variable can also be given directly.
+    default:
+        value for all assignments that are not in `values_def`
+
+    Returns
+    -------
+    a numpy array, with one dimension for each variable. When `default` is
+    None and some assignments are not defined, it is an array of objects,
+    with None for these assignments.
+    """
+    shape = tuple(len(v.domain) for v in variables)
+    all_values = list(values_def)
+    if default is not None:
+        all_values.append(default)
+    dtype = np.result_type(*all_values) if all_values else np.float64
+    matrix = np.full(shape, 0 if default is None else default, dtype=dtype)
+    assigned = np.zeros(shape, dtype=bool) if default is None else None
+
+    # Index of each value, from its str representation, for each variable
+    indexes = [{str(val): i for i, val in enumerate(v.domain.values)}
+               for v in variables]
+
+    def value_index(i, val_def):
+        try:
+            return indexes[i][val_def]
+        except KeyError:
+            # raises a ValueError if the value is not in the domain
+            return variables[i].domain.to_domain_value(val_def)[0]
+
+    for value, assignments_def in values_def.items():
+        if not isinstance(assignments_def, str):
+            if len(variables) != 1:
+                raise ValueError('Invalid assignment {} for value {} in '
+                                 'extensional constraint'
+                                 .format(assignments_def, value))
+            positions = [(variables[0].domain.index(assignments_def),)]
+        else:
+            positions = []
+            for ass_def in assignments_def.split('|'):
+                vals_def = ass_def.split()
+                if len(vals_def) != len(variables):
+                    raise ValueError('Invalid assignment "{}" for value {} in '
+                                     'extensional constraint'
+                                     .format(ass_def, value))
+                positions.append(tuple(value_index(i, val_def)
+                                       for i, val_def in enumerate(vals_def)))
+        # Set all assignments for this value at once
+        positions = tuple(np.array(positions).T)
+        matrix[positions] = value
+        if assigned is not None:
+            assigned[positions] = True
+
+    if assigned is not None and not assigned.all():
+        matrix = matrix.astype(object)
+        matrix[~assigned] = None
+    return matrix
+
+
 def _yaml_constraints(constraints: Iterable[RelationProtocol]):
-    constraints_dict = {}
+    stream = StringIO()
+    _write_yaml_constraints(constraints, stream)
+    return stream.getvalue()
+
+
+def _write_yaml_constraints(constraints: Iterable[RelationProtocol],
+                            stream: TextIO):
+    constraints = sorted(constraints, key=lambda c: c.name)
+    if not constraints:
+        stream.write('constraints: {}\n')
+        return
+    stream.write('constraints:\n')
+    assignments_cache = {}
     for r in constraints:
         if hasattr(r, 'expression'):
-
-            constraints_dict[r.name] = {'type': 'intention',
-                                        'function': r.expression}
+            _write_yaml_mapping({r.name: {'type': 'intention',
+                                          'function': r.expression}},
+                                stream, 1)
+            continue
+
+        constraint_dict = {'type': 'extensional',
+                           'variables': [v.name for v in r.dimensions]}
+        if isinstance(r, NAryMatrixRelation) and r._m.dtype != object:
+            default, values = _extensional_values(r, assignments_cache)
+            if default is not None:
+                constraint_dict['default'] = default
         else:
-            # fallback to extensional constraint
+            # fallback for other relations: evaluate all assignments
             variables = [v.name for v in r.dimensions]
             values = defaultdict(lambda : [])
-
             for assignment in generate_assignment_as_dict(r.dimensions):
                 val = r(**assignment)
-                ass_str = ' '.join([str(assignment[var]) for var in variables])
+                ass_str = ' '.join([str(assignment[var])
+                                    for var in variables])
                 values[val].append(ass_str)
 
             for val in values:
                 values[val] = ' | '.join(values[val])
             values = dict(values)
-            constraints_dict[r.name] = {'type': 'extensional',
-                                        'variables' : variables,
-                                        'values' : values}
+        constraint_dict['values'] = values
+        _write_yaml_mapping({r.name: constraint_dict}, stream, 1)
+
+
+def _extensional_values(r: NAryMatrixRelation, assignments_cache=None):
+    """
+    Values of an extensional constraint, grouped from its matrix.
 
-    return yaml.dump({'constraints': constraints_dict},
-                     default_flow_style=False)
+    Parameters
+    ----------
+    r: NAryMatrixRelation
+        the constraint
+    assignments_cache: dict
+        optional dict used to cache the str representations of
+        assignments, which are the same for all the constraints whose
+        variables have the same domains.
+
+    Returns
+    -------
+    a pair (default, values) where default is the most frequent value in
+    the matrix (None if the matrix is empty) and values maps each other
+    value to its assignments, formatted as for the yaml format:
+    "1 2 3 | 1 3 4". Undefined (NaN) values are written explicitly, under a
+    single NaN key, otherwise they would get the default value when
+    loading the constraint.
+    """
+    # Use the same order as generate_assignment: the first variable changes
+    # the most often.
+    m = r._m.ravel(order='F')
+    if m.size == 0:
+        return None, {}
+    unique, inverse = np.unique(m, return_inverse=True)
+    counts = np.bincount(inverse)
+    # NaN are used for assignments without value
+    defined = ~np.isnan(unique) if unique.dtype.kind == 'f' else \
+        np.ones(len(unique), dtype=bool)
+    default_index = None
+    if defined.any():
+        default_index = int(np.argmax(np.where(defined, counts, -1)))
+
+    str_domains = tuple(tuple(str(val) for val in v.domain.values)
+                        for v in r.dimensions)
+    assignments_cache = {} if assignments_cache is None \
+        else assignments_cache
+    try:
+        assignments = assignments_cache[str_domains]
+    except KeyError:
+        # product varies the last element the most often
+        assignments = np.array([' '.join(reversed(a)) for a in
+                                product(*reversed(str_domains))],
+                               dtype=object)
+        assignments_cache[str_domains] = assignments
+    assignments = assignments[np.argsort(inverse, kind='stable')]
+
+    values = {}
+    undefined = []
+    start = 0
+    for i, value in enumerate(unique.tolist()):
+        end = start + counts[i]
+        if not defined[i]:
+            # np.unique does not merge NaN values
+            undefined.extend(assignments[start:end].tolist())
+        elif i != default_index:
+            values[value] = ' | '.join(assignments[start:end].tolist())
+        start = end
+    if undefined:
+        values[float('nan')] = ' | '.join(undefined)
+    default = unique[default_index].item() \
+        if default_index is not None else None
+    return default, values
 
 
 def _build_agents(loaded) -> Dict[str, AgentDef]:
@@ -368,7 +625,7 @@ def _build_agents(loaded) -> Dict[str, AgentDef]:
     return agents
 
 
-def _yaml_agents(agents) -> str:
+def _dict_agents(agents) -> Dict:
     agt_dict = {}
     hosting_costs = {}
     routes = {}
@@ -385,10 +642,9 @@ def _yaml_agents(agents) -> str:
         routes[agt.name] = agt.routes
         routes['default'] = agt.default_route
 
-    return yaml.dump({'agents': agt_dict,
-                      'hosting_costs': hosting_costs,
-                      'routes': routes},
-                     default_flow_style=False)
+    return {'agents': agt_dict,
+            'hosting_costs': hosting_costs,
+            'routes': routes}
 
 
 def _build_dist_hints(loaded, dcop):
@@ -465,7 +721,7 @@ def load_scenario(scenario_str) -> Scenario:
     :param scenario_str:
     :return:
     """
-    loaded = yaml.load(scenario_str)
+    loaded = yaml.load(scenario_str, Loader=YamlLoader)
     evts = []
     for evt in loaded['events']:
         id = evt['id']
@@ -0,0 +1,259 @@
+# BSD-3-Clause License
+#
+# Copyright 2017 Orange
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+
+"""
+Helpers for the distribution methods based on an integer linear program
+(`ilp_fgdp` and `ilp_compref`).
+
+These methods can use two solvers:
+
+* `glpk`, which requires the `glpsol` executable to be installed,
+* `cbc`, which is bundled with PuLP.
+
+The solver can be given a time limit and a relative MIP gap. When the
+solver stops before proving optimality, the best feasible solution it found
+is used. With `cbc`, the search can also be warm-started from an initial
+solution (typically the one found by the `heur_comhost` heuristic). As cbc
+only checks its time limit between two steps of the search, which can be
+very long on large models, it is killed if it has not returned shortly after
+the time limit.
+
+"""
+import logging
+import math
+import os
+import subprocess
+import tempfile
+from typing import Dict, Any
+
+from pulp import LpProblem, LpVariable, LpStatusNotSolved, PulpSolverError
+from pulp.solvers import GLPK_CMD, PULP_CBC_CMD
+
+logger = logging.getLogger('distribution.ilp')
+
+ILP_SOLVERS = ['glpk', 'cbc']
+
+# Extra time, relative to the time limit, given to cbc before killing it.
+KILL_MARGIN = 0.1
+# Minimum extra time, in seconds, given to cbc before killing it.
+KILL_MIN_DELAY = 5
+
+
+def ilp_params(params: Dict[str, str]) -> Dict[str, Any]:
+    """
+    Parameters for ILP-based distribution methods.
+
+    If a value for parameter is given in `params` it is used, otherwise a
+    default value is used instead.
+
+    Parameters
+    ----------
+    params: dict
+        a dict containing name and values (as strings) for parameters:
+        `solver` (`glpk` or `cbc`), `time_limit` (in seconds), `mip_gap`
+        (relative gap) and `warm_start` (0 or 1).
+
+    Returns
+    -------
+    dict
+        the parameters, that can be passed as keyword arguments to the
+        `distribute` function of the distribution method.
+    """
+    ilp = {
+        'solver': None,
+        'time_limit': None,
+        'mip_gap': None,
+        'warm_start': True,
+    }
+    if 'solver' in params:
+        if params['solver'] not in ILP_SOLVERS:
+            raise ValueError("'solver' parameter must be one of {}"
+                             .format(ILP_SOLVERS))
+        ilp['solver'] = params['solver']
+    for p in ['time_limit', 'mip_gap']:
+        if p in params:
+            try:
+                ilp[p] = float(params[p])
+            except ValueError:
+                raise TypeError("'{}' parameter must be a float".format(p))
+    if 'warm_start' in params:
+        if params['warm_start'] not in ['0', '1']:
+            raise ValueError("'warm_start' parameter must be 0 or 1")
+        ilp['warm_start'] = params['warm_start'] == '1'
+
+    remaining_params = set(params) - set(ilp)
+    if remaining_params:
+        raise ValueError('Unknown parameter(s) for ilp distribution : {}'
+                         .format(remaining_params))
+    return ilp
+
+
+def default_solver() -> str:
+    """
+    The solver used when none is given: `glpk` when `glpsol` is installed,
+    `cbc` otherwise.
+    """
+    return 'glpk' if GLPK_CMD().available() else 'cbc'
+
+
+class CbcMipStartCmd(PULP_CBC_CMD):
+    """
+    PuLP's bundled CBC solver, with support for warm starts and a hard
+    time limit.
+
+    PuLP (1.x) does not support passing an initial solution to CBC, it is
+    given here with CBC's `mips` command, in a solution file.
+
+    Parameters
+    ----------
+    initial_values: dict
+        a dict {LpVariable: value} giving an initial solution. Variables
+        that are not in this dict are left free.
+    """
+
+    def __init__(self, initial_values: Dict[LpVariable, float]=None,
+                 **kwargs):
+        super().__init__(**kwargs)
+        self.initial_values = initial_values
+
+    def actualSolve(self, lp, **kwargs):
+        if not self.executable(self.path):
+            raise PulpSolverError('Pulp: cannot execute {}'.format(self.path))
+        fd, tmp_lp = tempfile.mkstemp(suffix='-pulp.lp')
+        os.close(fd)
+        tmp_sol = tmp_lp[:-3] + '.sol'
+        tmp_start = tmp_lp[:-3] + '.mst'
+        try:
+            # Use the lp format, as the mps writer renames variables, which
+            # are needed in the initial solution file.
+            lp.writeLP(tmp_lp)
+            cmd = [self.path, tmp_lp]
+            if self.initial_values:
+                with open(tmp_start, mode='w') as f:
+                    f.write('Stopped on iterations - objective value 0\n')
+                    for i, (v, val) in enumerate(self.initial_values.items()):
+                        f.write('{} {} {}\n'.format(i, v.name, val))
+                cmd += ['mips', tmp_start]
+            if self.fracGap is not None:
+                cmd += ['ratio', str(self.fracGap)]
+            timeout = None
+            if self.maxSeconds is not None:
+                cmd += ['sec', str(self.maxSeconds)]
+                timeout = self.maxSeconds + \
+                    max(KILL_MIN_DELAY, KILL_MARGIN * self.maxSeconds)
+            cmd += ['branch', 'printingOptions', 'all', 'solution', tmp_sol]
+
+            logger.debug('Running %s', ' '.join(cmd))
+            with open(os.devnull, 'w') as devnull:
+                pipe = None if self.msg else devnull
+                proc = subprocess.Popen(cmd, stdout=pipe, stderr=pipe)
+                try:
+                    proc.wait(timeout=timeout)
+                except subprocess.TimeoutExpired:
+                    proc.kill()
+                    proc.wait()
+                    logger.warning('cbc killed after %s seconds', timeout)
+                    lp.status = LpStatusNotSolved
+                    return lp.status
+            if proc.returncode != 0 or not os.path.exists(tmp_sol):
+                raise PulpSolverError(
+                    'Pulp: Error while executing {}'.format(self.path))
+
+            lp.status, values, reduced_costs, shadow_prices, slacks = \
+                self.readsol_LP(tmp_sol, lp, lp.variables())
+            lp.assignVarsVals(values)
+            lp.assignVarsDj(reduced_costs)
+            lp.assignConsPi(shadow_prices)
+            lp.assignConsSlack(slacks, activity=True)
+            return lp.status
+        finally:
+            for f in [tmp_lp, tmp_sol, tmp_start]:
+                if os.path.exists(f):
+                    os.remove(f)
+
+
+def solve(pb: LpProblem, solver: str=None, time_limit: float=None,
+          mip_gap: float=None,
+          initial_values: Dict[LpVariable, float]=None) -> int:
+    """
+    Solve an integer linear program.
+
+    When the solver stops before proving optimality (e.g. because of the
+    time limit), the variables hold the best solution it found, if any. As
+    solvers do not report this consistently, callers must check the
+    feasibility of the solution themselves.
+
+    Parameters
+    ----------
+    pb: LpProblem
+        the problem to solve
+    solver: str
+        `glpk` or `cbc`, if None the solver given by `default_solver()` is
+        used.
+    time_limit: float
+        time limit for the solver, in seconds
+    mip_gap: float
+        relative MIP gap at which the solver stops
+    initial_values: dict
+        a dict {LpVariable: value} used to warm-start the solver. Only
+        supported with `cbc`, ignored with `glpk`.
+
+    Returns
+    -------
+    int
+        the PuLP status of the problem, `LpStatusNotSolved` if the solver
+        failed.
+    """
+    solver = default_solver() if solver is None else solver
+    if solver == 'glpk':
+        options = ['--pcost']
+        if time_limit is not None:
+            options += ['--tmlim', str(int(math.ceil(time_limit)))]
+        if mip_gap is not None:
+            options += ['--mipgap', str(mip_gap)]
+        cmd = GLPK_CMD(keepFiles=0, msg=False, options=options)
+    elif solver == 'cbc':
+        cmd = CbcMipStartCmd(initial_values=initial_values, msg=False,
+                             maxSeconds=time_limit, fracGap=mip_gap)
+    else:
+        raise ValueError('Invalid ilp solver {}, must be one of {}'
+                         .format(solver, ILP_SOLVERS))
+
+    logger.debug('Solving %s with %s, %s variables', pb.name, solver,
+                 pb.numVariables())
+    try:
+        status = pb.solve(cmd)
+    except PulpSolverError as e:
+        logger.warning('Error when solving %s with %s : %s',
+                       pb.name, solver, e)
+        return LpStatusNotSolved
+    logger.debug('Solver %s status: %s', solver, status)
+    return status
@@ -39,6 +39,10 @@ from pydcop.computations_graph.objects import ComputationGraph
 from pydcop.dcop.objects import AgentDef
 from pydcop.distribution.objects import Distribution, DistributionHints, \
     ImpossibleDistributionException
+from pydcop.distribution.incremental import distribute_remove, \
+    distribute_add
+
+__all__ = ['distribute', 'distribute_remove', 'distribute_add']
 
 logger = logging.getLogger('distribution.adhoc')
 
@@ -182,16 +186,3 @@ def _distribute_try(computation_graph: ComputationGraph,
         var_hosted[n.name] = selected
 
     return Distribution({a: list(mapping[a]) for a in mapping})
-
-
-def distribute_remove(secp, current_distribution, removed_device):
-    # TODO à implémenter !
-    # FIXME : only take neighbors agents as variable ?
-    raise NotImplementedError()
-
-
-def distribute_add(secp, new_device, current_distribution,
-                   connected_models=None):
-    # TODO à implémenter !
-    # FIXME : only take neighbors agents as variable ?
-    raise NotImplementedError()
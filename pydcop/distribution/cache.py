@@ -0,0 +1,358 @@
+# BSD-3-Clause License
+#
+# Copyright 2017 Orange
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+
+"""
+On-disk cache for distributions.
+
+Distributing the computations of a DCOP may be expensive (e.g. ilp-based
+methods), and the same distribution is computed again each time a DCOP is
+solved. `DistributionCache` stores distributions on disk, in the yaml format
+used by `pydcop.distribution.yamlformat`, keyed on a hash of everything the
+distribution depends on:
+
+* the content of the dcop files (for binary dcops, only the header is used,
+  as constraints' tables have no impact on distributions),
+* the computation graph model,
+* the distribution method, its parameters, and its source and the source of
+  the pydcop modules it depends on,
+* the dcop algorithm and the source of its `computation_memory` and
+  `communication_load` functions,
+* the agents' definitions,
+* the version of pydcop.
+
+Distributions computed within a time budget (with the `portfolio` method, or
+with a `time_limit` parameter) are not cached: they depend on the load of the
+machine, and may be improved when computed again (see `is_cacheable`).
+
+Computation graphs are not cached: building them is much faster than
+deserializing them, as computation nodes embed the dcop's variables and
+constraints.
+
+The size of the cache is bounded: when it exceeds its maximum size, the least
+recently used entries are removed.
+
+"""
+import hashlib
+import inspect
+import json
+import logging
+import os
+import sys
+import tempfile
+from importlib import import_module
+from typing import Iterable, Optional, Dict, Any, Callable, List
+
+import yaml
+
+from pydcop.dcop.binarydcop import is_binary_dcop, HEADER_FILE
+from pydcop.dcop.objects import AgentDef
+from pydcop.distribution.objects import Distribution
+from pydcop.distribution.yamlformat import load_dist
+from pydcop.version import __version__
+
+logger = logging.getLogger('distribution.cache')
+
+# Environment variable giving the cache directory.
+CACHE_DIR_ENV = 'PYDCOP_CACHE_DIR'
+
+# Default maximum size of the cache, in bytes.
+DEFAULT_MAX_SIZE = 256 * 1024 * 1024
+
+ENTRY_SUFFIX = '.yaml'
+
+# Distribution methods that are always run within a time budget.
+TIME_BOUNDED_METHODS = ['portfolio']
+
+# Parameters giving a time budget to a distribution method.
+TIME_BOUND_PARAMS = ['time_limit', 'time_budget']
+
+
+def is_cacheable(dist: str, dist_params: Dict[str, Any]=None) -> bool:
+    """
+    Whether the distributions computed by a method can be cached.
+
+    Parameters
+    ----------
+    dist: str
+        the distribution method
+    dist_params: dict
+        parameters of the distribution method
+
+    Returns
+    -------
+    bool
+        False if the method is run within a time budget, True otherwise.
+
+    Examples
+    --------
+    >>> is_cacheable('ilp_fgdp', {'solver': 'glpk'})
+    True
+    >>> is_cacheable('ilp_fgdp', {'time_limit': 10})
+    False
+    >>> is_cacheable('portfolio')
+    False
+    """
+    if dist in TIME_BOUNDED_METHODS:
+        return False
+    return not any((dist_params or {}).get(p) is not None
+                   for p in TIME_BOUND_PARAMS)
+
+
+def default_cache_dir() -> str:
+    """
+    The cache directory: `$PYDCOP_CACHE_DIR` if set, otherwise `pydcop` in
+    the user's cache directory (`$XDG_CACHE_HOME` or `~/.cache`).
+    """
+    if os.environ.get(CACHE_DIR_ENV):
+        return os.environ[CACHE_DIR_ENV]
+    cache_home = os.environ.get('XDG_CACHE_HOME') or \
+        os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(cache_home, 'pydcop')
+
+
+class DistributionCache(object):
+    """
+    Size-bounded, content-addressed, on-disk cache of distributions.
+
+    Parameters
+    ----------
+    directory: str
+        the directory where distributions are stored, defaults to
+        `default_cache_dir()`. It is created if needed.
+    max_size: int
+        maximum size of the cache, in bytes.
+    """
+
+    def __init__(self, directory: str=None, max_size: int=DEFAULT_MAX_SIZE):
+        self.directory = default_cache_dir() if directory is None \
+            else directory
+        self.max_size = max_size
+
+    def key(self, dcop_files: Iterable[str], graph: str, dist: str,
+            algo: str=None,
+            computation_memory: Callable=None,
+            communication_load: Callable=None,
+            dist_params: Dict[str, Any]=None,
+            agents: Iterable[AgentDef]=None) -> str:
+        """
+        Key of the distribution of a dcop.
+
+        Parameters
+        ----------
+        dcop_files: list of str
+            the files (or binary dcop directories) the dcop was loaded from.
+        graph: str
+            the computation graph model
+        dist: str
+            the distribution method
+        algo: str
+            the dcop algorithm, if any
+        computation_memory: callable
+            the algorithm's footprint function, if any
+        communication_load: callable
+            the algorithm's communication load function, if any
+        dist_params: dict
+            parameters of the distribution method
+        agents: iterable of AgentDef
+            the agents the computations are distributed on
+
+        Returns
+        -------
+        str
+            a hex digest identifying the distribution.
+        """
+        h = hashlib.sha256()
+        for f in dcop_files:
+            h.update(_file_digest(f).encode())
+        description = {
+            'version': __version__,
+            'graph': graph,
+            'dist': dist,
+            'dist_source': _module_source('pydcop.distribution.' + dist),
+            'algo': algo,
+            'computation_memory': _function_source(computation_memory),
+            'communication_load': _function_source(communication_load),
+            'dist_params': repr(sorted((dist_params or {}).items())),
+            'agents': [_agent_description(a) for a in agents or []],
+        }
+        h.update(json.dumps(description, sort_keys=True, default=repr)
+                 .encode())
+        return h.hexdigest()
+
+    def get(self, key: str) -> Optional[Distribution]:
+        """
+        The distribution cached for `key`, or None if there is none.
+        """
+        path = self._path(key)
+        try:
+            with open(path, encoding='utf-8') as f:
+                distribution = load_dist(f.read())
+            # Update the entry's modification time, used for LRU eviction
+            os.utime(path)
+        except FileNotFoundError:
+            logger.debug('Cache miss for %s', key)
+            return None
+        except (OSError, ValueError, yaml.YAMLError) as e:
+            logger.warning('Invalid cache entry %s, ignored : %s', path, e)
+            return None
+        logger.info('Distribution found in cache: %s', path)
+        return distribution
+
+    def put(self, key: str, distribution: Distribution):
+        """
+        Store a distribution in the cache, and evict least recently used
+        entries if the cache exceeds its maximum size.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        content = yaml.dump({'distribution': distribution.mapping()})
+        # Write in a temporary file and rename it, for concurrent commands
+        # not to read a partial entry.
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(content)
+            os.replace(tmp_path, self._path(key))
+        except OSError:
+            os.remove(tmp_path)
+            raise
+        logger.info('Distribution stored in cache: %s', self._path(key))
+        self.evict()
+
+    def evict(self):
+        """
+        Remove least recently used entries until the size of the cache is
+        below its maximum size.
+        """
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(ENTRY_SUFFIX):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        size = sum(s for _, s, _ in entries)
+        for _, entry_size, path in sorted(entries):
+            if size <= self.max_size:
+                break
+            try:
+                os.remove(path)
+                logger.debug('Evicted cache entry %s', path)
+            except FileNotFoundError:
+                pass
+            size -= entry_size
+
+    def clear(self):
+        """
+        Remove all entries from the cache.
+        """
+        if not os.path.isdir(self.directory):
+            return
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(ENTRY_SUFFIX):
+                os.remove(entry.path)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + ENTRY_SUFFIX)
+
+
+def _file_digest(path: str) -> str:
+    if is_binary_dcop(path):
+        path = os.path.join(path, HEADER_FILE)
+    h = hashlib.sha256()
+    with open(path, mode='rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _agent_description(agent: AgentDef) -> Dict[str, Any]:
+    return {
+        'name': agent.name,
+        'default_hosting_cost': agent.default_hosting_cost,
+        'hosting_costs': agent.hosting_costs,
+        'default_route': agent.default_route,
+        'routes': agent.routes,
+        'extra_attr': agent.extra_attr(),
+    }
+
+
+def _module_source(name: str) -> Optional[str]:
+    # Digest of the source of the module and of the pydcop modules it
+    # depends on.
+    try:
+        module = import_module(name)
+    except ImportError:
+        return None
+    h = hashlib.sha256()
+    for m in sorted(_dependencies(module), key=lambda m: m.__name__):
+        h.update(m.__name__.encode())
+        try:
+            h.update(inspect.getsource(m).encode())
+        except (OSError, TypeError):
+            pass
+    return h.hexdigest()
+
+
+def _dependencies(module) -> List:
+    """
+    The module and the pydcop modules it imports, directly or not.
+
+    Imports are found from the module's globals: modules, and the modules
+    the imported functions and classes are defined in. The globals of
+    packages are not followed, as they depend on which of their submodules
+    have been imported.
+    """
+    found = {module.__name__: module}
+    stack = [module]
+    while stack:
+        m = stack.pop()
+        if hasattr(m, '__path__') and m is not module:
+            continue
+        for obj in list(vars(m).values()):
+            name = obj.__name__ if inspect.ismodule(obj) \
+                else getattr(obj, '__module__', None)
+            if not isinstance(name, str) or name in found or \
+                    not name.startswith('pydcop.') or name not in sys.modules:
+                continue
+            found[name] = sys.modules[name]
+            stack.append(found[name])
+    return list(found.values())
+
+
+def _function_source(f: Optional[Callable]) -> Optional[str]:
+    if f is None:
+        return None
+    try:
+        return inspect.getsource(f)
+    except (OSError, TypeError):
+        return '{}.{}'.format(getattr(f, '__module__', ''),
+                              getattr(f, '__qualname__', repr(f)))
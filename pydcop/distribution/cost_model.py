@@ -0,0 +1,265 @@
+# BSD-3-Clause License
+#
+# Copyright 2017 Orange
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+
+"""
+Precompiled cost model for distributions.
+
+The cost of a distribution, as defined in `ilp_compref`, is a weighted sum of
+
+* the communication cost: for each couple of computations linked in the
+  computation graph, the message load between them multiplied by the cost
+  of the route between their hosting agents,
+* the hosting cost: for each computation, the cost of hosting it on its
+  agent.
+
+`DistributionCostModel` compiles this cost for a computation graph and a set
+of agents into numpy arrays: an edge list with message loads, the routes
+between agents and the hosting costs. The cost of a distribution is then
+evaluated with a few gathers and sums, and the variation of cost when moving
+a single computation is evaluated in O(degree), which makes comparing many
+distributions (e.g. in a local search) much faster than calling
+`communication_load`, `route` and `hosting_cost` for each link.
+
+Routes and hosting costs are stored as dense matrices when they are small
+enough. Otherwise, as most routes from an agent have its default route cost
+and most hosting costs are the agent's default hosting cost, only the
+default costs and the sorted exceptions are stored.
+
+"""
+from itertools import combinations
+from typing import Iterable, Callable, Dict, Tuple, Union
+
+import numpy as np
+
+from pydcop.computations_graph.objects import ComputationGraph, \
+    ComputationNode
+from pydcop.dcop.objects import AgentDef
+from pydcop.distribution.objects import Distribution
+
+# Weight factors when aggregating communication costs and hosting costs,
+# same as ilp_compref.
+RATIO_HOST_COMM = 0.5
+
+# Maximum number of entries of a dense routes or hosting costs matrix.
+DENSE_MATRIX_MAX_SIZE = 4 * 1024 * 1024
+
+
+class DistributionCostModel(object):
+    """
+    Cost model for the distributions of a computation graph on a set of
+    agents.
+
+    Distributions are represented either as `Distribution` objects or as
+    assignments: numpy arrays giving, for each computation (in the order of
+    `computations`) the index of its agent (in the order of `agents`).
+
+    Parameters
+    ----------
+    computation_graph: ComputationGraph
+        the computation graph
+    agentsdef: iterable of AgentDef
+        the agents the computations are distributed on
+    communication_load: callable
+        communication load between a computation and one of its neighbors. If
+        None, communication costs are 0.
+    ratio_host_comm: float
+        weight of the communication cost, the weight of the hosting cost
+        being `1 - ratio_host_comm`.
+    """
+
+    def __init__(self, computation_graph: ComputationGraph,
+                 agentsdef: Iterable[AgentDef],
+                 communication_load: Callable[[ComputationNode, str],
+                                              float]=None,
+                 ratio_host_comm: float=RATIO_HOST_COMM):
+        agents = list(agentsdef)
+        self.ratio_host_comm = ratio_host_comm
+        self.computations = [n.name for n in computation_graph.nodes]
+        self.agents = [a.name for a in agents]
+        self.computation_index = {c: i for i, c in
+                                  enumerate(self.computations)}
+        self.agent_index = {a: i for i, a in enumerate(self.agents)}
+
+        # Edge list, with the same message loads as
+        # ilp_compref.msg_load_func: a couple of computations may appear
+        # several times if there are several links between them.
+        src, dst, loads = [], [], []
+        pairs_loads = {}  # type: Dict[Tuple[str, str], float]
+        if communication_load is not None:
+            for link in computation_graph.links:
+                # As we support hypergraph, we may have more than 2 ends to
+                # a link. Links' nodes are sets, sort them for the cost to
+                # be deterministic with asymmetric loads or routes.
+                for c1, c2 in combinations(sorted(link.nodes), 2):
+                    if (c1, c2) not in pairs_loads:
+                        node = computation_graph.computation(c1)
+                        pairs_loads[(c1, c2)] = sum(
+                            communication_load(node, c2)
+                            for l in computation_graph.links_for_node(c1)
+                            if c2 in l.nodes)
+                    src.append(self.computation_index[c1])
+                    dst.append(self.computation_index[c2])
+                    loads.append(pairs_loads[(c1, c2)])
+        self._src = np.array(src, dtype=np.int64)
+        self._dst = np.array(dst, dtype=np.int64)
+        self._loads = np.array(loads, dtype=np.float64)
+
+        # Edges incident to each computation, in CSR format.
+        ends = np.concatenate([self._src, self._dst])
+        edges = np.concatenate([np.arange(len(src))] * 2)
+        order = np.argsort(ends, kind='mergesort')
+        self._incident = edges[order]
+        self._incident_ptr = np.searchsorted(
+            ends[order], np.arange(len(self.computations) + 1))
+
+        self._routes = _RowDefaultMatrix(
+            len(agents), len(agents),
+            [a.default_route for a in agents],
+            {(i, self.agent_index[other]): r
+             for i, a in enumerate(agents)
+             for other, r in a.routes.items() if other in self.agent_index},
+            zero_diagonal=True)
+        self._hosting = _RowDefaultMatrix(
+            len(agents), len(self.computations),
+            [a.default_hosting_cost for a in agents],
+            {(i, self.computation_index[c]): cost
+             for i, a in enumerate(agents)
+             for c, cost in a.hosting_costs.items()
+             if c in self.computation_index})
+        self._computations_range = np.arange(len(self.computations))
+
+    def assignment(self, distribution: Distribution) -> np.ndarray:
+        """
+        Assignment array for a distribution.
+
+        Raises
+        ------
+        KeyError
+            if a computation is not hosted in the distribution.
+        """
+        return np.array([self.agent_index[distribution.agent_for(c)]
+                         for c in self.computations], dtype=np.int64)
+
+    def communication_cost(self, assignment: np.ndarray) -> float:
+        """
+        Communication cost of an assignment.
+        """
+        a_src, a_dst = assignment[self._src], assignment[self._dst]
+        return float(np.dot(self._loads, self._routes.get(a_src, a_dst)))
+
+    def hosting_cost(self, assignment: np.ndarray) -> float:
+        """
+        Hosting cost of an assignment.
+        """
+        return float(self._hosting.get(assignment,
+                                       self._computations_range).sum())
+
+    def cost(self, distribution: Union[Distribution, np.ndarray]) \
+            -> Tuple[float, float, float]:
+        """
+        Cost of a distribution or an assignment.
+
+        Returns
+        -------
+        cost, communication cost, hosting cost
+        """
+        if isinstance(distribution, Distribution):
+            distribution = self.assignment(distribution)
+        comm = self.communication_cost(distribution)
+        hosting = self.hosting_cost(distribution)
+        cost = self.ratio_host_comm * comm + \
+            (1 - self.ratio_host_comm) * hosting
+        return cost, comm, hosting
+
+    def move_delta(self, assignment: np.ndarray, computation: str,
+                   agent: str) -> float:
+        """
+        Variation of the cost of an assignment when moving a computation to
+        another agent, in O(degree of the computation).
+        """
+        c = self.computation_index[computation]
+        new, old = self.agent_index[agent], assignment[c]
+        if new == old:
+            return 0.
+        edges = self._incident[
+            self._incident_ptr[c]:self._incident_ptr[c + 1]]
+        src, dst = self._src[edges], self._dst[edges]
+        a_src, a_dst = assignment[src], assignment[dst]
+        moved_src = np.where(src == c, new, a_src)
+        moved_dst = np.where(dst == c, new, a_dst)
+        comm = np.dot(self._loads[edges],
+                      self._routes.get(moved_src, moved_dst) -
+                      self._routes.get(a_src, a_dst))
+        hosting = self._hosting.get(new, c) - self._hosting.get(old, c)
+        return float(self.ratio_host_comm * comm +
+                     (1 - self.ratio_host_comm) * hosting)
+
+
+class _RowDefaultMatrix(object):
+    # A matrix where most values of a row are equal to a default value for
+    # this row. Stored as a dense matrix when small enough, otherwise as
+    # the defaults and the sorted codes (row * n_cols + col) and values of
+    # the exceptions.
+
+    def __init__(self, n_rows: int, n_cols: int, defaults: Iterable[float],
+                 exceptions: Dict[Tuple[int, int], float],
+                 zero_diagonal: bool=False):
+        self._n_cols = n_cols
+        self._zero_diagonal = zero_diagonal
+        self._defaults = np.array(list(defaults), dtype=np.float64)
+        if n_rows * n_cols <= DENSE_MATRIX_MAX_SIZE:
+            self._dense = np.repeat(self._defaults, n_cols)\
+                .reshape((n_rows, n_cols))
+            for (i, j), v in exceptions.items():
+                self._dense[i, j] = v
+            if zero_diagonal:
+                np.fill_diagonal(self._dense, 0)
+        else:
+            self._dense = None
+            items = sorted((i * n_cols + j, v)
+                           for (i, j), v in exceptions.items())
+            self._codes = np.array([code for code, _ in items],
+                                   dtype=np.int64)
+            self._values = np.array([v for _, v in items], dtype=np.float64)
+
+    def get(self, rows, cols):
+        if self._dense is not None:
+            return self._dense[rows, cols]
+        values = self._defaults[rows]
+        if len(self._codes):
+            codes = np.asarray(rows) * self._n_cols + cols
+            pos = np.minimum(np.searchsorted(self._codes, codes),
+                             len(self._codes) - 1)
+            values = np.where(self._codes[pos] == codes,
+                              self._values[pos], values)
+        if self._zero_diagonal:
+            values = np.where(np.equal(rows, cols), 0, values)
+        return values
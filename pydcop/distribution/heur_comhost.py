@@ -35,11 +35,19 @@ Distribution heuristic based on hosting costs and communication cost.
 Greedy algorithm:
 We place first the computation with the highest footprint.
 
+The state of the placement is updated incrementally when placing (or
+un-placing, when backtracking) a computation: we keep the remaining capacity
+of each agent and, for each computation, the communication load with its
+already placed neighbors, aggregated by hosting agent. This way, placing a
+computation only costs O(|A|.log|A| + degree), instead of scanning the whole
+mapping for every candidate agent.
+
 """
 import logging
+from heapq import heapify, heappop
 from typing import Iterable, Callable, List, Dict, Tuple
 
-from collections import defaultdict
+from collections import defaultdict, Counter
 
 from pydcop.computations_graph.objects import ComputationGraph, ComputationNode
 from pydcop.dcop.objects import AgentDef
@@ -83,7 +91,8 @@ def distribute(computation_graph: ComputationGraph,
     logger.info('placing computations %s',
                 [(f, c.name) for f, c, _ in computations])
 
-    current_mapping = {}  # Type: Dict[str, str]
+    placement = Placement(computations, agentsdef, communication_load)
+    current_mapping = placement.mapping
     i = 0
     while len(current_mapping) != len(computations):
         footprint, computation, candidates = computations[i]
@@ -92,12 +101,10 @@ def distribute(computation_graph: ComputationGraph,
         # try
         # look for agent for computation c
         if candidates is None:
-            candidates = candidate_hosts(computation, footprint,
-                                         computations, agentsdef,
-                                         communication_load, current_mapping)
+            candidates = placement.candidate_hosts(computation, footprint)
             computations[i] = footprint, computation, candidates
         logger.debug('Candidates for computation %s : %s',
-                     computation.name, candidates   )
+                     computation.name, candidates)
 
         if not candidates:
             if i==0:
@@ -109,13 +116,12 @@ def distribute(computation_graph: ComputationGraph,
                         'of computation %s (was on %s',
                         computation.name, computations[i][1].name,
                         current_mapping[computations[i][1].name])
-            current_mapping.pop(computations[i][1].name)
+            placement.unplace(computations[i][1])
 
             # FIXME : eliminate selected agent for previous computation
         else:
-            _, selected = candidates.pop()
-            current_mapping[computation.name] = selected.name
-            computations[i] = footprint, computation, candidates
+            _, _, selected = heappop(candidates)
+            placement.place(computation, selected)
             logger.debug('Place computation %s on agent %s', computation.name,
                         selected.name)
             i += 1
@@ -140,34 +146,102 @@ def distribution_cost(distribution: Distribution,
         computation_memory, communication_load)
 
 
-def candidate_hosts(computation: ComputationNode, footprint: float,
-                    computations: List[Tuple],
-                    agents: Iterable[AgentDef],
-                    communication_load: Callable[[ComputationNode, str], float],
-                    mapping: Dict[str, str]):
-    candidates = []
-    for agt in agents:
-        # Compute remaining capacity for agt, to check if it as enough place
-        # left. Only keep agents that have enough capacity.
-        capa = agt.capacity
-        for c, a in mapping.items():
-            if a == agt.name:
-                c_footprint = next(f for f, comp, _ in computations
-                                 if comp.name == c)
-                capa -= c_footprint
-        if capa < footprint:
-            continue
-
-        # compute cost of assigning computation to agt
-        hosting_cost = agt.hosting_cost(computation.name)
-        comm_cost = 0
-        for l in computation.links:
-            for n in l.nodes:
-                if n in mapping:
-                    comm_cost += communication_load(computation, n) \
-                            * agt.route(mapping[n])
-        cost = RATIO_HOST_COMM * comm_cost + (1-RATIO_HOST_COMM) *hosting_cost
-        candidates.append((cost, agt))
-
-    candidates.sort(key=lambda o: (o[0], o[1].name), reverse=True)
-    return candidates
+class Placement(object):
+    """
+    Incremental state of a (partial) placement of computations on agents.
+
+    Parameters
+    ----------
+    computations: list of tuples
+        the computations to place, as (footprint, ComputationNode, _) tuples.
+    agents: iterable of AgentDef
+        the agents computations can be placed on.
+    communication_load: callable
+        function giving the communication load between a computation and one
+        of its neighbors.
+    """
+
+    def __init__(self, computations: List[Tuple],
+                 agents: Iterable[AgentDef],
+                 communication_load: Callable[[ComputationNode, str], float]):
+        self.agents = list(agents)
+        self.communication_load = communication_load
+        self.mapping = {}  # type: Dict[str, str]
+
+        self.footprints = {}  # type: Dict[str, float]
+        self.nodes = {}  # type: Dict[str, ComputationNode]
+        for footprint, computation, _ in computations:
+            self.footprints.setdefault(computation.name, footprint)
+            self.nodes[computation.name] = computation
+        self.remaining = {a.name: a.capacity for a in self.agents}
+
+        # For each computation, the computations that have it in their
+        # links, with the number of times it appears in these links.
+        self._dependents = defaultdict(list) \
+            # type: Dict[str, List[Tuple[ComputationNode, int]]]
+        for _, computation, _ in computations:
+            occurrences = Counter(n for l in computation.links
+                                  for n in l.nodes if n != computation.name)
+            for n, count in occurrences.items():
+                self._dependents[n].append((computation, count))
+
+        # For each computation, communication load with its placed
+        # neighbors, aggregated by the agent hosting these neighbors.
+        self.placed_load = defaultdict(dict) \
+            # type: Dict[str, Dict[str, float]]
+
+    def place(self, computation: ComputationNode, agent: AgentDef):
+        self.mapping[computation.name] = agent.name
+        self.remaining[agent.name] -= self.footprints[computation.name]
+        self._update_load(computation.name, agent.name, 1)
+
+    def unplace(self, computation: ComputationNode):
+        agt_name = self.mapping.pop(computation.name)
+        self.remaining[agt_name] += self.footprints[computation.name]
+        self._update_load(computation.name, agt_name, -1)
+
+    def _update_load(self, name: str, agt_name: str, sign: int):
+        for dependent, count in self._dependents[name]:
+            if dependent.name in self.mapping:
+                continue
+            loads = self.placed_load[dependent.name]
+            load = sign * count * self.communication_load(dependent, name)
+            loads[agt_name] = loads.get(agt_name, 0) + load
+
+    def candidate_hosts(self, computation: ComputationNode,
+                        footprint: float) -> List[Tuple[float, str, AgentDef]]:
+        """
+        Candidate agents for hosting a computation.
+
+        Parameters
+        ----------
+        computation: ComputationNode
+            the computation to place
+        footprint: float
+            the footprint of this computation
+
+        Returns
+        -------
+        list of tuples
+            a heap of (cost, agent name, AgentDef) tuples, containing only
+            the agents that have enough capacity left for the computation.
+            The best candidate, with the lowest cost, is on top of the heap.
+        """
+        loads = self.placed_load[computation.name]
+        candidates = []
+        for agt in self.agents:
+            # Only keep agents that have enough capacity.
+            if self.remaining[agt.name] < footprint:
+                continue
+
+            # compute cost of assigning computation to agt
+            hosting_cost = agt.hosting_cost(computation.name)
+            comm_cost = 0
+            for other_agt, load in loads.items():
+                comm_cost += load * agt.route(other_agt)
+            cost = RATIO_HOST_COMM * comm_cost + \
+                (1-RATIO_HOST_COMM) * hosting_cost
+            candidates.append((cost, agt.name, agt))
+
+        heapify(candidates)
+        return candidates
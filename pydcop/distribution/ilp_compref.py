@@ -49,21 +49,33 @@ sending a message over a route between two agents.
 Note: this distribution methods honors the agent's capacity constraints but
 does no use the distribution hints (if some are given, they are just ignored).
 
+The model is sparse: a computation can only be hosted on the agents that have
+enough capacity for it and, as most routes from an agent usually have the same
+cost, the communication cost between two computations only needs variables for
+each agent that can host both of them and for the routes with another cost. The solver
+(`glpk` or `cbc`), its time limit and MIP gap can be given as parameters (see
+`dist_params`); the search is warm-started with the solution of the
+`heur_comhost` heuristic and the best feasible solution found within the
+time limit is returned.
+
 """
 
 
 import logging
-from typing import Callable, Iterable
+from collections import defaultdict, Counter
+from typing import Callable, Iterable, Dict, List, Tuple, Optional
 from itertools import combinations
 
-from pulp.constants import LpBinary, LpMinimize, LpStatusOptimal
-from pulp.pulp import LpVariable, LpProblem, lpSum, value, \
-    LpAffineExpression
-from pulp.solvers import GLPK_CMD
+from pulp.constants import LpBinary, LpMinimize, LpStatusInfeasible, \
+    LpConstraintEQ, LpConstraintGE, LpConstraintLE
+from pulp.pulp import LpVariable, LpProblem, LpAffineExpression, \
+    LpConstraint
 
 from pydcop.computations_graph.objects import ComputationGraph, Link, \
     ComputationNode
 from pydcop.dcop.objects import AgentDef
+from pydcop.distribution._ilp import solve, ilp_params
+from pydcop.distribution.cost_model import DistributionCostModel
 from pydcop.distribution.objects import DistributionHints, \
     ImpossibleDistributionException, Distribution
 
@@ -80,7 +92,9 @@ def distribute(computation_graph: ComputationGraph,
                agentsdef: Iterable[AgentDef],
                hints: DistributionHints=None,
                computation_memory=None,
-               communication_load=None) -> Distribution:
+               communication_load=None,
+               solver: str=None, time_limit: float=None,
+               mip_gap: float=None, warm_start: bool=True) -> Distribution:
     """
     Generate a distribution for the given computation graph.
 
@@ -92,48 +106,69 @@ def distribute(computation_graph: ComputationGraph,
     Link node as  arguments and return the memory footprint for this node
     :param communication_load: a function that takes a Link as an argument
       and return the communication cost of this edge
+    :param solver: the ilp solver, `glpk` or `cbc`
+    :param time_limit: time limit for the solver, in seconds
+    :param mip_gap: relative MIP gap at which the solver stops
+    :param warm_start: if True, use the `heur_comhost` heuristic to find an
+      initial solution
     """
-
+    agentsdef = list(agentsdef)
     footprint = footprint_fonc(computation_graph, computation_memory)
     capacity = capacity_fonc(agentsdef)
     route = route_fonc(agentsdef)
     msg_load = msg_load_func(computation_graph, communication_load)
     hosting_cost = hosting_cost_func(agentsdef)
 
+    initial_mapping = None
+    if warm_start:
+        # Imported here as heur_comhost uses distribution_cost from this module
+        from pydcop.distribution import heur_comhost
+        try:
+            initial_mapping = heur_comhost.distribute(
+                computation_graph, agentsdef, hints, computation_memory,
+                communication_load).mapping()
+        except ValueError:
+            logger.info('No initial solution for warm start')
+
     mapping = lp_model(computation_graph, agentsdef, footprint, capacity, route,
-                       msg_load, hosting_cost)
+                       msg_load, hosting_cost, solver=solver,
+                       time_limit=time_limit, mip_gap=mip_gap,
+                       initial_mapping=initial_mapping)
     dist = Distribution(mapping)
 
     return dist
 
 
+def dist_params(params: Dict[str, str]):
+    """
+    Returns the parameters for the distribution method.
+
+    :param params: a dict containing name and values for parameters
+    :return: the parameters for `distribute`, see `_ilp.ilp_params`
+    """
+    return ilp_params(params)
+
+
 def distribution_cost(distribution: Distribution,
                       computation_graph: ComputationGraph,
                       agentsdef: Iterable[AgentDef],
                       computation_memory: Callable[[ComputationNode], float],
                       communication_load: Callable[[ComputationNode, str],
                                                    float]) -> float:
+    """
+    Cost of a distribution: communication and hosting costs.
 
-    route = route_fonc(agentsdef)
-    msg_load = msg_load_func(computation_graph, communication_load)
-    hosting_cost = hosting_cost_func(agentsdef)
-
-    comm = 0
-    agt_names = [a.name for a in agentsdef]
-    for l in computation_graph.links:
-        # As we support hypergraph, we may have more than 2 ends to a link
-        for c1, c2 in combinations(l.nodes, 2):
-            a1 = distribution.agent_for(c1)
-            a2 = distribution.agent_for(c2)
-            comm += route(a1, a2) * msg_load(c1, c2)
-
-    hosting = 0
-    for computation in computation_graph.nodes:
-        agent = distribution.agent_for(computation.name)
-        hosting += hosting_cost(agent, computation.name)
+    The cost is evaluated with a `DistributionCostModel`, when evaluating
+    many distributions of the same graph, build the model once and use it
+    directly.
 
-    cost = RATIO_HOST_COMM * comm + (1-RATIO_HOST_COMM) * hosting
-    return cost, comm, hosting
+    Returns
+    -------
+    cost, communication cost, hosting cost
+    """
+    model = DistributionCostModel(computation_graph, agentsdef,
+                                  communication_load, RATIO_HOST_COMM)
+    return model.cost(distribution)
 
 
 def lp_model(cg: ComputationGraph,
@@ -142,81 +177,191 @@ def lp_model(cg: ComputationGraph,
              capacity: Callable[[str], float],
              route: Callable[[str, str], float],
              msg_load: Callable[[str, str], float],
-             hosting_cost: Callable[[str, str], float]):
+             hosting_cost: Callable[[str, str], float],
+             solver: str=None, time_limit: float=None, mip_gap: float=None,
+             initial_mapping: Dict[str, List[str]]=None):
+    """
+    Build and solve the ILP for the distribution.
 
+    If given, `initial_mapping` ({agent: [computations]}) is used to
+    warm-start the solver and is returned if the solver does not find a
+    better solution.
+
+    """
     comp_names = [n.name for n in cg.nodes]
     agt_names = [a.name for a in agentsdef]
     pb = LpProblem('ilp_compref', LpMinimize)
 
-    # One binary variable xij for each (variable, agent) couple
-    xs = LpVariable.dict('x', (comp_names, agt_names), cat=LpBinary)
-
-    # One binary variable for computations c1 and c2, and agent a1 and a2
-    betas = {}
-    count = 0
-    for a1, a2 in combinations(agt_names, 2):
-        # Only create variables for couple c1, c2 if there is an edge in the
-        # graph between these two computations.
-        for l in cg.links:
-            # As we support hypergraph, we may have more than 2 ends to a link
-            for c1, c2 in combinations(l.nodes, 2):
-                count += 2
-                b = LpVariable('b_{}_{}_{}_{}'.format(c1, a1, c2, a2),
-                               cat=LpBinary)
-                betas[(c1, a1, c2, a2)] = b
-                pb += b <= xs[(c1, a1)]
-                pb += b <= xs[(c2, a2)]
-                pb += b >= xs[(c2, a2)] + xs[(c1, a1)] - 1
-
-                b = LpVariable('b_{}_{}_{}_{}'.format(c1, a2, c2, a1),
-                               cat=LpBinary)
-                betas[(c1, a2, c2, a1)] = b
-                pb += b <= xs[(c2, a1)]
-                pb += b <= xs[(c1, a2)]
-                pb += b >= xs[(c1, a2)] + xs[(c2, a1)] - 1
+    footprints = {c: footprint(c) for c in comp_names}
+    capacities = {a: capacity(a) for a in agt_names}
+    # Computations can only be hosted on agents with enough capacity.
+    candidates = {c: [a for a in agt_names if footprints[c] <= capacities[a]]
+                  for c in comp_names}
+
+    # One binary variable xij for each (computation, candidate agent) couple
+    xs = {}
+    for c in comp_names:
+        for a in candidates[c]:
+            xs[(c, a)] = LpVariable('x_{}'.format(len(xs)), cat=LpBinary)
+
+    # Message loads, only for couples c1, c2 with an edge in the graph
+    # between these two computations.
+    loads = _pairs_loads(cg, msg_load)
+
+    # Communication costs. For each agent a1, most routes from a1 to the
+    # other agents usually have the same cost default[a1], only the routes
+    # with another cost (exceptions) need variables for each couple of
+    # agents. As c2 is hosted on exactly one agent, the cost when c1 is on
+    # a1 and c2 on another agent is
+    #   default[a1] * (x_c1_a1 - alpha_a1)
+    #   + sum of (route(a1, a2) - default[a1]) * beta_a1_a2 on exceptions a2
+    # where alpha_a1 = x_c1_a1 AND x_c2_a1, beta_a1_a2 = x_c1_a1 AND x_c2_a2.
+    default, exceptions = _routes_structure(agt_names, route)
+    candidates_sets = {c: set(agts) for c, agts in candidates.items()}
+    terms = defaultdict(lambda: 0)  # type: Dict[LpVariable, float]
+    ands = []  # type: List[Tuple[LpVariable, LpVariable, LpVariable]]
+    for (c1, c2), load in loads.items():
+        if not load:
+            continue
+        for a1 in candidates[c1]:
+            x1 = xs[(c1, a1)]
+            cost = RATIO_HOST_COMM * load * default[a1]
+            if cost:
+                terms[x1] += cost
+                if a1 in candidates_sets[c2]:
+                    _and_var(pb, terms, ands, -cost, x1, xs[(c2, a1)])
+            for a2, r in exceptions[a1].items():
+                if a2 in candidates_sets[c2]:
+                    _and_var(pb, terms, ands,
+                             RATIO_HOST_COMM * load * (r - default[a1]),
+                             x1, xs[(c2, a2)])
 
     # Set objective: communication + hosting_cost
-    pb += _objective(xs, betas, route, msg_load, hosting_cost), \
-        'Communication costs and prefs'
+    for (c, a), x in xs.items():
+        terms[x] += (1-RATIO_HOST_COMM) * hosting_cost(a, c)
+    pb += LpAffineExpression(terms), 'Communication costs and prefs'
 
     # Adding constraints:
     # Constraints: Memory capacity for all agents.
+    agt_xs = {a: [] for a in agt_names}
+    for (c, a), x in xs.items():
+        agt_xs[a].append((x, footprints[c]))
     for a in agt_names:
-        pb += lpSum([footprint(i) * xs[i, a] for i in comp_names])\
-              <= capacity(a), \
-              'Agent {} capacity'.format(a)
+        pb += LpConstraint(agt_xs[a], LpConstraintLE, rhs=capacities[a])
 
     # Constraints: all computations must be hosted.
     for c in comp_names:
-        pb += lpSum([xs[c, a] for a in agt_names]) == 1, \
-            'Computation {} hosted'.format(c)
-
-    # solve using GLPK
-    status = pb.solve(solver=GLPK_CMD(keepFiles=1, msg=False,
-                                      options=['--pcost']))
-
-    if status != LpStatusOptimal:
+        pb += LpConstraint([(xs[(c, a)], 1) for a in candidates[c]],
+                           LpConstraintEQ, rhs=1)
+
+    initial_values = None
+    if initial_mapping is not None:
+        initial_mapping = _check_mapping(initial_mapping, comp_names,
+                                         agt_names, footprints, capacities)
+    if initial_mapping is not None:
+        hosts = {c: a for a in initial_mapping for c in initial_mapping[a]}
+        initial_values = {x: int(hosts[c] == a) for (c, a), x in xs.items()}
+        initial_values.update({v: initial_values[x1] * initial_values[x2]
+                               for v, x1, x2 in ands})
+
+    status = solve(pb, solver, time_limit, mip_gap, initial_values)
+
+    mapping = None
+    if status != LpStatusInfeasible:
+        mapping = {a: [] for a in agt_names}
+        for (c, a), x in xs.items():
+            if x.varValue is not None and x.varValue > 0.5:
+                mapping[a].append(c)
+        mapping = _check_mapping(mapping, comp_names, agt_names, footprints,
+                                 capacities)
+
+    if mapping is None and initial_mapping is None:
         raise ImpossibleDistributionException("No possible optimal"
                                               " distribution ")
-    logger.debug('GLPK cost : %s', value(pb.objective))
-
-    # print('BETAS:')
-    # for c1, a1, c2, a2 in betas:
-    #     print('  ', c1, a1, c2, a2, value(betas[(c1, a1, c2, a2)]))
-    #
-    # print('XS:')
-    # for c, a in xs:
-    #     print('  ', c, a, value(xs[(c, a)]))
-
-    mapping = {}
-    for k in agt_names:
-        agt_computations = [i for i, ka in xs
-                            if ka == k and value(xs[(i, ka)]) == 1]
-        # print(k, ' -> ', agt_computations)
-        mapping[k] = agt_computations
+    if mapping is None or (
+            initial_mapping is not None and
+            _mapping_cost(initial_mapping, loads, route, hosting_cost) <
+            _mapping_cost(mapping, loads, route, hosting_cost)):
+        logger.info('Solver did not improve initial solution')
+        mapping = initial_mapping
     return mapping
 
 
+def _and_var(pb: LpProblem, terms: Dict[LpVariable, float],
+             ands: List[Tuple[LpVariable, LpVariable, LpVariable]],
+             coef: float, x1: LpVariable, x2: LpVariable):
+    # Add to the objective `coef * (x1 AND x2)`. The variable for x1 AND x2
+    # can be continuous and, depending on the sign of coef, we only need
+    # upper or lower bounds constraints, as the objective is minimized.
+    if not coef:
+        return
+    v = LpVariable('b_{}'.format(len(ands)), lowBound=0, upBound=1)
+    if coef < 0:
+        pb += LpConstraint([(v, 1), (x1, -1)], LpConstraintLE, rhs=0)
+        pb += LpConstraint([(v, 1), (x2, -1)], LpConstraintLE, rhs=0)
+    else:
+        pb += LpConstraint([(v, 1), (x1, -1), (x2, -1)],
+                           LpConstraintGE, rhs=-1)
+    terms[v] += coef
+    ands.append((v, x1, x2))
+
+
+def _routes_structure(agt_names: List[str],
+                      route: Callable[[str, str], float]) \
+        -> Tuple[Dict[str, float], Dict[str, Dict[str, float]]]:
+    # For each agent, the most common cost of the routes from this agent
+    # and the routes that have another cost.
+    default, exceptions = {}, {}
+    for a1 in agt_names:
+        routes = {a2: route(a1, a2) for a2 in agt_names if a2 != a1}
+        counts = Counter(routes.values())
+        default[a1] = counts.most_common(1)[0][0] if counts else 0
+        exceptions[a1] = {a2: r for a2, r in routes.items()
+                          if r != default[a1]}
+    return default, exceptions
+
+
+def _pairs_loads(cg: ComputationGraph, msg_load: Callable[[str, str], float])\
+        -> Dict[Tuple[str, str], float]:
+    loads = {}
+    for l in cg.links:
+        # As we support hypergraph, we may have more than 2 ends to a link
+        for c1, c2 in combinations(l.nodes, 2):
+            if (c1, c2) not in loads:
+                loads[(c1, c2)] = msg_load(c1, c2)
+    return loads
+
+
+def _check_mapping(mapping: Dict[str, List[str]], comp_names: List[str],
+                   agt_names: List[str], footprints: Dict[str, float],
+                   capacities: Dict[str, float]) \
+        -> Optional[Dict[str, List[str]]]:
+    # Returns the mapping if it is a valid solution for the model, None
+    # otherwise.
+    hosted = [c for a in agt_names for c in mapping.get(a, [])]
+    if len(hosted) != len(comp_names) or set(hosted) != set(comp_names):
+        return None
+    for a in agt_names:
+        # Small tolerance, as the solver values are floats.
+        if sum(footprints[c] for c in mapping.get(a, [])) > \
+                capacities[a] + 1e-6:
+            return None
+    return {a: list(mapping.get(a, [])) for a in agt_names}
+
+
+def _mapping_cost(mapping: Dict[str, List[str]],
+                  loads: Dict[Tuple[str, str], float],
+                  route: Callable[[str, str], float],
+                  hosting_cost: Callable[[str, str], float]) -> float:
+    # Value of the objective of the model for a mapping
+    hosts = {c: a for a in mapping for c in mapping[a]}
+    comm = sum(route(hosts[c1], hosts[c2]) * load
+               for (c1, c2), load in loads.items()
+               if hosts[c1] != hosts[c2])
+    costs = sum(hosting_cost(a, c) for c, a in hosts.items())
+    return RATIO_HOST_COMM * comm + (1-RATIO_HOST_COMM) * costs
+
+
 def msg_load_func(cg: ComputationGraph,
                   communication_load: Callable[[ComputationNode, str], float])\
         -> Callable[[str, str], float]:
@@ -236,20 +381,20 @@ def capacity_fonc(agents_def: Iterable[AgentDef])\
     :param agents_def:
     :return: a function that gives the agent's capacity given it's name
     """
+    agents = {a.name: a for a in agents_def}
+
     def capacity(agent_name):
-        for a in agents_def:
-            if a.name == agent_name:
-                return a.capacity
+        return agents[agent_name].capacity
     return capacity
 
 
 def route_fonc(agents_def: Iterable[AgentDef])\
         -> Callable[[str], float]:
 
+    agents = {a.name: a for a in agents_def}
+
     def route(a1_name: str, a2_name: str):
-        for a in agents_def:
-            if a.name == a1_name:
-                return a.route(a2_name)
+        return agents[a1_name].route(a2_name)
     return route
 
 
@@ -278,20 +423,8 @@ def hosting_cost_func(agts_def: Iterable[AgentDef])\
     :param agts_def: the AgentsDef
     :return: a function that returns the hosting cost for agt, comp
     """
+    agents = {a.name: a for a in agts_def}
+
     def cost(agt_name: str, comp_name: str):
-        for a in agts_def:
-            if a.name == agt_name:
-                return a.hosting_cost(comp_name)
+        return agents[agt_name].hosting_cost(comp_name)
     return cost
-
-
-def _objective(xs, betas, route, msg_load, hosting_cost):
-    # We want to minimize communication and hosting costs
-    # Objective is the communication + hosting costs
-    comm = LpAffineExpression()
-    for c1, a1, c2, a2 in betas:
-        comm += route(a1, a2) * msg_load(c1, c2) * betas[(c1, a1, c2, a2)]
-
-    costs = lpSum([hosting_cost(a, c) * xs[(c, a)] for c, a in xs])
-
-    return lpSum([RATIO_HOST_COMM * comm ,  (1-RATIO_HOST_COMM) * costs])
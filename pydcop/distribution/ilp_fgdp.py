@@ -30,13 +30,22 @@
 
 
 import logging
-from typing import List, Iterable
+from collections import defaultdict
+from typing import List, Iterable, Dict, Tuple, Optional
 
-from pulp import LpMinimize, LpVariable, LpProblem, LpBinary, lpSum, \
-    GLPK_CMD, value, LpStatusOptimal
+from pulp import LpMinimize, LpVariable, LpProblem, LpBinary, \
+    LpAffineExpression, LpConstraint, LpConstraintEQ, LpConstraintGE, \
+    LpConstraintLE, LpStatusInfeasible
 
 from pydcop.computations_graph.factor_graph import ComputationsFactorGraph
 from pydcop.dcop.objects import AgentDef
+from pydcop.distribution import heur_comhost
+from pydcop.distribution._ilp import solve, ilp_params
+from pydcop.distribution.incremental import distribute_remove, \
+    distribute_add
+
+__all__ = ['distribute', 'dist_params', 'factor_graph_lp_model',
+           'distribute_remove', 'distribute_add']
 
 logger = logging.getLogger('distribution.ilpfgdp')
 
@@ -55,6 +64,14 @@ Designed for an article for OPTMAS 2017 (best paper)
 
 based on ILP, optimize for communication wrt capacity.
 
+The model is sparse: a computation can only be hosted on the agents that have
+enough capacity for it and a link (i, j) only gets a co-location variable
+for the agents that can host both i and j. The solver (`glpk` or `cbc`),
+its time limit and MIP gap can be given as parameters (see `dist_params`);
+the search is warm-started with the solution of the `heur_comhost`
+heuristic and the best feasible solution found within the time limit is
+returned.
+
 """
 
 
@@ -62,7 +79,9 @@ def distribute(computation_graph: ComputationGraph,
                agentsdef: Iterable[AgentDef],
                hints: DistributionHints=None,
                computation_memory=None,
-               communication_load=None):
+               communication_load=None,
+               solver: str=None, time_limit: float=None,
+               mip_gap: float=None, warm_start: bool=True):
     """
     Generate a distribution for the dcop.
 
@@ -73,6 +92,11 @@ def distribute(computation_graph: ComputationGraph,
       argument and return the memory footprint for this
     :param link_communication: a function that takes a Link as an argument 
       and return the communication cost of this edge
+    :param solver: the ilp solver, `glpk` or `cbc`
+    :param time_limit: time limit for the solver, in seconds
+    :param mip_gap: relative MIP gap at which the solver stops
+    :param warm_start: if True, use the `heur_comhost` heuristic to find an
+      initial solution
     """
     if computation_memory is None or communication_load is None:
         raise ImpossibleDistributionException('LinearProg distribution requires '
@@ -82,28 +106,40 @@ def distribute(computation_graph: ComputationGraph,
 
     hints = DistributionHints() if hints is None else hints
 
-    return factor_graph_lp_model(computation_graph, agents, hints,
-                                 computation_memory, communication_load)
+    initial_mapping = None
+    if warm_start:
+        try:
+            initial_mapping = heur_comhost.distribute(
+                computation_graph, agents, hints, computation_memory,
+                communication_load).mapping()
+        except ValueError:
+            logger.info('No initial solution for warm start')
 
+    return factor_graph_lp_model(computation_graph, agents, hints,
+                                 computation_memory, communication_load,
+                                 solver=solver, time_limit=time_limit,
+                                 mip_gap=mip_gap,
+                                 initial_mapping=initial_mapping)
 
-def distribute_remove(secp, current_distribution, removed_device):
-    # TODO à implémenter !
-    # FIXME : only take neighbors agents as variable ?
-    raise NotImplementedError()
 
+def dist_params(params: Dict[str, str]):
+    """
+    Returns the parameters for the distribution method.
 
-def distribute_add(secp, new_device, current_distribution,
-                   connected_models=None):
-    # TODO à implémenter !
-    # FIXME : only take neighbors agents as variable ?
-    raise NotImplementedError()
+    :param params: a dict containing name and values for parameters
+    :return: the parameters for `distribute`, see `_ilp.ilp_params`
+    """
+    return ilp_params(params)
 
 
 def factor_graph_lp_model(cg: ComputationsFactorGraph,
                           agents: List[AgentDef],
                           hints: DistributionHints=None,
                           computation_memory=None,
-                          communication_load=None):
+                          communication_load=None,
+                          solver: str=None, time_limit: float=None,
+                          mip_gap: float=None,
+                          initial_mapping: Dict[str, List[str]]=None):
     """
     To distribute we need:
     * com : the communication cost of an edge between a var and a fact
@@ -116,163 +152,256 @@ def factor_graph_lp_model(cg: ComputationsFactorGraph,
     * mem_var and mem_fac are given by the computation_memory method.
     * com is given by computation_memory
 
+    If given, `initial_mapping` ({agent: [computations]}) is used to
+    warm-start the solver and is returned if the solver does not find a
+    better solution.
+
     :return:
     """
-    variables = [n for n in cg.nodes if n.type == 'VariableComputation']
-    factors = [n for n in cg.nodes if n.type == 'FactorComputation']
-
+    hints = DistributionHints() if hints is None else hints
     agents = list(agents)
     agents_names = [a.name for a in agents]
 
+    footprints = {n.name: computation_memory(n) for n in cg.nodes}
+
     fixed_dist = Distribution({a.name: hints.must_host(a.name)
                                for a in agents})
 
     # Only keep computations for which we actually need to find an agent.
-    vars_to_host = [v.name for v in variables
-                    if not fixed_dist.has_computation(v.name)]
-    facs_to_host = [f.name for f in factors
-                    if not fixed_dist.has_computation(f.name)]
-
-    # x_i^k : binary variable indicating if var x_i is hosted on agent a_k.
-    xs = _build_xs_binvar(vars_to_host, agents_names)
-    # f_j^k : binary variable indicating if factor f_j is hosted on agent a_k.
-    fs = _build_fs_binvar(facs_to_host, agents_names)
-    # alpha_ijk : binary variable indicating if  x_i and f_j are both on a_k.
-    alphas = _build_alphaijk_binvars(cg, agents_names)
-
-    # LP problem with objective function (total communication cost).
+    to_host = [n.name for n in cg.nodes
+               if not fixed_dist.has_computation(n.name)]
+
+    # Decrease capacity for already hosted computations
+    capacities = {a.name: a.capacity -
+                  sum(footprints[c] for c in hints.must_host(a.name))
+                  for a in agents}
+    # Computations can only be hosted on agents with enough capacity.
+    candidates = {c: {a for a in agents_names
+                      if footprints[c] <= capacities[a]}
+                  for c in to_host}
+
+    # x_i^k : binary variable indicating if computation i is hosted on
+    # agent a_k.
+    xs = _build_xs_binvar(candidates, agents_names)
+    # alpha_ijk : variable indicating if  x_i and f_j are both on a_k.
+    alphas = _build_alphaijk_binvars(cg, agents_names, candidates,
+                                     footprints, capacities)
+
     pb = LpProblem('distribution', LpMinimize)
-    pb += _objective_function(cg, communication_load, alphas,
-                              agents_names), 'Communication costs'
-    # Constraints.
-    # All variable computations must be hosted:
-    for i in vars_to_host:
-        pb += lpSum([xs[(i, k)] for k in agents_names]) == 1, \
-              'var {} is hosted'.format(i)
+    pb += _objective_function(cg, communication_load, alphas, xs,
+                              fixed_dist), 'Communication costs'
 
-    # All factor computations must be hosted:
-    for j in facs_to_host:
-        pb += lpSum([fs[(j, k)] for k in agents_names]) == 1, \
-              'factor {} is hosted'.format(j)
+    # Constraints.
+    # All computations must be hosted:
+    for c in to_host:
+        pb += LpConstraint([(xs[(c, k)], 1) for k in candidates[c]],
+                           LpConstraintEQ, rhs=1)
 
     # Each agent must host at least one computation:
     # We only need this constraints for agents that do not already host a
     # computation:
-    empty_agents = [a for a in agents_names if not hints.must_host(a)]
-    for k in empty_agents:
-        pb += lpSum([xs[(i, k)] for i in vars_to_host]) + \
-              lpSum([fs[(j, k)] for j in facs_to_host]) >= 1, \
-              'atleastone {}'.format(k)
+    agt_xs = {a: [] for a in agents_names}
+    for (c, k), x in xs.items():
+        agt_xs[k].append((x, footprints[c]))
+    for k in agents_names:
+        if not hints.must_host(k):
+            pb += LpConstraint([(x, 1) for x, _ in agt_xs[k]],
+                               LpConstraintGE, rhs=1)
 
     # Memory capacity constraint for agents
-    for a in agents:
-        # Decrease capacity for already hosted computations
-        capacity = a.capacity - \
-                   sum([_computation_memory_in_cg(c, cg, computation_memory)
-                        for c in hints.must_host(a.name)])
-
-        pb += lpSum([_computation_memory_in_cg(i, cg, computation_memory) *
-                     xs[(i, a.name)] for i in vars_to_host]) \
-            + lpSum([_computation_memory_in_cg(j, cg, computation_memory) *
-                     fs[(j, a.name)] for j in facs_to_host]) <= capacity, \
-            'memory {}'.format(a.name)
-
-    # Linearization constraints for alpha_ijk.
-    for link in cg.links:
-        i, j = link.variable_node, link.factor_node
-        for k in agents_names:
-
-            if i in vars_to_host and j in facs_to_host:
-                pb += alphas[((i, j), k)] <= xs[(i, k)], \
-                    'lin1 {}{}{}'.format(i, j, k)
-                pb += alphas[((i, j), k)] <= fs[(j, k)], \
-                    'lin2 {}{}{}'.format(i, j, k)
-                pb += alphas[((i, j), k)] >= xs[(i, k)] + fs[(j, k)] - 1, \
-                    'lin3 {}{}{}'.format(i, j, k)
-
-            elif i in vars_to_host and j not in facs_to_host:
-                # Var is free, factor is already hosted
-                if fixed_dist.agent_for(j) == k:
-                    pb += alphas[((i, j), k)] == xs[(i, k)]
-                else:
-                    pb += alphas[((i, j), k)] == 0
-
-            elif i not in vars_to_host and j in facs_to_host:
-                # if i is not in vars_vars_to_host, it means that it's a
-                # computation that is already hosted (from  hints)
-                if fixed_dist.agent_for(i) == k:
-                    pb += alphas[((i, j), k)] == fs[(j, k)]
-                else:
-                    pb += alphas[((i, j), k)] == 0
-
-            else:
-                # i and j are both alredy hosted
-                if fixed_dist.agent_for(i) == k and fixed_dist.agent_for(j) \
-                        == k:
-                    pb += alphas[((i, j), k)] == 1
-                else:
-                    pb += alphas[((i, j), k)] == 0
-
-    # Now solve our LP
-    # status = pb.solve(GLPK_CMD())
-    # status = pb.solve(GLPK_CMD(mip=1))
-    # status = pb.solve(GLPK_CMD(mip=0, keepFiles=1,
-    #                                options=['--simplex', '--interior']))
-    status = pb.solve(GLPK_CMD(keepFiles=0, msg=False, options=['--pcost']))
-
-    if status != LpStatusOptimal:
+    for k in agents_names:
+        pb += LpConstraint(agt_xs[k], LpConstraintLE, rhs=capacities[k])
+
+    # Linearization constraints for alpha_ijk: as the objective maximizes
+    # the alphas (with positive communication loads), alpha_ijk <= x_ik and
+    # alpha_ijk <= x_jk are enough, and alpha_ijk does not need to be
+    # an integer variable.
+    for ((i, j), k), alpha in alphas.items():
+        pb += LpConstraint([(alpha, 1), (xs[(i, k)], -1)],
+                           LpConstraintLE, rhs=0)
+        pb += LpConstraint([(alpha, 1), (xs[(j, k)], -1)],
+                           LpConstraintLE, rhs=0)
+
+    initial_values = None
+    if initial_mapping is not None:
+        initial_mapping = _check_mapping(
+            _repair_mapping(initial_mapping, agents_names, footprints,
+                            fixed_dist, capacities),
+            cg, agents_names, footprints, fixed_dist, capacities, hints)
+    if initial_mapping is not None:
+        hosts = {c: a for a in initial_mapping for c in initial_mapping[a]}
+        initial_values = {x: int(hosts[c] == k) for (c, k), x in xs.items()}
+        initial_values.update({
+            alpha: int(hosts[i] == k and hosts[j] == k)
+            for ((i, j), k), alpha in alphas.items()})
+
+    status = solve(pb, solver, time_limit, mip_gap, initial_values)
+
+    mapping = None
+    if status != LpStatusInfeasible:
+        mapping = {k: list(fixed_dist.computations_hosted(k))
+                   for k in agents_names}
+        for (c, k), x in xs.items():
+            if x.varValue is not None and x.varValue > 0.5:
+                mapping[k].append(c)
+        mapping = _check_mapping(mapping, cg, agents_names, footprints,
+                                 fixed_dist, capacities, hints)
+
+    if mapping is None and initial_mapping is None:
         raise ImpossibleDistributionException("No possible optimal"
                                               " distribution ")
-    else:
-        logger.debug('GLPK cost : %s', value(pb.objective))
-
-        comp_dist = fixed_dist
-        for k in agents_names:
-
-            agt_vars = [i for i, ka in xs
-                        if ka == k and value(xs[(i, ka)]) == 1]
-            comp_dist.host_on_agent(k, agt_vars)
-
-            agt_rels = [j for j, ka in fs
-                        if ka == k and value(fs[(j, ka)]) == 1]
-            comp_dist.host_on_agent(k, agt_rels)
-        return comp_dist
-
-
-def _build_alphaijk_binvars(cg: ComputationsFactorGraph, agents_names: Iterable[
-    str]):
+    if mapping is None or (
+            initial_mapping is not None and
+            _communication_gain(cg, communication_load, initial_mapping) >
+            _communication_gain(cg, communication_load, mapping)):
+        logger.info('Solver did not improve initial solution')
+        mapping = initial_mapping
+
+    return Distribution(mapping)
+
+
+def _check_mapping(mapping: Dict[str, List[str]],
+                   cg: ComputationGraph,
+                   agents_names: List[str],
+                   footprints: Dict[str, float],
+                   fixed_dist: Distribution,
+                   capacities: Dict[str, float],
+                   hints: DistributionHints) \
+        -> Optional[Dict[str, List[str]]]:
+    # Returns the mapping if it is a valid solution for the model, None
+    # otherwise.
+    hosted = [c for k in agents_names for c in mapping.get(k, [])]
+    if len(hosted) != len(cg.nodes) or \
+            set(hosted) != {n.name for n in cg.nodes}:
+        return None
+    for k in agents_names:
+        computations = mapping.get(k, [])
+        if not computations:
+            return None
+        if any(fixed_dist.has_computation(c) and fixed_dist.agent_for(c) != k
+               for c in computations):
+            return None
+        # Small tolerance, as the solver values are floats.
+        load = sum(footprints[c] for c in computations
+                   if c not in hints.must_host(k))
+        if load > capacities[k] + 1e-6:
+            return None
+    return {k: list(mapping.get(k, [])) for k in agents_names}
+
+
+def _repair_mapping(mapping: Dict[str, List[str]],
+                    agents_names: List[str],
+                    footprints: Dict[str, float],
+                    fixed_dist: Distribution,
+                    capacities: Dict[str, float]) -> Dict[str, List[str]]:
+    # Fix a mapping (typically found by a heuristic that does not know the
+    # constraints of this model) so that computations are hosted according
+    # to the hints and all agents host at least one computation.
+    hosts = {c: a for a in mapping for c in mapping[a]}
+    for c in fixed_dist.computations:
+        hosts[c] = fixed_dist.agent_for(c)
+    repaired = {a: [] for a in agents_names}
+    for c, a in hosts.items():
+        repaired[a].append(c)
+
+    for k in agents_names:
+        if repaired[k]:
+            continue
+        # Move a computation from the agent that hosts the most computations
+        for donor in sorted(agents_names, key=lambda a: -len(repaired[a])):
+            if len(repaired[donor]) < 2:
+                break
+            movable = [c for c in repaired[donor]
+                       if not fixed_dist.has_computation(c)
+                       and footprints[c] <= capacities[k]]
+            if movable:
+                repaired[donor].remove(movable[0])
+                repaired[k].append(movable[0])
+                break
+    return repaired
+
+
+def _communication_gain(cg: ComputationGraph, communication_load,
+                        mapping: Dict[str, List[str]]) -> float:
+    # Total communication load of the links whose both ends are hosted on
+    # the same agent, this is the (negated) objective of the model.
+    hosts = {c: a for a in mapping for c in mapping[a]}
+    return sum(communication_load(cg.computation(link.variable_node),
+                                  link.factor_node)
+               for link in cg.links
+               if hosts[link.variable_node] == hosts[link.factor_node])
+
+
+def _build_alphaijk_binvars(cg: ComputationsFactorGraph,
+                            agents_names: Iterable[str],
+                            candidates: Dict[str, Iterable[str]]=None,
+                            footprints: Dict[str, float]=None,
+                            capacities: Dict[str, float]=None) \
+        -> Dict[Tuple[Tuple[str, str], str], LpVariable]:
     # As these variables are only used in the objective function,
     # when optimizing communication cost, we only need them when (i,j) is an
-    # edge in the factor graph
-    alphas = LpVariable.dict('a',
-                             ([(link.variable_node,
-                                link.factor_node) for
-                               link in cg.links],
-                              agents_names),
-                             cat=LpBinary)
+    # edge in the factor graph, and when both i and j can be hosted on
+    # agent k (given `candidates` and, if given, the capacity of k and the
+    # footprints of i and j). If `candidates` is not given, all agents can
+    # host all computations.
+    # These variables are 0/1 but, given the linearization constraints, they
+    # do not need to be declared as binary.
+    alphas = {}
+    for link in cg.links:
+        i, j = link.variable_node, link.factor_node
+        if candidates is None:
+            agents = agents_names
+        elif i in candidates and j in candidates:
+            agents = [k for k in agents_names
+                      if k in candidates[i] and k in candidates[j]]
+            if capacities is not None:
+                agents = [k for k in agents if footprints[i] + footprints[j]
+                          <= capacities[k]]
+        else:
+            continue
+        for k in agents:
+            alphas[((i, j), k)] = \
+                LpVariable('a_{}'.format(len(alphas)), lowBound=0, upBound=1)
     return alphas
 
 
-def _build_fs_binvar(facs_to_host, agents_names):
-    if not facs_to_host:
-        return {}
-    return LpVariable.dict('f', (facs_to_host, agents_names), cat=LpBinary)
-
-
-def _build_xs_binvar(vars_to_host, agents_names):
-    if not vars_to_host:
-        return {}
-    return LpVariable.dict('x', (vars_to_host, agents_names), cat=LpBinary)
+def _build_xs_binvar(candidates: Dict[str, Iterable[str]],
+                     agents_names: List[str]) \
+        -> Dict[Tuple[str, str], LpVariable]:
+    xs = {}
+    for c, agts in candidates.items():
+        for k in agents_names:
+            if k in agts:
+                xs[(c, k)] = LpVariable('x_{}'.format(len(xs)), cat=LpBinary)
+    return xs
 
 
 def _objective_function(cg: ComputationGraph, communication_load,
-                        alphas, agents_names):
+                        alphas, xs=None, fixed_dist: Distribution=None):
     # The objective function is the negated sum of the communication cost on
     # the links in the factor graph.
-    return lpSum([-communication_load(cg.computation(link.variable_node),
-                                      link.factor_node ) *
-                  alphas[((link.variable_node, link.factor_node), k)]
-                  for link in cg.links for k in agents_names])
+    # For links with one end already hosted (from hints), the communication
+    # cost only depends on the variable for the other end. Links with both
+    # ends already hosted only add a constant to the objective and are
+    # ignored.
+    terms = defaultdict(lambda: 0)  # type: Dict[LpVariable, float]
+    if fixed_dist is not None:
+        for link in cg.links:
+            i, j = link.variable_node, link.factor_node
+            if fixed_dist.has_computation(i):
+                x = xs.get((j, fixed_dist.agent_for(i)))
+            elif fixed_dist.has_computation(j):
+                x = xs.get((i, fixed_dist.agent_for(j)))
+            else:
+                continue
+            if x is not None:
+                terms[x] -= communication_load(cg.computation(i), j)
+    loads = {}
+    for ((i, j), _), alpha in alphas.items():
+        if (i, j) not in loads:
+            loads[(i, j)] = communication_load(cg.computation(i), j)
+        terms[alpha] -= loads[(i, j)]
+    return LpAffineExpression(terms)
 
 
 def _computation_memory_in_cg(computation_name: str,
@@ -0,0 +1,592 @@
+# BSD-3-Clause License
+#
+# Copyright 2017 Orange
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+
+"""
+Incremental redistribution, when agents leave or join the system.
+
+Instead of computing a whole new distribution, these methods start from the
+current distribution and only move the computations that must be moved
+(computations hosted on agents that left, computations that must be
+hosted on a new agent) and, with a bounded local search, some computations
+in their neighborhood, when this decreases the cost of the distribution.
+
+The cost is the same as for `heur_comhost` and `ilp_compref`: communication
+cost (communication load multiplied by the route cost between agents) and
+hosting costs.
+
+The work done only depends on the size of the neighborhood of the moved
+computations, not on the size of the whole computation graph, which makes
+these methods usable for repairing a distribution at run time, see the
+`incremental` repair method of the orchestrator.
+"""
+
+import logging
+from collections import deque
+from typing import Iterable, Callable, List, Dict, Set, FrozenSet, Optional
+
+from pydcop.computations_graph.objects import ComputationGraph, \
+    ComputationNode
+from pydcop.dcop.objects import AgentDef
+from pydcop.distribution import ilp_compref
+from pydcop.distribution.objects import Distribution, DistributionHints, \
+    ImpossibleDistributionException
+
+logger = logging.getLogger('distribution.incremental')
+
+RATIO_HOST_COMM = ilp_compref.RATIO_HOST_COMM
+
+# Default maximum number of moves of the local search, for each computation
+# that had to be moved.
+MOVES_PER_COMPUTATION = 10
+
+EPSILON = 1e-9
+
+
+def distribute_remove(distribution: Distribution,
+                      computation_graph: ComputationGraph,
+                      agentsdef: Iterable[AgentDef],
+                      removed_agents: Iterable[str],
+                      hints: DistributionHints=None,
+                      computation_memory: Callable[[ComputationNode],
+                                                   float]=None,
+                      communication_load: Callable[[ComputationNode, str],
+                                                   float]=None,
+                      movable: Iterable[str]=None,
+                      max_moves: int=None) -> Distribution:
+    """
+    Repair a distribution after the departure of some agents.
+
+    Computations hosted on the removed agents are placed on the remaining
+    agents. If no agent has enough capacity left for one of these
+    computations, some movable computations are moved to make room for it.
+    Then, a local search moves the re-hosted computations and movable
+    computations in their neighborhood, when it decreases the cost of the
+    distribution.
+
+    Parameters
+    ----------
+    distribution: Distribution
+        the current distribution.
+    computation_graph: ComputationGraph
+        the computation graph.
+    agentsdef: iterable of AgentDef
+        the agents available after the departure. Removed agents are ignored
+        if they are included.
+    removed_agents: iterable of str
+        names of the agents that left.
+    hints: DistributionHints
+        optional distribution hints.
+    computation_memory: callable
+        memory footprint of a computation. When not given, agents' capacity
+        is not taken into account.
+    communication_load: callable
+        communication load between a computation and one of its neighbors.
+        When not given, a load of 1 is used for all links.
+    movable: iterable of str
+        names of the computations, besides the ones hosted on removed agents,
+        that can be moved. By default all computations can be moved,
+        except computations that must be hosted on a given agent.
+    max_moves: int
+        maximum number of moves during the local search, defaults to
+        MOVES_PER_COMPUTATION times the number of orphaned computations.
+
+    Returns
+    -------
+    Distribution
+        the new distribution, which does not use the removed agents.
+
+    Raises
+    ------
+    ImpossibleDistributionException
+        if some computation could not be placed on the remaining agents.
+    """
+    removed_agents = set(removed_agents)
+    agents = [a for a in agentsdef if a.name not in removed_agents]
+    hosts = {c: a for a, cs in distribution.mapping().items()
+             if a not in removed_agents for c in cs}
+    orphaned = [c for a in removed_agents if a in distribution.agents
+                for c in distribution.computations_hosted(a)]
+    logger.info('Repairing distribution after removal of %s, '
+                'orphaned computations: %s', removed_agents, orphaned)
+
+    redistribution = Redistribution(
+        computation_graph, agents, hosts, hints, computation_memory,
+        communication_load, movable)
+    groups = redistribution.groups(orphaned)
+    for group in sorted(groups, key=redistribution.group_footprint,
+                        reverse=True):
+        redistribution.place(group)
+
+    # Start the local search with the re-hosted computations and their
+    # neighbors, as their cost has changed.
+    seeds = groups | redistribution.groups(
+        redistribution.neighbors(c for g in groups for c in g))
+    max_moves = MOVES_PER_COMPUTATION * len(orphaned) if max_moves is None \
+        else max_moves
+    redistribution.local_search(seeds, max_moves)
+    return redistribution.distribution()
+
+
+def distribute_add(distribution: Distribution,
+                   computation_graph: ComputationGraph,
+                   agentsdef: Iterable[AgentDef],
+                   added_agents: Iterable[str],
+                   hints: DistributionHints=None,
+                   computation_memory: Callable[[ComputationNode],
+                                                float]=None,
+                   communication_load: Callable[[ComputationNode, str],
+                                                float]=None,
+                   movable: Iterable[str]=None,
+                   max_moves: int=None) -> Distribution:
+    """
+    Rebalance a distribution after the arrival of new agents.
+
+    Computations that must be hosted on the new agents (according to
+    `hints`) are moved to them. Then a local search moves computations
+    to the new agents, when it decreases the cost of the distribution, and
+    their neighbors along with them. It starts with the computations that
+    are moved, those for which the new agents have a specific hosting cost
+    and those hosted on agents that are over their capacity.
+
+    As moving a computation to an empty agent always increases the
+    communication cost, new agents with only default hosting costs
+    generally do not get any computation.
+
+    Parameters
+    ----------
+    distribution: Distribution
+        the current distribution.
+    computation_graph: ComputationGraph
+        the computation graph.
+    agentsdef: iterable of AgentDef
+        all the agents, including the new ones.
+    added_agents: iterable of str
+        names of the agents that joined the system.
+    hints: DistributionHints
+        optional distribution hints.
+    computation_memory: callable
+        memory footprint of a computation. When not given, agents' capacity
+        is not taken into account.
+    communication_load: callable
+        communication load between a computation and one of its neighbors.
+        When not given, a load of 1 is used for all links.
+    movable: iterable of str
+        names of the computations that can be moved. By default all
+        computations can be moved, except computations that must be hosted
+        on a given agent.
+    max_moves: int
+        maximum number of moves during the local search, defaults to
+        MOVES_PER_COMPUTATION times the number of computations the search
+        starts with.
+
+    Returns
+    -------
+    Distribution
+        the new distribution.
+    """
+    added_agents = set(added_agents)
+    agents = list(agentsdef)
+    hosts = {c: a for a, cs in distribution.mapping().items() for c in cs}
+    redistribution = Redistribution(
+        computation_graph, agents, hosts, hints, computation_memory,
+        communication_load, movable)
+
+    seeds = set()
+    for agt in agents:
+        if agt.name not in added_agents:
+            continue
+        for group in redistribution.groups(redistribution.pinned_on(agt.name)):
+            redistribution.move(group, agt.name)
+            seeds.add(group)
+        seeds.update(redistribution.groups(
+            c for c in agt.hosting_costs if c in hosts))
+    for agt in agents:
+        if redistribution.remaining(agt.name) < 0:
+            seeds.update(redistribution.groups(
+                redistribution.hosted(agt.name)))
+    logger.info('Rebalancing distribution after arrival of %s, starting '
+                'with %s', added_agents, seeds)
+
+    max_moves = MOVES_PER_COMPUTATION * len(seeds) if max_moves is None \
+        else max_moves
+    redistribution.local_search(seeds, max_moves)
+    return redistribution.distribution()
+
+
+Group = FrozenSet[str]
+
+
+class Redistribution(object):
+    """
+    Incremental modification of a distribution.
+
+    Computations that must be hosted together (`host_with` hints) are
+    always moved together, as a group. All information on the current
+    distribution (agents load, computations hosted by an agent) is only
+    computed when it is needed, for the agents and computations involved in
+    the modification.
+
+    Parameters
+    ----------
+    computation_graph: ComputationGraph
+        the computation graph.
+    agents: list of AgentDef
+        the agents computations can be hosted on.
+    hosts: dict
+        the current placement of computations, as a dict
+        {computation name: agent name}. Computations that are not in this
+        dict are not hosted yet.
+    hints: DistributionHints
+        optional distribution hints.
+    computation_memory: callable
+        memory footprint of a computation.
+    communication_load: callable
+        communication load between a computation and one of its neighbors.
+    movable: iterable of str
+        names of the computations that can be moved, besides the ones that
+        are not hosted yet. If None, all computations can be moved, except
+        the ones that must be hosted on a given agent.
+    """
+
+    def __init__(self, computation_graph: ComputationGraph,
+                 agents: List[AgentDef], hosts: Dict[str, str],
+                 hints: DistributionHints=None,
+                 computation_memory: Callable[[ComputationNode],
+                                              float]=None,
+                 communication_load: Callable[[ComputationNode, str],
+                                              float]=None,
+                 movable: Iterable[str]=None):
+        self.cg = computation_graph
+        self.agents = {a.name: a for a in agents}
+        self.hosts = hosts
+        self.hints = DistributionHints() if hints is None else hints
+        self.computation_memory = computation_memory
+        self.communication_load = communication_load
+        self.movable = None if movable is None else set(movable)
+
+        # Computations that must be hosted on a given agent, only for the
+        # available agents.
+        self._pinned = {c: a for a in self.agents
+                        for c in self.hints.must_host(a)}
+        # Agents with a specific hosting cost, for each computation.
+        self._specific_costs = {}  # type: Dict[str, Set[str]]
+        for agt in agents:
+            for c in agt.hosting_costs:
+                self._specific_costs.setdefault(c, set()).add(agt.name)
+
+        self._footprints = {}  # type: Dict[str, float]
+        self._hosted = {}  # type: Dict[str, Set[str]]
+        self._loads = {}  # type: Dict[str, float]
+
+    def footprint(self, computation: str) -> float:
+        try:
+            return self._footprints[computation]
+        except KeyError:
+            footprint = 0 if self.computation_memory is None else \
+                self.computation_memory(self.cg.computation(computation))
+            self._footprints[computation] = footprint
+            return footprint
+
+    def group_footprint(self, group: Group) -> float:
+        return sum(self.footprint(c) for c in group)
+
+    def hosted(self, agent: str) -> Set[str]:
+        """
+        Computations currently hosted on `agent`.
+        """
+        try:
+            return self._hosted[agent]
+        except KeyError:
+            # Only scan the whole placement once, when the first agent is
+            # requested.
+            for c, a in self.hosts.items():
+                self._hosted.setdefault(a, set()).add(c)
+            for a in self.agents:
+                self._hosted.setdefault(a, set())
+            return self._hosted[agent]
+
+    def remaining(self, agent: str) -> float:
+        """
+        Remaining capacity on `agent`.
+        """
+        if agent not in self._loads:
+            self._loads[agent] = sum(self.footprint(c)
+                                     for c in self.hosted(agent))
+        try:
+            capacity = self.agents[agent].capacity
+        except AttributeError:
+            capacity = float('inf')
+        return capacity - self._loads[agent]
+
+    def pinned_on(self, agent: str) -> List[str]:
+        """
+        Computations that must be hosted on `agent`.
+        """
+        return [c for c in self.hints.must_host(agent)
+                if self.is_computation(c)]
+
+    def groups(self, computations: Iterable[str]) -> Set[Group]:
+        """
+        Groups of computations that must be hosted together, for a set of
+        computations.
+        """
+        groups = set()
+        for c in computations:
+            groups.add(frozenset([c] + [o for o in self.hints.host_with(c)
+                                        if self.is_computation(o)]))
+        return groups
+
+    def is_computation(self, name: str) -> bool:
+        try:
+            self.cg.computation(name)
+            return True
+        except KeyError:
+            return False
+
+    def is_movable(self, group: Group) -> bool:
+        for c in group:
+            if c in self._pinned:
+                return False
+            if c in self.hosts and self.movable is not None \
+                    and c not in self.movable:
+                return False
+        return True
+
+    def neighbors(self, computations: Iterable[str]) -> Set[str]:
+        """
+        Neighbors of a set of computations, not including these computations.
+        """
+        computations = set(computations)
+        return {n for c in computations
+                for link in self.cg.links_for_node(c)
+                for n in link.nodes if n not in computations}
+
+    def neighbors_loads(self, group: Group,
+                        extra_hosts: Dict[str, str]=None) -> Dict[str, float]:
+        """
+        Communication load between a group and the agents hosting its
+        neighbors.
+
+        `extra_hosts` can be used to give the agents of computations that
+        are not hosted yet.
+        """
+        extra_hosts = {} if extra_hosts is None else extra_hosts
+        loads = {}
+        for c in group:
+            node = self.cg.computation(c)
+            for link in self.cg.links_for_node(c):
+                for n in link.nodes:
+                    if n in group:
+                        continue
+                    agt = self.hosts.get(n, extra_hosts.get(n))
+                    if agt is None:
+                        continue
+                    load = 1 if self.communication_load is None else \
+                        self.communication_load(node, n)
+                    loads[agt] = loads.get(agt, 0) + load
+        return loads
+
+    def cost(self, group: Group, agent: str,
+             loads: Dict[str, float]) -> float:
+        """
+        Cost of hosting `group` on `agent`, given its neighbors loads.
+        """
+        agt = self.agents[agent]
+        comm = sum(load * agt.route(a) for a, load in loads.items())
+        hosting = sum(agt.hosting_cost(c) for c in group)
+        return RATIO_HOST_COMM * comm + (1 - RATIO_HOST_COMM) * hosting
+
+    def candidates(self, group: Group, loads: Dict[str, float]) -> Set[str]:
+        """
+        Agents that are worth considering for hosting `group`: agents
+        hosting its neighbors and agents with a specific hosting cost for
+        one of its computations.
+        """
+        candidates = {a for a in loads if a in self.agents}
+        for c in group:
+            candidates.update(self._specific_costs.get(c, ()))
+        return candidates
+
+    def move(self, group: Group, agent: str):
+        for c in group:
+            previous = self.hosts.get(c)
+            if previous is not None:
+                self.hosted(previous).discard(c)
+                if previous in self._loads:
+                    self._loads[previous] -= self.footprint(c)
+            self.hosts[c] = agent
+            self.hosted(agent).add(c)
+            if agent in self._loads:
+                self._loads[agent] += self.footprint(c)
+
+    def place(self, group: Group):
+        """
+        Place a group of computations that is not hosted yet.
+
+        The group is placed on the agent with the lowest cost for it, among
+        agents that have enough remaining capacity. If there is no such
+        agent, we try to make room for the group by moving movable
+        computations.
+
+        Raises
+        ------
+        ImpossibleDistributionException
+            if the group could not be placed.
+        """
+        for c in group:
+            if c in self._pinned:
+                self.move(group, self._pinned[c])
+                return
+
+        footprint = self.group_footprint(group)
+        loads = self.neighbors_loads(group)
+        costs = sorted((self.cost(group, a, loads), a)
+                       for a in self.candidates(group, loads))
+        for _, agt in costs:
+            if self.remaining(agt) >= footprint:
+                self.move(group, agt)
+                return
+
+        # No candidate agent has enough capacity: look at all agents.
+        costs = sorted((self.cost(group, a, loads), a) for a in self.agents)
+        for _, agt in costs:
+            if self.remaining(agt) >= footprint:
+                self.move(group, agt)
+                return
+        for _, agt in costs:
+            if self._make_room(agt, group):
+                self.move(group, agt)
+                return
+        raise ImpossibleDistributionException(
+            'Could not find an agent with enough capacity for {}'
+            .format(sorted(group)))
+
+    def _make_room(self, agent: str, incoming: Group) -> bool:
+        """
+        Move computations out of `agent` until it has enough remaining
+        capacity for the `incoming` group.
+
+        Computations whose move increases the cost the least are moved
+        first.
+
+        Returns
+        -------
+        bool
+            True if enough room could be made on agent, False otherwise. In
+            this case, no computation has been moved.
+        """
+        footprint = self.group_footprint(incoming)
+        incoming_hosts = dict.fromkeys(incoming, agent)
+        evictions = []
+        for group in self.groups(self.hosted(agent)):
+            if not self.is_movable(group):
+                continue
+            loads = self.neighbors_loads(group, incoming_hosts)
+            current = self.cost(group, agent, loads)
+            for cost, other in sorted((self.cost(group, a, loads), a)
+                                      for a in self.agents if a != agent):
+                if self.remaining(other) >= self.group_footprint(group):
+                    evictions.append((cost - current, sorted(group), other,
+                                      group))
+                    break
+
+        moves = []
+        for _, _, other, group in sorted(evictions):
+            if self.remaining(agent) >= footprint:
+                break
+            if self.remaining(other) >= self.group_footprint(group):
+                moves.append(group)
+                self.move(group, other)
+        if self.remaining(agent) >= footprint:
+            logger.debug('Made room on %s by moving %s', agent, moves)
+            return True
+        for group in moves:
+            self.move(group, agent)
+        return False
+
+    def best_move(self, group: Group) -> Optional[tuple]:
+        """
+        Best move for a group.
+
+        Returns
+        -------
+        A tuple (gain, agent) where gain is the cost decrease when moving the
+        group to agent, or None if no move decreases the cost.
+        """
+        current = self.hosts[next(iter(group))]
+        footprint = self.group_footprint(group)
+        loads = self.neighbors_loads(group)
+        current_cost = self.cost(group, current, loads)
+        # Also leave agents that are over capacity.
+        best = (EPSILON, None) if self.remaining(current) >= 0 \
+            else (-float('inf'), None)
+        for agt in self.candidates(group, loads):
+            if agt == current or self.remaining(agt) < footprint:
+                continue
+            gain = current_cost - self.cost(group, agt, loads)
+            if gain > best[0]:
+                best = gain, agt
+        return None if best[1] is None else best
+
+    def local_search(self, seeds: Iterable[Group], max_moves: int):
+        """
+        Improve the distribution by moving computations, starting with the
+        `seeds` groups.
+
+        When a group is moved, its neighbors are also considered for
+        moving. At most `max_moves` moves are done.
+        """
+        queue = deque(seeds)
+        queued = set(queue)
+        moves = 0
+        while queue and moves < max_moves:
+            group = queue.popleft()
+            queued.discard(group)
+            if not self.is_movable(group):
+                continue
+            move = self.best_move(group)
+            if move is None:
+                continue
+            gain, agt = move
+            logger.debug('Moving %s to %s, gain %s', group, agt, gain)
+            self.move(group, agt)
+            moves += 1
+            for neighbor in self.groups(self.neighbors(group)):
+                if neighbor not in queued:
+                    queue.append(neighbor)
+                    queued.add(neighbor)
+        logger.info('Local search done with %s moves', moves)
+
+    def distribution(self) -> Distribution:
+        mapping = {a: [] for a in self.agents}
+        for c, a in self.hosts.items():
+            mapping[a].append(c)
+        return Distribution(mapping)
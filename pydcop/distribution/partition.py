@@ -0,0 +1,627 @@
+# BSD-3-Clause License
+#
+# Copyright 2017 Orange
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+
+"""
+Multilevel graph partitioning distribution, for large computation graphs.
+
+The computation graph is seen as a weighted graph, where the weight of a node
+is the memory footprint of the computation (given by `computation_memory`) and
+the weight of an edge is the communication load between its two ends (given
+by `communication_load`). The distribution is built like in multilevel graph
+partitioning tools (e.g. METIS):
+
+* coarsening: the graph is repeatedly coarsened by merging pairs of nodes
+  linked by a heavy edge (heavy-edge matching), until it is small enough,
+* initial partitioning: nodes of the coarsest graph are greedily placed on
+  agents, under the agents' capacity, heaviest nodes first,
+* refinement: the placement is projected back on each finer graph and
+  improved with Fiduccia-Mattheyses moves: single nodes are moved to
+  another agent, in the order of the best cost improvement, accepting
+  temporarily worsening moves and rolling back to the best placement found
+  during the pass.
+
+The cost minimized is the same as in `ilp_compref` and `heur_comhost`:
+communication costs (using the agents' routes) and hosting costs.
+
+Distribution hints are honored: computations that must be hosted together
+(`host_with`) are merged in a single node before coarsening, and nodes
+containing a `must_host` computation are pinned on their agent and never moved.
+
+"""
+import logging
+from collections import defaultdict
+from heapq import heappush, heappop
+from itertools import combinations
+from typing import Iterable, Callable, List, Dict, Optional, Tuple
+
+from pydcop.computations_graph.objects import ComputationGraph, \
+    ComputationNode
+from pydcop.dcop.objects import AgentDef
+from pydcop.distribution import ilp_compref
+from pydcop.distribution.objects import Distribution, DistributionHints, \
+    ImpossibleDistributionException
+
+logger = logging.getLogger('distribution.partition')
+
+# Weight factors when aggregating communication costs and hosting costs in the
+# objective function, same as ilp_compref.
+RATIO_HOST_COMM = ilp_compref.RATIO_HOST_COMM
+
+# Coarsening stops when the graph has less than COARSEST_NODES_PER_AGENT
+# nodes for each agent, or when a coarsening step does not reduce the number
+# of nodes by at least COARSENING_MIN_REDUCTION.
+COARSEST_NODES_PER_AGENT = 20
+COARSENING_MIN_REDUCTION = 0.1
+
+# The weight of a coarse node is limited to a fraction of the biggest agent
+# capacity, to keep the initial placement of the coarse graph feasible.
+COARSE_NODE_CAPACITY_RATIO = 4
+
+# Maximum number of refinement passes on each level and number of moves
+# without improvement after which a pass is stopped.
+MAX_REFINEMENT_PASSES = 4
+MAX_MOVES_WITHOUT_GAIN = 50
+
+EPSILON = 1e-9
+
+
+def distribute(computation_graph: ComputationGraph,
+               agentsdef: Iterable[AgentDef],
+               hints: DistributionHints=None,
+               computation_memory: Callable[[ComputationNode], float]=None,
+               communication_load: Callable[[ComputationNode, str],
+                                            float]=None) \
+        -> Distribution:
+    """
+    Distribute computations using multilevel graph partitioning.
+
+    Parameters
+    ----------
+    computation_graph: ComputationGraph
+        the computation graph to distribute
+    agentsdef: iterable of AgentDef
+        the agents the computations are distributed on
+    hints: DistributionHints
+        optional distribution hints
+    computation_memory: callable
+        memory footprint of a computation
+    communication_load: callable
+        communication load between a computation and one of its neighbors
+
+    Returns
+    -------
+    Distribution
+        a distribution of all computations, respecting agents' capacity and
+        hints.
+
+    Raises
+    ------
+    ImpossibleDistributionException
+        if no distribution could be found.
+    """
+    if computation_memory is None or communication_load is None:
+        raise ImpossibleDistributionException(
+            'partition distribution requires computation_memory and '
+            'communication_load functions')
+    agents = list(agentsdef)
+    if not agents:
+        raise ImpossibleDistributionException('No agent for distribution')
+    hints = DistributionHints() if hints is None else hints
+
+    graph, members = _build_graph(computation_graph, agents, hints,
+                                  computation_memory, communication_load)
+    agents_costs = _AgentsCosts(agents)
+    capacities = agents_costs.capacities
+
+    fixed_loads = [0] * len(agents)
+    for node, agt in enumerate(graph.fixed):
+        if agt is not None:
+            fixed_loads[agt] += graph.weights[node]
+    for agt, load in enumerate(fixed_loads):
+        if load > capacities[agt]:
+            raise ImpossibleDistributionException(
+                'Not enough capacity on agent {} for the computations it '
+                'must host'.format(agents[agt].name))
+
+    # Coarsening
+    max_node_weight = max(capacities) / COARSE_NODE_CAPACITY_RATIO
+    levels = [graph]
+    while len(levels[-1]) > COARSEST_NODES_PER_AGENT * len(agents):
+        coarse = levels[-1].coarsen(max_node_weight)
+        if len(coarse) > (1 - COARSENING_MIN_REDUCTION) * len(levels[-1]):
+            break
+        levels.append(coarse)
+    logger.info('Coarsened graph in %s levels: %s', len(levels),
+                [len(g) for g in levels])
+
+    # Initial placement on the coarsest graph. If this fails, because
+    # coarse nodes are too big, use a finer graph.
+    placement = None
+    while placement is None:
+        graph = levels.pop()
+        placement = _Placement(graph, agents_costs)
+        if not placement.greedy_placement():
+            if not levels:
+                raise ImpossibleDistributionException(
+                    'Could not find a distribution respecting agents '
+                    'capacity')
+            placement = None
+    placement.refine()
+
+    # Uncoarsening and refinement
+    while levels:
+        graph = levels.pop()
+        placement = placement.project(graph)
+        placement.refine()
+
+    mapping = {a.name: [] for a in agents}
+    for node, agt in enumerate(placement.parts):
+        mapping[agents[agt].name].extend(members[node])
+    return Distribution(mapping)
+
+
+def distribution_cost(distribution: Distribution,
+                      computation_graph: ComputationGraph,
+                      agentsdef: Iterable[AgentDef],
+                      computation_memory: Callable[[ComputationNode], float],
+                      communication_load: Callable[[ComputationNode, str],
+                                                   float]) \
+        -> Tuple[float, float, float]:
+    return ilp_compref.distribution_cost(
+        distribution, computation_graph, agentsdef,
+        computation_memory, communication_load)
+
+
+class WeightedGraph(object):
+    """
+    Weighted graph used for partitioning.
+
+    Nodes are identified by their index, from 0 to `len(graph) - 1`.
+
+    Parameters
+    ----------
+    weights: list of float
+        the weight of each node.
+    edges: list of dict
+        for each node, the weight of the edges to its neighbors.
+    sizes: list of int
+        for each node, the number of computations it contains.
+    hosting: list of dict
+        for each node, the difference, for each agent that has specific
+        hosting costs for the computations in this node, between these costs
+        and the default hosting costs of the agent.
+    fixed: list
+        for each node, the index of the agent it must be hosted on, or None.
+    """
+
+    def __init__(self, weights: List[float], edges: List[Dict[int, float]],
+                 sizes: List[int], hosting: List[Dict[int, float]],
+                 fixed: List[Optional[int]]):
+        self.weights = weights
+        self.edges = edges
+        self.sizes = sizes
+        self.hosting = hosting
+        self.fixed = fixed
+        # For a coarsened graph, index of the coarse node for each node of
+        # this graph
+        self.coarse_map = None  # type: List[int]
+
+    def __len__(self):
+        return len(self.weights)
+
+    def coarsen(self, max_weight: float) -> 'WeightedGraph':
+        """
+        Coarsen the graph by heavy-edge matching.
+
+        Each node is merged with the unmatched neighbor it has the heaviest
+        edge with, unless the merged node would weight more than
+        `max_weight` or the two nodes are pinned on different agents.
+
+        Parameters
+        ----------
+        max_weight: float
+            the maximum weight of a merged node.
+
+        Returns
+        -------
+        WeightedGraph
+            the coarse graph. `coarse_map` is set on this graph, to map its
+            nodes to the nodes of the coarse graph.
+        """
+        weights, fixed = self.weights, self.fixed
+        coarse_map = [-1] * len(self)
+        coarse_count = 0
+        # Visiting low-degree nodes first leaves more choice for high-degree
+        # nodes, which gives better matchings.
+        for u in sorted(range(len(self)), key=lambda n: len(self.edges[n])):
+            if coarse_map[u] != -1:
+                continue
+            best, best_w = None, -1
+            for v, w in self.edges[u].items():
+                if coarse_map[v] != -1 or w <= best_w or \
+                        weights[u] + weights[v] > max_weight:
+                    continue
+                if fixed[u] is not None and fixed[v] is not None \
+                        and fixed[u] != fixed[v]:
+                    continue
+                best, best_w = v, w
+            coarse_map[u] = coarse_count
+            if best is not None:
+                coarse_map[best] = coarse_count
+            coarse_count += 1
+
+        c_weights = [0] * coarse_count
+        c_sizes = [0] * coarse_count
+        c_edges = [defaultdict(float) for _ in range(coarse_count)]
+        c_hosting = [{} for _ in range(coarse_count)]
+        c_fixed = [None] * coarse_count
+        for u, cu in enumerate(coarse_map):
+            c_weights[cu] += weights[u]
+            c_sizes[cu] += self.sizes[u]
+            if fixed[u] is not None:
+                c_fixed[cu] = fixed[u]
+            hosting = c_hosting[cu]
+            for agt, cost in self.hosting[u].items():
+                hosting[agt] = hosting.get(agt, 0) + cost
+            edges = c_edges[cu]
+            for v, w in self.edges[u].items():
+                cv = coarse_map[v]
+                if cv != cu:
+                    edges[cv] += w
+
+        self.coarse_map = coarse_map
+        return WeightedGraph(c_weights, c_edges, c_sizes, c_hosting, c_fixed)
+
+
+def _build_graph(cg: ComputationGraph, agents: List[AgentDef],
+                 hints: DistributionHints,
+                 computation_memory: Callable[[ComputationNode], float],
+                 communication_load: Callable[[ComputationNode, str], float])\
+        -> Tuple[WeightedGraph, List[List[str]]]:
+    """
+    Build the finest weighted graph for a computation graph.
+
+    Computations that must be hosted together are merged in a single node.
+
+    Returns
+    -------
+    A tuple (graph, members) where members gives, for each node of the
+    graph, the names of the computations it contains.
+    """
+    nodes = {n.name: n for n in cg.nodes}
+
+    # Union-find on computations that must be hosted together.
+    groups = {name: name for name in nodes}
+
+    def find(name):
+        while groups[name] != name:
+            groups[name] = groups[groups[name]]
+            name = groups[name]
+        return name
+
+    for name in nodes:
+        for other in hints.host_with(name):
+            if other in nodes:
+                groups[find(other)] = find(name)
+
+    index = {}  # type: Dict[str, int]
+    members = []  # type: List[List[str]]
+    node_of = {}  # type: Dict[str, int]
+    for name in nodes:
+        root = find(name)
+        if root not in index:
+            index[root] = len(members)
+            members.append([])
+        node_of[name] = index[root]
+        members[index[root]].append(name)
+
+    weights = [0] * len(members)
+    sizes = [len(m) for m in members]
+    for name, node in nodes.items():
+        weights[node_of[name]] += computation_memory(node)
+
+    fixed = [None] * len(members)  # type: List[Optional[int]]
+    hosting = [{} for _ in members]  # type: List[Dict[int, float]]
+    for i, agt in enumerate(agents):
+        for name in hints.must_host(agt.name):
+            if name not in node_of:
+                continue
+            node = node_of[name]
+            if fixed[node] is not None and fixed[node] != i:
+                raise ImpossibleDistributionException(
+                    'Computation {} must be hosted with computations hosted '
+                    'on another agent'.format(name))
+            fixed[node] = i
+        for name, cost in agt.hosting_costs.items():
+            if name in node_of:
+                node_hosting = hosting[node_of[name]]
+                node_hosting[i] = node_hosting.get(i, 0) + \
+                    cost - agt.default_hosting_cost
+
+    edges = [defaultdict(float) for _ in members]
+    for link in cg.links:
+        # As we support hypergraph, we may have more than 2 ends to a link
+        for c1, c2 in combinations(link.nodes, 2):
+            n1, n2 = node_of[c1], node_of[c2]
+            if n1 != n2:
+                load = communication_load(nodes[c1], c2)
+                edges[n1][n2] += load
+                edges[n2][n1] += load
+
+    return WeightedGraph(weights, edges, sizes, hosting, fixed), members
+
+
+class _AgentsCosts(object):
+    """
+    Capacities, routes and hosting costs of the agents, indexed by their
+    position in `agents`.
+
+    Routes are stored as a default route for each agent and the difference
+    between this default route and the specific routes of the agent,
+    which makes the communication cost of a node only depend on the
+    number of agents hosting its neighbors and of specific routes.
+    """
+
+    def __init__(self, agents: List[AgentDef]):
+        index = {a.name: i for i, a in enumerate(agents)}
+        self.capacities = [a.capacity for a in agents]
+        self.default_costs = [a.default_hosting_cost for a in agents]
+        self.default_routes = [a.default_route for a in agents]
+        self.route_exceptions = [
+            {index[other]: route - a.default_route
+             for other, route in a.routes.items()
+             if other in index and other != a.name}
+            for a in agents]
+
+
+class _Placement(object):
+    """
+    Placement of the nodes of a WeightedGraph on agents.
+
+    Agents are identified by their index.
+    """
+
+    def __init__(self, graph: WeightedGraph, agents_costs: _AgentsCosts):
+        self.graph = graph
+        self.agents_costs = agents_costs
+        self.capacities = agents_costs.capacities
+        self.parts = [-1] * len(graph)
+        self.loads = [0] * len(self.capacities)
+
+    def project(self, graph: WeightedGraph) -> '_Placement':
+        """
+        Project the placement on the finer graph `graph`, whose coarse graph
+        is the graph of this placement.
+        """
+        placement = _Placement(graph, self.agents_costs)
+        placement.parts = [self.parts[c] for c in graph.coarse_map]
+        placement.loads = self.loads[:]
+        return placement
+
+    def connections(self, node: int) -> Tuple[Dict[int, float], float]:
+        """
+        Communication load between `node` and the agents hosting its
+        neighbors.
+
+        Returns
+        -------
+        A tuple (connections, total) where connections is a dict giving the
+        load with each agent and total is the sum of these loads.
+        """
+        parts = self.parts
+        connections = defaultdict(float)
+        total = 0
+        for v, w in self.graph.edges[node].items():
+            if parts[v] != -1:
+                connections[parts[v]] += w
+                total += w
+        return connections, total
+
+    def cost(self, node: int, agt: int,
+             connections: Tuple[Dict[int, float], float]) -> float:
+        """
+        Cost of hosting `node` on `agt`, given its connections.
+        """
+        costs = self.agents_costs
+        loads, total = connections
+        comm = costs.default_routes[agt] * (total - loads.get(agt, 0))
+        exceptions = costs.route_exceptions[agt]
+        if len(exceptions) < len(loads):
+            comm += sum(loads.get(a, 0) * route
+                        for a, route in exceptions.items())
+        else:
+            comm += sum(w * exceptions.get(a, 0) for a, w in loads.items()
+                        if a != agt)
+        hosting = costs.default_costs[agt] * self.graph.sizes[node] + \
+            self.graph.hosting[node].get(agt, 0)
+        return RATIO_HOST_COMM * comm + (1 - RATIO_HOST_COMM) * hosting
+
+    def move(self, node: int, agt: int):
+        weight = self.graph.weights[node]
+        if self.parts[node] != -1:
+            self.loads[self.parts[node]] -= weight
+        self.loads[agt] += weight
+        self.parts[node] = agt
+
+    def greedy_placement(self) -> bool:
+        """
+        Place all nodes on the agent with the lowest cost for them.
+
+        Pinned nodes are placed first. Then, like in graph growing
+        partitioning, the next node to place is the one most connected to
+        the already placed nodes, or the heaviest one when no remaining node
+        is connected to a placed node.
+
+        Returns
+        -------
+        bool
+            False if some node could not be placed, because no agent had
+            enough capacity left.
+        """
+        graph = self.graph
+        connected = [0] * len(graph)
+        heap = []
+
+        def place(node: int, agt: int):
+            self.move(node, agt)
+            for v, w in graph.edges[node].items():
+                if self.parts[v] == -1:
+                    connected[v] += w
+                    heappush(heap, (-connected[v], -graph.weights[v], v))
+
+        for node, agt in enumerate(graph.fixed):
+            if agt is not None:
+                place(node, agt)
+
+        free = sorted((n for n in range(len(graph))
+                       if graph.fixed[n] is None),
+                      key=lambda n: graph.weights[n])
+        while free:
+            node = None
+            while heap and node is None:
+                neg_connected, _, node = heappop(heap)
+                # Skip placed nodes and outdated entries.
+                if self.parts[node] != -1 or \
+                        -neg_connected != connected[node]:
+                    node = None
+            while node is None and free:
+                node = free.pop()
+                if self.parts[node] != -1:
+                    node = None
+            if node is None:
+                break
+
+            weight = graph.weights[node]
+            connections = self.connections(node)
+            candidates = [(self.cost(node, agt, connections), agt)
+                          for agt, capacity in enumerate(self.capacities)
+                          if self.loads[agt] + weight <= capacity]
+            if not candidates:
+                return False
+            place(node, min(candidates)[1])
+        return True
+
+    def best_move(self, node: int) -> Optional[Tuple[float, int]]:
+        """
+        Best move for a node.
+
+        Only agents hosting a neighbor of the node, or with a specific
+        hosting cost for it, are considered. For equal gains, the least
+        loaded agent is preferred.
+
+        Returns
+        -------
+        A tuple (gain, agent) where gain is the cost decrease when moving the
+        node to agent, or None if the node cannot be moved.
+        """
+        current = self.parts[node]
+        connections = self.connections(node)
+        weight = self.graph.weights[node]
+        targets = set(connections[0])
+        targets.update(self.graph.hosting[node])
+        targets.discard(current)
+        current_cost = self.cost(node, current, connections)
+        best = None
+        for agt in targets:
+            if self.loads[agt] + weight > self.capacities[agt]:
+                continue
+            gain = current_cost - self.cost(node, agt, connections)
+            if best is None or gain > best[0] or \
+                    (gain == best[0] and self.loads[agt] < self.loads[best[1]]):
+                best = gain, agt
+        return best
+
+    def _push_move(self, heap: List, node: int,
+                   move: Tuple[float, int]=None):
+        move = self.best_move(node) if move is None else move
+        if move is not None:
+            gain, agt = move
+            # On a plateau of moves with the same gain, moving nodes
+            # to less loaded agents first gives more room for later moves.
+            balance = self.loads[agt] - self.loads[self.parts[node]]
+            heappush(heap, (-gain, balance, node, agt))
+
+    def refine(self):
+        """
+        Improve the placement with Fiduccia-Mattheyses passes.
+        """
+        for _ in range(MAX_REFINEMENT_PASSES):
+            if self._fm_pass() <= EPSILON:
+                break
+
+    def _fm_pass(self) -> float:
+        """
+        A Fiduccia-Mattheyses refinement pass.
+
+        Returns
+        -------
+        float
+            the decrease of the cost of the placement.
+        """
+        fixed = self.graph.fixed
+        edges = self.graph.edges
+        heap = []
+        for node in range(len(self.graph)):
+            if fixed[node] is None:
+                self._push_move(heap, node)
+
+        locked = set()
+        moves = []
+        total_gain, best_gain, best_count = 0, 0, 0
+        while heap:
+            neg_gain, _, node, agt = heappop(heap)
+            if node in locked:
+                continue
+            # Gains in the heap may be outdated, as neighbors or the load of
+            # agents may have changed since they were computed.
+            move = self.best_move(node)
+            if move is None:
+                continue
+            if move[1] != agt or abs(move[0] + neg_gain) > EPSILON:
+                self._push_move(heap, node, move)
+                continue
+
+            moves.append((node, self.parts[node]))
+            self.move(node, agt)
+            locked.add(node)
+            total_gain -= neg_gain
+            if total_gain > best_gain + EPSILON:
+                best_gain, best_count = total_gain, len(moves)
+            elif len(moves) - best_count > MAX_MOVES_WITHOUT_GAIN:
+                break
+            for v in edges[node]:
+                if v not in locked and fixed[v] is None:
+                    self._push_move(heap, v)
+
+        # Roll back to the best placement found during the pass.
+        for node, agt in reversed(moves[best_count:]):
+            self.move(node, agt)
+        return best_gain
@@ -0,0 +1,431 @@
+# BSD-3-Clause License
+#
+# Copyright 2017 Orange
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+
+"""
+Portfolio distribution: race several distribution methods and keep the best.
+
+Distribution methods offer different trade-offs between speed and quality:
+`oneagent` is instant, `heur_comhost` and `partition` are fast heuristics and
+the ilp-based methods are optimal but may take a very long time. The
+portfolio runs several methods concurrently, each one in its own process,
+within a wall-clock time budget. Each distribution is scored with the cost
+function shared by `ilp_compref`, `heur_comhost` and `partition`
+(communication and hosting costs) and the distribution with the smallest
+cost is returned. Methods still running when the budget is exhausted are
+killed, together with any solver process they have started.
+
+Methods that fail (e.g. because they do not support the computation graph or
+cannot find a distribution respecting agents' capacities) are simply ignored,
+an ImpossibleDistributionException is only raised if no method returned a
+distribution. Some methods (e.g. `oneagent`) ignore agents' capacities or
+distribution hints: the distribution returned by each method is checked
+before being scored and methods returning an invalid distribution are
+considered as failed.
+
+"""
+import logging
+import multiprocessing
+import os
+import signal
+import traceback
+from collections import namedtuple
+from importlib import import_module
+from multiprocessing.connection import wait
+from time import perf_counter
+from typing import Iterable, Callable, List, Dict, Any, Optional, Tuple
+
+from pydcop.computations_graph.objects import ComputationGraph, \
+    ComputationNode
+from pydcop.dcop.objects import AgentDef
+from pydcop.distribution import ilp_compref
+from pydcop.distribution.cost_model import DistributionCostModel
+from pydcop.distribution.objects import Distribution, DistributionHints, \
+    ImpossibleDistributionException
+
+logger = logging.getLogger('distribution.portfolio')
+
+# Methods used when none are given, fastest first.
+DEFAULT_METHODS = ['oneagent', 'adhoc', 'heur_comhost', 'partition',
+                   'ilp_compref', 'ilp_fgdp']
+
+# Wall-clock time budget, in seconds, used when none is given.
+DEFAULT_TIME_BUDGET = 60
+
+# Fraction of the time budget given as time limit to methods that support
+# one (the ilp-based methods), so that they can return their best solution
+# before being killed.
+TIME_LIMIT_RATIO = 0.8
+
+# Status of a method in the portfolio results.
+FINISHED = 'FINISHED'
+FAILED = 'FAILED'
+TIMEOUT = 'TIMEOUT'
+
+
+# Result of a distribution method in the portfolio: `distribution` and `cost`
+# are None unless `status` is `FINISHED`, `time` is the time taken by the
+# method, in seconds, and `error` gives the reason of the failure for `FAILED`
+# methods.
+MethodResult = namedtuple('MethodResult', ['method', 'status', 'time',
+                                           'cost', 'distribution', 'error'])
+
+
+def distribute(computation_graph: ComputationGraph,
+               agentsdef: Iterable[AgentDef],
+               hints: DistributionHints=None,
+               computation_memory: Callable[[ComputationNode], float]=None,
+               communication_load: Callable[[ComputationNode, str],
+                                            float]=None,
+               methods: List[str]=None,
+               time_budget: float=None,
+               methods_params: Dict[str, Dict[str, Any]]=None,
+               max_workers: int=None) -> Distribution:
+    """
+    Distribute computations with the best of several distribution methods.
+
+    See `run_portfolio` for the parameters.
+
+    Returns
+    -------
+    Distribution
+        the distribution with the smallest cost.
+
+    Raises
+    ------
+    ImpossibleDistributionException
+        if no method could find a distribution within the time budget.
+    """
+    best, _ = run_portfolio(computation_graph, agentsdef, hints,
+                            computation_memory, communication_load,
+                            methods=methods, time_budget=time_budget,
+                            methods_params=methods_params,
+                            max_workers=max_workers)
+    return best.distribution
+
+
+def run_portfolio(computation_graph: ComputationGraph,
+                  agentsdef: Iterable[AgentDef],
+                  hints: DistributionHints=None,
+                  computation_memory: Callable[[ComputationNode],
+                                               float]=None,
+                  communication_load: Callable[[ComputationNode, str],
+                                               float]=None,
+                  methods: List[str]=None,
+                  time_budget: float=None,
+                  methods_params: Dict[str, Dict[str, Any]]=None,
+                  max_workers: int=None) \
+        -> Tuple[MethodResult, List[MethodResult]]:
+    """
+    Run several distribution methods concurrently, within a time budget.
+
+    Parameters
+    ----------
+    computation_graph: ComputationGraph
+        the computation graph to distribute
+    agentsdef: iterable of AgentDef
+        the agents the computations are distributed on
+    hints: DistributionHints
+        optional distribution hints
+    computation_memory: callable
+        memory footprint of a computation
+    communication_load: callable
+        communication load between a computation and one of its neighbors
+    methods: list of str
+        names of the distribution methods (modules in
+        `pydcop.distribution`), defaults to `DEFAULT_METHODS`.
+    time_budget: float
+        wall-clock time budget in seconds, defaults to `DEFAULT_TIME_BUDGET`.
+    methods_params: dict
+        optional keyword arguments for the `distribute` function of each
+        method, as a dict {method: {name: value}}.
+    max_workers: int
+        maximum number of methods running at the same time, defaults to the
+        number of cpus. When there are more methods, they are started when
+        another method finishes, in the order of `methods`.
+
+    Returns
+    -------
+    best: MethodResult
+        the result of the method that gave the distribution with the
+        smallest cost, ties are broken using the order of `methods`.
+    results: list of MethodResult
+        the result of each method, in the order of `methods`.
+
+    Raises
+    ------
+    ImpossibleDistributionException
+        if no method could find a distribution within the time budget.
+    """
+    if computation_memory is None or communication_load is None:
+        raise ImpossibleDistributionException(
+            'portfolio distribution requires computation_memory and '
+            'communication_load functions to compare distributions')
+    methods = DEFAULT_METHODS if methods is None else list(methods)
+    if not methods:
+        raise ValueError('No distribution method in portfolio')
+    for method in methods:
+        if method == 'portfolio':
+            raise ValueError('portfolio cannot be used in a portfolio')
+        import_module('pydcop.distribution.' + method)
+    time_budget = DEFAULT_TIME_BUDGET if time_budget is None else time_budget
+    methods_params = {} if methods_params is None else methods_params
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    agents = list(agentsdef)
+    # Built once for all methods, used in their processes to score their
+    # distribution.
+    cost_model = DistributionCostModel(computation_graph, agents,
+                                       communication_load,
+                                       ilp_compref.RATIO_HOST_COMM)
+
+    ctx = multiprocessing.get_context()
+    start = perf_counter()
+    deadline = start + time_budget
+    pending = list(methods)
+    running = {}  # type: Dict[Any, Tuple[str, Any, float]]
+    results = {}  # type: Dict[str, MethodResult]
+
+    try:
+        while pending or running:
+            while pending and len(running) < max_workers:
+                method = pending.pop(0)
+                params = _method_params(method, methods_params.get(method),
+                                        deadline - perf_counter())
+                reader, writer = ctx.Pipe(duplex=False)
+                process = ctx.Process(
+                    target=_run_method, name='portfolio_' + method,
+                    args=(writer, method, params, computation_graph, agents,
+                          hints, computation_memory, communication_load,
+                          cost_model),
+                    daemon=True)
+                process.start()
+                writer.close()
+                running[reader] = method, process, perf_counter()
+                logger.info('Started distribution method %s', method)
+
+            remaining = deadline - perf_counter()
+            if remaining <= 0:
+                break
+            for reader in wait(list(running), timeout=remaining):
+                method, process, started = running.pop(reader)
+                results[method] = _receive(reader, method,
+                                           perf_counter() - started)
+                process.join()
+                logger.info('Distribution method %s %s in %.3fs, cost %s',
+                            method, results[method].status,
+                            results[method].time, results[method].cost)
+    finally:
+        for reader, (method, process, started) in running.items():
+            logger.info('Killing distribution method %s after %.3fs',
+                        method, perf_counter() - started)
+            _kill(process)
+            reader.close()
+            results[method] = MethodResult(method, TIMEOUT,
+                                           perf_counter() - started,
+                                           None, None, None)
+    for method in pending:
+        results[method] = MethodResult(method, TIMEOUT, 0, None, None, None)
+
+    results = [results[m] for m in methods]
+    finished = [r for r in results if r.status == FINISHED]
+    if not finished:
+        raise ImpossibleDistributionException(
+            'No distribution method found a distribution in {}s : {}'
+            .format(time_budget,
+                    {r.method: r.error or r.status for r in results}))
+    best = min(finished, key=lambda r: r.cost)
+    logger.info('Best distribution found by %s, with cost %s',
+                best.method, best.cost)
+    return best, results
+
+
+def dist_params(params: Dict[str, str]) -> Dict[str, Any]:
+    """
+    Parameters for the portfolio distribution method.
+
+    Parameters
+    ----------
+    params: dict
+        a dict containing name and values (as strings) for parameters:
+        `methods` (comma-separated list of distribution methods),
+        `time_budget` (in seconds) and `max_workers`.
+
+    Returns
+    -------
+    dict
+        the parameters, that can be passed as keyword arguments to
+        `distribute`.
+    """
+    portfolio = {
+        'methods': None,
+        'time_budget': None,
+        'max_workers': None,
+    }
+    if 'methods' in params:
+        portfolio['methods'] = [m.strip() for m in params['methods'].split(',')
+                                if m.strip()]
+    if 'time_budget' in params:
+        try:
+            portfolio['time_budget'] = float(params['time_budget'])
+        except ValueError:
+            raise TypeError("'time_budget' parameter must be a float")
+    if 'max_workers' in params:
+        try:
+            portfolio['max_workers'] = int(params['max_workers'])
+        except ValueError:
+            raise TypeError("'max_workers' parameter must be an int")
+
+    remaining_params = set(params) - set(portfolio)
+    if remaining_params:
+        raise ValueError('Unknown parameter(s) for portfolio distribution : {}'
+                         .format(remaining_params))
+    return portfolio
+
+
+def distribution_cost(distribution: Distribution,
+                      computation_graph: ComputationGraph,
+                      agentsdef: Iterable[AgentDef],
+                      computation_memory: Callable[[ComputationNode], float],
+                      communication_load: Callable[[ComputationNode, str],
+                                                   float]) \
+        -> Tuple[float, float, float]:
+    return ilp_compref.distribution_cost(
+        distribution, computation_graph, agentsdef,
+        computation_memory, communication_load)
+
+
+def _method_params(method: str, params: Optional[Dict[str, Any]],
+                   remaining: float) -> Dict[str, Any]:
+    # Methods supporting a time limit get one, unless it was given
+    # explicitly, so that they return their best distribution in time.
+    module = import_module('pydcop.distribution.' + method)
+    if params is None:
+        if not hasattr(module, 'dist_params'):
+            return {}
+        params = module.dist_params({})
+    if 'time_limit' in params and params['time_limit'] is None:
+        params = dict(params, time_limit=max(1, remaining * TIME_LIMIT_RATIO))
+    return params
+
+
+def _run_method(writer, method: str, params: Dict[str, Any],
+                computation_graph: ComputationGraph, agents: List[AgentDef],
+                hints: DistributionHints, computation_memory,
+                communication_load, cost_model: DistributionCostModel):
+    # Runs in the method's process: use a new process group, to be able to
+    # kill the method along with any solver process it starts.
+    if hasattr(os, 'setpgid'):
+        os.setpgid(0, 0)
+    try:
+        module = import_module('pydcop.distribution.' + method)
+        distribution = module.distribute(
+            computation_graph, agents, hints=hints,
+            computation_memory=computation_memory,
+            communication_load=communication_load, **params)
+        mapping = distribution.mapping()
+        _check_distribution(mapping, computation_graph, agents, hints,
+                            computation_memory)
+        cost, _, _ = cost_model.cost(distribution)
+        writer.send((FINISHED, mapping, cost, None))
+    except Exception as e:
+        logger.debug('Distribution method %s failed: %s', method,
+                     traceback.format_exc())
+        writer.send((FAILED, None, None, '{}: {}'.format(type(e).__name__, e)))
+    finally:
+        writer.close()
+
+
+def _check_distribution(mapping: Dict[str, List[str]],
+                        computation_graph: ComputationGraph,
+                        agents: List[AgentDef], hints: DistributionHints,
+                        computation_memory):
+    # Raises an ImpossibleDistributionException if the distribution does not
+    # host all computations or does not respect capacities and hints.
+    hosts = {c: a for a, cs in mapping.items() for c in cs}
+    missing = {n.name for n in computation_graph.nodes} - set(hosts)
+    if missing:
+        raise ImpossibleDistributionException(
+            'Computations {} not distributed'.format(missing))
+
+    for agent in agents:
+        capacity = getattr(agent, 'capacity', None)
+        if capacity is None:
+            continue
+        footprint = sum(computation_memory(computation_graph.computation(c))
+                        for c in mapping.get(agent.name, []))
+        if footprint > capacity:
+            raise ImpossibleDistributionException(
+                'Capacity of agent {} exceeded: {} > {}'
+                .format(agent.name, footprint, capacity))
+
+    if hints is None:
+        return
+    for agent in agents:
+        for c in hints.must_host(agent.name):
+            if c in hosts and hosts[c] != agent.name:
+                raise ImpossibleDistributionException(
+                    'Computation {} must be hosted on {}, not {}'
+                    .format(c, agent.name, hosts[c]))
+    for c in hosts:
+        for other in hints.host_with(c):
+            if other in hosts and hosts[other] != hosts[c]:
+                raise ImpossibleDistributionException(
+                    'Computations {} and {} must be hosted on the same '
+                    'agent'.format(c, other))
+
+
+def _receive(reader, method: str, elapsed: float) -> MethodResult:
+    try:
+        status, mapping, cost, error = reader.recv()
+    except EOFError:
+        # The process died without sending its result
+        return MethodResult(method, FAILED, elapsed, None, None,
+                            'process exited without result')
+    finally:
+        reader.close()
+    if status != FINISHED:
+        return MethodResult(method, status, elapsed, None, None, error)
+    return MethodResult(method, status, elapsed, cost,
+                        Distribution(mapping), None)
+
+
+def _kill(process):
+    if not process.is_alive():
+        process.join()
+        return
+    if hasattr(os, 'killpg'):
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except OSError:
+            process.terminate()
+    else:
+        process.terminate()
+    process.join()
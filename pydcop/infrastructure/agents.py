@@ -45,6 +45,7 @@ import logging
 import sys
 import threading
 import traceback
+from collections import defaultdict
 from functools import partial
 from importlib import import_module
 from threading import Thread
@@ -57,11 +58,13 @@ from pydcop.dcop.objects import AgentDef, create_binary_variables
 from pydcop.dcop.objects import BinaryVariable
 from pydcop.dcop.relations import Constraint
 from pydcop.infrastructure.communication import Messaging, \
-    CommunicationLayer, UnreachableAgent
+    CommunicationLayer, UnreachableAgent, MSG_MGT
 from pydcop.infrastructure.computations import MessagePassingComputation, \
     build_computation
 from pydcop.infrastructure.discovery import Discovery, UnknownComputation, \
     UnknownAgent, _is_technical
+from pydcop.infrastructure.profiling import AgentProfiler
+from pydcop.infrastructure.stats import Histogram, open_trace_sink
 from pydcop.infrastructure.ui import UiServer
 from pydcop.reparation import create_computation_hosted_constraint, \
     create_agent_capacity_constraint, create_agent_hosting_constraint, \
@@ -100,6 +103,24 @@ class Agent(object):
         started.
     daemon: boolean
         indicates if the agent should use a daemon thread (defaults to False)
+    msg_metrics: boolean
+        if True, the agent records histograms of the time messages wait in
+        its queue, of the time spent handling them (by message type and by
+        computation) and of the time needed to send them. These histograms
+        are included in the agent's metrics. Defaults to False.
+    profile: str
+        if given, the messages handled by the agent are profiled and the
+        profiling results are written in this directory when the agent
+        stops. See `pydcop.infrastructure.profiling`.
+    trace: str
+        if given, a record is written in this file for each message handled
+        by the agent, with the statistics returned by the handler. See
+        `pydcop.infrastructure.stats`.
+    nccc: bool
+        if True, computations deployed on this agent count their constraint
+        checks and maintain a logical clock for non-concurrent constraint
+        checks (NCCC), which are included in the agent's metrics. Defaults
+        to False.
 
     See Also
     --------
@@ -110,7 +131,11 @@ class Agent(object):
                  comm: CommunicationLayer,
                  agent_def: AgentDef=None,
                  ui_port: int=None,
-                 daemon: bool=False):
+                 daemon: bool=False,
+                 msg_metrics: bool=False,
+                 profile: str=None,
+                 trace: str=None,
+                 nccc: bool=False):
         self._name = name
         self.agent_def = agent_def
         self.logger = logging.getLogger('pydcop.agent.' + name)
@@ -119,7 +144,7 @@ class Agent(object):
         self._comm = comm
         self.discovery = Discovery(self._name, self.address)
         self._comm.discovery = self.discovery
-        self._messaging = Messaging(name, comm)
+        self._messaging = Messaging(name, comm, msg_metrics=msg_metrics)
 
         # Ui server
         self._ui_port = ui_port
@@ -147,6 +172,20 @@ class Agent(object):
         # list will not revceive any message.
         self.paused_computations = []
 
+        # Histograms for messages metrics, only when requested
+        self._msg_metrics = msg_metrics
+        self._queue_wait_times = Histogram()
+        self._handling_times = defaultdict(Histogram)
+        self._computation_handling_times = defaultdict(Histogram)
+
+        # Profiler for message handlers, only when requested
+        self._profiler = AgentProfiler(name, profile) \
+            if profile is not None else None
+        # Buffer for computation steps records, only when requested
+        self._trace = open_trace_sink(trace).buffer(name) \
+            if trace is not None else None
+        self.nccc = nccc
+
     @property
     def communication(self)-> CommunicationLayer:
         """
@@ -668,7 +707,7 @@ class Agent(object):
         # stop condition. It's up the the algorithm to decide if it wants to
         # handle the message.
         dest = self.computation(dest_name)
-        dest.on_message(sender_name, msg, t)
+        return dest.on_message(sender_name, msg, t)
 
     def metrics(self):
         idle = 0 if self._run_t is None else self._run_t - self.t_active
@@ -680,6 +719,22 @@ class Agent(object):
             'idle': idle,
             'cycles': {c.name: c.cycle_count for c in self.computations()}
         }
+        if self.nccc:
+            clocks = {c.name: c.nccc_clock for c in self.computations()
+                      if c.nccc_clock is not None}
+            m['nccc'] = {c: clock.clock for c, clock in clocks.items()}
+            m['constraint_checks'] = {c: clock.checks
+                                      for c, clock in clocks.items()}
+        if self._msg_metrics:
+            m['msg_metrics'] = {
+                'queue_wait': self._queue_wait_times.to_dict(),
+                'send': self._messaging.send_times.to_dict(),
+                'handling': {t: h.to_dict()
+                             for t, h in self._handling_times.items()},
+                'handling_computation': {
+                    c: h.to_dict()
+                    for c, h in self._computation_handling_times.items()}
+            }
         return m
 
     def set_periodic_action(self, period: float, cb: Callable):
@@ -709,6 +764,8 @@ class Agent(object):
         try:
             self._running = True
             self._on_start()
+            if self._profiler is not None:
+                self._profiler.start()
             while not self._stopping.is_set():
                 # Process messages, if any
                 full_msg, t = self._messaging.next_msg(0.05)
@@ -718,10 +775,32 @@ class Agent(object):
 
                     current_t = perf_counter()
                     try:
-                        sender, dest, msg, _ = full_msg
+                        sender, dest, msg, msg_type = full_msg
                         self._idle = False
-                        if not self._stopping.is_set():
-                            self._handle_message(sender, dest, msg, t)
+                        stats = None
+                        tracing = self._trace is not None \
+                            and msg_type != MSG_MGT \
+                            and not _is_technical(dest)
+                        clock = self.computation(dest).nccc_clock \
+                            if tracing and self.nccc else None
+                        checks = clock.checks if clock is not None else 0
+                        if self._stopping.is_set():
+                            pass
+                        elif self._profiler is not None:
+                            stats = self._profiler.profile_handler(
+                                dest, msg.type, self._handle_message,
+                                sender, dest, msg, t)
+                        else:
+                            stats = self._handle_message(sender, dest, msg, t)
+                        if tracing:
+                            if clock is not None:
+                                stats = dict(stats) \
+                                    if isinstance(stats, dict) else {}
+                                stats['cc_count'] = clock.checks - checks
+                                stats['nccc'] = clock.clock
+                            self._trace.record(
+                                dest, sender, msg, current_t,
+                                perf_counter() - current_t, stats)
                     finally:
                         if self._run_t is not None:
                             e = perf_counter()
@@ -731,6 +810,12 @@ class Agent(object):
                                 self.logger.warning(
                                     'Long message handling (%s) : %s',
                                     msg_duration, msg)
+                            if self._msg_metrics and msg_type != MSG_MGT:
+                                self._queue_wait_times.add(current_t - t)
+                                self._handling_times[msg.type].add(
+                                    msg_duration)
+                                self._computation_handling_times[dest].add(
+                                    msg_duration)
 
                 # Process periodic action. Only once the agents runs the
                 # computations (i.e. self._run_t is not None)
@@ -738,7 +823,7 @@ class Agent(object):
                 if self._start_t is not None \
                         and self._periodic_cb is not None \
                         and ct - last_cb_time >= self._period:
-                    self.logger.warning('periodic cb %s %s ', ct, last_cb_time)
+                    self.logger.debug('periodic cb %s %s ', ct, last_cb_time)
                     self._periodic_cb()
                     last_cb_time = ct
 
@@ -758,6 +843,10 @@ class Agent(object):
             self._running = False
             self._comm.shutdown()
             self._on_stop()
+            if self._profiler is not None:
+                self._profiler.stop()
+            if self._trace is not None:
+                self._trace.close()
             self.logger.info('Thread of agent %s stopped', self._name)
 
     def is_idle(self):
@@ -807,8 +896,12 @@ class ResilientAgent(Agent):
     """
 
     def __init__(self, name: str, comm: CommunicationLayer,
-                 agent_def: AgentDef, replication: str, ui_port=None):
-        super().__init__(name, comm, agent_def, ui_port=ui_port)
+                 agent_def: AgentDef, replication: str, ui_port=None,
+                 msg_metrics: bool=False, profile: str=None,
+                 trace: str=None, nccc: bool=False):
+        super().__init__(name, comm, agent_def, ui_port=ui_port,
+                         msg_metrics=msg_metrics, profile=profile,
+                         trace=trace, nccc=nccc)
         self.replication_comp = None
         if replication is not None:
             self.logger.debug('deploying replication computation %s',
@@ -1135,7 +1228,7 @@ class ResilientAgent(Agent):
                 self.logger.info('Deploying computation %s locally with '
                                  'definition , %r',repair_comp.candidate,
                                  comp_def)
-                comp = build_computation(comp_def)
+                comp = build_computation(comp_def, count_checks=self.nccc)
                 self.add_computation(comp)
             else:
                 self.logger.info('Reparation: computation %s NOT selected on '
@@ -34,7 +34,7 @@ import logging
 from collections import namedtuple, defaultdict
 from http.server import HTTPServer, BaseHTTPRequestHandler
 from queue import Empty, PriorityQueue
-from threading import Thread
+from threading import Thread, Lock
 from time import perf_counter
 from typing import Tuple, Dict
 
@@ -43,6 +43,7 @@ from requests.exceptions import ConnectionError
 
 from pydcop.infrastructure.discovery import UnknownComputation, \
     UnknownAgent
+from pydcop.infrastructure.stats import Histogram
 from pydcop.utils.simple_repr import simple_repr, from_repr
 
 logger = logging.getLogger('infrastructure.communication')
@@ -347,13 +348,17 @@ class HttpCommunicationLayer(CommunicationLayer):
 
         dest_address = 'http://{}:{}/pydcop'.format(server, port)
         msg_repr = simple_repr(msg.msg)
+        headers = {'sender-agent': src_agent,
+                   'dest-agent': dest_agent,
+                   'sender-comp': msg.src_comp,
+                   'dest-comp': msg.dest_comp,
+                   'type': str(msg.msg_type)}
+        if msg.msg.nccc is not None:
+            # NCCC logical clock of the sender, not part of the message repr
+            headers['nccc'] = str(msg.msg.nccc)
         try:
             r = requests.post(dest_address,
-                              headers={'sender-agent': src_agent,
-                                       'dest-agent': dest_agent,
-                                       'sender-comp': msg.src_comp,
-                                       'dest-comp': msg.dest_comp,
-                                       'type': str(msg.msg_type)},
+                              headers=headers,
                               json=msg_repr,
                               timeout=0.5)
         except ConnectionError:
@@ -394,8 +399,10 @@ class MPCHttpHandler(BaseHTTPRequestHandler):
         post_data = self.rfile.read(content_length)
         content = json.loads(str(post_data, "utf-8"))
 
-        comp_msg = ComputationMessage(src_comp, dest_comp,
-                                      from_repr(content), int(type))
+        msg = from_repr(content)
+        if 'nccc' in self.headers:
+            msg.nccc = int(self.headers['nccc'])
+        comp_msg = ComputationMessage(src_comp, dest_comp, msg, int(type))
         try:
             self.server.comm.on_post_message(self.path, sender, dest, comp_msg)
 
@@ -421,6 +428,21 @@ MSG_VALUE = 15
 MSG_ALGO = 20
 
 
+class _CoalescingSlot(object):
+    """
+    Placeholder put in the queue for a coalescable message.
+
+    The content of the slot is replaced in place when a newer message,
+    with the same source, destination and type, is posted before the
+    slot is taken out of the queue.
+    """
+    __slots__ = ['key', 'full_msg']
+
+    def __init__(self, key: Tuple[str, str, str], full_msg: ComputationMessage):
+        self.key = key
+        self.full_msg = full_msg
+
+
 class Messaging(object):
     """
     A `Messaging` instance is responsible for all messaged-based communication
@@ -436,6 +458,13 @@ class Messaging(object):
 
     Also accumulates metrics on messages sending.
 
+    Messages whose `coalescable` attribute is True are coalesced: if a
+    message from the same source computation, to the same target
+    computation and with the same type, is still waiting in the queue when a
+    new one is posted, the pending message is replaced by the new one
+    instead of queuing both. This is only meant for messages where only the
+    latest one matters (for example MaxSum costs messages).
+
     Parameters
     ----------
     agent_name: str
@@ -443,10 +472,13 @@ class Messaging(object):
     comm: CommunicationLayer
         a concrete implementation of the CommunicationLayer protocol, it will
         be used to send messages to other agents.
+    msg_metrics: bool
+        if True, the time needed to send each non-management message to
+        another agent is recorded in the `send_times` histogram. Defaults to False.
     """
 
     def __init__(self, agent_name: str,
-                 comm: CommunicationLayer):
+                 comm: CommunicationLayer, msg_metrics: bool=False):
         self._queue = PriorityQueue()
         self._local_agent = agent_name
         self.discovery = comm.discovery
@@ -461,6 +493,12 @@ class Messaging(object):
         self.size_ext_msg = defaultdict(lambda: 0)  # type: Dict[str, int]
         self.last_msg_time = 0
         self.msg_queue_count = 0
+        self.send_times = Histogram() if msg_metrics else None
+
+        # Pending coalescable messages: (src, dest, type) -> slot in the queue
+        self._pending_slots = {}  # type: Dict[Tuple[str, str, str], _CoalescingSlot]
+        self._slots_lock = Lock()
+        self.msg_coalesced_count = 0
 
     @property
     def communication(self)-> CommunicationLayer:
@@ -496,9 +534,13 @@ class Messaging(object):
         try:
             _, _, t, full_msg = self._queue.get(block=True,
                                                 timeout=timeout)
-            return full_msg, t
         except Empty:
             return None, None
+        if isinstance(full_msg, _CoalescingSlot):
+            with self._slots_lock:
+                del self._pending_slots[full_msg.key]
+                full_msg = full_msg.full_msg
+        return full_msg, t
 
     def post_msg(self, src_computation: str, dest_computation: str,
                  msg, msg_type: int=MSG_ALGO, on_error=None):
@@ -565,9 +607,12 @@ class Messaging(object):
             # that the #  tuple will always be orderable. The time is
             # useful to measure the delay between reception and handling
             # of a message.
-            self.msg_queue_count += 1
-            self._queue.put((msg_type, self.msg_queue_count,
-                             perf_counter(), full_msg))
+            if getattr(msg, 'coalescable', False) is True:
+                self._post_coalescable(msg_type, full_msg)
+            else:
+                self.msg_queue_count += 1
+                self._queue.put((msg_type, self.msg_queue_count,
+                                 perf_counter(), full_msg))
         else:
             logger.debug('Posting remote message {} -> {} : "{!r}"'
                          .format(src_computation, dest_computation, str(msg)))
@@ -588,8 +633,30 @@ class Messaging(object):
                 self.count_ext_msg[src_computation] += 1
                 self.size_ext_msg[src_computation] += msg.size
 
-            self._comm.send_msg(self._local_agent, dest_agent, full_msg,
-                                on_error=on_error)
+            if self.send_times is None or msg_type == MSG_MGT:
+                self._comm.send_msg(self._local_agent, dest_agent, full_msg,
+                                    on_error=on_error)
+            else:
+                send_t = perf_counter()
+                self._comm.send_msg(self._local_agent, dest_agent, full_msg,
+                                    on_error=on_error)
+                self.send_times.add(perf_counter() - send_t)
+
+    def _post_coalescable(self, msg_type: int, full_msg: ComputationMessage):
+        key = (full_msg.src_comp, full_msg.dest_comp, full_msg.msg.type)
+        with self._slots_lock:
+            slot = self._pending_slots.get(key)
+            if slot is not None:
+                # The previous message has not been handled yet, only the
+                # latest one matters: replace it in place.
+                slot.full_msg = full_msg
+                self.msg_coalesced_count += 1
+                return
+            slot = _CoalescingSlot(key, full_msg)
+            self._pending_slots[key] = slot
+            self.msg_queue_count += 1
+            self._queue.put((msg_type, self.msg_queue_count,
+                             perf_counter(), slot))
 
     def _on_computation_registration(self, evt: str, computation: str,
                                      agent: str):
@@ -30,17 +30,23 @@
 
 
 import logging
+from copy import copy
 from importlib import import_module
 from typing import List, Tuple, Any, Callable
 
 from pydcop.algorithms import ComputationDef
 from pydcop.dcop.objects import Variable
+from pydcop.dcop.relations import CountingRelation
 from pydcop.utils.simple_repr import SimpleRepr, SimpleReprException, \
     simple_repr
 
 
 class Message(SimpleRepr):
 
+    # Logical NCCC clock of the sender, only set when counting constraint
+    # checks, see `NcccClock`.
+    nccc = None
+
     def __init__(self, msg_type, content=None):
         self._msg_type = msg_type
         self._content = content
@@ -57,6 +63,18 @@ class Message(SimpleRepr):
     def content(self):
         return self._content
 
+    @property
+    def coalescable(self) -> bool:
+        """
+        If True, only the latest message of this type sent from a computation
+        to another computation matters and a message waiting in the
+        receiver's queue can be replaced by a newer one.
+
+        Defaults to False, must be overwritten in sub-classes for messages
+        that can be coalesced.
+        """
+        return False
+
     def __str__(self):
         return 'Message({})'.format(self.type)
 
@@ -198,6 +216,9 @@ class MessagePassingComputation(object):
         self._paused_messages_post = []  # type: List[Tuple[str, Any, int, Any]]
         self._paused_messages_recv = []  # type: List[Tuple[str, Any, float]]
 
+        # Only set when counting constraint checks, see `build_computation`.
+        self.nccc_clock = None  # type: NcccClock
+
     @property
     def name(self) -> str:
         """
@@ -330,9 +351,16 @@ class MessagePassingComputation(object):
             the received message that must be handled
         t: float
             reception time
+
+        Returns
+        -------
+        The value returned by the message handler, if any, which may be a
+        dict of statistics about this step (see `pydcop.infrastructure.stats`)
         """
+        if self.nccc_clock is not None and msg.nccc is not None:
+            self.nccc_clock.merge(msg.nccc)
         if not self.is_paused:
-            self._msg_handlers[msg.type](sender, msg, t)
+            return self._msg_handlers[msg.type](sender, msg, t)
         else:
             self._paused_messages_recv.append((sender, msg, t))
 
@@ -357,6 +385,8 @@ class MessagePassingComputation(object):
         on_error: error handling method
             passed to the messaging component.
         """
+        if self.nccc_clock is not None:
+            msg.nccc = self.nccc_clock.clock
         if not self.is_paused:
             self._msg_sender(self.name, target, msg, prio, on_error)
         else:
@@ -527,14 +557,79 @@ class VariableComputation(DcopComputation):
         pass
 
 
-def build_computation(comp_def: ComputationDef) -> MessagePassingComputation:
+class NcccClock(object):
+    """
+    Counts constraint checks for a computation.
+
+    `checks` is the number of constraint checks performed by the computation.
+    `clock` is its logical clock for non-concurrent constraint checks (NCCC):
+    it is incremented on each check, sent with every message and, when
+    receiving a message, set to the maximum of its value and of the clock of
+    the sender.
+
+    >>> clock = NcccClock()
+    >>> clock.check(); clock.check()
+    >>> clock.merge(5)
+    >>> clock.check()
+    >>> clock.checks, clock.clock
+    (3, 6)
+    """
+
+    __slots__ = ['checks', 'clock']
+
+    def __init__(self):
+        self.checks = 0
+        self.clock = 0
+
+    def check(self):
+        self.checks += 1
+        self.clock += 1
+
+    def merge(self, clock: int):
+        if clock > self.clock:
+            self.clock = clock
+
+
+def build_computation(comp_def: ComputationDef, count_checks: bool=False) \
+        -> MessagePassingComputation:
     """
     Build a concrete computation instance from a computation definition.
 
-    :param comp_def: the computation definition
-    :return: a concrete MessagePassingComputation
+    Parameters
+    ----------
+    comp_def: ComputationDef
+        the computation definition
+    count_checks: bool
+        if True, the constraints of the computation are wrapped in
+        `CountingRelation` objects, which count constraint checks on the
+        `nccc_clock` of the computation. Otherwise constraints are used
+        as-is, with no overhead.
+
+    Returns
+    -------
+    MessagePassingComputation:
+        a concrete MessagePassingComputation
     """
     algo_module = import_module('pydcop.algorithms.{}'
                                 .format(comp_def.algo.algo))
-    computation = algo_module.build_computation(comp_def)
+    if not count_checks:
+        return algo_module.build_computation(comp_def)
+
+    clock = NcccClock()
+    computation = algo_module.build_computation(
+        _counting_computation_def(comp_def, clock))
+    computation.nccc_clock = clock
     return computation
+
+
+def _counting_computation_def(comp_def: ComputationDef, clock: NcccClock) \
+        -> ComputationDef:
+    # The node is copied, as it may be shared with other computations (e.g.
+    # with the orchestrator, when agents run in the same process)
+    node = copy(comp_def.node)
+    if hasattr(node, '_factor'):
+        node._factor = CountingRelation(node._factor, clock)
+    if hasattr(node, '_constraints'):
+        node._constraints = type(node._constraints)(
+            CountingRelation(c, clock) for c in node._constraints)
+    return ComputationDef(node, comp_def.algo)
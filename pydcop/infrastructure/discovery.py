@@ -1137,15 +1137,18 @@ class Discovery(object):
         if not is_change:
             return
         if computation in self._computation_cbs:
-            for cb, oneshot in self._computation_cbs[computation]:
+            # Iterate on a copy, as callbacks may unsubscribe
+            for cb, oneshot in self._computation_cbs[computation][:]:
                 self.logger.debug('fire computation_added call back for %s : '
                                   '%s', computation, cb)
                 cb('computation_added', computation, agent)
-            # Remove all one-shot callback for this computation
-            self._computation_cbs[computation][:] = \
-                [(cb, oneshot)
-                 for cb, oneshot in self._computation_cbs[computation]
-                 if not oneshot]
+            # Remove all one-shot callback for this computation, unless all
+            # callbacks have been unsubscribed
+            if computation in self._computation_cbs:
+                self._computation_cbs[computation][:] = \
+                    [(cb, oneshot)
+                     for cb, oneshot in self._computation_cbs[computation]
+                     if not oneshot]
 
     def unregister_computation(self, computation: ComputationName,
                                agent: AgentName=None, publish: bool=True):
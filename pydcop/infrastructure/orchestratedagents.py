@@ -72,6 +72,18 @@ class OrchestratedAgent(ResilientAgent):
         mode for metrics collection : 'period', 'cycle' 'value_change' or None
     metrics_period: float
         when using metrics_on='period', the periodicity for metrics messages
+    msg_metrics: bool
+        if True, histograms on messages handling are included in the metrics
+        sent to the orchestrator, see `Agent`.
+    profile: str
+        if given, directory where the agent's profiling results are written,
+        see `Agent`.
+    trace: str
+        if given, file where the agent writes a record for each handled
+        message, see `Agent`.
+    nccc: bool
+        if True, deployed computations count constraint checks and NCCC, see
+        `Agent`.
 
 
     See Also
@@ -82,9 +94,12 @@ class OrchestratedAgent(ResilientAgent):
     def __init__(self, agt_def: AgentDef, comm: CommunicationLayer,
                  orchestrator_address: Address,
                  metrics_on: str=None, metrics_period: float=None,
-                 replication: str=None, ui_port=None):
+                 replication: str=None, ui_port=None,
+                 msg_metrics: bool=False, profile: str=None,
+                 trace: str=None, nccc: bool=False):
         super().__init__(agt_def.name, comm, agt_def, replication,
-                         ui_port=ui_port)
+                         ui_port=ui_port, msg_metrics=msg_metrics,
+                         profile=profile, trace=trace, nccc=nccc)
 
         # Orchestrator and orchestration computation hosted by it:
         self.discovery.use_directory(ORCHESTRATOR, orchestrator_address)
@@ -247,7 +262,8 @@ class OrchestrationComputation(MessagePassingComputation):
         comp_def = msg.comp_def
         self.logger.info('Deploying computations %s  on %s',
                               comp_def.node, self.agent.name)
-        computation = build_computation(comp_def)
+        computation = build_computation(comp_def,
+                                        count_checks=self.agent.nccc)
         self.agent.add_computation(computation)
 
     def _on_setup_repair(self, sender: str, msg: SetupRepairMessage, t: float):
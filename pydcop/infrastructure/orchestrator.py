@@ -30,6 +30,7 @@
 
 
 import threading
+from importlib import import_module
 from queue import Queue
 from time import perf_counter
 from typing import Dict, Tuple, Callable
@@ -40,22 +41,28 @@ from collections import defaultdict
 
 import yaml
 
-from pydcop.algorithms import AlgoDef, filter_assignment_dict, ComputationDef
+from pydcop.algorithms import AlgoDef, ComputationDef
 from pydcop.computations_graph.objects import ComputationGraph
-from pydcop.dcop.dcop import DCOP
+from pydcop.dcop.dcop import DCOP, SolutionCostTracker
 from pydcop.dcop.scenario import Scenario
-from pydcop.distribution.objects import Distribution
+from pydcop.distribution.incremental import distribute_remove
+from pydcop.distribution.objects import Distribution, \
+    ImpossibleDistributionException
 from pydcop.infrastructure.agents import Agent, AgentException
 from pydcop.infrastructure.communication import CommunicationLayer, MSG_MGT
 from pydcop.infrastructure.computations import Message, message_type, \
     MessagePassingComputation
 from pydcop.infrastructure.discovery import Directory, UnknownAgent
+from pydcop.infrastructure.stats import merge_msg_metrics, \
+    msg_metrics_summary, merge_nccc_metrics
 from pydcop.reparation.removal import _removal_candidate_agents, \
     _removal_orphaned_computations, _removal_candidate_agt_info
 
 ORCHESTRATOR = 'orchestrator'
 ORCHESTRATOR_MGT = '_mgt_orchestrator'
 
+REPAIR_METHODS = ['dcop', 'incremental']
+
 
 class Orchestrator(object):
     """
@@ -111,6 +118,19 @@ class Orchestrator(object):
         A queue used to collect metrics
     collect_moment: str
         metrics collection mode (e.g. 'value_change')
+    profile: str
+        if given, the orchestrator's agent is profiled and the profiling
+        results are written in this directory.
+    metrics_max_rate: float
+        if given, the maximum number of metrics emitted per second on the
+        collector queue, in 'value_change' and 'period' collection modes.
+    repair: str
+        method used to repair the distribution when agents leave the
+        system: 'dcop' (the default) for the distributed repair, where
+        agents hosting replicas of orphaned computations solve a repair
+        DCOP, or 'incremental' for a centralized incremental redistribution
+        of orphaned computations by the orchestrator
+        (see `pydcop.distribution.incremental`).
 
     """
 
@@ -120,8 +140,14 @@ class Orchestrator(object):
                  dcop: DCOP,
                  infinity=float('inf'),
                  collector: Queue=None,
-                 collect_moment: str='value_change'):
-        self._own_agt = Agent(ORCHESTRATOR, comm)
+                 collect_moment: str='value_change',
+                 profile: str=None,
+                 metrics_max_rate: float=None,
+                 repair: str='dcop'):
+        if repair not in REPAIR_METHODS:
+            raise ValueError('Invalid repair method {}, must be one of {}'
+                             .format(repair, REPAIR_METHODS))
+        self._own_agt = Agent(ORCHESTRATOR, comm, profile=profile)
         self.directory = Directory(self._own_agt.discovery)
         self._own_agt.add_computation(self.directory.directory_computation)
         self._own_agt.discovery.use_directory(ORCHESTRATOR,
@@ -141,7 +167,13 @@ class Orchestrator(object):
 
         self.mgt = AgentsMgt(algo, cg, agent_mapping, dcop,
                              self._own_agt, self, infinity, collector=collector,
-                             collect_moment=collect_moment)
+                             collect_moment=collect_moment,
+                             metrics_max_rate=metrics_max_rate,
+                             repair=repair)
+        if metrics_max_rate:
+            # Metrics skipped due to the rate limit are emitted later
+            self._own_agt.set_periodic_action(1 / metrics_max_rate,
+                                              self.mgt.flush_metrics)
 
     @property
     def address(self):
@@ -531,6 +563,12 @@ class AgentsMgt(MessagePassingComputation):
         metrics will be posted on this queue.
     collect_moment:
         metrics collection mode
+    metrics_max_rate: float
+        if given, the maximum number of metrics emitted per second, in
+        'value_change' and 'period' collection modes. Metrics that were
+        skipped are emitted by `flush_metrics`.
+    repair: str
+        repair method, 'dcop' or 'incremental'.
     """
 
     def __init__(self, algo: AlgoDef, cg: ComputationGraph,
@@ -539,7 +577,9 @@ class AgentsMgt(MessagePassingComputation):
                  orchestrator_agent: Agent, orchestrator: Orchestrator,
                  infinity=float('inf'),
                  collector: Queue=None,
-                 collect_moment: str='value_change'):
+                 collect_moment: str='value_change',
+                 metrics_max_rate: float=None,
+                 repair: str='dcop'):
         super().__init__(ORCHESTRATOR_MGT)
         self._orchestrator_agent = orchestrator_agent
         self._orchestrator = orchestrator
@@ -566,6 +606,10 @@ class AgentsMgt(MessagePassingComputation):
 
         self._collect_moment = collect_moment
         self._collector = collector
+        self._min_emit_interval = 1 / metrics_max_rate \
+            if metrics_max_rate else None
+        self._last_emit_t = None
+        self._pending_emit_t = None
 
         self._nb_computations = 0
         self.start_time = None
@@ -575,6 +619,10 @@ class AgentsMgt(MessagePassingComputation):
         self._agts_state = {}  # type: Dict[str, str]
         self._comps_state = {}  # type: Dict[str, str]
 
+        # Agents hosting the replicas of each computation, as reported by
+        # the agents when their replication is done.
+        self.replica_hosts = {}  # type: Dict[str, List[str]]
+
         self.all_registered = threading.Event()
         self.ready_to_run = threading.Event()
 
@@ -589,9 +637,17 @@ class AgentsMgt(MessagePassingComputation):
         self._agent_cycle_values = defaultdict(lambda: {})
         # used to detect the end of a cycle
         self._computation_cycle = defaultdict(lambda: set())
+        # Cost of the current assignment, updated on each value change.
+        self._cost_tracker = SolutionCostTracker(
+            dcop.constraints.values(), dcop.all_variables, infinity)
 
         self.dist_count = 0
 
+        self._repair = repair
+        # For incremental repair: computations being re-deployed, with their
+        # new host.
+        self._redeployed = {}  # type: Dict[str, str]
+
     @property
     def type(self):
         return 'mgt'
@@ -721,6 +777,7 @@ class AgentsMgt(MessagePassingComputation):
     def _on_computation_replicated_msg(self, sender: str,
                                        msg: ComputationReplicatedMessage, _):
 
+        self.replica_hosts.update(msg.replica_hosts)
         if msg.agent in self._agts_state \
               and self._agts_state[msg.agent] == 'replicating':
             self._agts_state[msg.agent] = 'ready'
@@ -758,6 +815,7 @@ class AgentsMgt(MessagePassingComputation):
         else:
             self._agent_cycle_values[self._current_cycle][msg.computation] =\
                 (msg.value, msg.cost)
+            self._cost_tracker.set_value(msg.computation, msg.value)
             if self._collect_moment == 'value_change':
                 if msg.computation not in self._dcop.variables:
                     # only emit metrics for dcop variable (not reparation
@@ -766,7 +824,7 @@ class AgentsMgt(MessagePassingComputation):
 
                 self._agt_cycle_metrics[self._current_cycle][msg.agent] =\
                     msg.metrics
-                self._emit_metrics(t)
+                self._throttled_emit_metrics(t)
 
     def _on_cycle_change_msg(self, sender: str, msg: CycleChangeMessage,
                              t: float):
@@ -794,6 +852,9 @@ class AgentsMgt(MessagePassingComputation):
                         self._nb_computations:
                     self._current_cycle = cycle_end
 
+                    self._cost_tracker.update(
+                        {c: v[0] for c, v in
+                         self._agent_cycle_values[cycle_end].items() if v})
                     if cycle_end > 0:
                         # During a cycle, not all computation select a new
                         # value, we need to get the unchanged values frm the
@@ -820,7 +881,7 @@ class AgentsMgt(MessagePassingComputation):
                          dict(msg.metrics), sender)
         self._agt_cycle_metrics[self._current_cycle][msg.agent] = msg.metrics
 
-        self._emit_metrics(t)
+        self._throttled_emit_metrics(t)
 
     def _on_agent_stopped_msg(self, sender: str, msg: AgentStoppedMessage,
                               _: float):
@@ -907,7 +968,10 @@ class AgentsMgt(MessagePassingComputation):
                 self.logger.error('Unknown event action %s ', a)
                 raise ValueError('Unknown event action ' + str(a))
 
-        self._agents_removal(leaving_agents)
+        if self._repair == 'incremental':
+            self._incremental_repair(leaving_agents)
+        else:
+            self._agents_removal(leaving_agents)
 
     def _agents_removal(self, leaving_agents: List[str]):
         # Now inform other agents of the list of agents that left the system
@@ -939,6 +1003,103 @@ class AgentsMgt(MessagePassingComputation):
             self._send_mgt_msg(candidate, msg)
             self._agts_state[candidate] = 'repair_setup'
 
+    def _incremental_repair(self, leaving_agents: List[str]):
+        """
+        Repair the distribution with a centralized and incremental
+        redistribution of the orphaned computations.
+
+        As running computations cannot be migrated, only orphaned
+        computations are moved: they are deployed on their new host from
+        their definition, and all computations are resumed once they have
+        all been deployed.
+        """
+        names = {n.name for n in self.graph.nodes}
+        mapping = {a: [c for c in self.discovery.agent_computations(a)
+                       if c in names]
+                   for a in self.discovery.agents()}
+        current = Distribution(mapping)
+        orphaned = [c for a in leaving_agents if a in mapping
+                    for c in mapping[a]]
+        agents = [self._dcop.agents[a] for a in mapping
+                  if a in self._dcop.agents and a not in leaving_agents]
+
+        algo_module = import_module('pydcop.algorithms.'+self._algo.algo)
+        try:
+            distribution = distribute_remove(
+                current, self.graph, agents, leaving_agents,
+                hints=self._dcop.dist_hints,
+                computation_memory=algo_module.computation_memory,
+                communication_load=algo_module.communication_load,
+                movable=[])
+        except ImpossibleDistributionException as e:
+            self.logger.error('Could not repair distribution after removal '
+                              'of agents %s, orphaned computations %s will '
+                              'not be repaired : %s',
+                              leaving_agents, orphaned, e)
+            self._resume_computations()
+            return
+
+        self._redeployed = {c: distribution.agent_for(c) for c in orphaned}
+        self.logger.info('On removal of agents %s, re-deploying orphaned '
+                         'computations : %s', leaving_agents,
+                         self._redeployed)
+        if not self._redeployed:
+            self._resume_computations()
+            return
+        for c, agt in self._redeployed.items():
+            comp_def = ComputationDef(self.graph.computation(c), self._algo)
+            self._send_mgt_msg(agt, DeployMessage(comp_def))
+            self.discovery.subscribe_computation(
+                c, self._cb_redeployed_registration)
+
+    def _cb_redeployed_registration(self, evt: str, computation: str,
+                                    agent: str):
+        # Cb registered to discovery, for computations re-deployed by
+        # incremental repair.
+        if evt != 'computation_added' or \
+                self._redeployed.get(computation) != agent:
+            return
+        self.logger.debug('Computation %s re-deployed on %s',
+                          computation, agent)
+        redeployed = self._redeployed
+        redeployed[computation] = None
+        if any(a is not None for a in redeployed.values()):
+            return
+
+        self.logger.info('All orphaned computations have been re-deployed, '
+                         'resuming computations')
+        hosts = defaultdict(list)
+        for c in redeployed:
+            hosts[self.discovery.computation_agent(c)].append(c)
+            self.discovery.unsubscribe_computation(
+                c, self._cb_redeployed_registration)
+        self._redeployed = {}
+        for agt, computations in hosts.items():
+            self._send_mgt_msg(agt, RunAgentMessage(computations))
+        self._dump_distribution('incremental')
+        self._resume_computations()
+
+    def _resume_computations(self):
+        for agent in self.discovery.agents():
+            self._send_mgt_msg(
+                agent,
+                ResumeMessage(self.discovery.agent_computations(agent)))
+            self._agts_state[agent] = 'running'
+
+    def _dump_distribution(self, dist_algo: str):
+        dist = {a: self.discovery.agent_computations(a)
+                for a in self.discovery.agents()}
+        result = {
+            'inputs': {
+                'dist_algo': dist_algo,
+            },
+            'distribution': dist,
+        }
+        f_name = 'evtdist_{}.yaml'.format(self.dist_count)
+        with open(f_name, mode='w', encoding='utf-8') as f:
+            f.write(yaml.dump(result))
+        self.dist_count += 1
+
     def _agents_arrival(self, arrived_agents: List[str]):
         # TODO
         # For arrival,
@@ -1006,26 +1167,10 @@ class AgentsMgt(MessagePassingComputation):
                                  'resuming computations',
                                  msg.agent)
 
-                # Dump current distribution
-                dist = {a: self.discovery.agent_computations(a)
-                        for a in self.discovery.agents()}
-                result = {
-                    'inputs': {
-                        'dist_algo': 'repair',
-                    },
-                    'distribution': dist,
-                }
-                f_name = 'evtdist_{}.yaml'.format(self.dist_count)
-                with open(f_name, mode='w', encoding='utf-8') as f:
-                    f.write(yaml.dump(result))
-                self.dist_count += 1
+                self._dump_distribution('repair')
 
                 # Resume all computation now that everything is ok
-                for agent in self.discovery.agents():
-                    self._send_mgt_msg(
-                        agent,
-                        ResumeMessage(self.discovery.agent_computations(agent)))
-                    self._agts_state[agent] = 'running'
+                self._resume_computations()
 
                 # Check if all orphaned computations have been re-hosted.
                 lost_orphaned = [c for c, s in self._comps_state.items()
@@ -1076,13 +1221,10 @@ class AgentsMgt(MessagePassingComputation):
         agent_values = self._agent_cycle_values[self._current_cycle]
         assignment = {k: agent_values[k][0] for k in agent_values
                       if agent_values[k]}
-        # only keep dcop variable to compute the solution cost
-        # it might other contain variables used for reparation
-        dcop_assignment = filter_assignment_dict(
-            assignment, self._dcop.variables.values())
+        # The cost is maintained incrementally by the tracker, which ignores
+        # variables used for reparation.
         try:
-            violation, cost = self._dcop.solution_cost(dcop_assignment,
-                                                       self.infinity)
+            violation, cost = self._cost_tracker.cost
         except ValueError:
             var_names = set(self._dcop.variables)
             ass_names = set(assignment)
@@ -1130,11 +1272,45 @@ class AgentsMgt(MessagePassingComputation):
             'agt_metrics': self._agt_cycle_metrics[self._current_cycle]
         }
 
+        # Messages histograms are only available if agents collect them
+        msg_metrics = merge_msg_metrics(
+            self._agt_cycle_metrics[self._current_cycle].values())
+        if msg_metrics is not None:
+            global_metrics['msg_metrics'] = msg_metrics
+            global_metrics.update(msg_metrics_summary(msg_metrics))
+
+        # Constraint checks are only available if agents count them
+        nccc_metrics = merge_nccc_metrics(
+            self._agt_cycle_metrics[self._current_cycle].values())
+        if nccc_metrics is not None:
+            global_metrics.update(nccc_metrics)
+
         return global_metrics
 
     def _emit_metrics(self, t):
         if self._collector is not None:
+            self._pending_emit_t = None
+            self._last_emit_t = t
             self._collector.put((t, self.global_metrics('RUNNING', t)))
 
+    def _throttled_emit_metrics(self, t):
+        # Emit metrics, unless they have already been emitted less than
+        # _min_emit_interval ago, in which case they are emitted later by
+        # flush_metrics.
+        if self._min_emit_interval is not None \
+                and self._last_emit_t is not None \
+                and t - self._last_emit_t < self._min_emit_interval:
+            self._pending_emit_t = t
+        else:
+            self._emit_metrics(t)
+
+    def flush_metrics(self):
+        """
+        Emit metrics that have been delayed due to the metrics rate limit,
+        if any.
+        """
+        if self._pending_emit_t is not None:
+            self._emit_metrics(self._pending_emit_t)
+
     def _send_mgt_msg(self, agt, msg):
         self.post_msg('_mgt_' + agt, msg, MSG_MGT)
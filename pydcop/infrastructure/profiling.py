@@ -0,0 +1,246 @@
+# BSD-3-Clause License
+#
+# Copyright 2017 Orange
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+
+"""
+Profiling support for agents.
+
+When profiling is enabled on an agent (see the `profile` argument of
+`Agent`), all messages handled by the agent are profiled by an
+`AgentProfiler`, which:
+
+* keeps cumulative timers for each message handler, i.e. for each pair
+  (computation, message type),
+* runs a `cProfile.Profile` only while handling messages. As each agent
+  has its own profiler, this also works with thread-based agents, which is
+  not the case when running the whole process under cProfile,
+* registers the agent's thread on a sampling profiler, which periodically
+  records the stack of the thread while it is handling a message.
+
+When the agent stops, the profiler writes in the profiling directory, for an
+agent named `a1`:
+
+* `a1.pstats` : cProfile statistics, which can be loaded with `pstats`,
+* `a1.collapsed` : the sampled stacks, in the 'collapsed' format used by
+  flamegraph tools (one line per stack, frames separated by ';', followed by
+  the number of samples),
+* `a1_handlers.csv` : the cumulative timers for each handler.
+
+"""
+
+import cProfile
+import logging
+import os
+import sys
+import threading
+from collections import defaultdict, Counter
+from time import perf_counter, sleep
+from typing import Dict, Tuple, Callable, List
+
+logger = logging.getLogger('pydcop.profiling')
+
+# Period, in seconds, between two samples of the agents' threads stacks.
+SAMPLING_PERIOD = 0.005
+
+
+class AgentProfiler(object):
+    """
+    Profiler for the messages handled by an agent.
+
+    Parameters
+    ----------
+    agent_name: str
+        name of the profiled agent, used for naming the output files.
+    directory: str
+        directory where profiling results will be written.
+    cprofile: bool
+        if True (the default), use cProfile when handling messages.
+    sampling: bool
+        if True (the default), sample the stack of the agent's thread while
+        it is handling messages.
+    """
+
+    def __init__(self, agent_name: str, directory: str,
+                 cprofile: bool=True, sampling: bool=True):
+        self.agent_name = agent_name
+        self.directory = directory
+        self._profile = cProfile.Profile() if cprofile else None
+        self._sampling = sampling
+
+        # (computation, msg_type) -> [count, cumulative time]
+        self.handler_times = defaultdict(lambda: [0, 0])  \
+            # type: Dict[Tuple[str, str], List]
+        self.stacks = Counter()  # type: Dict[str, int]
+        self.busy = False
+        self._thread_id = None
+
+    def start(self):
+        """
+        Start profiling the current thread.
+
+        Must be called from the agent's thread.
+        """
+        self._thread_id = threading.get_ident()
+        if self._sampling:
+            _sampler.register(self._thread_id, self)
+
+    def stop(self):
+        """
+        Stop profiling and write the results.
+        """
+        if self._thread_id is not None and self._sampling:
+            _sampler.unregister(self._thread_id)
+        self.dump()
+
+    def profile_handler(self, computation: str, msg_type: str,
+                        handler: Callable, *args):
+        """
+        Call `handler` with `args`, profiling it.
+
+        Parameters
+        ----------
+        computation: str
+            name of the computation the message is handled by.
+        msg_type: str
+            type of the handled message.
+        handler: Callable
+            the handler for the message.
+        """
+        self.busy = True
+        start = perf_counter()
+        if self._profile is not None:
+            self._profile.enable()
+        try:
+            return handler(*args)
+        finally:
+            if self._profile is not None:
+                self._profile.disable()
+            timer = self.handler_times[(computation, msg_type)]
+            timer[0] += 1
+            timer[1] += perf_counter() - start
+            self.busy = False
+
+    def add_sample(self, frame):
+        """
+        Called by the sampler with the current frame of the agent's thread.
+        """
+        self.stacks[collapse_stack(frame)] += 1
+
+    def dump(self):
+        os.makedirs(self.directory, exist_ok=True)
+        base_path = os.path.join(self.directory, self.agent_name)
+
+        if self._profile is not None:
+            self._profile.dump_stats(base_path + '.pstats')
+
+        if self._sampling:
+            with open(base_path + '.collapsed', 'w', encoding='utf-8') as f:
+                for stack, count in sorted(self.stacks.items()):
+                    f.write('{} {}\n'.format(stack, count))
+
+        with open(base_path + '_handlers.csv', 'w', encoding='utf-8') as f:
+            f.write('computation,msg_type,count,total_time,mean_time\n')
+            for (comp, msg_type), (count, total) in \
+                    sorted(self.handler_times.items(),
+                           key=lambda item: -item[1][1]):
+                f.write('{},{},{},{},{}\n'.format(
+                    comp, msg_type, count, total, total / count))
+        logger.info('Profiling results for %s written in %s',
+                    self.agent_name, self.directory)
+
+
+def collapse_stack(frame) -> str:
+    """
+    Collapsed representation of a stack, as used by flamegraph tools.
+
+    Parameters
+    ----------
+    frame:
+        the top frame of the stack
+
+    Returns
+    -------
+    str:
+        all the frames of the stack, from the outermost one, separated by
+        ';'. Each frame is given as 'file:function:line'.
+    """
+    frames = []
+    while frame is not None:
+        code = frame.f_code
+        frames.append('{}:{}:{}'.format(os.path.basename(code.co_filename),
+                                        code.co_name, code.co_firstlineno))
+        frame = frame.f_back
+    return ';'.join(reversed(frames))
+
+
+class _StackSampler(object):
+    """
+    Periodically samples the stacks of all registered threads.
+
+    A single sampling thread is used for all profiled agents in the process,
+    it only runs while at least one agent is registered.
+    """
+
+    def __init__(self, period: float):
+        self.period = period
+        self._profilers = {}  # type: Dict[int, AgentProfiler]
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def register(self, thread_id: int, profiler: AgentProfiler):
+        with self._lock:
+            self._profilers[thread_id] = profiler
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run,
+                                                name='stack_sampler',
+                                                daemon=True)
+                self._thread.start()
+
+    def unregister(self, thread_id: int):
+        with self._lock:
+            self._profilers.pop(thread_id, None)
+
+    def _run(self):
+        while True:
+            sleep(self.period)
+            with self._lock:
+                if not self._profilers:
+                    self._thread = None
+                    return
+                profilers = list(self._profilers.items())
+            frames = sys._current_frames()
+            for thread_id, profiler in profilers:
+                # Only sample while the agent is handling a message,
+                # otherwise we would mostly sample the wait on the queue.
+                if profiler.busy and thread_id in frames:
+                    profiler.add_sample(frames[thread_id])
+
+
+_sampler = _StackSampler(SAMPLING_PERIOD)
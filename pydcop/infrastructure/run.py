@@ -29,10 +29,11 @@
 # POSSIBILITY OF SUCH DAMAGE.
 
 
+import os
 from importlib import import_module
 from multiprocessing import Process
 from queue import Queue
-from typing import Union
+from typing import Union, Optional
 
 from pydcop.algorithms.objects import AlgoDef
 from pydcop.computations_graph.objects import ComputationGraph
@@ -104,7 +105,9 @@ def solve(dcop: DCOP,
     if graph is None:
         graph_module = import_module('pydcop.computations_graph.{}'.
                                      format(algo_module.GRAPH_TYPE))
-        graph = graph_module.build_computation_graph(dcop)
+        graph_params = algo_module.graph_params(algo_def) \
+            if hasattr(algo_module, 'graph_params') else {}
+        graph = graph_module.build_computation_graph(dcop, **graph_params)
 
     elif isinstance(graph, str):
         graph_module = import_module('pydcop.computations_graph.'+graph)
@@ -146,7 +149,13 @@ def run_local_thread_dcop(algo: AlgoDef,
                           collector: Queue=None,
                           collect_moment: str='value_change',
                           period=None,
-                          replication=None)-> Orchestrator:
+                          replication=None,
+                          msg_metrics: bool=False,
+                          profile: str=None,
+                          trace: str=None,
+                          nccc: bool=False,
+                          metrics_max_rate: float=None,
+                          repair: str='dcop')-> Orchestrator:
     """Build orchestrator and agents for running a dcop in threads.
 
     The DCOP will be run in a single process, using one thread for each agent.
@@ -172,6 +181,24 @@ def run_local_thread_dcop(algo: AlgoDef,
         period for collecting metrics, only used we 'period' metric collection
     replication
         replication algorithm,  for resilent DCOP.
+    msg_metrics: bool
+        if True, agents collect histograms on messages handling, which are
+        aggregated in the orchestrator's metrics.
+    profile: str
+        if given, the orchestrator and all agents are profiled and the
+        profiling results are written in this directory.
+    trace: str
+        if given, all agents write a record in this file for each step of
+        their computations, see `pydcop.infrastructure.stats`.
+    nccc: bool
+        if True, computations count constraint checks and NCCC, which are
+        reported in the orchestrator's metrics.
+    metrics_max_rate: float
+        if given, maximum number of metrics per second put on the collector
+        queue by the orchestrator.
+    repair: str
+        method used by the orchestrator to repair the distribution when
+        agents leave the system, 'dcop' or 'incremental'.
 
     Returns
     -------
@@ -190,7 +217,10 @@ def run_local_thread_dcop(algo: AlgoDef,
     comm = InProcessCommunicationLayer()
     orchestrator = Orchestrator(algo, cg, distribution, comm, dcop, infinity,
                                 collector=collector,
-                                collect_moment=collect_moment)
+                                collect_moment=collect_moment,
+                                profile=profile,
+                                metrics_max_rate=metrics_max_rate,
+                                repair=repair)
     orchestrator.start()
 
     # Create and start all agents.
@@ -201,7 +231,11 @@ def run_local_thread_dcop(algo: AlgoDef,
                                   orchestrator.address,
                                   metrics_on=collect_moment,
                                   metrics_period=period,
-                                  replication=replication)
+                                  replication=replication,
+                                  msg_metrics=msg_metrics,
+                                  profile=profile,
+                                  trace=trace,
+                                  nccc=nccc)
         agent.start()
 
     # once all agents have started and registered to the orchestrator,
@@ -215,7 +249,13 @@ def run_local_process_dcop(algo: AlgoDef, cg: ComputationGraph,
                            collector: Queue=None,
                            collect_moment: str='value_change',
                            period=None,
-                           replication=None
+                           replication=None,
+                           msg_metrics: bool=False,
+                           profile: str=None,
+                           trace: str=None,
+                           nccc: bool=False,
+                           metrics_max_rate: float=None,
+                           repair: str='dcop'
                            ):
 
     agents = dcop.agents
@@ -223,7 +263,10 @@ def run_local_process_dcop(algo: AlgoDef, cg: ComputationGraph,
     comm = HttpCommunicationLayer(('127.0.0.1', port))
     orchestrator = Orchestrator(algo, cg, distribution, comm, dcop, infinity,
                                 collector=collector,
-                                collect_moment=collect_moment)
+                                collect_moment=collect_moment,
+                                profile=profile,
+                                metrics_max_rate=metrics_max_rate,
+                                repair=repair)
     orchestrator.start()
 
     # Create and start all agents.
@@ -234,7 +277,11 @@ def run_local_process_dcop(algo: AlgoDef, cg: ComputationGraph,
                     args=[agents[a_name], port, orchestrator.address],
                     kwargs={'metrics_on': collect_moment,
                             'metrics_period': period,
-                            'replication': replication},
+                            'replication': replication,
+                            'msg_metrics': msg_metrics,
+                            'profile': profile,
+                            'trace': agent_trace_path(trace, a_name),
+                            'nccc': nccc},
                     daemon=True)
         p.start()
 
@@ -244,10 +291,30 @@ def run_local_process_dcop(algo: AlgoDef, cg: ComputationGraph,
 
 
 def _build_process_agent(agt_def: AgentDef, port, orchestrator_address,
-                         metrics_on, metrics_period, replication):
+                         metrics_on, metrics_period, replication,
+                         msg_metrics=False, profile=None, trace=None,
+                         nccc=False):
     comm = HttpCommunicationLayer(('127.0.0.1', port))
     agent = OrchestratedAgent(agt_def, comm, orchestrator_address,
                               metrics_on=metrics_on,
                               metrics_period=metrics_period,
-                              replication=replication)
+                              replication=replication,
+                              msg_metrics=msg_metrics,
+                              profile=profile,
+                              trace=trace,
+                              nccc=nccc)
     agent.start()
+
+
+def agent_trace_path(trace: Optional[str], agent: str) -> Optional[str]:
+    """
+    Trace file for an agent, when agents run in different processes and
+    cannot share the same trace file.
+
+    >>> agent_trace_path('/tmp/trace.csv', 'a1')
+    '/tmp/trace_a1.csv'
+    """
+    if trace is None:
+        return None
+    base, ext = os.path.splitext(trace)
+    return '{}_{}{}'.format(base, agent, ext)
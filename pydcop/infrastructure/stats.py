@@ -31,73 +31,573 @@
 
 
 """
-This module is used to collect statistics from computations
+This module is used to collect statistics from computations.
 
-Each node emits a set of statistics for each step it performed. A step is a
-set of computations (compute costs, messages, select a value, etc.) it
-performed in response to an event.
-Event will generally be : either initialisation or the reception of a message
-from another node.
+Each computation emits a set of statistics for each step it performed. A step
+is a set of computations (compute costs, messages, select a value, etc.) it
+performed in response to an event, which is generally the reception of a
+message from another computation.
+
+When tracing is enabled on an agent, a record is added to the agent's
+`TraceBuffer` each time the agent handles a message. This record contains
+timing information and the statistics returned by the message handler, if
+any. Handlers may return a dict with any of the keys 'num_msg_out',
+'size_msg_out', 'op_count' (number of logic operations) and 'current_value'.
+When constraint checks are counted (see `NcccClock`), the agent adds the
+'cc_count' and 'nccc' keys, from the NCCC clock of the computation.
+
+All buffers using the same file share a `TraceSink`, whose background thread
+periodically drains the buffers and writes the records in the file, as CSV or
+as Parquet if the file name ends with '.parquet' and pyarrow is available.
+
+It also provides fixed-bucket histograms, used by agents to measure the time
+spent by messages in queue, handling them and sending them.
 
 """
 
+import csv
 import logging
-
-# When logged in a cvs file, statistics will be written in this order :
+import threading
+from bisect import bisect_left
+from collections import defaultdict, deque
 from time import time
+from typing import List, Dict, Any, Optional, Iterable
+
+logger = logging.getLogger('pydcop.stats')
 
+# When written in a trace file, statistics will be written in this order :
 columns = [
-    'time',
-    'start_time',  # start time for this step
+    'time',  # time at the end of the step
     'duration',  # duration of the step
-    'agent',  # agent hosting the node
-    'node_name',  # nome of the node (e.g. name of the variable or factor)
-    'node_type',  # type of the node which performed the step : factor, variable
-    'step_num',  # number of this step for this node (0,1, 2,3...)
-    'event_type',  # event that started the step: init, costs _msg, etc.
-    'size_msg',  # size of msg,if the step was started by a message
+    'agent',  # agent hosting the computation
+    'computation',  # name of the computation (e.g. variable or factor)
+    'step_num',  # number of this step for this computation (0, 1, 2, 3...)
+    'event_type',  # type of the message that started the step
+    'sender',  # computation that sent this message
+    'size_msg',  # size of this message
     'num_msg_out',  # number of msg sent in this step
     'size_msg_out',  # total size of msg sent in this step
-    'op_count',  # number of operations performed in this step
-    'nc_op_count',  # Non-concurrent number of operations so far
-    'current_value',  # for var node, the current selected value
+    'op_count',  # number of logic operations performed in this step
+    'cc_count',  # number of constraint checks performed in this step
+    'nccc',  # non-concurrent number of constraint checks so far
+    'current_value',  # for variable computations, the current value
 ]
 
-computation_logger = logging.getLogger('computation')
-logging_enabled = False
+# Maximum number of records kept in a trace buffer between two flushes.
+DEFAULT_BUFFER_CAPACITY = 100000
+
+
+class TraceBuffer(object):
+    """
+    A thread-safe ring buffer of computation steps records, for one agent.
+
+    When the buffer is full, the oldest records are dropped, which only
+    happens if the sink cannot write them fast enough.
+
+    Parameters
+    ----------
+    agent: str
+        name of the agent
+    sink: TraceSink
+        the sink that drains this buffer
+    capacity: int
+        maximum number of records in the buffer
+    """
+
+    def __init__(self, agent: str, sink: 'TraceSink',
+                 capacity: int=DEFAULT_BUFFER_CAPACITY):
+        self.agent = agent
+        self.sink = sink
+        self.dropped = 0
+        self._records = deque(maxlen=capacity)
+        self._lock = threading.Lock()
 
-is_first = True
+    def record(self, computation: str, sender: str, msg,
+               start: float, duration: float, stats: Optional[Dict]):
+        """
+        Record a step of a computation.
 
-def set_stats_file(file_path):
-    if not logging_enabled:
-        return
-    global is_first
-    is_first = True
-    handler = logging.FileHandler(file_path)
-    msg_formatter = logging.Formatter('%(message)s')
-    handler.setFormatter(msg_formatter)
-    computation_logger.addHandler(handler)
+        Parameters
+        ----------
+        computation: str
+            name of the computation
+        sender: str
+            name of the computation that sent the message
+        msg: Message
+            the handled message
+        start: float
+            time (perf_counter) when the step started
+        duration: float
+            duration of the step, in seconds
+        stats: dict
+            statistics returned by the message handler, may be None
+        """
+        with self._lock:
+            if len(self._records) == self._records.maxlen:
+                self.dropped += 1
+            self._records.append((time(), duration, start,
+                                  computation, msg.type, sender, msg.size,
+                                  stats))
 
-def trace_computation(data):
+    def drain(self) -> List:
+        with self._lock:
+            records = list(self._records)
+            self._records.clear()
+        return records
+
+    def close(self):
+        self.sink.release(self)
+
+
+class TraceSink(object):
     """
-    Add a entry containing all the data from one computation step.
+    Writes the records from a set of trace buffers in a file.
 
-    :param data: a dict {key: value} where all the key must be defined in
-    stats.columns.
+    Records are written by a background thread, every `flush_period`
+    seconds, and when the last buffer is released.
 
+    Parameters
+    ----------
+    path: str
+        path of the trace file. If it ends with '.parquet' and pyarrow is
+        installed, records are written as Parquet, otherwise as CSV.
+    flush_period: float
+        period, in seconds, between two flushes
     """
-    if not logging_enabled:
-        return
-    global is_first
-    if is_first:
-        is_first = False
-        computation_logger.info(', '.join(columns))
-
-    ordered = [str(time())]
-    for k in columns[1:]:
-        if k in data:
-            ordered.append(str(data[k]))
-        else:
-            ordered.append('')
-    computation_logger.info(', '.join(ordered))
 
+    def __init__(self, path: str, flush_period: float=1):
+        self.path = path
+        self.flush_period = flush_period
+        self._buffers = []  # type: List[TraceBuffer]
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._writer = _create_trace_writer(path)
+
+        self._step_counts = defaultdict(int)
+        self._closed = threading.Event()
+        self._thread = threading.Thread(target=self._run,
+                                        name='trace_sink', daemon=True)
+        self._thread.start()
+
+    def buffer(self, agent: str,
+               capacity: int=DEFAULT_BUFFER_CAPACITY) -> TraceBuffer:
+        """
+        Create a new buffer, drained by this sink.
+
+        Parameters
+        ----------
+        agent: str
+            name of the agent that will use the buffer
+        capacity: int
+            maximum number of records in the buffer
+
+        Returns
+        -------
+        TraceBuffer:
+            a new trace buffer.
+        """
+        buffer = TraceBuffer(agent, self, capacity)
+        with self._lock:
+            self._buffers.append(buffer)
+        return buffer
+
+    def release(self, buffer: TraceBuffer):
+        """
+        Release a buffer: its records are flushed and it is not drained
+        anymore. When no buffer remains, the sink is closed.
+        """
+        self.flush()
+        with self._lock:
+            if buffer in self._buffers:
+                self._buffers.remove(buffer)
+            last = not self._buffers
+        if last:
+            self.close()
+
+    def flush(self):
+        with self._lock:
+            buffers = list(self._buffers)
+        with self._flush_lock:
+            if self._writer is None:
+                return
+            records = []
+            for buffer in buffers:
+                records.extend((buffer.agent, r) for r in buffer.drain())
+            if not records:
+                return
+            # Write steps in the order they started
+            records.sort(key=lambda r: r[1][2])
+            self._writer.write([self._trace_row(agent, r)
+                                for agent, r in records])
+
+    def close(self):
+        with _sinks_lock:
+            if _sinks.get(self.path) is self:
+                del _sinks[self.path]
+        self._closed.set()
+        self.flush()
+        with self._flush_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+
+    def _run(self):
+        while not self._closed.wait(self.flush_period):
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error('Could not write trace to %s : %s',
+                             self.path, e)
+
+    def _trace_row(self, agent: str, record) -> Dict[str, Any]:
+        t, duration, start, computation, msg_type, sender, \
+            msg_size, stats = record
+        stats = stats if isinstance(stats, dict) else {}
+
+        step_num = self._step_counts[computation]
+        self._step_counts[computation] += 1
+        return {
+            'time': t,
+            'duration': duration,
+            'agent': agent,
+            'computation': computation,
+            'step_num': step_num,
+            'event_type': msg_type,
+            'sender': sender,
+            'size_msg': msg_size,
+            'num_msg_out': stats.get('num_msg_out'),
+            'size_msg_out': stats.get('size_msg_out'),
+            'op_count': stats.get('op_count'),
+            'cc_count': stats.get('cc_count'),
+            'nccc': stats.get('nccc'),
+            'current_value': stats.get('current_value'),
+        }
+
+
+_sinks = {}  # type: Dict[str, TraceSink]
+_sinks_lock = threading.Lock()
+
+
+def open_trace_sink(path: str) -> TraceSink:
+    """
+    The trace sink writing to `path`.
+
+    All agents in the same process tracing to the same file share the same
+    sink, which is created when needed.
+
+    Parameters
+    ----------
+    path: str
+        path of the trace file
+
+    Returns
+    -------
+    TraceSink:
+        a trace sink writing to this file.
+    """
+    with _sinks_lock:
+        if path not in _sinks:
+            _sinks[path] = TraceSink(path)
+        return _sinks[path]
+
+
+def _create_trace_writer(path: str):
+    if path.endswith('.parquet'):
+        try:
+            return _ParquetTraceWriter(path)
+        except ImportError:
+            path = path[:-len('.parquet')] + '.csv'
+            logger.warning('pyarrow is not available, writing trace as csv '
+                           'in %s', path)
+    return _CsvTraceWriter(path)
+
+
+class _CsvTraceWriter(object):
+
+    def __init__(self, path: str):
+        self._file = open(path, 'w', newline='', encoding='utf-8')
+        self._writer = csv.DictWriter(self._file, fieldnames=columns)
+        self._writer.writeheader()
+
+    def write(self, rows: List[Dict[str, Any]]):
+        self._writer.writerows(rows)
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class _ParquetTraceWriter(object):
+
+    def __init__(self, path: str):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        self._pa = pa
+        string_columns = {'agent', 'computation', 'event_type', 'sender',
+                          'current_value'}
+        float_columns = {'time', 'duration'}
+        self._schema = pa.schema([
+            (c, pa.string() if c in string_columns
+             else pa.float64() if c in float_columns else pa.int64())
+            for c in columns])
+        self._writer = pq.ParquetWriter(path, self._schema)
+
+    def write(self, rows: List[Dict[str, Any]]):
+        data = {c: [r[c] for r in rows] for c in columns}
+        data['current_value'] = [None if v is None else str(v)
+                                 for v in data['current_value']]
+        self._writer.write_table(
+            self._pa.Table.from_pydict(data, schema=self._schema))
+
+    def close(self):
+        self._writer.close()
+
+
+# Upper bounds (in seconds) of the buckets used for time histograms : from 1µs
+# to about 16s, each bucket being twice as large as the previous one.
+TIME_BUCKETS = [1e-6 * 2 ** i for i in range(25)]
+
+
+class Histogram(object):
+    """
+    A fixed-bucket histogram.
+
+    Each bucket is defined by its upper bound, an extra bucket counts all
+    values greater than the last bound. Adding a value only costs a binary
+    search in the bounds, which makes histograms cheap enough to be used for
+    instrumenting message handling.
+
+    Histograms using the same buckets can be merged, e.g. to aggregate
+    histograms from several agents.
+
+    Parameters
+    ----------
+    bounds: list of float
+        upper bounds of the buckets, in increasing order. Defaults to
+        `TIME_BUCKETS`.
+
+    Examples
+    --------
+
+    >>> h = Histogram([1, 2, 4])
+    >>> for v in [0.5, 1.5, 1.7, 10]:
+    ...     h.add(v)
+    >>> h.counts
+    [1, 2, 0, 1]
+    >>> h.percentile(0.5)
+    2
+    """
+
+    __slots__ = ['bounds', 'counts', 'count', 'total', 'min', 'max']
+
+    def __init__(self, bounds: List[float]=None):
+        self.bounds = TIME_BUCKETS if bounds is None else bounds
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def add(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def merge(self, other: 'Histogram'):
+        """
+        Add the values counted in `other` to this histogram.
+
+        Parameters
+        ----------
+        other: Histogram
+            a histogram, which must use the same buckets.
+        """
+        if other.bounds != self.bounds:
+            raise ValueError('Cannot merge histograms with different buckets')
+        for i, c in enumerate(other.counts):
+            self.counts[i] += c
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None:
+            self.min = other.min if self.min is None \
+                else min(self.min, other.min)
+            self.max = other.max if self.max is None \
+                else max(self.max, other.max)
+
+    @property
+    def mean(self) -> Optional[float]:
+        return self.total / self.count if self.count else None
+
+    def percentile(self, p: float) -> Optional[float]:
+        """
+        An upper bound for the `p` percentile of the values in the histogram.
+
+        Parameters
+        ----------
+        p: float
+            percentile, between 0 and 1.
+
+        Returns
+        -------
+        float:
+            the upper bound of the bucket containing the percentile (or the
+            maximum value if it is in the last bucket), None if the
+            histogram is empty.
+        """
+        if not self.count:
+            return None
+        rank = p * self.count
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= rank and c:
+                return self.bounds[i] if i < len(self.bounds) \
+                    else self.max
+        return self.max
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Plain dict representation, which can be included in metrics messages.
+        The bounds are not included, histograms are expected to use the
+        default buckets.
+        """
+        return {'counts': list(self.counts), 'count': self.count,
+                'total': self.total, 'min': self.min, 'max': self.max}
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any],
+                  bounds: List[float]=None) -> 'Histogram':
+        h = cls(bounds)
+        h.counts = list(d['counts'])
+        h.count, h.total = d['count'], d['total']
+        h.min, h.max = d['min'], d['max']
+        return h
+
+    def __repr__(self):
+        return 'Histogram(count={}, mean={}, max={})'.format(
+            self.count, self.mean, self.max)
+
+
+def merge_msg_metrics(agents_metrics: Iterable[Dict]) -> Optional[Dict]:
+    """
+    Aggregate the message metrics from several agents.
+
+    Parameters
+    ----------
+    agents_metrics: iterable of dict
+        metrics from the agents (as returned by `Agent.metrics()`). Metrics
+        without a 'msg_metrics' entry are ignored.
+
+    Returns
+    -------
+    dict:
+        a dict with the same structure than the 'msg_metrics' entry of
+        agent's metrics, where all histograms have been merged. None if no
+        agent reported message metrics.
+    """
+    queue_wait, send = Histogram(), Histogram()
+    handling = defaultdict(Histogram)
+    handling_computation = {}
+    found = False
+    for agt_metrics in agents_metrics:
+        try:
+            msg_metrics = agt_metrics['msg_metrics']
+        except KeyError:
+            continue
+        found = True
+        queue_wait.merge(Histogram.from_dict(msg_metrics['queue_wait']))
+        send.merge(Histogram.from_dict(msg_metrics['send']))
+        for msg_type, h in msg_metrics['handling'].items():
+            handling[msg_type].merge(Histogram.from_dict(h))
+        # Computations are hosted on a single agent, no need to merge them
+        handling_computation.update(msg_metrics['handling_computation'])
+    if not found:
+        return None
+    return {
+        'queue_wait': queue_wait.to_dict(),
+        'send': send.to_dict(),
+        'handling': {t: h.to_dict() for t, h in handling.items()},
+        'handling_computation': handling_computation
+    }
+
+
+def msg_metrics_summary(msg_metrics: Dict) -> Dict[str, Optional[float]]:
+    """
+    Summary values (mean and 99th percentile) for aggregated message metrics.
+
+    Parameters
+    ----------
+    msg_metrics: dict
+        message metrics, as returned by `merge_msg_metrics`
+
+    Returns
+    -------
+    dict:
+        a dict with one entry for each column in `msg_metrics_columns`.
+    """
+    handling = Histogram()
+    for h in msg_metrics['handling'].values():
+        handling.merge(Histogram.from_dict(h))
+    summary = {}
+    for name, h in [('queue_wait', Histogram.from_dict(
+                                    msg_metrics['queue_wait'])),
+                    ('handling', handling),
+                    ('send', Histogram.from_dict(msg_metrics['send']))]:
+        summary[name + '_avg'] = h.mean
+        summary[name + '_p99'] = h.percentile(0.99)
+    return summary
+
+
+# Columns added to metrics csv files when collecting message metrics
+msg_metrics_columns = ['queue_wait_avg', 'queue_wait_p99',
+                       'handling_avg', 'handling_p99', 'send_avg', 'send_p99']
+
+
+def merge_nccc_metrics(agents_metrics: Iterable[Dict]) -> Optional[Dict]:
+    """
+    Aggregate the constraint checks counts from several agents.
+
+    Parameters
+    ----------
+    agents_metrics: iterable of dict
+        metrics from the agents (as returned by `Agent.metrics()`). Metrics
+        without a 'nccc' entry are ignored.
+
+    Returns
+    -------
+    dict:
+        a dict with the non-concurrent constraint checks count ('nccc'),
+        which is the highest logical clock of all computations, and the total
+        number of constraint checks ('constraint_checks'). None if no agent
+        counted constraint checks.
+
+    Examples
+    --------
+
+    >>> merge_nccc_metrics([{'nccc': {'v1': 4, 'v2': 6},
+    ...                      'constraint_checks': {'v1': 4, 'v2': 3}},
+    ...                     {'nccc': {'v3': 5},
+    ...                      'constraint_checks': {'v3': 5}}])
+    {'nccc': 6, 'constraint_checks': 12}
+    """
+    nccc, checks = 0, 0
+    found = False
+    for agt_metrics in agents_metrics:
+        try:
+            clocks = agt_metrics['nccc']
+        except KeyError:
+            continue
+        found = True
+        nccc = max([nccc] + list(clocks.values()))
+        checks += sum(agt_metrics['constraint_checks'].values())
+    if not found:
+        return None
+    return {'nccc': nccc, 'constraint_checks': checks}
+
+
+# Columns added to metrics csv files when counting constraint checks
+nccc_columns = ['nccc', 'constraint_checks']
@@ -33,7 +33,8 @@ from typing import Callable, Tuple, Dict, List
 
 from pydcop.dcop.objects import BinaryVariable
 from pydcop.dcop.relations import NAryFunctionRelation, RelationProtocol, \
-    Constraint
+    Constraint, ExactlyKRelation, KnapsackThresholdRelation, \
+    LinearSumRelation
 
 
 def create_computation_hosted_constraint(computation_name: str,
@@ -53,15 +54,8 @@ def create_computation_hosted_constraint(computation_name: str,
     :return: a constraint object
     """
 
-    def hosted(**kwargs):
-        # kwargs will be a map {bin_var_name -> value} giving the binary
-        # value for each of the n candidate agent the computation could be
-        # hosted on
-        s = sum([v for v in kwargs.values()])
-        return 0 if s == 1 else 10000
-
-    constraint = NAryFunctionRelation(
-        hosted, list(bin_vars.values()),
+    constraint = ExactlyKRelation(
+        list(bin_vars.values()), 1, 10000,
         name='{}_hosted'.format(computation_name))
 
     return constraint
@@ -95,22 +89,10 @@ def create_agent_capacity_constraint(agt_name: str, remaining_capacity,
     -------
     a Constraint object
     """
-    # Reversed lookup table: which (agt, computation) a variable is about:
-    var_lookup = {v.name: k for k, v in bin_vars.items()}
-
-    def capacity(**kwargs):
-        # kwargs will be a name {v_name : value}
-        # where v_name is x_{}_{}
-        orphaned_footprint = 0
-        for v_name in kwargs:
-            comp, _ = var_lookup[v_name]
-            orphaned_footprint += kwargs[v_name] * footprint_func(comp)
-
-        repair_capa = remaining_capacity - orphaned_footprint
-        return 0 if repair_capa >= 0 else 10000
-
-    constraint = NAryFunctionRelation(capacity, list(bin_vars.values()),
-                                      name=agt_name + '_capacity')
+    footprints = [footprint_func(comp) for comp, _ in bin_vars]
+    constraint = KnapsackThresholdRelation(
+        list(bin_vars.values()), footprints, remaining_capacity, 10000,
+        name=agt_name + '_capacity')
     return constraint
 
 
@@ -140,18 +122,9 @@ def create_agent_hosting_constraint(agt_name: str,
     a Constraint object
     """
 
-    # Reversed lookup table: which (agt, computation) a variable is about:
-    var_lookup = {v.name: k for k, v in bin_vars.items()}
-
-    def hosting_cost(**kwargs):
-        cost = 0
-        for v_name in kwargs:
-            comp, _ = var_lookup[v_name]
-            cost += kwargs[v_name] * hosting_func(comp)
-        return cost
-
-    constraint = NAryFunctionRelation(hosting_cost, list(bin_vars.values()),
-                                      name=agt_name + '_hosting')
+    costs = [hosting_func(comp) for comp, _ in bin_vars]
+    constraint = LinearSumRelation(list(bin_vars.values()), costs,
+                                   name=agt_name + '_hosting')
     return constraint
 
 
@@ -46,6 +46,7 @@ from pydcop.infrastructure.computations import MessagePassingComputation, \
 from pydcop.infrastructure.discovery import Discovery, Address
 from pydcop.replication.path_utils import Node, Path, PathsTable, \
     cheapest_path_to, affordable_path_from, filter_missing_agents_paths
+from pydcop.utils.simple_repr import SimpleRepr
 
 """
 UCS-based algorithm for replica distribution
@@ -105,10 +106,105 @@ AgentName = Node
 MSG_REPLICATION = 18
 
 
+class ReplicationBatch(SimpleRepr):
+    """
+    A set of computations, owned by the same agent, replicated together.
+
+    Instead of running one search, and one stream of messages, for each
+    computation, the computations of a batch are replicated by a single
+    search: each request carries the whole batch and each host accepts the
+    subset of the batch that fits in its capacity.
+
+    Parameters
+    ----------
+    computation_defs: list of ComputationDef
+        the definitions of the computations to replicate
+    footprints: list of float
+        the footprint of each computation
+    replica_counts: list of int
+        the number of replicas still to be placed for each computation
+    hosts: list of list of agent names
+        for each computation, the agents that accepted a replica during this
+        replication.
+    """
+
+    def __init__(self, computation_defs: List[ComputationDef],
+                 footprints: List[float],
+                 replica_counts: List[int],
+                 hosts: List[List[AgentName]]=None):
+        self._computation_defs = list(computation_defs)
+        self._footprints = list(footprints)
+        self._replica_counts = list(replica_counts)
+        if hosts is None:
+            hosts = [[] for _ in self._computation_defs]
+        self._hosts = [list(h) for h in hosts]
+
+    @property
+    def computation_defs(self) -> List[ComputationDef]:
+        return self._computation_defs
+
+    @property
+    def footprints(self) -> List[float]:
+        return self._footprints
+
+    @property
+    def replica_counts(self) -> List[int]:
+        return self._replica_counts
+
+    @property
+    def hosts(self) -> List[List[AgentName]]:
+        return self._hosts
+
+    @property
+    def names(self) -> List[ComputationName]:
+        return [c.name for c in self._computation_defs]
+
+    @property
+    def key(self) -> Tuple[ComputationName, ...]:
+        return tuple(self.names)
+
+    @property
+    def done(self) -> bool:
+        return all(count <= 0 for count in self._replica_counts)
+
+    def pending(self) -> List[int]:
+        """
+        Indexes of the computations that still need replicas.
+        """
+        return [i for i, count in enumerate(self._replica_counts)
+                if count > 0]
+
+    def accept(self, index: int, agent: AgentName):
+        """
+        Record that `agent` accepted a replica of the computation at `index`.
+        """
+        self._hosts[index].append(agent)
+        self._replica_counts[index] -= 1
+
+    def copy(self) -> 'ReplicationBatch':
+        return ReplicationBatch(self._computation_defs, self._footprints,
+                                self._replica_counts, self._hosts)
+
+    def __str__(self):
+        return 'ReplicationBatch({})'.format(
+            dict(zip(self.names, self._replica_counts)))
+
+    def __repr__(self):
+        return 'ReplicationBatch({}, {}, {})'.format(
+            self.names, self._replica_counts, self._hosts)
+
+    def __eq__(self, other):
+        if type(other) != ReplicationBatch:
+            return False
+        return self.names == other.names \
+            and self._replica_counts == other.replica_counts \
+            and self._hosts == other.hosts
+
+
 class UCSReplicateMessage(Message):
     """
     This message is sent by an agent to it's neighbors to asks them to host
-    replicas
+    replicas for a batch of computations.
     """
 
     def __init__(self, rep_msg_type: str,
@@ -116,10 +212,7 @@ class UCSReplicateMessage(Message):
                  rq_path: Path,
                  paths: PathsTable,
                  visited: List[AgentName],
-                 computation_def: ComputationDef,
-                 footprint: float,
-                 replica_count: int,
-                 hosts: List[str],
+                 batch: ReplicationBatch,
                  ):
         super().__init__('ucs_replicate', None)
         # to to float computations, cannot check for strict >= 0
@@ -127,14 +220,11 @@ class UCSReplicateMessage(Message):
         assert spent >= -0.01
         self._rep_msg_type = rep_msg_type
         self._rq_path = rq_path
-        self._computation_def = computation_def
-        self._footprint = footprint
         self._budget = budget
         self._spent = spent
-        self._replica_count = replica_count
         self._paths = paths
         self._visited = visited
-        self._hosts = hosts
+        self._batch = batch
 
     @property
     def rep_msg_type(self):
@@ -144,14 +234,6 @@ class UCSReplicateMessage(Message):
     def rq_path(self) -> Path:
         return self._rq_path
 
-    @property
-    def computation_def(self) -> ComputationDef:
-        return self._computation_def
-
-    @property
-    def footprint(self) -> float:
-        return self._footprint
-
     @property
     def budget(self) -> float:
         return self._budget
@@ -160,10 +242,6 @@ class UCSReplicateMessage(Message):
     def spent(self) -> float:
         return self._spent
 
-    @property
-    def replica_count(self) -> int:
-        return self._replica_count
-
     @property
     def paths(self) -> PathsTable:
         return self._paths
@@ -173,24 +251,21 @@ class UCSReplicateMessage(Message):
         return self._visited
 
     @property
-    def hosts(self) -> List[AgentName]:
-        return self._hosts
+    def batch(self) -> ReplicationBatch:
+        return self._batch
 
     def __str__(self):
-        return 'UCSReplicateMessage({}, {}, {}, {}, {})'.format(
-            self.computation_def.name, self.budget, self.spent,
-            self.replica_count, self.rq_path)
+        return 'UCSReplicateMessage({}, {}, {}, {})'.format(
+            self.batch, self.budget, self.spent, self.rq_path)
 
     def __repr__(self):
-        return 'UCSReplicateMessage({}, {}, {}, {}, {})'.format(
-            self.computation_def.name, self.budget, self.spent,
-            self.replica_count, self.rq_path)
+        return 'UCSReplicateMessage({}, {}, {}, {})'.format(
+            self.batch, self.budget, self.spent, self.rq_path)
 
     def __eq__(self, other):
         if type(other) != UCSReplicateMessage:
-            return True
-        if self.computation_def == other.computation_def and self.budget == \
-                other.budget and self.hosts == other.hosts:
+            return False
+        if self.batch == other.batch and self.budget == other.budget:
             return True
         return False
 
@@ -390,6 +465,10 @@ class UCSReplication(MessagePassingComputation):
         """
         Launch replication process for the computation(s) passed as argument.
 
+        All computations are replicated together, as a single batch: the
+        replication requests carry all computations and hosts accept the
+        replicas that fit in their capacity.
+
         Parameters
         ----------
         k_target: int
@@ -406,10 +485,6 @@ class UCSReplication(MessagePassingComputation):
             self.logger.info('Request for replications of all computations %s -'
                              ' %s', computations, k_target)
             computations = [c for c in self.computations]
-        elif not computations:
-            self.logger.info('No computation to replicate for %s ', self.name)
-            self.replication_done(dict(deepcopy(self._replica_hosts)))
-            return
         elif type(computations) == ComputationName:
             if computations not in self.computations:
                 msg = 'Requesting replication of unknown computation {}' \
@@ -425,6 +500,11 @@ class UCSReplication(MessagePassingComputation):
                 self.logger.error(msg)
                 raise ValueError(msg)
 
+        if not computations:
+            self.logger.info('No computation to replicate for %s ', self.name)
+            self.replication_done(dict(deepcopy(self._replica_hosts)))
+            return
+
         self._replication_in_progress.add(computations)
         neighbors = self.replication_neighbors()
         if not neighbors:
@@ -436,16 +516,19 @@ class UCSReplication(MessagePassingComputation):
         self.logger.info('Starting replications of computations %s on '
                          'neighbors %s - %s', computations, neighbors, k_target)
 
-        for c in computations:
-            # initialize paths with our neighbors and their costs
-            paths = {Path(self.agt_name, n): self.route(n)
-                     for n in neighbors}
-            budget = min(c for c in paths.values())
-            visited = [self.agt_name]
-            comp_def, footprint = self.computations[c]
-            self.on_replicate_request(
-                budget, 0, Path(self.agt_name), paths, visited,
-                comp_def, footprint, replica_count=k_target, hosts=[])
+        # All computations are replicated with a single search, whose
+        # requests carry the whole batch.
+        comp_defs, footprints = zip(*(self.computations[c]
+                                      for c in computations))
+        batch = ReplicationBatch(comp_defs, footprints,
+                                 [k_target] * len(computations))
+        # initialize paths with our neighbors and their costs
+        paths = PathsTable({Path(self.agt_name, n): self.route(n)
+                            for n in neighbors})
+        budget = min(c for c in paths.values())
+        visited = [self.agt_name]
+        self.on_replicate_request(budget, 0, Path(self.agt_name), paths,
+                                  visited, batch)
 
     def on_start(self):
         # Register to all agents event, in order to use them for distribution
@@ -465,7 +548,7 @@ class UCSReplication(MessagePassingComputation):
                           _: float):
         """
         This method is called when receiving a request from another agent to
-        host a replica.
+        host replicas.
 
         Parameters
         ----------
@@ -482,39 +565,36 @@ class UCSReplication(MessagePassingComputation):
                               sender_name, msg)
             self.on_replicate_request(msg.budget, msg.spent,
                                       msg.rq_path, msg.paths, msg.visited,
-                                      msg.computation_def, msg.footprint,
-                                      msg.replica_count, msg.hosts)
+                                      msg.batch)
         elif msg.rep_msg_type == 'replicate_answer':
             self.logger.debug('Received replication answer from %s, %s',
                               sender_name, msg)
             agent = msg.rq_path.last()
             pending = self._pending_requests.pop(
-                (agent, msg.computation_def.name), False)
+                (agent, msg.batch.key), False)
             if not pending:
                 # If not in pending request : error !
                 self.logger.error('Unexpected answer %s - %s  not in %s',
-                                  (agent, msg.computation_def.name), msg,
+                                  (agent, msg.batch.key), msg,
                                   list(self._pending_requests.keys()))
 
             self.on_replicate_answer(msg.budget, msg.spent,
                                      msg.rq_path, msg.paths, msg.visited,
-                                     msg.computation_def, msg.footprint,
-                                     msg.replica_count, msg.hosts)
+                                     msg.batch)
         else:
             raise ValueError('Invalid message type ' + str(msg.rep_msg_type))
 
     def on_replicate_request(self, budget: float, spent: float,
                              rq_path: Path, paths: PathsTable,
                              visited: List[AgentName],
-                             comp_def: ComputationDef, footprint: float,
-                             replica_count: int, hosts: List[str]):
+                             batch: ReplicationBatch):
         assert self.agt_name == rq_path.last()
 
         if rq_path in paths:
             paths.pop(rq_path)
         if self.agt_name not in visited:  # first visit for this node
             visited.append(self.agt_name)
-            self._add_hosting_path(spent, comp_def.name, rq_path, paths)
+            self._add_hosting_path(spent, batch, rq_path, paths)
 
         neighbors = self.replication_neighbors()
 
@@ -532,14 +612,12 @@ class UCSReplication(MessagePassingComputation):
         target_paths = (rq_path + Path(p.head()) for _, p in affordable_paths)
 
         for target_path in target_paths:
-            forwarded, replica_count = \
-                self._visit_path(budget, spent, target_path, paths, visited,
-                                 comp_def, footprint, replica_count, hosts)
-            if forwarded:
+            if self._visit_path(budget, spent, target_path, paths, visited,
+                                batch):
                 return
 
         self.logger.info('No reachable path for %s with budget %s ',
-                         comp_def.name, budget)
+                         batch.names, budget)
 
         # Either:
         #  * No path : Not on a already known path
@@ -561,15 +639,12 @@ class UCSReplication(MessagePassingComputation):
                 #                   cheapest_path, cheapest)
                 pass
 
-        self._send_answer(budget, spent, rq_path, paths, visited,
-                          comp_def, footprint, replica_count,
-                          hosts)
+        self._send_answer(budget, spent, rq_path, paths, visited, batch)
 
     def on_replicate_answer(self, budget: float, spent: float,
                             rq_path: Path, paths: PathsTable,
                             visited: List[AgentName],
-                            comp_def: ComputationDef, footprint: float,
-                            replica_count: int, hosts: List[str]):
+                            batch: ReplicationBatch):
         *_, current, sender = rq_path
         initial_path = rq_path[:-1]
 
@@ -578,17 +653,16 @@ class UCSReplication(MessagePassingComputation):
 
         # If all replica have been placed, report back to requester if any, or
         # signal that replication is done.
-        if replica_count == 0:
+        if batch.done:
             if len(rq_path) >= 3:
                 self.logger.debug(
                     'All replica placed for %s, report back to requester',
-                    comp_def.name)
+                    batch.names)
                 self._send_answer(budget, spent, initial_path, paths,
-                                  visited, comp_def, footprint,
-                                  replica_count, hosts)
+                                  visited, batch)
                 return
             else:
-                self.computation_replicated(comp_def.name, hosts)
+                self._batch_replicated(batch)
                 return
 
         # If there are still replica to be placed, keep trying on neighbors
@@ -601,38 +675,34 @@ class UCSReplication(MessagePassingComputation):
                         if back_path + Path(p.head()) != rq_path)
 
         for target_path in target_paths:
-            forwarded, replica_count = \
-                self._visit_path(budget, spent, target_path, paths, visited,
-                                 comp_def, footprint, replica_count, hosts)
-            if forwarded:
+            if self._visit_path(budget, spent, target_path, paths, visited,
+                                batch):
                 return
 
         # Could not send to any neighbor: get back to requester
         if len(rq_path) >= 3:
             self._send_answer(budget, spent, initial_path, paths, visited,
-                              comp_def, footprint, replica_count, hosts)
+                              batch)
             return
 
         # no reachable candidate path and no ancestor to go back,
         # we are back at the start node: increase the budget
         if not paths:
             # Cannot increase budget, replica distribution is finished for
-            # this computation, even if we have not reached target resiliency
+            # this batch, even if we have not reached target resiliency
             # level. Report the final replica distribution to the orchestrator.
-            self.computation_replicated(comp_def.name, hosts)
+            self._batch_replicated(batch)
         else:
             budget = min(c for p, c in paths.items() if p != rq_path)
-            self.logger.info('Increase budget for computation %s : %s',
-                             comp_def.name, budget)
+            self.logger.info('Increase budget for computations %s : %s',
+                             batch.names, budget)
             self.on_replicate_request(budget, 0, Path(current),
-                                      paths, visited, comp_def, footprint,
-                                      replica_count, hosts)
+                                      paths, visited, batch)
 
     def _send_request(self, budget: float, spent: float,
                       rq_path: Path, paths: PathsTable,
                       visited: List[AgentName],
-                      comp_def: ComputationDef, footprint: float,
-                      replica_count: int, hosts: List[AgentName]):
+                      batch: ReplicationBatch):
         target_agt = rq_path.last()
         cost_to_next = self.route(target_agt)
         budget_to_next = budget - cost_to_next
@@ -640,27 +710,24 @@ class UCSReplication(MessagePassingComputation):
 
         self.logger.debug('sending replica request from  %s to %s for %s - %s ('
                           'budget = %s, cost to next %s)',
-                          self.name, target_agt, rq_path, comp_def.name,
+                          self.name, target_agt, rq_path, batch,
                           budget_to_next, cost_to_next)
         self.post_msg(
             replication_computation_name(target_agt),
             UCSReplicateMessage('replicate_request', budget_to_next,
                                 spent_to_next, rq_path, paths, visited,
-                                comp_def, footprint, replica_count, hosts),
+                                batch),
             MSG_REPLICATION
         )
 
         # All request must be answered, otherwise the replication is stuck.
         # Keep track of all request sent.
-        self._pending_requests[(target_agt, comp_def.name)] = \
-            (budget, spent, rq_path, paths.copy(), visited[:], comp_def,
-             footprint, replica_count, hosts[:])
+        self._pending_requests[(target_agt, batch.key)] = \
+            (budget, spent, rq_path, paths.copy(), visited[:], batch.copy())
 
     def _send_answer(self, budget: float, spent: float,
                      rq_path: Path, paths: PathsTable,
-                     visited: List[AgentName], comp_def: ComputationDef,
-                     footprint: float, replica_count: int,
-                     hosts: List[AgentName]):
+                     visited: List[AgentName], batch: ReplicationBatch):
         assert rq_path.last() == self.agt_name
         target_agt = rq_path.before_last()
         cost_to_target = self.route(target_agt)
@@ -668,13 +735,12 @@ class UCSReplication(MessagePassingComputation):
         spent -= cost_to_target
         self.logger.debug('sending replica answer from %s to %s for %s %s'
                           '( %s %s %s )',
-                          self.name, target_agt, rq_path, comp_def.name,
+                          self.name, target_agt, rq_path, batch,
                           budget, spent, cost_to_target)
         self.post_msg(
             replication_computation_name(target_agt),
             UCSReplicateMessage('replicate_answer', budget, spent,
-                                rq_path, paths, visited,
-                                comp_def, footprint, replica_count, hosts),
+                                rq_path, paths, visited, batch),
             MSG_REPLICATION
         )
 
@@ -743,27 +809,41 @@ class UCSReplication(MessagePassingComputation):
         self._hosted_replicas.pop(computation)
         self.discovery.unregister_replica(computation, self.agt_name)
 
-    def _add_hosting_path(self, spent: float, computation: ComputationName,
+    def _batch_replicated(self, batch: ReplicationBatch):
+        for computation, hosts in zip(batch.names, batch.hosts):
+            self.computation_replicated(computation, hosts)
+
+    def _hostable(self, batch: ReplicationBatch) -> List[int]:
+        # Indexes of the computations of the batch that still need replicas
+        # and could be hosted here.
+        return [i for i in batch.pending()
+                if batch.names[i] not in self.computations
+                and batch.names[i] not in self._hosted_replicas]
+
+    def _add_hosting_path(self, spent: float, batch: ReplicationBatch,
                           rq_path: Path, paths: PathsTable):
-        if computation not in self.computations:
+        hosting_costs = [self.agent_def.hosting_cost(batch.names[i])
+                         for i in self._hostable(batch)]
+        if hosting_costs:
             # Add a path to a virtual node with a route corresponding to the
-            # hosting cost
+            # hosting cost. With several computations, we use the cheapest
+            # hosting cost: computations with a higher hosting cost are only
+            # accepted when the budget is high enough, see _visit_path.
             hosting_path = rq_path + Path('__hosting__')
-            hosting_cost = spent + self.agent_def.hosting_cost(computation)
+            hosting_cost = spent + min(hosting_costs)
             self.logger.debug('Add path to host %s on local hosting node %s '
-                              'with cost %s ', computation,
+                              'with cost %s ', batch.names,
                               hosting_path, hosting_cost,)
             paths[hosting_path] = hosting_cost
 
     def _visit_path(self, budget: float, spent: float,
                     target_path: Path, paths: PathsTable,
                     visited: List[AgentName],
-                    comp_def: ComputationDef, footprint: float,
-                    replica_count: int, hosts: List[str]):
+                    batch: ReplicationBatch) -> bool:
         """
         Visit a path in the replication graph.
 
-        Visiting can means attempting to host a replica, if we are on a
+        Visiting can means attempting to host replicas, if we are on a
         __hosting__ node, or forwarding to another agent or answering the
         requester.
 
@@ -774,44 +854,50 @@ class UCSReplication(MessagePassingComputation):
         target_path
         paths
         visited
-        comp_def
-        footprint
-        replica_count
-        hosts
+        batch
 
         Returns
         -------
         forwarded: boolean
             a boolean indicating if the request has been answered or
             forwarded to another agent.
-        replica_count: int
-            the updated replica count.
         """
         if target_path.last() == '__hosting__':
             # We are actually 'visiting' the '__hosting__' virtual node
             # so we must remove it form the paths.
             paths.pop(target_path)
-            if self._can_host(target_path.head(), comp_def.name, footprint):
-                self._accept_replica(target_path.head(), comp_def, footprint)
-                hosts.append(self.agent_def.name)
-                replica_count -= 1
-                if replica_count == 0:
-                    self.logger.info(
-                        'Target resiliency reached for %s, report back to '
-                        'requester , hosts : %s', comp_def.name, hosts)
-                    self._send_answer(budget, spent, target_path[:-1], paths,
-                                      visited, comp_def, footprint,
-                                      replica_count, hosts)
-                    return True, replica_count
-                return False, replica_count
+            origin_agt = target_path.head()
+            deferred = []
+            for i in self._hostable(batch):
+                computation = batch.names[i]
+                hosting_cost = self.agent_def.hosting_cost(computation)
+                if round(hosting_cost - budget, 4) > 0.0001:
+                    # Not affordable yet for this computation, the hosting
+                    # node will be visited again with a higher budget.
+                    deferred.append(hosting_cost)
+                elif self._can_host(origin_agt, computation,
+                                    batch.footprints[i]):
+                    self._accept_replica(origin_agt, batch.computation_defs[i],
+                                         batch.footprints[i])
+                    batch.accept(i, self.agent_def.name)
+            if deferred:
+                paths[target_path] = spent + min(deferred)
+
+            if batch.done:
+                self.logger.info(
+                    'Target resiliency reached for %s, report back to '
+                    'requester , hosts : %s', batch.names, batch.hosts)
+                self._send_answer(budget, spent, target_path[:-1], paths,
+                                  visited, batch)
+                return True
             # If the cheapest path was __hosting__, we can still try
             # to visit the next path (as we known __hosting__ never
             # have any other neighbor) => consider the request as not forwarded
-            return False, replica_count
+            return False
 
         self._send_request(budget, spent, target_path, paths, visited,
-                           comp_def, footprint, replica_count, hosts)
-        return True, replica_count
+                           batch)
+        return True
 
     def _replicate_on_agent_lost(self, agent: AgentName):
         """
@@ -834,6 +920,9 @@ class UCSReplication(MessagePassingComputation):
                              'host %s - %s ', agent, removed_replicas,
                              dict(self._replica_hosts))
 
+            # Computations missing the same number of replicas are
+            # re-replicated in a single batch.
+            batches = defaultdict(list)
             for removed_replica in removed_replicas:
                 missing_replica = self.k_target - \
                                   len(self._replica_hosts[removed_replica])
@@ -847,7 +936,9 @@ class UCSReplication(MessagePassingComputation):
                         'replicas: %s',
                         removed_replica, self._replica_hosts[removed_replica])
                 else:
-                    self.replicate(missing_replica, removed_replica)
+                    batches[missing_replica].append(removed_replica)
+            for missing_replica, batch in batches.items():
+                self.replicate(missing_replica, batch)
 
     def _answer_lost_requests(self, agent: AgentName):
         lost_rqs = [(rq_agt, rq_comp)
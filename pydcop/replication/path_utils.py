@@ -29,10 +29,17 @@
 # POSSIBILITY OF SUCH DAMAGE.
 
 
+import heapq
+from collections.abc import Mapping, MutableMapping
 from typing import Iterable, Optional, Dict, Tuple, List, Sized, Union
 
+from pydcop.utils.simple_repr import SimpleRepr
+
 Node = str
 
+# Key marking the end of a path in the trie of a PathsTable.
+_END = None
+
 
 class Path(Sized, Iterable, object):
     """
@@ -151,39 +158,185 @@ class Path(Sized, Iterable, object):
     def __hash__(self):
         return hash(self._path)
 
+    def _simple_repr(self):
+        return {'__module__': self.__module__,
+                '__qualname__': self.__class__.__qualname__,
+                'nodes': list(self._path)}
 
-PathsTable = Dict[Path, float]
+    @classmethod
+    def _from_repr(cls, r):
+        return cls(r['nodes'])
 
-# TODO : replace Pathstable with specific class
-#
-# class PathsTable_draft(object):
-#
-#     def __init__(self):
-#         self._paths = {}  # type: Dict[Path, float]
-#
-#     def filter_invalid(self, agents):
-#         self._paths = filter_missing_agents_paths()
-#         pass
-#
-#     def remove(self, path: ReplicationPath_draft) -> Boolean:
-#         try:
-#             self._paths.pop(path)
-#             return True
-#         except KeyError:
-#             return False
-#
-#     def add(self, path: ReplicationPath_draft, cost: float):
-#         pass
-#
-#     def cheapest_path_to(self, target: ReplicationComputationName) \
-#             -> Tuple(float, ReplicationPath_draft):
-#         pass
-#
 
-#
-#     def path_starting_with(self, prefix: ReplicationPath_draft,
-#                        paths: 'PathsTable_draft') -> 'PathsTable_draft':
-#         pass
+class PathsTable(MutableMapping, SimpleRepr):
+    """
+    Table of known paths, with their costs.
+
+    A PathsTable behaves like a dict { Path -> cost }, but also indexes its
+    paths:
+
+    * in a prefix trie over the nodes of the paths, to find all paths
+      starting with a given prefix without scanning the whole table,
+    * in a min-heap of costs for each last node, to find the cheapest path
+      ending at a node in O(log n). Entries for removed or updated paths are
+      discarded lazily from these heaps.
+
+    Paths are iterated in insertion order, like a dict, and this order is
+    used to break ties between paths with the same cost.
+
+    The simple representation of a table, used when sending it in a
+    message, is front-coded: paths are listed in trie order and each path is
+    only given as the number of nodes it shares with the previous path and
+    its remaining nodes.
+
+    Parameters
+    ----------
+    paths: dict or PathsTable
+        optional initial paths, with their costs.
+    """
+
+    def __init__(self, paths: Mapping=None) -> None:
+        self._costs = {}  # type: Dict[Path, float]
+        self._seqs = {}  # type: Dict[Path, int]
+        self._seq = 0
+        # Trie nodes are dicts { Node -> child trie node }, the _END key
+        # holds the path ending at this trie node, if any.
+        self._trie = {}  # type: Dict
+        self._by_last = {}  # type: Dict[Node, List[Tuple[float, int, Path]]]
+        if paths:
+            for path, cost in paths.items():
+                self[path] = cost
+
+    def __getitem__(self, path: Path) -> float:
+        return self._costs[path]
+
+    def __setitem__(self, path: Path, cost: float):
+        if path not in self._costs:
+            self._seqs[path] = self._seq
+            self._seq += 1
+            trie_node = self._trie
+            for node in path:
+                trie_node = trie_node.setdefault(node, {})
+            trie_node[_END] = path
+        elif self._costs[path] == cost:
+            return
+        self._costs[path] = cost
+        heapq.heappush(self._by_last.setdefault(path.last(), []),
+                       (cost, self._seqs[path], path))
+
+    def __delitem__(self, path: Path):
+        del self._costs[path]
+        del self._seqs[path]
+        trie_nodes = [self._trie]
+        for node in path:
+            trie_nodes.append(trie_nodes[-1][node])
+        del trie_nodes[-1][_END]
+        # Prune the branches that do not lead to any path any more.
+        for node, parent in zip(reversed(list(path)),
+                                reversed(trie_nodes[:-1])):
+            if parent[node]:
+                break
+            del parent[node]
+
+    def __iter__(self):
+        return iter(self._costs)
+
+    def __len__(self):
+        return len(self._costs)
+
+    def __contains__(self, path):
+        return path in self._costs
+
+    def __repr__(self):
+        return 'PathsTable({})'.format(self._costs)
+
+    def copy(self) -> 'PathsTable':
+        return PathsTable(self)
+
+    def cheapest_path_to(self, target: Node) -> Tuple[float, Path]:
+        """
+        Cheapest path ending at `target`, see `cheapest_path_to`.
+        """
+        heap = self._by_last.get(target)
+        while heap:
+            cost, seq, path = heap[0]
+            if self._seqs.get(path) == seq and self._costs[path] == cost:
+                return cost, path
+            heapq.heappop(heap)
+        return float('inf'), Path()
+
+    def paths_starting_with(self, prefix: Path) -> List[Tuple[float, Path]]:
+        """
+        Paths starting with `prefix`, see `path_starting_with`.
+        """
+        trie_node = self._trie
+        for node in prefix:
+            try:
+                trie_node = trie_node[node]
+            except KeyError:
+                return []
+        found = []
+        prefix_len = len(prefix)
+        for path in self._walk(trie_node):
+            found.append((self._costs[path], self._seqs[path],
+                          path[prefix_len:]))
+        found.sort(key=lambda x: (x[0], x[1]))
+        return [(cost, tail) for cost, _, tail in found]
+
+    def filtered(self, available: Iterable[Node]) -> 'PathsTable':
+        """
+        New table with only the paths whose nodes are all in `available`.
+        """
+        available = set(available)
+        kept = []
+        stack = [self._trie]
+        while stack:
+            trie_node = stack.pop()
+            for node, child in trie_node.items():
+                if node is _END:
+                    kept.append(child)
+                elif node in available:
+                    stack.append(child)
+        kept.sort(key=self._seqs.__getitem__)
+        table = PathsTable()
+        for path in kept:
+            table[path] = self._costs[path]
+        return table
+
+    def _walk(self, trie_node):
+        # Depth-first walk over the paths of a sub-trie, in trie order.
+        stack = [trie_node]
+        while stack:
+            trie_node = stack.pop()
+            if _END in trie_node:
+                yield trie_node[_END]
+            stack.extend(reversed([child for node, child in trie_node.items()
+                                   if node is not _END]))
+
+    def _simple_repr(self):
+        encoded = []
+        previous = ()
+        for path in self._walk(self._trie):
+            nodes = tuple(path)
+            shared = 0
+            for a, b in zip(previous, nodes):
+                if a != b:
+                    break
+                shared += 1
+            encoded.append([shared, list(nodes[shared:]), self._costs[path]])
+            previous = nodes
+        return {'__module__': self.__module__,
+                '__qualname__': self.__class__.__qualname__,
+                'paths': encoded}
+
+    @classmethod
+    def _from_repr(cls, r):
+        table = cls()
+        previous = ()
+        for shared, nodes, cost in r['paths']:
+            previous = previous[:shared] + tuple(nodes)
+            table[Path(previous)] = cost
+        return table
 
 
 def cheapest_path_to(target: Node,
@@ -196,8 +349,8 @@ def cheapest_path_to(target: Node,
     ----------
     target: Node
         The end node to look for
-    paths: dict of path, float
-        A dict of known paths with their costs
+    paths: PathsTable or dict of path, float
+        Known paths with their costs
 
     Returns
     -------
@@ -208,11 +361,7 @@ def cheapest_path_to(target: Node,
 
     :return:
     """
-    c = float('inf')
-    for p in paths:
-        if p.last() == target:
-            return paths[p], p
-    return c, Path()
+    return _as_table(paths).cheapest_path_to(target)
 
 
 def path_starting_with(prefix: Path,
@@ -226,18 +375,15 @@ def path_starting_with(prefix: Path,
     ----------
     prefix: Path
         path prefix to look for
-    paths: PathsTable (dict of Path float)
-        a dict of known paths with their costs
+    paths: PathsTable or dict of Path, float
+        known paths with their costs
 
     Returns
     -------
     List[Tuple[float, Path]]
         a list of tuple (cost, path_without_prefix)
     """
-    found = filter(lambda x: x[1] is not None,
-                   ((cost, path.tail_if_start_with(prefix))
-                    for path, cost in paths.items()))
-    return sorted(found, key=lambda x: x[0])
+    return _as_table(paths).paths_starting_with(prefix)
 
 
 def affordable_path_from(prefix: Path, max_path_cost: float,
@@ -271,11 +417,11 @@ def filter_missing_agents_paths(
     # include the local virtual node in the list of available path : it is
     # not the name of a replication computation but be definitively want to
     # keep it as it is the only node that accepts replicas:
-    replication_computations = list(replication_computations) + ['__hosting__']
-    filtered = {}
-    for path, cost in paths.items():
-        missing = [elt for elt in path if elt not in replication_computations]
-        if missing:
-            continue
-        filtered[path] = cost
-    return filtered
+    replication_computations = set(replication_computations) | {'__hosting__'}
+    return _as_table(paths).filtered(replication_computations)
+
+
+def _as_table(paths: Mapping) -> PathsTable:
+    if isinstance(paths, PathsTable):
+        return paths
+    return PathsTable(paths)
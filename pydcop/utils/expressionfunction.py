@@ -29,10 +29,13 @@
 # POSSIBILITY OF SUCH DAMAGE.
 
 
+import builtins
 from typing import List
 from collections.abc import Callable
 from pydcop.utils.simple_repr import SimpleRepr, simple_repr, from_repr
 
+_BUILTINS = frozenset(dir(builtins))
+
 
 class ExpressionFunction(Callable, SimpleRepr):
     """
@@ -82,9 +85,7 @@ class ExpressionFunction(Callable, SimpleRepr):
 
         # We want to allow using builtin function like abs, round, etc.
         # We must filter them out from the list of variables
-        import sys
-        builtins = dir(sys.modules["builtins"])
-        self._vars = [v for v in f_vars if v not in builtins]
+        self._vars = [v for v in f_vars if v not in _BUILTINS]
 
     @property
     def expression(self):
@@ -146,6 +146,53 @@ class GraphColoring1(unittest.TestCase):
                                 'constraints_hypergraph', algo='dsa')
         # lame: we do not check the result, we just ensure we do not crash
 
+    def test_partition_factorgraph(self):
+        result = run_distribute('graph_coloring1.yaml', 'partition',
+                                'factor_graph', algo='maxsum')
+        dist = result['distribution']
+
+        self.assertTrue(is_hosted(dist, 'v1'))
+        self.assertTrue(is_hosted(dist, 'v2'))
+        self.assertTrue(is_hosted(dist, 'v3'))
+        self.assertIsNotNone(result['cost'])
+
+    def test_portfolio(self):
+        result = run_distribute('graph_coloring1.yaml', 'portfolio',
+                                'factor_graph', algo='maxsum',
+                                params=['methods:heur_comhost,partition',
+                                        'time_budget:20'])
+        dist = result['distribution']
+
+        self.assertTrue(is_hosted(dist, 'v1'))
+        self.assertTrue(is_hosted(dist, 'v2'))
+        self.assertTrue(is_hosted(dist, 'v3'))
+        portfolio = result['portfolio']
+        self.assertIn(portfolio['best'], ['heur_comhost', 'partition'])
+        self.assertEqual(set(portfolio['methods']),
+                         {'heur_comhost', 'partition'})
+
+    def test_ilp_compref_dist_params(self):
+        result = run_distribute('graph_coloring1.yaml', 'ilp_compref',
+                                'constraints_hypergraph', algo='dsa',
+                                params=['solver:cbc', 'time_limit:5',
+                                        'warm_start:0'])
+        dist = result['distribution']
+
+        self.assertTrue(is_hosted(dist, 'v1'))
+        self.assertTrue(is_hosted(dist, 'v2'))
+        self.assertTrue(is_hosted(dist, 'v3'))
+
+    def test_ilp_compref_invalid_dist_params(self):
+        self.assertRaises(CalledProcessError, run_distribute,
+                          'graph_coloring1.yaml', 'ilp_compref',
+                          'constraints_hypergraph', algo='dsa',
+                          params=['solver:foo'])
+
+    def test_dist_params_not_supported(self):
+        self.assertRaises(CalledProcessError, run_distribute,
+                          'graph_coloring1.yaml', 'oneagent',
+                          'constraints_hypergraph', params=['foo:bar'])
+
 
 class DistAlgoOpionCompatibility(unittest.TestCase):
 
@@ -169,17 +216,20 @@ def is_hosted(mapping, computation: str):
     return False
 
 
-def run_distribute(filename, distribution, graph=None, algo=None):
+def run_distribute(filename, distribution, graph=None, algo=None,
+                   params=None):
     """
     Run the distribute cli command with the given parameters
     """
     filename = instance_path(filename)
     algo_opt = '' if algo is None else '-a ' + algo
     graph_opt = '' if graph is None else '-g ' + graph
+    params_opt = '' if params is None else '-p ' + ' '.join(params)
     cmd = 'dcop.py distribute -d {distribution} {graph_opt} ' \
-          '{algo_opt} {file}'.format(distribution=distribution,
-                                     graph_opt=graph_opt,
-                                     algo_opt=algo_opt,
-                                     file=filename)
+          '{algo_opt} {file} {params_opt}'.format(distribution=distribution,
+                                                  graph_opt=graph_opt,
+                                                  algo_opt=algo_opt,
+                                                  params_opt=params_opt,
+                                                  file=filename)
     output = check_output(cmd, stderr=STDOUT, timeout=10, shell=True)
     return yaml.load(output.decode(encoding='utf-8'))
@@ -0,0 +1,103 @@
+# BSD-3-Clause License
+#
+# Copyright 2017 Orange
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+
+
+import os
+import tempfile
+import unittest
+from subprocess import check_output, STDOUT
+
+from pydcop.dcop.yamldcop import load_dcop, load_dcop_from_file
+
+
+class GraphColoring(unittest.TestCase):
+
+    def test_generate_yaml(self):
+        output = run_generate('graph_coloring -n 20 -c 3 -d 0.3 '
+                              '--capacity 50')
+        dcop = load_dcop(output)
+
+        self.assertEqual(len(dcop.variables), 20)
+        self.assertEqual(len(dcop.agents), 20)
+        self.assertEqual(dcop.agent('a0').capacity, 50)
+        for c in dcop.constraints.values():
+            self.assertEqual(len(c.dimensions), 2)
+
+    def test_generate_binary(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'dcop')
+            run_generate('graph_coloring -n 20 -c 3 -d 0.3',
+                         output=path, dcop_format='binary')
+            dcop = load_dcop_from_file([path])
+
+        self.assertEqual(len(dcop.variables), 20)
+
+
+class MixedProblem(unittest.TestCase):
+
+    def test_generate_nary(self):
+        output = run_generate('mixed_problem -v 20 -c 10 -H 0.3 -r 3 '
+                              '-d 0.5 -A 3')
+        dcop = load_dcop(output)
+
+        self.assertEqual(len(dcop.variables), 20)
+        self.assertEqual(len(dcop.constraints), 10)
+        for c in dcop.constraints.values():
+            self.assertLessEqual(len(c.dimensions), 3)
+        used = {v.name for c in dcop.constraints.values()
+                for v in c.dimensions}
+        self.assertEqual(used, set(dcop.variables))
+
+
+class SmallWorld(unittest.TestCase):
+
+    def test_generate_binary(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'dcop')
+            run_generate('small_world -n 50 -d 3 -r 5',
+                         output=path, dcop_format='binary')
+            dcop = load_dcop_from_file([path])
+
+            self.assertEqual(len(dcop.variables), 50)
+            for c in dcop.constraints.values():
+                self.assertEqual(c._m.shape, (3, 3))
+
+
+def run_generate(problem, output=None, dcop_format='yaml'):
+    """
+    Run the generate cli command with the given parameters
+    """
+    output_opt = '' if output is None else '--output ' + output
+    cmd = 'dcop.py {output_opt} generate -f {dcop_format} {problem}'\
+        .format(output_opt=output_opt, dcop_format=dcop_format,
+                problem=problem)
+    output = check_output(cmd, stderr=STDOUT, timeout=30, shell=True)
+    return output.decode(encoding='utf-8')
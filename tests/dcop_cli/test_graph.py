@@ -46,6 +46,20 @@ class GraphColoring1(unittest.TestCase):
         self.assertEqual(result['edges_count'], 4)
         self.assertEqual(result['density'], 4/(3*2))
 
+    def test_pseudotree_heuristic(self):
+        result = run_graph('graph_coloring1.yaml', 'pseudotree',
+                           '--heuristic min_fill')
+
+        self.assertEqual(result['nodes_count'], 3)
+        self.assertEqual(result['induced_width'], 1)
+
+    def test_pseudotree_optimized(self):
+        result = run_graph('graph_coloring1.yaml', 'pseudotree',
+                           '--heuristic optimized --time_budget 0.2')
+
+        self.assertEqual(result['nodes_count'], 3)
+        self.assertEqual(result['induced_width'], 1)
+
     def test_factor_graph(self):
         result = run_graph('graph_coloring1.yaml', 'factor_graph')
 
@@ -87,9 +101,9 @@ class SecpSimple1(unittest.TestCase):
         self.assertEqual(result['density'], 1/3)
 
 
-def run_graph(filename, graph):
+def run_graph(filename, graph, options=''):
     filename = instance_path(filename)
-    cmd = 'dcop.py graph -g {graph} {file}'.format(graph=graph,
-                                                   file=filename)
+    cmd = 'dcop.py graph -g {graph} {options} {file}'.format(
+        graph=graph, options=options, file=filename)
     output = check_output(cmd, stderr=STDOUT, timeout=10, shell=True)
     return yaml.load(output.decode(encoding='utf-8'))
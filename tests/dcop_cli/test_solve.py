@@ -152,6 +152,17 @@ class GraphColoring1(unittest.TestCase):
                            'process')
         self.check_results(result)
 
+    def test_dpop_oneagent_min_fill(self):
+        result = run_solve('dpop', 'oneagent', 'graph_coloring1.yaml', 1,
+                           algo_params='pseudotree:min_fill')
+        self.check_results(result)
+
+    def test_dpop_oneagent_optimized(self):
+        result = run_solve('dpop', 'oneagent', 'graph_coloring1.yaml', 2,
+                           algo_params='pseudotree:optimized '
+                                       '-p time_budget:0.2')
+        self.check_results(result)
+
     def test_dpop_ilp_fgdp(self):
         # ILP-FGDP does not work for dpop, it should return an error
         self.assertRaises(CalledProcessError, run_solve,
@@ -0,0 +1,66 @@
+# BSD-3-Clause License
+#
+# Copyright 2017 Orange
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+
+"""
+Fixtures shared by unit tests.
+"""
+
+import pytest
+
+from pydcop.computations_graph.objects import ComputationGraph, \
+    ComputationNode
+
+
+def computations_chain(size: int) -> ComputationGraph:
+    """
+    A computation graph with a chain of `size` computations:
+    c1 - c2 - ... - cn.
+    """
+    names = ['c{}'.format(i) for i in range(1, size + 1)]
+    neighbors = {name: [] for name in names}
+    for n1, n2 in zip(names, names[1:]):
+        neighbors[n1].append(n2)
+        neighbors[n2].append(n1)
+    nodes = [ComputationNode(name, 'dummy_type', neighbors=neighbors[name])
+             for name in names]
+    return ComputationGraph(graph_type='test', nodes=nodes)
+
+
+@pytest.fixture
+def graph():
+    # chain c1 - c2 - c3
+    return computations_chain(3)
+
+
+@pytest.fixture
+def chain_graph():
+    """Factory for computation graphs made of a chain of computations."""
+    return computations_chain
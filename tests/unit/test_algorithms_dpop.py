@@ -36,6 +36,8 @@ import numpy as np
 import pytest
 
 from pydcop.algorithms import dpop
+from pydcop.algorithms.objects import AlgoDef
+from pydcop.computations_graph.pseudotree import OPTIMIZE_TIME_BUDGET
 from pydcop.algorithms.dpop import DpopMessage
 from pydcop.dcop.objects import Variable
 from pydcop.dcop.relations import NAryMatrixRelation, AsNAryFunctionRelation
@@ -49,6 +51,33 @@ def test_communicatino_load():
 def test_computation_memory():
     dpop.computation_memory()
 
+
+def test_algo_params_default_pseudotree():
+    params = dpop.algo_params({})
+    assert params['pseudotree'] == 'most_connected'
+
+
+def test_algo_params_pseudotree():
+    params = dpop.algo_params({'pseudotree': 'min_fill'})
+    assert dpop.graph_params(AlgoDef('dpop', **params)) == \
+        {'heuristic': 'min_fill', 'time_budget': OPTIMIZE_TIME_BUDGET}
+
+
+def test_algo_params_optimized_pseudotree():
+    params = dpop.algo_params({'pseudotree': 'optimized',
+                               'time_budget': '0.5'})
+    assert dpop.graph_params(AlgoDef('dpop', **params)) == \
+        {'heuristic': 'optimized', 'time_budget': 0.5}
+
+
+def test_algo_params_invalid():
+    with pytest.raises(ValueError):
+        dpop.algo_params({'pseudotree': 'foo'})
+    with pytest.raises(ValueError):
+        dpop.algo_params({'foo': 'bar'})
+    with pytest.raises(TypeError):
+        dpop.algo_params({'time_budget': 'foo'})
+
 class JoinRelationsTestCase(unittest.TestCase):
 
     def test_arity_bothsamevar(self):
@@ -391,6 +420,18 @@ class AlgoExampleTwoVarsTestcase(unittest.TestCase):
         self.a1._on_value_message(self.a0, msg, 0)
         self.assertEqual(self.a1.current_value, 'a')
 
+    def test_op_count_two_vars(self):
+
+        # the leaf joins r0_1 (4 entries) and projects the result (4 entries)
+        stats = self.a1.on_start()
+        self.assertEqual(stats['op_count'], 8)
+
+        # the root joins the util (2 entries) and selects its value (2)
+        u1_0 = NAryMatrixRelation([self.x0], np.array([2, 4]))
+        stats = self.a0._on_util_message(self.x1.name,
+                                         DpopMessage('UTIL', u1_0), 0)
+        self.assertEqual(stats['op_count'], 4)
+
 
 class AlgoExampleThreeVarsTestcase(unittest.TestCase):
     """
@@ -35,11 +35,14 @@ from unittest.mock import MagicMock
 
 from pydcop.algorithms.maxsum import approx_match, FactorAlgo, \
     computation_memory, VARIABLE_UNIT_SIZE, FACTOR_UNIT_SIZE, \
-    communication_load, HEADER_SIZE, UNIT_SIZE, MaxSumMessage
+    communication_load, HEADER_SIZE, UNIT_SIZE, MaxSumMessage, \
+    VariableAlgo, INFINITY
 from pydcop.computations_graph.factor_graph import VariableComputationNode, \
     FactorComputationNode, FactorGraphLink
-from pydcop.dcop.objects import Variable, VariableDomain
-from pydcop.dcop.relations import AsNAryFunctionRelation, relation_from_str
+from pydcop.dcop.objects import Variable, VariableDomain, BinaryVariable
+from pydcop.dcop.relations import AsNAryFunctionRelation, \
+    relation_from_str, NAryFunctionRelation, KnapsackThresholdRelation, \
+    ExactlyKRelation
 from pydcop.utils.simple_repr import simple_repr, from_repr
 
 
@@ -119,6 +122,97 @@ class MaxSumFactorAlgoTest(unittest.TestCase):
         self.assertEqual(costs[9], (9 - 4)/2)
         self.assertEqual(costs[2], 0)
 
+    def test_cost_for_binary_sum_factor_matches_enumeration(self):
+        variables = [BinaryVariable('x{}'.format(i)) for i in range(5)]
+        weights = [3, 1, 2, 2, 4]
+        knapsack = KnapsackThresholdRelation(variables, weights, 5, 1000,
+                                             name='capa')
+
+        def capa(**kwargs):
+            s = sum(w * kwargs[v.name] for v, w in zip(variables, weights))
+            return 0 if s <= 5 else 1000
+        enumerated = NAryFunctionRelation(capa, variables, name='capa')
+
+        fast = FactorAlgo(knapsack, comp_def=MagicMock())
+        slow = FactorAlgo(enumerated, comp_def=MagicMock())
+        received = {'x0': {0: 2, 1: -3}, 'x1': {1: 1}, 'x2': {0: 0, 1: -2},
+                    'x4': {0: 1, 1: -5}}
+        fast._costs = received
+        slow._costs = received
+
+        for v in variables:
+            self.assertEqual(fast._costs_for_var(v), slow._costs_for_var(v))
+
+    def test_cost_for_binary_sum_factor_with_infinite_costs(self):
+        variables = [BinaryVariable('x{}'.format(i)) for i in range(4)]
+        weights = [3, 1, 6, 2]
+        knapsack = KnapsackThresholdRelation(variables, weights, 5, INFINITY,
+                                             name='capa')
+
+        def capa(**kwargs):
+            s = sum(w * kwargs[v.name] for v, w in zip(variables, weights))
+            return 0 if s <= 5 else INFINITY
+        enumerated = NAryFunctionRelation(capa, variables, name='capa')
+
+        fast = FactorAlgo(knapsack, comp_def=MagicMock())
+        slow = FactorAlgo(enumerated, comp_def=MagicMock())
+        # Negative costs must not make infeasible assignments finite
+        received = {'x0': {0: 2, 1: -3}, 'x1': {1: 1}, 'x3': {0: 1, 1: -5}}
+        fast._costs = received
+        slow._costs = received
+
+        for v in variables:
+            self.assertEqual(fast._costs_for_var(v), slow._costs_for_var(v))
+        # x2 = 1 always exceeds the capacity
+        self.assertEqual(fast._costs_for_var(variables[2]), {0: -2})
+
+    def test_cost_for_binary_sum_factor_does_not_enumerate(self):
+        # 2^60 assignments: this would never end if we enumerated them
+        variables = [BinaryVariable('x{}'.format(i)) for i in range(60)]
+        hosted = ExactlyKRelation(variables, 1, 10000, name='hosted')
+        f = FactorAlgo(hosted, comp_def=MagicMock())
+        f._costs = {v.name: {0: 0, 1: i} for i, v in enumerate(variables)}
+
+        self.assertEqual(f._costs_for_var(variables[0]), {0: 1, 1: 0})
+        self.assertEqual(f._costs_for_var(variables[1]), {0: 0, 1: 0})
+
+    def test_op_count_in_stats(self):
+        x1 = Variable('x1', list(range(3)))
+        x2 = Variable('x2', list(range(2)))
+
+        @AsNAryFunctionRelation(x1, x2)
+        def cost(x1_, x2_):
+            return x1_ + x2_
+
+        f = FactorAlgo(cost, comp_def=MagicMock())
+        f.message_sender = MagicMock()
+
+        # waiting for the costs of x2, no cost computed
+        stats = f._on_cost_msg('x1', MaxSumMessage({0: 0, 1: 0, 2: 0}), 0)
+        self.assertEqual(stats['op_count'], 0)
+
+        # costs for x1: the 6 assignments of the factor are evaluated
+        stats = f._on_cost_msg('x2', MaxSumMessage({0: 0, 1: 0}), 0)
+        self.assertEqual(stats['num_msg_out'], 1)
+        self.assertEqual(stats['op_count'], 6)
+
+
+class MaxSumVariableAlgoTest(unittest.TestCase):
+
+    def test_op_count_in_stats(self):
+        x1 = Variable('x1', list(range(3)))
+        v = VariableAlgo(x1, ['f1', 'f2', 'f3'], comp_def=MagicMock())
+        v.message_sender = MagicMock()
+
+        # select value: 3 additions, costs for f2 and f3: 3 additions each
+        stats = v._on_cost_msg('f1', MaxSumMessage({0: 1, 1: 0, 2: 2}), 0)
+        self.assertEqual(stats['op_count'], 9)
+
+        # select value: 6 additions, costs for f1 and f2: 3 additions each,
+        # costs for f3: 6 additions
+        stats = v._on_cost_msg('f2', MaxSumMessage({0: 1, 1: 0, 2: 2}), 0)
+        self.assertEqual(stats['op_count'], 18)
+
 
 class VarDummy:
     def __init__(self, name):
@@ -0,0 +1,203 @@
+# BSD-3-Clause License
+#
+# Copyright 2017 Orange
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+
+import os
+
+import numpy as np
+import pytest
+
+from pydcop.dcop.binarydcop import yaml_to_binary, load_dcop_from_binary, \
+    is_binary_dcop, write_dcop_binary, TABLES_FILE
+from pydcop.dcop.dcop import DCOP
+from pydcop.dcop.objects import Domain, Variable
+from pydcop.dcop.relations import NAryMatrixRelation
+from pydcop.dcop.yamldcop import load_dcop_from_file
+
+DCOP_YAML = """
+name: binary test
+objective: min
+
+domains:
+  d:
+    type: int
+    values: [0, 1, 2]
+variables:
+  v1:
+    domain: d
+  v2:
+    domain: d
+constraints:
+  ext:
+    type: extensional
+    default: 10
+    variables: [v1, v2]
+    values:
+      2: 0 0
+      3: 1 2 | 2 1
+  cost_v1:
+    type: extensional
+    variables: v1
+    values:
+      0.5: 1
+  diff:
+    type: intention
+    function: 1 if v1 == v2 else 0
+agents:
+  a1:
+    capacity: 100
+  a2:
+    capacity: 100
+"""
+
+AGENTS_YAML = """
+agents:
+  a3:
+    capacity: 50
+"""
+
+
+@pytest.fixture
+def yaml_file(tmpdir):
+    path = os.path.join(str(tmpdir), 'dcop.yaml')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(DCOP_YAML)
+    return path
+
+
+def test_convert_and_load(yaml_file, tmpdir):
+    path = os.path.join(str(tmpdir), 'dcop_bin')
+    yaml_to_binary([yaml_file], path)
+
+    assert is_binary_dcop(path)
+    assert not is_binary_dcop(yaml_file)
+    assert os.path.exists(os.path.join(path, TABLES_FILE.format('int64')))
+
+    dcop = load_dcop_from_binary(path)
+    assert dcop.name == 'binary test'
+    assert set(dcop.variables) == {'v1', 'v2'}
+    assert set(dcop.agents) == {'a1', 'a2'}
+
+    ext = dcop.constraint('ext')
+    assert [v.name for v in ext.dimensions] == ['v1', 'v2']
+    assert ext(v1=0, v2=0) == 2
+    assert ext(v1=1, v2=2) == 3
+    assert ext(v1=2, v2=1) == 3
+    assert ext(v1=2, v2=2) == 10
+
+    cost_v1 = dcop.constraint('cost_v1')
+    assert cost_v1(v1=1) == 0.5
+    # No default value
+    assert cost_v1._m[0] is None
+
+    assert dcop.constraint('diff')(v1=1, v2=1) == 1
+
+
+def test_same_cost_as_yaml(yaml_file, tmpdir):
+    path = os.path.join(str(tmpdir), 'dcop_bin')
+    yaml_to_binary([yaml_file], path)
+
+    binary_dcop = load_dcop_from_binary(path)
+    yaml_dcop = load_dcop_from_file(yaml_file)
+    for v1 in range(3):
+        for v2 in range(3):
+            assignment = {'v1': v1, 'v2': v2}
+            assert binary_dcop.constraint('ext')(**assignment) == \
+                yaml_dcop.constraint('ext')(**assignment)
+            assert binary_dcop.constraint('diff')(**assignment) == \
+                yaml_dcop.constraint('diff')(**assignment)
+
+
+def test_tables_are_memory_mapped(yaml_file, tmpdir):
+    path = os.path.join(str(tmpdir), 'dcop_bin')
+    yaml_to_binary([yaml_file], path)
+
+    dcop = load_dcop_from_binary(path)
+    matrix = dcop.constraint('ext')._m
+    assert not matrix.flags.writeable
+    assert type(matrix) == np.ndarray
+
+    dcop = load_dcop_from_binary(path, mmap=False)
+    assert dcop.constraint('ext')._m.flags.writeable
+
+
+def test_load_with_extra_yaml(yaml_file, tmpdir):
+    path = os.path.join(str(tmpdir), 'dcop_bin')
+    yaml_to_binary([yaml_file], path)
+    agents_file = os.path.join(str(tmpdir), 'agents.yaml')
+    with open(agents_file, 'w', encoding='utf-8') as f:
+        f.write(AGENTS_YAML)
+
+    dcop = load_dcop_from_file([path, agents_file])
+
+    assert set(dcop.agents) == {'a1', 'a2', 'a3'}
+    assert dcop.agent('a3').capacity == 50
+
+
+def test_write_dcop_binary(yaml_file, tmpdir):
+    dcop = load_dcop_from_file([yaml_file])
+    path = os.path.join(str(tmpdir), 'dcop_bin')
+
+    write_dcop_binary(dcop, path)
+    loaded = load_dcop_from_binary(path)
+
+    assert set(loaded.constraints) == {'ext', 'cost_v1', 'diff'}
+    assert loaded.constraint('diff').expression == '1 if v1 == v2 else 0'
+    assert loaded.constraint('ext')(v1=1, v2=2) == 3
+    assert loaded.constraint('ext')(v1=0, v2=1) == 10
+    assert set(loaded.agents) == {'a1', 'a2'}
+    assert loaded.agent('a1').capacity == 100
+    for assignment in [{'v1': 1, 'v2': 0}, {'v1': 1, 'v2': 1},
+                       {'v1': 1, 'v2': 2}]:
+        assert loaded.solution_cost(assignment, True) == \
+            dcop.solution_cost(assignment, True)
+
+
+def test_tables_keep_their_dtype(yaml_file, tmpdir):
+    path = os.path.join(str(tmpdir), 'dcop_bin')
+    yaml_to_binary([yaml_file], path)
+
+    dcop = load_dcop_from_binary(path)
+    yaml_dcop = load_dcop_from_file(yaml_file)
+    assert dcop.constraint('ext')._m.dtype == \
+        yaml_dcop.constraint('ext')._m.dtype
+    assert dcop.constraint('cost_v1')._m.dtype == object
+
+
+def test_non_numeric_table_is_rejected(tmpdir):
+    d = Domain('d', '', [0, 1])
+    v1 = Variable('v1', d)
+    dcop = DCOP('non numeric')
+    dcop.add_constraint(NAryMatrixRelation(
+        [v1], np.array(['a', 'b'], dtype=object), name='c1'))
+
+    with pytest.raises(ValueError) as exc:
+        write_dcop_binary(dcop, os.path.join(str(tmpdir), 'dcop_bin'))
+    assert 'c1' in str(exc.value)
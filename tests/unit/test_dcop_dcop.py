@@ -29,9 +29,15 @@
 # POSSIBILITY OF SUCH DAMAGE.
 
 
-from pydcop.dcop.dcop import DCOP
+import itertools
+
+import numpy as np
+import pytest
+
+from pydcop.dcop.dcop import DCOP, SolutionCostTracker, CompiledEvaluator, \
+    solution_cost
 from pydcop.dcop.objects import Variable, VariableDomain, AgentDef, \
-    create_agents
+    create_agents, VariableWithCostDict
 from pydcop.dcop.relations import constraint_from_str
 
 
@@ -85,3 +91,169 @@ def test_dcop_add_agents_from_dict():
     assert dcop.agent('a1').name == 'a1'
     assert dcop.agent('a2').name == 'a2'
     assert dcop.agent('a3').name == 'a3'
+
+
+def test_solution_cost_tracker_incremental_update():
+    d = VariableDomain('d', '', [0, 1, 2])
+    v1, v2, v3 = Variable('v1', d), Variable('v2', d), Variable('v3', d)
+    c1 = constraint_from_str('c1', 'v1 + v2', [v1, v2])
+    c2 = constraint_from_str('c2', 'v2 * v3', [v2, v3])
+    tracker = SolutionCostTracker([c1, c2], [v1, v2, v3], 1000)
+
+    tracker.update({'v1': 1, 'v2': 2})
+    with pytest.raises(ValueError):
+        tracker.cost
+
+    tracker.set_value('v3', 1)
+    assert tracker.cost == (0, 5)
+    tracker.set_value('v2', 0)
+    assert tracker.cost == (0, 1)
+    # unknown variables (e.g. used for reparation) are ignored
+    tracker.set_value('unknown', 3)
+    assert tracker.cost == (0, 1)
+
+
+def test_solution_cost_tracker_hard_constraints():
+    d = VariableDomain('d', '', [0, 1, 2])
+    v1, v2 = Variable('v1', d), Variable('v2', d)
+    c1 = constraint_from_str('c1', '1000 if v1 == v2 else v1', [v1, v2])
+    tracker = SolutionCostTracker([c1], [v1, v2], 1000)
+
+    tracker.update({'v1': 1, 'v2': 1})
+    assert tracker.cost == (1, 0)
+    tracker.set_value('v2', 2)
+    assert tracker.cost == (0, 1)
+
+
+def test_solution_cost_tracker_matches_solution_cost():
+    d = VariableDomain('d', '', [0, 1, 2])
+    v1 = VariableWithCostDict('v1', d, {0: 0.5, 1: 1.5, 2: 2.5})
+    v2, v3 = Variable('v2', d), Variable('v3', d)
+    dcop = DCOP()
+    dcop += 'c1', '0.1 * v1 + v2', [v1, v2]
+    dcop += 'c2', 'v2 * v3 if v3 != 2 else 1000', [v2, v3]
+    tracker = SolutionCostTracker(dcop.constraints.values(),
+                                  dcop.all_variables, 1000)
+
+    assignment = {'v1': 0, 'v2': 0, 'v3': 0}
+    tracker.update(assignment)
+    for name, value in [('v1', 2), ('v3', 2), ('v2', 1), ('v1', 1),
+                        ('v3', 1), ('v2', 2)]:
+        tracker.set_value(name, value)
+        assignment[name] = value
+        hard, soft = dcop.solution_cost(assignment, 1000)
+        assert tracker.cost[0] == hard
+        assert tracker.cost[1] == pytest.approx(soft)
+
+
+def _evaluation_dcop():
+    d = VariableDomain('d', '', [0, 1, 2])
+    v1 = VariableWithCostDict('v1', d, {0: 0.5, 1: 1.5, 2: 2.5})
+    v2, v3 = Variable('v2', d), Variable('v3', d)
+    dcop = DCOP()
+    dcop += 'c1', '0.1 * v1 + v2', [v1, v2]
+    dcop += 'c2', 'v2 * v3 if v3 != 2 else 1000', [v2, v3]
+    dcop += 'c3', 'v1 + v2 + v3', [v1, v2, v3]
+    return dcop
+
+
+def test_dcop_solution_cost_compiled():
+    dcop = _evaluation_dcop()
+    relations = dcop.constraints.values()
+    for values in itertools.product([0, 1, 2], repeat=3):
+        assignment = dict(zip(['v1', 'v2', 'v3'], values))
+        hard, soft = dcop.solution_cost(assignment, 1000)
+        expected_hard, expected_soft = solution_cost(
+            relations, dcop.all_variables, assignment, 1000)
+        assert hard == expected_hard
+        assert soft == pytest.approx(expected_soft)
+
+
+def test_dcop_solution_cost_incomplete_assignment():
+    dcop = _evaluation_dcop()
+    with pytest.raises(ValueError):
+        dcop.solution_cost({'v1': 0, 'v2': 1}, 1000)
+
+
+def test_dcop_solution_cost_value_not_in_domain():
+    dcop = _evaluation_dcop()
+    dcop.variables['v1'] = Variable('v1', VariableDomain('d', '', [0, 1, 2]))
+
+    # Relations defined by an expression can still be evaluated
+    assert dcop.solution_cost({'v1': 10, 'v2': 0, 'v3': 0}, 1000) == (0, 11)
+
+
+def test_dcop_solutions_costs_batch():
+    dcop = _evaluation_dcop()
+    assignments = [dict(zip(['v1', 'v2', 'v3'], values))
+                   for values in itertools.product([0, 1, 2], repeat=3)]
+
+    hard, soft = dcop.solutions_costs(assignments, 1000)
+
+    for i, assignment in enumerate(assignments):
+        expected_hard, expected_soft = dcop.solution_cost(assignment, 1000)
+        assert hard[i] == expected_hard
+        assert soft[i] == pytest.approx(expected_soft)
+
+
+def test_dcop_solutions_costs_from_value_indexes():
+    dcop = _evaluation_dcop()
+    evaluator = dcop.evaluator
+    assignment = {'v1': 2, 'v2': 1, 'v3': 0}
+    indexes = np.array([evaluator.value_indexes(assignment)])
+
+    hard, soft = dcop.solutions_costs(indexes, 1000)
+
+    assert (hard[0], soft[0]) == \
+        pytest.approx(dcop.solution_cost(assignment, 1000))
+
+
+def test_dcop_evaluator_not_tabulated():
+    dcop = _evaluation_dcop()
+    evaluator = CompiledEvaluator(dcop.constraints.values(),
+                                  dcop.all_variables, max_table_size=3)
+    assignment = {'v1': 2, 'v2': 1, 'v3': 2}
+
+    assert evaluator.cost(assignment, 1000) == \
+        pytest.approx(dcop.solution_cost(assignment, 1000))
+    hard, soft = evaluator.batch_cost([assignment], 1000)
+    assert (hard[0], soft[0]) == \
+        pytest.approx(dcop.solution_cost(assignment, 1000))
+
+
+def test_dcop_evaluator_partial_domain_expression():
+    d = VariableDomain('d', '', [0, 1, 2])
+    v1, v2 = Variable('v1', d), Variable('v2', d)
+    dcop = DCOP()
+    # Not defined for v2 == 0, which is never evaluated
+    dcop += 'c', '10 / v2 + v1', [v1, v2]
+
+    assert dcop.solution_cost({'v1': 1, 'v2': 2}, 1000) == (0, 6)
+    hard, soft = dcop.solutions_costs([{'v1': 1, 'v2': 2},
+                                       {'v1': 0, 'v2': 1}], 1000)
+    assert hard.tolist() == [0, 0]
+    assert soft.tolist() == [6, 10]
+
+
+def test_dcop_evaluator_invalidated_on_change():
+    dcop = _evaluation_dcop()
+    evaluator = dcop.evaluator
+    assert dcop.evaluator is evaluator
+
+    v4 = Variable('v4', VariableDomain('d', '', [0, 1, 2]))
+    dcop += 'c4', 'v4 * 2', [v4]
+    assert dcop.evaluator is not evaluator
+    assert dcop.solution_cost({'v1': 0, 'v2': 0, 'v3': 0, 'v4': 2},
+                              1000) == (0, 4.5)
+
+
+def test_dcop_evaluator_invalidated_on_replaced_constraint():
+    dcop = _evaluation_dcop()
+    evaluator = dcop.evaluator
+    v2, v3 = dcop.variables['v2'], dcop.variables['v3']
+
+    dcop.constraints['c2'] = \
+        constraint_from_str('c2', 'v2 + v3', [v2, v3])
+    assert dcop.evaluator is not evaluator
+    assert dcop.solution_cost({'v1': 0, 'v2': 1, 'v3': 2}, 1000) == \
+        pytest.approx((0, 7.5))
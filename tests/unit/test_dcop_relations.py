@@ -29,20 +29,25 @@
 # POSSIBILITY OF SUCH DAMAGE.
 
 
+import random
 import unittest
 
 import numpy as np
+import pytest
 from pydcop.algorithms import generate_assignment, generate_assignment_as_dict
 
 import pydcop.dcop.objects
 from pydcop.dcop.objects import VariableDomain, Variable, ExternalVariable, \
-    Domain
+    Domain, BinaryVariable
 from pydcop.dcop.relations import NAryFunctionRelation, \
     is_compatible, ConditionalRelation, count_var_match, \
     AsNAryFunctionRelation, relation_from_str, \
     find_dependent_relations, NAryMatrixRelation, UnaryBooleanRelation, \
     UnaryFunctionRelation, ZeroAryRelation, add_var_to_rel, NeutralRelation, \
-    assignment_matrix, random_assignment_matrix
+    assignment_matrix, random_assignment_matrix, CountingRelation, \
+    dependent_relations_index, random_assignment_matrices, \
+    ExactlyKRelation, AtMostKRelation, LinearSumRelation, \
+    KnapsackThresholdRelation
 from pydcop.utils.expressionfunction import ExpressionFunction
 from pydcop.utils.simple_repr import simple_repr, from_repr, \
     SimpleReprException
@@ -1578,6 +1583,24 @@ class FindDependentRelations(unittest.TestCase):
         dependencies = find_dependent_relations(v1, [r1], {'e1': 0})
         self.assertEqual(len(dependencies), 0)
 
+
+class DependentRelationsIndex(unittest.TestCase):
+
+    def test_same_as_find_dependent_relations(self):
+        d = VariableDomain('d', 'd', [1, 2, 3])
+        v1, v2, v3, v4 = (Variable('v{}'.format(i), d) for i in range(1, 5))
+        r1 = NAryFunctionRelation(lambda x, y: x, [v1, v2], name='r1')
+        r2 = NAryFunctionRelation(lambda x, y: x, [v1, v3], name='r2')
+        r3 = NAryFunctionRelation(lambda x, y, z: x, [v2, v3, v1], name='r3')
+        relations = [r1, r2, r3]
+
+        index = dependent_relations_index(relations)
+
+        for v in [v1, v2, v3]:
+            self.assertEqual(index[v.name],
+                             find_dependent_relations(v, relations))
+        self.assertNotIn('v4', index)
+
         dependencies = find_dependent_relations(v1, [r1], {'e1': 1})
         self.assertEqual(len(dependencies), 1)
 
@@ -1676,3 +1699,200 @@ def test_random_ass_matrix_two_var():
     m = random_assignment_matrix([v1, v2], range(5))
     assert m[1][3] in range(5)
     print(m)
+
+
+def test_random_ass_matrices():
+    d1 = Domain('d1', 'd', range(4))
+    d2 = Domain('d2', 'd', range(3))
+    v1 = Variable('v1', d1)
+    v2 = Variable('v2', d2)
+
+    matrices = random_assignment_matrices([d1, d2], range(5), 10)
+    assert matrices.shape == (10, 4, 3)
+    assert set(np.unique(matrices)) <= set(range(5))
+
+    r = NAryMatrixRelation([v1, v2], matrices[2])
+    assert r(v1=1, v2=2) == matrices[2][1][2]
+
+
+class CheckCounter(object):
+    def __init__(self):
+        self.checks = 0
+
+    def check(self):
+        self.checks += 1
+
+
+def test_counting_relation_counts_evaluations():
+    d = Domain('d', 'd', range(3))
+    v1, v2 = Variable('v1', d), Variable('v2', d)
+    r = NAryFunctionRelation(lambda x, y: x + y, [v1, v2], name='r')
+    counter = CheckCounter()
+    c = CountingRelation(r, counter)
+
+    assert c(1, 2) == 3
+    assert c(v1=2, v2=2) == 4
+    assert c.get_value_for_assignment({'v1': 0, 'v2': 1}) == 1
+    assert counter.checks == 3
+
+
+def test_counting_relation_delegates():
+    d = Domain('d', 'd', range(3))
+    v1, v2 = Variable('v1', d), Variable('v2', d)
+    r = NAryFunctionRelation(lambda x, y: x + y, [v1, v2], name='r')
+    c = CountingRelation(r, CheckCounter())
+
+    assert c.name == 'r'
+    assert c.dimensions == [v1, v2]
+    assert c.arity == 2
+    assert c.shape == (3, 3)
+    assert c == r
+    assert hash(c) == hash(r)
+
+
+def test_counting_relation_slice_is_counted():
+    d = Domain('d', 'd', range(3))
+    v1, v2 = Variable('v1', d), Variable('v2', d)
+    r = NAryFunctionRelation(lambda x, y: x + y, [v1, v2], name='r')
+    counter = CheckCounter()
+    c = CountingRelation(r, counter)
+
+    sliced = c.slice({'v1': 1})
+    assert sliced(v2=2) == 3
+    assert counter.checks == 1
+
+
+def test_counting_relation_simple_repr():
+    d = Domain('d', 'd', range(3))
+    v1 = Variable('v1', d)
+    r = NAryMatrixRelation([v1], np.array([1, 2, 3]), name='r')
+    c = CountingRelation(r, CheckCounter())
+
+    # counting is not part of the simple repr
+    assert from_repr(simple_repr(c)) == r
+
+
+
+def brute_force_min_costs(relation, variable, costs, infinity=float('inf')):
+    inf = float('inf')
+    min_costs = {}
+    for asgt in generate_assignment_as_dict(relation.dimensions):
+        cost = relation(**asgt)
+        if cost >= infinity:
+            cost = inf
+        for v, val in asgt.items():
+            if v != variable.name and v in costs:
+                cost += costs[v].get(val, inf)
+        d = asgt[variable.name]
+        min_costs[d] = min(min_costs.get(d, inf), cost)
+    return min_costs
+
+
+def random_binary_costs(variables, rnd):
+    costs = {}
+    for v in variables:
+        draw = rnd.random()
+        if draw < 0.1:
+            # no message received yet for this variable
+            continue
+        elif draw < 0.2:
+            # infinite cost for one of the values
+            costs[v.name] = {rnd.choice([0, 1]): rnd.randint(-5, 5)}
+        else:
+            costs[v.name] = {0: rnd.randint(-5, 5), 1: rnd.randint(-5, 5)}
+    return costs
+
+
+def binary_relations(variables, rnd):
+    weights = [rnd.randint(0, 4) for _ in variables]
+    return [
+        ExactlyKRelation(variables, rnd.randint(0, 3), 100, name='exactly'),
+        AtMostKRelation(variables, rnd.randint(0, 3), 100, name='at_most'),
+        LinearSumRelation(variables, [rnd.randint(-4, 4) for _ in variables],
+                          offset=rnd.randint(0, 3), name='linear'),
+        KnapsackThresholdRelation(variables, weights, rnd.randint(0, 8), 100,
+                                  name='knapsack'),
+    ]
+
+
+def test_binary_relations_values():
+    x1, x2, x3 = (BinaryVariable('x{}'.format(i)) for i in range(1, 4))
+
+    exactly = ExactlyKRelation([x1, x2, x3], 1, 1000)
+    assert exactly(1, 0, 0) == 0
+    assert exactly(x1=1, x2=1, x3=0) == 1000
+    assert exactly(0, 0, 0) == 1000
+
+    at_most = AtMostKRelation([x1, x2, x3], 2, 1000)
+    assert at_most(1, 1, 0) == 0
+    assert at_most(1, 1, 1) == 1000
+
+    linear = LinearSumRelation([x1, x2, x3], [1, 2, 4], offset=3)
+    assert linear(1, 0, 1) == 8
+    assert linear({'x1': 0, 'x2': 1, 'x3': 0}) == 5
+
+    knapsack = KnapsackThresholdRelation([x1, x2, x3], [1, 2, 4], 5, 1000)
+    assert knapsack(1, 0, 1) == 0
+    assert knapsack(0, 1, 1) == 1000
+
+
+def test_binary_relations_slice():
+    x1, x2, x3 = (BinaryVariable('x{}'.format(i)) for i in range(1, 4))
+    rnd = random.Random(3)
+
+    for r in binary_relations([x1, x2, x3], rnd):
+        sliced = r.slice({'x1': 1})
+        assert sliced.dimensions == [x2, x3]
+        for asgt in generate_assignment_as_dict([x2, x3]):
+            full = dict(asgt, x1=1)
+            assert sliced(**asgt) == r(**full)
+
+
+def test_binary_relations_simple_repr():
+    x1, x2 = BinaryVariable('x1'), BinaryVariable('x2')
+    rnd = random.Random(4)
+
+    for r in binary_relations([x1, x2], rnd):
+        r2 = from_repr(simple_repr(r))
+        assert r == r2
+        assert r2(1, 1) == r(1, 1)
+
+
+def test_binary_relations_require_binary_variables():
+    d = Domain('d', 'd', range(3))
+    v1 = Variable('v1', d)
+    with pytest.raises(ValueError):
+        ExactlyKRelation([v1], 1, 100)
+
+
+def test_knapsack_relation_rejects_negative_weights():
+    x1 = BinaryVariable('x1')
+    with pytest.raises(ValueError):
+        KnapsackThresholdRelation([x1], [-1], 2, 100)
+
+
+@pytest.mark.parametrize('seed', range(30))
+def test_binary_relations_min_costs_match_brute_force(seed):
+    rnd = random.Random(seed)
+    variables = [BinaryVariable('x{}'.format(i))
+                 for i in range(rnd.randint(1, 7))]
+    costs = random_binary_costs(variables, rnd)
+
+    for r in binary_relations(variables, rnd):
+        for v in variables:
+            assert r.min_costs_for_var(v, costs) == \
+                brute_force_min_costs(r, v, costs), r.name
+
+
+@pytest.mark.parametrize('seed', range(30))
+def test_binary_relations_min_costs_with_finite_infinity(seed):
+    rnd = random.Random(seed)
+    variables = [BinaryVariable('x{}'.format(i))
+                 for i in range(rnd.randint(1, 7))]
+    costs = random_binary_costs(variables, rnd)
+
+    # Penalties of 100 are considered as infinite
+    for r in binary_relations(variables, rnd):
+        for v in variables:
+            assert r.min_costs_for_var(v, costs, 100) == \
+                brute_force_min_costs(r, v, costs, 100), r.name
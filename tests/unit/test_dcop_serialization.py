@@ -30,11 +30,19 @@
 
 
 
+import os
 import unittest
 
 import pytest
+import yaml
 
-from pydcop.dcop.yamldcop import load_dcop, DcopInvalidFormatError
+import numpy as np
+
+from pydcop.dcop.dcop import DCOP
+from pydcop.dcop.objects import Domain, Variable, AgentDef
+from pydcop.dcop.relations import NAryMatrixRelation, NAryFunctionRelation
+from pydcop.dcop.yamldcop import load_dcop, DcopInvalidFormatError, \
+    load_dcop_from_file, dcop_yaml
 
 
 def test_load_name_and_description():
@@ -556,6 +564,165 @@ class TestDcopLoadConstraints(unittest.TestCase):
 
         self.assertEqual(c(v1=7, v2=7), 10)  # Default value
 
+    def test_extensional_constraint_float_values(self):
+        self.dcop_str += """
+        constraints:
+          ext_test:
+            type: extensional
+            default: 1
+            variables: [v1, v2]
+            values:
+                0.5: 2 2 | 3 4
+        """
+
+        dcop = load_dcop(self.dcop_str)
+
+        c = dcop.constraint('ext_test')
+        self.assertEqual(c(v1=2, v2=2), 0.5)
+        self.assertEqual(c(v1=3, v2=4), 0.5)
+        self.assertEqual(c(v1=4, v2=3), 1)
+
+    def test_extensional_constraint_no_default(self):
+        self.dcop_str += """
+        constraints:
+          ext_test:
+            type: extensional
+            variables: [v1, v2]
+            values:
+                2: 2 2
+        """
+
+        dcop = load_dcop(self.dcop_str)
+
+        c = dcop.constraint('ext_test')
+        self.assertEqual(c(v1=2, v2=2), 2)
+
+    def test_extensional_constraint_invalid_assignment(self):
+        self.dcop_str += """
+        constraints:
+          ext_test:
+            type: extensional
+            default: 10
+            variables: [v1, v2]
+            values:
+                2: 2 2 | 3
+        """
+
+        self.assertRaises(ValueError, load_dcop, self.dcop_str)
+
+    def test_extensional_constraint_invalid_value(self):
+        self.dcop_str += """
+        constraints:
+          ext_test:
+            type: extensional
+            default: 10
+            variables: [v1, v2]
+            values:
+                2: 2 42
+        """
+
+        self.assertRaises(ValueError, load_dcop, self.dcop_str)
+
+
+def test_load_from_single_file_name():
+    filename = os.path.join(os.path.dirname(__file__), '..', 'instances',
+                            'graph_coloring1.yaml')
+
+    dcop = load_dcop_from_file(filename)
+
+    assert dcop.name == 'graph coloring'
+    assert len(dcop.variables) == 3
+
+
+INSTANCES_DIR = os.path.join(os.path.dirname(__file__), '..', 'instances')
+
+
+@pytest.mark.skipif(not yaml.__with_libyaml__, reason='libyaml not available')
+@pytest.mark.parametrize('filename', sorted(
+    f for f in os.listdir(INSTANCES_DIR) if f.endswith(('.yaml', '.yml'))))
+def test_libyaml_loader_parity(filename):
+    # yamldcop uses the libyaml loader when available: it must give the
+    # same data as the pure python loader.
+    with open(os.path.join(INSTANCES_DIR, filename), encoding='utf-8') as f:
+        content = f.read()
+
+    assert yaml.load(content, Loader=yaml.CSafeLoader) == \
+        yaml.load(content, Loader=yaml.SafeLoader)
+
+
+def _matrix_dcop(matrix):
+    d1 = Domain('d1', '', [1, 2, 3])
+    d2 = Domain('d2', '', ['a', 'b'])
+    v1 = Variable('v1', d1)
+    v2 = Variable('v2', d2)
+    dcop = DCOP('test', 'min')
+    dcop.add_constraint(NAryMatrixRelation([v1, v2], matrix, name='c1'))
+    dcop.add_agents([AgentDef('a1'), AgentDef('a2')])
+    return dcop
+
+
+def test_dump_matrix_constraint_round_trip():
+    matrix = np.array([[1, 2], [3, 1], [1, 1]], dtype=float)
+    dcop = _matrix_dcop(matrix)
+
+    loaded = load_dcop(dcop_yaml(dcop))
+
+    c1 = loaded.constraints['c1']
+    for i, v1 in enumerate([1, 2, 3]):
+        for j, v2 in enumerate(['a', 'b']):
+            assert c1(v1=v1, v2=v2) == matrix[i, j]
+
+
+def test_dump_matrix_constraint_most_frequent_value_as_default():
+    matrix = np.array([[1, 2], [3, 1], [1, 1]], dtype=float)
+    dcop = _matrix_dcop(matrix)
+
+    dumped = dcop_yaml(dcop)
+
+    assert 'default: 1.0' in dumped
+    assert '2.0: "1 b"' in dumped
+    assert '3.0: "2 a"' in dumped
+
+
+def test_dump_matrix_constraint_writes_undefined_values():
+    matrix = np.array([[1, 2], [np.nan, 1], [np.nan, 1]], dtype=float)
+    dcop = _matrix_dcop(matrix)
+
+    dumped = dcop_yaml(dcop)
+
+    assert '.nan: "2 a | 3 a"' in dumped
+
+
+def test_dump_matrix_constraint_undefined_values_round_trip():
+    matrix = np.array([[1, 2], [np.nan, 1], [1, 1]], dtype=float)
+    dcop = _matrix_dcop(matrix)
+
+    loaded = load_dcop(dcop_yaml(dcop))
+
+    c1 = loaded.constraints['c1']
+    # undefined assignments must not get the default value when reloaded
+    assert np.isnan(c1(v1=2, v2='a'))
+    for v1, v2, value in [(1, 'a', 1), (1, 'b', 2), (2, 'b', 1),
+                          (3, 'a', 1), (3, 'b', 1)]:
+        assert c1(v1=v1, v2=v2) == value
+
+
+def test_dump_function_constraint_as_extensional():
+    d = Domain('d', '', [0, 1])
+    v1 = Variable('v1', d)
+    v2 = Variable('v2', d)
+    dcop = DCOP('test', 'min')
+    dcop.add_constraint(NAryFunctionRelation(lambda v1, v2: v1 + v2,
+                                             [v1, v2], name='c1'))
+    dcop.add_agents([AgentDef('a1')])
+
+    loaded = load_dcop(dcop_yaml(dcop))
+
+    c1 = loaded.constraints['c1']
+    assert c1(v1=0, v2=0) == 0
+    assert c1(v1=1, v2=0) == 1
+    assert c1(v1=1, v2=1) == 2
+
 
 class TestDcopLoadAgents(unittest.TestCase):
     def setUp(self):
@@ -928,3 +1095,23 @@ class TestLoadDistributionHintsHostWith(unittest.TestCase):
         self.assertIn('v1', hints.host_with('v2'))
         self.assertIn('v2', hints.host_with('v1'))
         self.assertIn('v2', hints.host_with('c1'))
+
+
+def test_dump_values_needing_quotes():
+    d = Domain('d', '', ['yes', 'null', '1', 'a:b', '#x'])
+    v1 = Variable('v 1', d, initial_value='null')
+    v2 = Variable('v2', d)
+    dcop = DCOP('test', 'min')
+    dcop.add_constraint(NAryMatrixRelation(
+        [v1, v2], np.arange(25, dtype=float).reshape(5, 5) * 1e16,
+        name='c1'))
+    dcop.add_agents([AgentDef('a1', hosting_costs={'c1': float('inf')},
+                              capacity=1.5)])
+
+    loaded = load_dcop(dcop_yaml(dcop))
+
+    assert loaded.domain('d').values == ('yes', 'null', '1', 'a:b', '#x')
+    assert loaded.variable('v 1').initial_value == 'null'
+    assert loaded.constraints['c1'](**{'v 1': '1', 'v2': 'a:b'}) == 13e16
+    assert loaded.agent('a1').hosting_cost('c1') == float('inf')
+    assert loaded.agent('a1').capacity == 1.5
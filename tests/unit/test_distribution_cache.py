@@ -0,0 +1,159 @@
+# BSD-3-Clause License
+#
+# Copyright 2017 Orange
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+
+import os
+
+import pytest
+
+from pydcop.dcop.objects import AgentDef
+from pydcop.distribution import cache as cache_module
+from pydcop.distribution.cache import DistributionCache, is_cacheable
+from pydcop.distribution.objects import Distribution
+
+
+def memory(computation):
+    return 1
+
+
+def other_memory(computation):
+    return 2
+
+
+@pytest.fixture
+def dcop_file(tmpdir):
+    f = tmpdir.join('dcop.yaml')
+    f.write('name: test\n')
+    return str(f)
+
+
+@pytest.fixture
+def cache(tmpdir):
+    return DistributionCache(str(tmpdir.join('cache')))
+
+
+def test_cache_miss(cache, dcop_file):
+    key = cache.key([dcop_file], 'factor_graph', 'adhoc')
+
+    assert cache.get(key) is None
+
+
+def test_put_get(cache, dcop_file):
+    key = cache.key([dcop_file], 'factor_graph', 'adhoc')
+    cache.put(key, Distribution({'a1': ['c1', 'c2'], 'a2': ['c3']}))
+
+    distribution = cache.get(key)
+    assert distribution.mapping() == {'a1': ['c1', 'c2'], 'a2': ['c3']}
+
+
+def test_key_depends_on_file_content(cache, dcop_file):
+    key1 = cache.key([dcop_file], 'factor_graph', 'adhoc')
+    with open(dcop_file, 'a') as f:
+        f.write('objective: min\n')
+    key2 = cache.key([dcop_file], 'factor_graph', 'adhoc')
+
+    assert key1 != key2
+
+
+def test_key_depends_on_parameters(cache, dcop_file):
+    key = cache.key([dcop_file], 'factor_graph', 'adhoc', 'maxsum', memory,
+                    None, {'p': 1}, [AgentDef('a1')])
+
+    assert key == cache.key([dcop_file], 'factor_graph', 'adhoc', 'maxsum',
+                            memory, None, {'p': 1}, [AgentDef('a1')])
+    assert key != cache.key([dcop_file], 'pseudotree', 'adhoc', 'maxsum',
+                            memory, None, {'p': 1}, [AgentDef('a1')])
+    assert key != cache.key([dcop_file], 'factor_graph', 'ilp_fgdp',
+                            'maxsum', memory, None, {'p': 1},
+                            [AgentDef('a1')])
+    assert key != cache.key([dcop_file], 'factor_graph', 'adhoc', 'maxsum',
+                            other_memory, None, {'p': 1}, [AgentDef('a1')])
+    assert key != cache.key([dcop_file], 'factor_graph', 'adhoc', 'maxsum',
+                            memory, None, {'p': 2}, [AgentDef('a1')])
+    assert key != cache.key([dcop_file], 'factor_graph', 'adhoc', 'maxsum',
+                            memory, None, {'p': 1},
+                            [AgentDef('a1', capacity=10)])
+
+
+def test_key_depends_on_dependencies_source(cache, dcop_file, monkeypatch):
+    key = cache.key([dcop_file], 'factor_graph', 'ilp_fgdp')
+
+    getsource = cache_module.inspect.getsource
+
+    def modified_getsource(obj):
+        source = getsource(obj)
+        if obj.__name__ == 'pydcop.distribution._ilp':
+            source += '\n# modified\n'
+        return source
+    monkeypatch.setattr(cache_module.inspect, 'getsource', modified_getsource)
+
+    assert key != cache.key([dcop_file], 'factor_graph', 'ilp_fgdp')
+
+
+def test_time_bounded_methods_are_not_cacheable():
+    assert is_cacheable('adhoc')
+    assert is_cacheable('ilp_fgdp', {'solver': 'glpk', 'time_limit': None})
+    assert not is_cacheable('ilp_fgdp', {'time_limit': 10})
+    assert not is_cacheable('portfolio')
+    assert not is_cacheable('portfolio', {'time_budget': 5})
+
+
+def test_lru_eviction(tmpdir, dcop_file):
+    cache = DistributionCache(str(tmpdir.join('cache')))
+    cache.put('k1', Distribution({'a1': ['c1']}))
+    entry_size = os.path.getsize(os.path.join(cache.directory, 'k1.yaml'))
+    cache.max_size = 2 * entry_size
+
+    cache.put('k2', Distribution({'a1': ['c2']}))
+    # Entries' modification time is used for LRU, make sure k1 is older
+    os.utime(os.path.join(cache.directory, 'k1.yaml'), (0, 0))
+    os.utime(os.path.join(cache.directory, 'k2.yaml'), (1, 1))
+    # Getting k1 makes it the most recently used entry
+    assert cache.get('k1') is not None
+    cache.put('k3', Distribution({'a1': ['c3']}))
+
+    assert cache.get('k1') is not None
+    assert cache.get('k2') is None
+    assert cache.get('k3') is not None
+
+
+def test_invalid_entry_is_ignored(cache):
+    os.makedirs(cache.directory)
+    with open(os.path.join(cache.directory, 'k1.yaml'), 'w') as f:
+        f.write('foo: [')
+
+    assert cache.get('k1') is None
+
+
+def test_clear(cache):
+    cache.put('k1', Distribution({'a1': ['c1']}))
+    cache.clear()
+
+    assert cache.get('k1') is None
@@ -0,0 +1,120 @@
+# BSD-3-Clause License
+#
+# Copyright 2017 Orange
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+
+import pytest
+
+from pydcop.computations_graph.objects import ComputationGraph, \
+    ComputationNode, Link
+from pydcop.dcop.objects import AgentDef
+from pydcop.distribution import cost_model
+from pydcop.distribution.cost_model import DistributionCostModel
+from pydcop.distribution.objects import Distribution
+
+
+def load(computation, neighbor):
+    return 2 if {computation.name, neighbor} == {'c1', 'c2'} else 1
+
+
+@pytest.fixture
+def agents():
+    return [AgentDef('a1', default_route=1, routes={'a2': 5},
+                     hosting_costs={'c1': 3}),
+            AgentDef('a2', default_route=2, routes={'a1': 5},
+                     default_hosting_cost=1),
+            AgentDef('a3', default_route=10, routes={'a2': 2})]
+
+
+@pytest.fixture(params=['dense', 'sparse'])
+def matrix_format(request, monkeypatch):
+    if request.param == 'sparse':
+        monkeypatch.setattr(cost_model, 'DENSE_MATRIX_MAX_SIZE', 0)
+    return request.param
+
+
+def test_cost(graph, agents, matrix_format):
+    model = DistributionCostModel(graph, agents, load)
+    dist = Distribution({'a1': ['c1'], 'a2': ['c2'], 'a3': ['c3']})
+
+    cost, comm, hosting = model.cost(dist)
+
+    # c1 - c2: load 2, route a1 - a2: 5
+    # c2 - c3: load 1, route a2 - a3: 2
+    assert comm == 12
+    # c1 on a1: 3, c2 on a2: 1, c3 on a3: 0
+    assert hosting == 4
+    assert cost == 0.5 * 12 + 0.5 * 4
+
+
+def test_cost_same_agent(graph, agents, matrix_format):
+    model = DistributionCostModel(graph, agents, load)
+    dist = Distribution({'a3': ['c1', 'c2', 'c3']})
+
+    assert model.cost(dist) == (0, 0, 0)
+
+
+def test_cost_without_load(graph, agents):
+    model = DistributionCostModel(graph, agents)
+    dist = Distribution({'a1': ['c1'], 'a2': ['c2'], 'a3': ['c3']})
+
+    assert model.cost(dist) == (2, 0, 4)
+
+
+def test_hypergraph_link(agents):
+    l = Link(['c1', 'c2', 'c3'])
+    nodes = [ComputationNode(c, 'dummy_type', links=[l])
+             for c in ['c1', 'c2', 'c3']]
+    graph = ComputationGraph(graph_type='test', nodes=nodes)
+    model = DistributionCostModel(graph, agents, load)
+    dist = Distribution({'a1': ['c1', 'c2'], 'a2': ['c3']})
+
+    # c1 - c3 and c2 - c3: load 1, route a1 - a2: 5
+    assert model.cost(dist)[1] == 10
+
+
+def test_move_delta(graph, agents, matrix_format):
+    model = DistributionCostModel(graph, agents, load)
+    assignment = model.assignment(
+        Distribution({'a1': ['c1'], 'a2': ['c2'], 'a3': ['c3']}))
+    cost = model.cost(assignment)[0]
+
+    for c in model.computations:
+        for a in model.agents:
+            moved = assignment.copy()
+            moved[model.computation_index[c]] = model.agent_index[a]
+            assert model.move_delta(assignment, c, a) == \
+                pytest.approx(model.cost(moved)[0] - cost)
+
+
+def test_missing_computation(graph, agents):
+    model = DistributionCostModel(graph, agents, load)
+
+    with pytest.raises(KeyError):
+        model.cost(Distribution({'a1': ['c1', 'c2']}))
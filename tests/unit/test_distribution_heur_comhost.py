@@ -0,0 +1,71 @@
+# BSD-3-Clause License
+#
+# Copyright 2017 Orange
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+
+
+from pydcop.dcop.objects import AgentDef
+from pydcop.distribution.heur_comhost import distribute, Placement
+
+
+def test_communication_cost_groups_neighbors(graph):
+    # c3 is placed first, on a2 which has the lowest hosting cost for it.
+    # Without communication cost, c1 and c2 would go on a1, which has a
+    # lower hosting cost.
+    agents = [AgentDef('a1', capacity=100, default_hosting_cost=1,
+                       default_route=100),
+              AgentDef('a2', capacity=100, default_hosting_cost=2,
+                       hosting_costs={'c3': 0}, default_route=100)]
+
+    dist = distribute(graph, agents,
+                      computation_memory=lambda c: 5,
+                      communication_load=lambda c, n: 1)
+
+    assert sorted(dist.computations_hosted('a2')) == ['c1', 'c2', 'c3']
+
+
+def test_placement_place_unplace(graph):
+    computations = [(5, n, None) for n in graph.nodes]
+    agents = [AgentDef('a1', capacity=10, routes={'a2': 3}),
+              AgentDef('a2', capacity=10)]
+    placement = Placement(computations, agents, lambda c, n: 2)
+
+    placement.place(graph.computation('c1'), agents[1])
+    assert placement.remaining == {'a1': 10, 'a2': 5}
+    assert placement.placed_load['c2'] == {'a2': 2}
+
+    candidates = placement.candidate_hosts(graph.computation('c2'), 5)
+    # a2: no communication cost, a1: route 3 to a2
+    assert [(cost, name) for cost, name, _ in sorted(candidates)] == \
+        [(0, 'a2'), (3, 'a1')]
+
+    placement.unplace(graph.computation('c1'))
+    assert placement.remaining == {'a1': 10, 'a2': 10}
+    assert placement.placed_load['c2'] == {'a2': 0}
+    assert placement.mapping == {}
@@ -40,7 +40,9 @@ from pydcop.computations_graph.objects import ComputationGraph, \
 from pydcop.dcop.objects import AgentDef, create_variables, Domain
 from pydcop.dcop.relations import constraint_from_str
 
-from pydcop.distribution.ilp_compref import lp_model
+from pydcop.distribution import ilp_compref
+from pydcop.distribution.ilp_compref import lp_model, dist_params
+from pydcop.distribution.objects import ImpossibleDistributionException
 
 
 class TestLpModelHostingCost(unittest.TestCase):
@@ -331,6 +333,83 @@ class TestLpModelWithHyperGraph(unittest.TestCase):
         self.assertTrue(len(mapping['a1']) == 0)
 
 
+class TestLpModelSolver(unittest.TestCase):
+
+    def setUp(self):
+        c1 = ComputationNode('c1', 'dummy_type', neighbors=['c2'])
+        c2 = ComputationNode('c2', 'dummy_type', neighbors=['c1'])
+
+        self.cg = ComputationGraph(graph_type='test',
+                                   nodes=[c1, c2])
+        self.agents = [AgentDef('a1'),
+                       AgentDef('a2'),
+                       AgentDef('a3')]
+
+    def test_no_variables_for_agents_without_capacity(self):
+        mapping = lp_model(self.cg, self.agents,
+                           footprint=lambda c: 10,
+                           capacity=lambda a: 5 if a == 'a1' else 10,
+                           route=lambda a1, a2: 1,
+                           msg_load=lambda c1, c2: 10,
+                           hosting_cost=lambda a, c: 0 if a == 'a1' else 1,
+                           solver='cbc')
+
+        self.assertEqual(mapping['a1'], [])
+        self.assertEqual(len(mapping['a2']), 1)
+        self.assertEqual(len(mapping['a3']), 1)
+
+    def test_better_than_initial_mapping(self):
+        mapping = lp_model(self.cg, self.agents,
+                           footprint=lambda c: 10,
+                           capacity=lambda a: 20,
+                           route=lambda a1, a2: 1,
+                           msg_load=lambda c1, c2: 10,
+                           hosting_cost=lambda a, c: 0 if a == 'a3' else 1,
+                           solver='cbc',
+                           initial_mapping={'a1': ['c1'], 'a2': ['c2']})
+
+        self.assertEqual(sorted(mapping['a3']), ['c1', 'c2'])
+
+    def test_initial_mapping_when_no_solution(self):
+        initial = {'a1': ['c1'], 'a2': ['c2'], 'a3': []}
+        # When the solver does not find any solution (e.g. time limit),
+        # use the initial solution.
+        with unittest.mock.patch.object(ilp_compref, 'solve',
+                                        return_value=0):
+            mapping = lp_model(self.cg, self.agents,
+                               footprint=lambda c: 10,
+                               capacity=lambda a: 20,
+                               route=lambda a1, a2: 1,
+                               msg_load=lambda c1, c2: 10,
+                               hosting_cost=lambda a, c: 0,
+                               initial_mapping=initial)
+
+        self.assertEqual(mapping, initial)
+
+    def test_invalid_initial_mapping_is_ignored(self):
+        with unittest.mock.patch.object(ilp_compref, 'solve',
+                                        return_value=0):
+            self.assertRaises(ImpossibleDistributionException, lp_model,
+                              self.cg, self.agents,
+                              footprint=lambda c: 10,
+                              capacity=lambda a: 10,
+                              route=lambda a1, a2: 1,
+                              msg_load=lambda c1, c2: 10,
+                              hosting_cost=lambda a, c: 0,
+                              initial_mapping={'a1': ['c1', 'c2']})
+
+    def test_dist_params(self):
+        params = dist_params({'solver': 'cbc', 'time_limit': '10'})
+
+        self.assertEqual(params['solver'], 'cbc')
+        self.assertEqual(params['time_limit'], 10)
+        self.assertIsNone(params['mip_gap'])
+        self.assertTrue(params['warm_start'])
+
+        self.assertRaises(ValueError, dist_params, {'solver': 'foo'})
+        self.assertRaises(ValueError, dist_params, {'foo': 'bar'})
+
+
 def is_same_route(r1, r2):
     a1, a2 = r2
     return (r1 == r2) or (r1 == (a2, a1))
@@ -40,9 +40,9 @@ from pydcop.computations_graph.factor_graph import ComputationsFactorGraph, \
 from pydcop.dcop.objects import Variable, VariableDomain, AgentDef
 from pydcop.dcop.relations import relation_from_str
 from pydcop.distribution.ilp_fgdp import distribute, _build_alphaijk_binvars, \
-    _objective_function, _computation_memory_in_cg
+    _objective_function, _computation_memory_in_cg, _repair_mapping
 from pydcop.distribution.objects import DistributionHints, \
-    ImpossibleDistributionException
+    ImpossibleDistributionException, Distribution
 
 Agent = namedtuple('Agent', ['name'])
 
@@ -298,6 +298,36 @@ class UtilityFunctions(unittest.TestCase):
         self.assertIn((('v1', 'f2'), 'a2'), alphas)
         print(alphas)
 
+    def test_build_alphaijk_only_for_candidate_agents(self):
+        f1 = relation_from_str('f1', 'v1 * 0.5', [v1])
+        f2 = relation_from_str('f2', 'v1 * 0.5', [v1])
+        cv1 = VariableComputationNode(v1, ['f1', 'f2'])
+        cf1 = FactorComputationNode(f1)
+        cf2 = FactorComputationNode(f2)
+        cg = ComputationsFactorGraph([cv1], [cf1, cf2])
+
+        agents_names = ['a1', 'a2']
+        # f2 is already hosted : no alpha for links with f2
+        candidates = {'v1': {'a1', 'a2'}, 'f1': {'a2'}}
+
+        alphas = _build_alphaijk_binvars(cg, agents_names, candidates)
+
+        self.assertEqual(len(alphas), 1)
+        self.assertIn((('v1', 'f1'), 'a2'), alphas)
+
+    def test_repair_mapping(self):
+        # v1 must be hosted on a2 and a3 must host at least one computation
+        mapping = {'a1': ['v1', 'f1', 'f2'], 'a2': [], 'a3': []}
+        fixed = Distribution({'a2': ['v1']})
+
+        repaired = _repair_mapping(mapping, ['a1', 'a2', 'a3'],
+                                   {'v1': 10, 'f1': 10, 'f2': 10}, fixed,
+                                   {'a1': 100, 'a2': 90, 'a3': 100})
+
+        self.assertEqual(repaired['a2'], ['v1'])
+        self.assertEqual(len(repaired['a1']), 1)
+        self.assertEqual(len(repaired['a3']), 1)
+
     def test_obj_function(self):
         f1 = relation_from_str('f1', 'v1 * 0.5', [v1])
         cv1 = VariableComputationNode(v1, ['f1'])
@@ -307,7 +337,7 @@ class UtilityFunctions(unittest.TestCase):
         agents_names = ['a1', 'a2']
         alphas = _build_alphaijk_binvars(cg, agents_names)
 
-        obj = _objective_function(cg, communication_load, alphas, agents_names)
+        obj = _objective_function(cg, communication_load, alphas)
 
         # In that case, the objective function must depend on two variables:
         self.assertEqual(len(obj.sorted_keys()), 2)
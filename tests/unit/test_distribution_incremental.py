@@ -0,0 +1,184 @@
+# BSD-3-Clause License
+#
+# Copyright 2017 Orange
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+
+
+import pytest
+
+from pydcop.dcop.objects import AgentDef
+from pydcop.distribution.incremental import distribute_remove, \
+    distribute_add
+from pydcop.distribution.objects import Distribution, DistributionHints, \
+    ImpossibleDistributionException
+
+
+@pytest.fixture
+def graph(chain_graph):
+    # chain c1 - c2 - c3 - c4
+    return chain_graph(4)
+
+
+def test_remove_orphaned_go_to_neighbors(graph):
+    agents = [AgentDef('a1', capacity=100), AgentDef('a2', capacity=100),
+              AgentDef('a3', capacity=100)]
+    dist = Distribution({'a1': ['c1'], 'a2': ['c2'], 'a3': ['c3', 'c4']})
+
+    new_dist = distribute_remove(dist, graph, agents, ['a2'],
+                                 computation_memory=lambda c: 1,
+                                 communication_load=lambda c, n: 1)
+
+    assert 'a2' not in new_dist.agents
+    assert sorted(new_dist.computations) == ['c1', 'c2', 'c3', 'c4']
+    # c2 is hosted with one of its neighbors
+    assert new_dist.agent_for('c2') in [new_dist.agent_for('c1'),
+                                        new_dist.agent_for('c3')]
+
+
+def test_remove_respects_capacity(graph):
+    agents = [AgentDef('a1', capacity=2), AgentDef('a2', capacity=100),
+              AgentDef('a3', capacity=2)]
+    dist = Distribution({'a1': ['c1'], 'a2': ['c2'], 'a3': ['c3', 'c4']})
+
+    new_dist = distribute_remove(dist, graph, agents, ['a2'],
+                                 computation_memory=lambda c: 1,
+                                 communication_load=lambda c, n: 1)
+
+    assert new_dist.agent_for('c2') == 'a1'
+
+
+def test_remove_makes_room(graph):
+    # No agent has enough capacity for c2: c4 is moved to make room for it.
+    agents = [AgentDef('a1', capacity=1), AgentDef('a2', capacity=100),
+              AgentDef('a3', capacity=3), AgentDef('a4', capacity=1)]
+    dist = Distribution({'a1': ['c1'], 'a2': ['c2'], 'a3': ['c3', 'c4'],
+                         'a4': []})
+
+    new_dist = distribute_remove(
+        dist, graph, agents, ['a2'],
+        computation_memory=lambda c: 2 if c.name == 'c2' else 1,
+        communication_load=lambda c, n: 1)
+
+    assert new_dist.agent_for('c2') == 'a3'
+    assert new_dist.agent_for('c4') == 'a4'
+
+
+def test_remove_only_move_movable(graph):
+    agents = [AgentDef('a1', capacity=1), AgentDef('a2', capacity=100),
+              AgentDef('a3', capacity=3), AgentDef('a4', capacity=1)]
+    dist = Distribution({'a1': ['c1'], 'a2': ['c2'], 'a3': ['c3', 'c4'],
+                         'a4': []})
+
+    with pytest.raises(ImpossibleDistributionException):
+        distribute_remove(
+            dist, graph, agents, ['a2'],
+            computation_memory=lambda c: 2 if c.name == 'c2' else 1,
+            communication_load=lambda c, n: 1,
+            movable=[])
+
+
+def test_remove_impossible(graph):
+    agents = [AgentDef('a1', capacity=1), AgentDef('a2', capacity=100),
+              AgentDef('a3', capacity=2)]
+    dist = Distribution({'a1': ['c1'], 'a2': ['c2'], 'a3': ['c3', 'c4']})
+
+    with pytest.raises(ImpossibleDistributionException):
+        distribute_remove(dist, graph, agents, ['a2'],
+                          computation_memory=lambda c: 1,
+                          communication_load=lambda c, n: 1)
+
+
+def test_remove_host_with(graph):
+    agents = [AgentDef('a1', capacity=100), AgentDef('a2', capacity=100),
+              AgentDef('a3', capacity=100, hosting_costs={'c1': 10})]
+    dist = Distribution({'a1': ['c4'], 'a2': ['c1', 'c2', 'c3']})
+    hints = DistributionHints(host_with={'c1': ['c3']})
+
+    new_dist = distribute_remove(dist, graph, agents, ['a2'], hints,
+                                 computation_memory=lambda c: 1,
+                                 communication_load=lambda c, n: 1)
+
+    assert new_dist.agent_for('c1') == new_dist.agent_for('c3')
+
+
+def test_remove_local_search_moves_neighbors(graph):
+    # c2 is placed on a3, as it has a higher load with c3 than with c1,
+    # then c1, which is alone on a1, is moved along.
+    agents = [AgentDef('a1', capacity=100),
+              AgentDef('a2', capacity=100),
+              AgentDef('a3', capacity=100)]
+    dist = Distribution({'a1': ['c1'], 'a2': ['c2'], 'a3': ['c3', 'c4']})
+
+    def load(c, n):
+        return 5 if {c.name, n} == {'c2', 'c3'} else 1
+
+    new_dist = distribute_remove(dist, graph, agents, ['a2'],
+                                 computation_memory=lambda c: 1,
+                                 communication_load=load)
+
+    assert sorted(new_dist.computations_hosted('a3')) == \
+        ['c1', 'c2', 'c3', 'c4']
+
+
+def test_add_must_host(graph):
+    agents = [AgentDef('a1', capacity=100), AgentDef('a2', capacity=100)]
+    dist = Distribution({'a1': ['c1', 'c2', 'c3', 'c4']})
+    hints = DistributionHints(must_host={'a2': ['c4']})
+
+    new_dist = distribute_add(dist, graph, agents, ['a2'], hints,
+                              computation_memory=lambda c: 1,
+                              communication_load=lambda c, n: 1)
+
+    assert new_dist.agent_for('c4') == 'a2'
+    assert new_dist.agent_for('c1') == 'a1'
+
+
+def test_add_hosting_costs(graph):
+    agents = [AgentDef('a1', capacity=100, default_hosting_cost=5),
+              AgentDef('a2', capacity=100, default_hosting_cost=5,
+                       hosting_costs={'c4': 0, 'c3': 0})]
+    dist = Distribution({'a1': ['c1', 'c2', 'c3', 'c4']})
+
+    new_dist = distribute_add(dist, graph, agents, ['a2'],
+                              computation_memory=lambda c: 1,
+                              communication_load=lambda c, n: 1)
+
+    assert sorted(new_dist.computations_hosted('a2')) == ['c3', 'c4']
+    assert sorted(new_dist.computations_hosted('a1')) == ['c1', 'c2']
+
+
+def test_add_default_costs_no_move(graph):
+    agents = [AgentDef('a1', capacity=100), AgentDef('a2', capacity=100)]
+    dist = Distribution({'a1': ['c1', 'c2', 'c3', 'c4']})
+
+    new_dist = distribute_add(dist, graph, agents, ['a2'],
+                              computation_memory=lambda c: 1,
+                              communication_load=lambda c, n: 1)
+
+    assert new_dist.computations_hosted('a2') == []
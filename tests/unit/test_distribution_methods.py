@@ -0,0 +1,82 @@
+# BSD-3-Clause License
+#
+# Copyright 2017 Orange
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+
+"""
+Tests common to distribution methods that support capacity and hosting
+costs.
+"""
+
+from importlib import import_module
+
+import pytest
+
+from pydcop.dcop.objects import AgentDef
+from pydcop.distribution.objects import ImpossibleDistributionException
+
+
+@pytest.fixture(params=['heur_comhost', 'partition'])
+def distribute(request):
+    return import_module('pydcop.distribution.{}'.format(
+        request.param)).distribute
+
+
+def test_respect_capacity(graph, distribute):
+    agents = [AgentDef('a1', capacity=10), AgentDef('a2', capacity=10)]
+
+    dist = distribute(graph, agents,
+                      computation_memory=lambda c: 5,
+                      communication_load=lambda c, n: 1)
+
+    assert sorted(dist.computations) == ['c1', 'c2', 'c3']
+    assert len(dist.computations_hosted('a1')) <= 2
+    assert len(dist.computations_hosted('a2')) <= 2
+
+
+def test_hosting_cost(graph, distribute):
+    agents = [AgentDef('a1', capacity=100, hosting_costs={'c2': 10}),
+              AgentDef('a2', capacity=100, default_hosting_cost=1)]
+
+    dist = distribute(graph, agents,
+                      computation_memory=lambda c: 5,
+                      communication_load=lambda c, n: 0)
+
+    assert sorted(dist.computations_hosted('a1')) == ['c1', 'c3']
+    assert dist.computations_hosted('a2') == ['c2']
+
+
+def test_impossible_distribution(graph, distribute):
+    agents = [AgentDef('a1', capacity=5), AgentDef('a2', capacity=5)]
+
+    # heur_comhost raises a ValueError
+    with pytest.raises((ImpossibleDistributionException, ValueError)):
+        distribute(graph, agents,
+                   computation_memory=lambda c: 5,
+                   communication_load=lambda c, n: 1)
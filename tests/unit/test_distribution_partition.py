@@ -0,0 +1,160 @@
+# BSD-3-Clause License
+#
+# Copyright 2017 Orange
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+
+
+import pytest
+
+from pydcop.computations_graph.objects import ComputationGraph, \
+    ComputationNode
+from pydcop.dcop.objects import AgentDef
+from pydcop.distribution import partition
+from pydcop.distribution.objects import DistributionHints, \
+    ImpossibleDistributionException
+from pydcop.distribution.partition import distribute, WeightedGraph
+
+
+def clusters_graph(clusters, size):
+    """
+    Graph made of `clusters` rings of `size` nodes, each ring being linked
+    to the next one by a single edge, with a low communication load.
+    """
+    neighbors = {}
+    for k in range(clusters):
+        for i in range(size):
+            name = 'c{}_{}'.format(k, i)
+            neighbors[name] = {'c{}_{}'.format(k, (i + 1) % size),
+                               'c{}_{}'.format(k, (i - 1) % size)}
+    for k in range(clusters - 1):
+        neighbors['c{}_0'.format(k)].add('c{}_1'.format(k + 1))
+        neighbors['c{}_1'.format(k + 1)].add('c{}_0'.format(k))
+    nodes = [ComputationNode(n, 'dummy_type', neighbors=sorted(neighbors[n]))
+             for n in sorted(neighbors)]
+    cg = ComputationGraph(graph_type='test', nodes=nodes)
+
+    def load(c, n):
+        return 1 if c.name.split('_')[0] == n.split('_')[0] else 0.1
+    return cg, load
+
+
+def test_must_host(graph):
+    agents = [AgentDef('a1', capacity=100), AgentDef('a2', capacity=100)]
+    hints = DistributionHints(must_host={'a2': ['c1']})
+
+    dist = distribute(graph, agents, hints,
+                      computation_memory=lambda c: 5,
+                      communication_load=lambda c, n: 1)
+
+    # Without communication cost, all computations are hosted with c1.
+    assert sorted(dist.computations_hosted('a2')) == ['c1', 'c2', 'c3']
+
+
+def test_host_with(graph):
+    agents = [AgentDef('a1', capacity=10), AgentDef('a2', capacity=10)]
+    hints = DistributionHints(host_with={'c1': ['c3']})
+
+    dist = distribute(graph, agents, hints,
+                      computation_memory=lambda c: 5,
+                      communication_load=lambda c, n: 1)
+
+    assert dist.agent_for('c1') == dist.agent_for('c3')
+    assert dist.agent_for('c2') != dist.agent_for('c1')
+
+
+def test_conflicting_hints(graph):
+    agents = [AgentDef('a1', capacity=100), AgentDef('a2', capacity=100)]
+    hints = DistributionHints(must_host={'a1': ['c1'], 'a2': ['c3']},
+                              host_with={'c1': ['c3']})
+
+    with pytest.raises(ImpossibleDistributionException):
+        distribute(graph, agents, hints,
+                   computation_memory=lambda c: 5,
+                   communication_load=lambda c, n: 1)
+
+
+def test_requires_memory_and_load(graph):
+    agents = [AgentDef('a1', capacity=100)]
+
+    with pytest.raises(ImpossibleDistributionException):
+        distribute(graph, agents)
+
+
+def test_clusters_on_same_agent(monkeypatch):
+    # Use several coarsening levels, even on a small graph.
+    monkeypatch.setattr(partition, 'COARSEST_NODES_PER_AGENT', 2)
+    cg, load = clusters_graph(4, 30)
+    agents = [AgentDef('a{}'.format(i), capacity=40) for i in range(4)]
+
+    dist = distribute(cg, agents,
+                      computation_memory=lambda c: 1,
+                      communication_load=load)
+
+    for k in range(4):
+        cluster = {dist.agent_for('c{}_{}'.format(k, i)) for i in range(30)}
+        assert len(cluster) == 1
+    cost, comm, _ = partition.distribution_cost(
+        dist, cg, agents, lambda c: 1, load)
+    # Only the 3 edges between clusters have a communication cost
+    assert comm == pytest.approx(3 * 0.1)
+
+
+def test_coarsen_heavy_edge_matching():
+    # 0 - 1 - 2 - 3, with heavy edges 0-1 and 2-3
+    graph = WeightedGraph(
+        weights=[1, 1, 1, 1],
+        edges=[{1: 5}, {0: 5, 2: 1}, {1: 1, 3: 5}, {2: 5}],
+        sizes=[1, 1, 1, 1], hosting=[{0: 2}, {0: 1}, {}, {}],
+        fixed=[None, None, None, None])
+
+    coarse = graph.coarsen(max_weight=2)
+
+    assert graph.coarse_map[0] == graph.coarse_map[1]
+    assert graph.coarse_map[2] == graph.coarse_map[3]
+    assert len(coarse) == 2
+    c01 = graph.coarse_map[0]
+    c23 = graph.coarse_map[2]
+    assert coarse.weights == [2, 2]
+    assert coarse.sizes == [2, 2]
+    assert coarse.hosting[c01] == {0: 3}
+    assert coarse.edges[c01] == {c23: 1}
+
+
+def test_coarsen_respects_max_weight_and_fixed():
+    graph = WeightedGraph(
+        weights=[1, 2, 1],
+        edges=[{1: 5, 2: 1}, {0: 5}, {0: 1}],
+        sizes=[1, 1, 1], hosting=[{}, {}, {}],
+        fixed=[0, None, 1])
+
+    coarse = graph.coarsen(max_weight=2)
+
+    # 0-1 is too heavy and 0-2 are pinned on different agents
+    assert len(coarse) == 3
+    assert sorted(coarse.fixed, key=str) == [0, 1, None]
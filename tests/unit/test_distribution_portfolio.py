@@ -0,0 +1,192 @@
+# BSD-3-Clause License
+#
+# Copyright 2017 Orange
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+
+import multiprocessing
+import time
+
+import pytest
+
+from pydcop.dcop.objects import AgentDef
+from pydcop.distribution import adhoc, portfolio
+from pydcop.distribution.objects import Distribution, DistributionHints, \
+    ImpossibleDistributionException
+from pydcop.distribution.portfolio import run_portfolio, dist_params, \
+    FINISHED, FAILED, TIMEOUT
+
+
+def memory(computation):
+    return 5
+
+
+def load(computation, neighbor):
+    return 1
+
+
+def test_best_distribution(graph):
+    agents = [AgentDef('a1', capacity=100), AgentDef('a2', capacity=100),
+              AgentDef('a3', capacity=100)]
+
+    best, results = run_portfolio(graph, agents,
+                                  computation_memory=memory,
+                                  communication_load=load,
+                                  methods=['oneagent', 'partition'],
+                                  time_budget=20)
+
+    assert [r.method for r in results] == ['oneagent', 'partition']
+    assert all(r.status == FINISHED for r in results)
+    # oneagent places each computation on its own agent, partition places
+    # them all on the same agent, without any communication cost.
+    assert results[0].cost > 0
+    assert results[1].cost == 0
+    assert best.method == 'partition'
+    assert sorted(best.distribution.computations) == ['c1', 'c2', 'c3']
+
+
+def test_failed_methods_are_ignored(graph):
+    agents = [AgentDef('a1', capacity=100), AgentDef('a2', capacity=100)]
+
+    dist = portfolio.distribute(graph, agents,
+                                computation_memory=memory,
+                                communication_load=load,
+                                methods=['oneagent', 'heur_comhost'],
+                                time_budget=20)
+
+    assert sorted(dist.computations) == ['c1', 'c2', 'c3']
+
+
+def test_failure_reported(graph):
+    agents = [AgentDef('a1', capacity=100), AgentDef('a2', capacity=100)]
+
+    _, results = run_portfolio(graph, agents,
+                               computation_memory=memory,
+                               communication_load=load,
+                               methods=['oneagent', 'heur_comhost'],
+                               time_budget=20)
+
+    assert results[0].status == FAILED
+    assert 'Not enough agents' in results[0].error
+    assert results[0].distribution is None
+
+
+def test_no_distribution(graph):
+    agents = [AgentDef('a1', capacity=100)]
+
+    with pytest.raises(ImpossibleDistributionException):
+        portfolio.distribute(graph, agents,
+                             computation_memory=memory,
+                             communication_load=load,
+                             methods=['oneagent'], time_budget=20)
+
+
+def test_requires_memory_and_load(graph):
+    agents = [AgentDef('a1', capacity=100)]
+
+    with pytest.raises(ImpossibleDistributionException):
+        portfolio.distribute(graph, agents, methods=['heur_comhost'])
+
+
+def slow_distribute(*args, **kwargs):
+    time.sleep(60)
+
+
+@pytest.mark.skipif(multiprocessing.get_start_method() != 'fork',
+                    reason='requires forked processes')
+def test_stragglers_are_killed(graph, monkeypatch):
+    # Methods are run in forked processes, that see the patched function.
+    monkeypatch.setattr(adhoc, 'distribute', slow_distribute)
+    agents = [AgentDef('a1', capacity=100), AgentDef('a2', capacity=100)]
+
+    start = time.perf_counter()
+    best, results = run_portfolio(graph, agents,
+                                  computation_memory=memory,
+                                  communication_load=load,
+                                  methods=['adhoc', 'heur_comhost'],
+                                  time_budget=2, max_workers=2)
+
+    assert time.perf_counter() - start < 10
+    assert results[0].status == TIMEOUT
+    assert best.method == 'heur_comhost'
+
+
+def all_on_a1(computation_graph, *args, **kwargs):
+    return Distribution({'a1': [n.name for n in computation_graph.nodes]})
+
+
+@pytest.mark.skipif(multiprocessing.get_start_method() != 'fork',
+                    reason='requires forked processes')
+def test_capacity_violation_fails(graph, monkeypatch):
+    # Hosting all computations on a1 costs nothing but exceeds its capacity
+    monkeypatch.setattr(adhoc, 'distribute', all_on_a1)
+    agents = [AgentDef('a1', capacity=10), AgentDef('a2', capacity=10)]
+
+    best, results = run_portfolio(graph, agents,
+                                  computation_memory=memory,
+                                  communication_load=load,
+                                  methods=['adhoc', 'heur_comhost'],
+                                  time_budget=20)
+
+    assert results[0].status == FAILED
+    assert 'Capacity of agent a1 exceeded' in results[0].error
+    assert best.method == 'heur_comhost'
+    assert len(best.distribution.computations_hosted('a1')) <= 2
+
+
+@pytest.mark.skipif(multiprocessing.get_start_method() != 'fork',
+                    reason='requires forked processes')
+def test_hints_violation_fails(graph, monkeypatch):
+    monkeypatch.setattr(adhoc, 'distribute', all_on_a1)
+    agents = [AgentDef('a1', capacity=100), AgentDef('a2', capacity=100)]
+    hints = DistributionHints(must_host={'a2': ['c2']})
+
+    best, results = run_portfolio(graph, agents, hints,
+                                  computation_memory=memory,
+                                  communication_load=load,
+                                  methods=['adhoc', 'partition'],
+                                  time_budget=20)
+
+    assert results[0].status == FAILED
+    assert 'must be hosted on a2' in results[0].error
+    assert best.distribution.agent_for('c2') == 'a2'
+
+
+def test_dist_params():
+    params = dist_params({'methods': 'heur_comhost, partition',
+                          'time_budget': '10'})
+
+    assert params == {'methods': ['heur_comhost', 'partition'],
+                      'time_budget': 10, 'max_workers': None}
+
+
+def test_invalid_dist_params():
+    with pytest.raises(ValueError):
+        dist_params({'foo': '1'})
+    with pytest.raises(TypeError):
+        dist_params({'time_budget': 'foo'})
@@ -31,7 +31,8 @@
 
 import pytest
 
-from pydcop.computations_graph.objects import ComputationNode, Link
+from pydcop.computations_graph.objects import ComputationNode, Link, \
+    ComputationGraph
 from pydcop.utils.simple_repr import from_repr, simple_repr
 
 
@@ -94,4 +95,41 @@ def test_node_simplerepr():
     assert 'n2' in n1.neighbors
     assert 'n3' in n1.neighbors
     assert 'n4' in n1.neighbors
-    assert len(n1.links) == 3
\ No newline at end of file
+    assert len(n1.links) == 3
+
+def test_graph_lookup_computation():
+    cg = ComputationGraph(nodes=[ComputationNode('n1', neighbors=['n2']),
+                                 ComputationNode('n2', neighbors=['n1'])])
+
+    assert cg.computation('n2').name == 'n2'
+    assert cg.neighbors('n1') == ['n2']
+    assert Link(['n1', 'n2']) in cg.links_for_node('n2')
+    with pytest.raises(KeyError):
+        cg.computation('n3')
+
+
+def test_graph_lookup_after_nodes_change():
+    cg = ComputationGraph(nodes=[ComputationNode('n1', neighbors=['n2'])])
+    assert len(cg.links) == 1
+
+    cg.nodes.append(ComputationNode('n3', neighbors=['n1']))
+    assert cg.computation('n3').name == 'n3'
+    assert len(cg.links) == 2
+
+    cg.nodes = [ComputationNode('n4')]
+    assert cg.computation('n4').name == 'n4'
+    assert len(cg.links) == 0
+    with pytest.raises(KeyError):
+        cg.computation('n1')
+
+
+def test_graph_lookup_after_node_replaced():
+    cg = ComputationGraph(nodes=[ComputationNode('n1', neighbors=['n2']),
+                                 ComputationNode('n2', neighbors=['n1'])])
+    assert len(cg.links) == 1
+
+    cg.nodes[1] = ComputationNode('n3', neighbors=['n1'])
+    assert cg.computation('n3').name == 'n3'
+    assert cg.links == {Link(['n1', 'n2']), Link(['n1', 'n3'])}
+    with pytest.raises(KeyError):
+        cg.computation('n2')
@@ -29,12 +29,14 @@
 # POSSIBILITY OF SUCH DAMAGE.
 
 
+import random
 import unittest
 
 from pydcop.computations_graph.pseudotree import _find_neighbors_relations, \
     _BuildingNode, \
     _generate_dfs_tree, _visit_tree, build_computation_graph, \
-    _filter_relation_to_lowest_node, PseudoTreeNode, PseudoTreeLink
+    _filter_relation_to_lowest_node, PseudoTreeNode, PseudoTreeLink, \
+    PSEUDOTREE_HEURISTICS, UTIL_ENTRY_SIZE, pseudotree_candidates
 from pydcop.dcop.objects import Variable, VariableDomain
 from pydcop.dcop.dcop import DCOP
 from pydcop.dcop.relations import NAryFunctionRelation, relation_from_str
@@ -488,4 +490,156 @@ class TestMetrics(unittest.TestCase):
 
         g = build_computation_graph(dcop)
 
-        self.assertEqual(g.density(), 2/2)
\ No newline at end of file
+        self.assertEqual(g.density(), 2/2)
+
+def _is_valid_pseudotree(cg, constraints):
+    # All constraints must be between a node and one of its ancestors
+    ancestors = {}
+    for root in cg.roots:
+        for n in _visit_tree(root):
+            ancestors[n.name] = set() if n.parent is None \
+                else ancestors[n.parent.name] | {n.parent.name}
+    for c in constraints:
+        names = [v.name for v in c.dimensions]
+        for a in names:
+            for b in names:
+                if a != b and a not in ancestors[b] and b not in ancestors[a]:
+                    return False
+    return True
+
+
+def _random_graph(count, edges_count, seed=0):
+    rnd = random.Random(seed)
+    variables = [Variable('x{}'.format(i), [0, 1]) for i in range(count)]
+    constraints = []
+    for i in range(edges_count):
+        x, y = rnd.sample(variables, 2)
+        constraints.append(NAryFunctionRelation(lambda a, b: a + b, [x, y],
+                                                name='c{}'.format(i)))
+    return variables, constraints
+
+
+class PseudoTreeHeuristics(unittest.TestCase):
+
+    def test_long_chain(self):
+        # Used to hit the recursion limit with the recursive DFS
+        variables = [Variable('x{}'.format(i), [0, 1]) for i in range(5000)]
+        constraints = [
+            NAryFunctionRelation(lambda a, b: a + b,
+                                 [variables[i], variables[i+1]],
+                                 name='c{}'.format(i))
+            for i in range(len(variables) - 1)]
+
+        cg = build_computation_graph(None, variables=variables,
+                                     constraints=constraints)
+
+        self.assertEqual(len(cg.nodes), 5000)
+        self.assertEqual(len(cg.roots), 1)
+        self.assertEqual(cg.induced_width, 1)
+
+    def test_heuristics_build_valid_pseudotrees(self):
+        variables, constraints = _random_graph(40, 80)
+        for heuristic in PSEUDOTREE_HEURISTICS:
+            cg = build_computation_graph(None, variables=variables,
+                                         constraints=constraints,
+                                         heuristic=heuristic)
+            self.assertEqual(len(cg.nodes), 40)
+            self.assertTrue(_is_valid_pseudotree(cg, constraints))
+
+    def test_max_degree_root(self):
+        x = [Variable('x{}'.format(i), [0, 1]) for i in range(4)]
+        constraints = [
+            NAryFunctionRelation(lambda a, b: a + b, [x[0], x[1]], name='c1'),
+            NAryFunctionRelation(lambda a, b: a + b, [x[1], x[2]], name='c2'),
+            NAryFunctionRelation(lambda a, b: a + b, [x[1], x[3]], name='c3')]
+
+        for heuristic in ['most_connected', 'max_degree']:
+            cg = build_computation_graph(None, variables=x,
+                                         constraints=constraints,
+                                         heuristic=heuristic)
+            self.assertEqual(cg.roots[0].name, 'x1')
+
+    def test_several_components(self):
+        variables, constraints = _random_graph(30, 20)
+
+        cg = build_computation_graph(None, variables=variables,
+                                     constraints=constraints)
+
+        self.assertEqual(len(cg.nodes), 30)
+        self.assertGreater(len(cg.roots), 1)
+        self.assertTrue(_is_valid_pseudotree(cg, constraints))
+
+    def test_separators(self):
+        #       x1---X3
+        #        \  /
+        #         x2---x4
+        domain = ['a', 'b', 'c']
+        x1, x2, x3, x4 = (Variable('x{}'.format(i), domain)
+                          for i in range(1, 5))
+        dcop = DCOP('test', 'min')
+        dcop.add_constraint(relation_from_str('r1', 'x1 + x2', [x1, x2]))
+        dcop.add_constraint(relation_from_str('r2', 'x1 + x3', [x1, x3]))
+        dcop.add_constraint(relation_from_str('r3', 'x2 + x3', [x2, x3]))
+        dcop.add_constraint(relation_from_str('r4', 'x2 + x4', [x2, x4]))
+
+        cg = build_computation_graph(dcop)
+
+        # x2 has the highest degree, it is the root
+        self.assertEqual(cg.roots[0].name, 'x2')
+        self.assertEqual(cg.separators['x2'], set())
+        self.assertEqual(cg.separators['x4'], {'x2'})
+        self.assertEqual(cg.separators['x1'], {'x2'})
+        self.assertEqual(cg.separators['x3'], {'x1', 'x2'})
+        self.assertEqual(cg.induced_width, 2)
+
+    def test_util_sizes(self):
+        # same graph as test_separators, with a bigger domain for x1
+        x1 = Variable('x1', list(range(5)))
+        x2, x3, x4 = (Variable('x{}'.format(i), ['a', 'b', 'c'])
+                      for i in range(2, 5))
+        dcop = DCOP('test', 'min')
+        dcop.add_constraint(relation_from_str('r1', 'x1 + x2', [x1, x2]))
+        dcop.add_constraint(relation_from_str('r2', 'x1 + x3', [x1, x3]))
+        dcop.add_constraint(relation_from_str('r3', 'x2 + x3', [x2, x3]))
+        dcop.add_constraint(relation_from_str('r4', 'x2 + x4', [x2, x4]))
+
+        cg = build_computation_graph(dcop)
+
+        self.assertEqual(cg.util_sizes,
+                         {'x2': 1, 'x4': 3, 'x1': 3, 'x3': 15})
+        self.assertEqual(cg.max_util_size, 15)
+        self.assertEqual(cg.util_memory, 22 * UTIL_ENTRY_SIZE)
+
+    def test_candidates(self):
+        variables, constraints = _random_graph(30, 50)
+
+        candidates = pseudotree_candidates(None, variables, constraints,
+                                           restarts=8, seed=1)
+
+        self.assertEqual([c.heuristic for c in candidates[:4]],
+                         PSEUDOTREE_HEURISTICS)
+        self.assertLessEqual(len(candidates), 12)
+        for c in candidates:
+            self.assertTrue(_is_valid_pseudotree(c, constraints))
+
+    def test_optimized(self):
+        variables, constraints = _random_graph(30, 50)
+        candidates = pseudotree_candidates(None, variables, constraints,
+                                           time_budget=0.2)
+
+        cg = build_computation_graph(None, variables=variables,
+                                     constraints=constraints,
+                                     heuristic='optimized', time_budget=0.2)
+
+        self.assertTrue(_is_valid_pseudotree(cg, constraints))
+        # Randomized restarts are not reproducible, but the best tree is
+        # always at least as good as the ones built by heuristics.
+        self.assertLessEqual(cg.max_util_size,
+                             min(c.max_util_size for c in candidates[:4]))
+
+    def test_invalid_heuristic(self):
+        variables, constraints = _random_graph(4, 3)
+        with self.assertRaises(ValueError):
+            build_computation_graph(None, variables=variables,
+                                    constraints=constraints,
+                                    heuristic='foo')
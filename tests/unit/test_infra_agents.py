@@ -29,13 +29,14 @@
 # POSSIBILITY OF SUCH DAMAGE.
 
 
+import csv
 from time import sleep
 from unittest.mock import MagicMock
 
 import pytest
 
 from pydcop.infrastructure.computations import MessagePassingComputation, \
-    Message, message_type
+    Message, message_type, NcccClock
 from pydcop.infrastructure.communication import InProcessCommunicationLayer
 from pydcop.infrastructure.agents import Agent, AgentException
 from pydcop.infrastructure.discovery import Directory, UnknownComputation
@@ -290,3 +291,81 @@ def test_periodic_action(agent):
     assert len(list(cb.mock_calls)) == 5
 
 
+
+
+def test_no_msg_metrics_by_default(agent):
+    assert 'msg_metrics' not in agent.metrics()
+
+
+def test_msg_metrics():
+    agent = Agent('agt1', InProcessCommunicationLayer(), msg_metrics=True)
+    c1 = MessagePassingComputation('c1')
+    c1._msg_handlers['test'] = MagicMock()
+    # Agent.metrics() requires a cycle count on computations
+    c1.cycle_count = 0
+    agent.add_computation(c1)
+    agent.start()
+    agent.run()
+
+    c1.post_msg('c1', Message('test'))
+    c1.post_msg('c1', Message('test'))
+    wait_run()
+    agent.stop()
+
+    msg_metrics = agent.metrics()['msg_metrics']
+    assert msg_metrics['queue_wait']['count'] == 2
+    assert msg_metrics['handling']['test']['count'] == 2
+    assert msg_metrics['handling_computation']['c1']['count'] == 2
+    # local messages are not sent through the communication layer
+    assert msg_metrics['send']['count'] == 0
+
+
+def test_trace_handler_stats(tmpdir):
+    path = str(tmpdir.join('trace.csv'))
+    agent = Agent('agt1', InProcessCommunicationLayer(), trace=path)
+    c1 = MessagePassingComputation('c1')
+    c1._msg_handlers['test'] = MagicMock(
+        return_value={'num_msg_out': 3, 'size_msg_out': 12})
+    agent.add_computation(c1)
+    agent.start()
+    agent.run()
+
+    c1.post_msg('c1', Message('test'))
+    wait_run()
+    agent.stop()
+    agent.join()
+
+    with open(path) as f:
+        lines = f.readlines()
+    assert len(lines) == 2
+    assert lines[1].split(',')[2:10] == \
+        ['agt1', 'c1', '0', 'test', 'c1', '0', '3', '12']
+
+
+def test_trace_nccc_clock(tmpdir):
+    path = str(tmpdir.join('trace.csv'))
+    agent = Agent('agt1', InProcessCommunicationLayer(), trace=path,
+                  nccc=True)
+    c1 = MessagePassingComputation('c1')
+    c1.nccc_clock = NcccClock()
+
+    def handler(*_):
+        c1.nccc_clock.check()
+        c1.nccc_clock.check()
+        return {'num_msg_out': 1}
+    c1._msg_handlers['test'] = handler
+    agent.add_computation(c1)
+    agent.start()
+    agent.run()
+
+    c1.post_msg('c1', Message('test'))
+    wait_run()
+    agent.stop()
+    agent.join()
+
+    with open(path) as f:
+        rows = list(csv.DictReader(f))
+    assert len(rows) == 1
+    assert rows[0]['num_msg_out'] == '1'
+    assert rows[0]['cc_count'] == '2'
+    assert rows[0]['nccc'] == '2'
@@ -188,6 +188,64 @@ class TestMessaging(object):
         assert local_messaging.count_all_ext_msg == 0
         assert local_messaging.size_all_ext_msg == 0
 
+    def test_coalescable_msg_replaced_when_pending(self, local_messaging):
+        local_messaging.discovery.register_computation('c1', 'a1')
+        local_messaging.discovery.register_computation('c2', 'a1')
+
+        msg1, msg2 = CoalescableMessage(1), CoalescableMessage(2)
+        local_messaging.post_msg('c1', 'c2', msg1)
+        local_messaging.post_msg('c1', 'c2', msg2)
+
+        # Only the latest message is delivered
+        (src, dest, o_msg, _), _ = local_messaging.next_msg()
+        assert o_msg == msg2
+        assert local_messaging.msg_coalesced_count == 1
+        full_msg, _ = local_messaging.next_msg()
+        assert full_msg is None
+
+        # Once the pending message has been taken, new messages are queued
+        local_messaging.post_msg('c1', 'c2', msg1)
+        (src, dest, o_msg, _), _ = local_messaging.next_msg()
+        assert o_msg == msg1
+
+    def test_coalescable_msg_from_different_sources(self, local_messaging):
+        local_messaging.discovery.register_computation('c1', 'a1')
+        local_messaging.discovery.register_computation('c2', 'a1')
+        local_messaging.discovery.register_computation('c3', 'a1')
+
+        msg1, msg2 = CoalescableMessage(1), CoalescableMessage(2)
+        local_messaging.post_msg('c1', 'c2', msg1)
+        local_messaging.post_msg('c3', 'c2', msg2)
+
+        (src, _, o_msg, _), _ = local_messaging.next_msg()
+        assert (src, o_msg) == ('c1', msg1)
+        (src, _, o_msg, _), _ = local_messaging.next_msg()
+        assert (src, o_msg) == ('c3', msg2)
+        assert local_messaging.msg_coalesced_count == 0
+
+    def test_non_coalescable_msg_always_queued(self, local_messaging):
+        local_messaging.discovery.register_computation('c1', 'a1')
+        local_messaging.discovery.register_computation('c2', 'a1')
+
+        msg1, msg2 = Message('test', 1), Message('test', 2)
+        local_messaging.post_msg('c1', 'c2', msg1)
+        local_messaging.post_msg('c1', 'c2', msg2)
+
+        (_, _, o_msg, _), _ = local_messaging.next_msg()
+        assert o_msg == msg1
+        (_, _, o_msg, _), _ = local_messaging.next_msg()
+        assert o_msg == msg2
+
+
+class CoalescableMessage(Message):
+
+    def __init__(self, content):
+        super().__init__('coalescable', content)
+
+    @property
+    def coalescable(self):
+        return True
+
 
 class TestInProcessCommunictionLayer(object):
 
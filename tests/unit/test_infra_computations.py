@@ -31,7 +31,14 @@
 
 import pytest
 
-from pydcop.infrastructure.computations import Message, message_type
+from pydcop.algorithms import ComputationDef
+from pydcop.algorithms.objects import AlgoDef
+from pydcop.computations_graph.constraints_hypergraph import \
+    VariableComputationNode
+from pydcop.dcop.objects import Variable, Domain
+from pydcop.dcop.relations import constraint_from_str, CountingRelation
+from pydcop.infrastructure.computations import Message, message_type, \
+    MessagePassingComputation, NcccClock, build_computation
 from pydcop.utils.simple_repr import simple_repr
 from pydcop.utils.simple_repr import from_repr
 
@@ -81,3 +88,55 @@ def test_message_factory_serialization():
     print(r)
     obtained = from_repr(r)
     assert msg == obtained
+
+
+def test_nccc_clock_sent_with_messages():
+    c = MessagePassingComputation('c1')
+    c.message_sender = lambda *args: None
+    c.nccc_clock = NcccClock()
+    c.nccc_clock.check()
+
+    msg = Message('test')
+    c.post_msg('c2', msg)
+    assert msg.nccc == 1
+
+
+def test_nccc_clock_merged_on_receive():
+    c = MessagePassingComputation('c1')
+    c._msg_handlers['test'] = lambda *args: None
+    c.nccc_clock = NcccClock()
+    c.nccc_clock.check()
+
+    msg = Message('test')
+    msg.nccc = 5
+    c.on_message('c2', msg, 0)
+    assert c.nccc_clock.clock == 5
+    assert c.nccc_clock.checks == 1
+
+
+def test_no_nccc_clock_by_default():
+    c = MessagePassingComputation('c1')
+    c.message_sender = lambda *args: None
+    msg = Message('test')
+    c.post_msg('c2', msg)
+    assert msg.nccc is None
+
+
+def test_build_computation_counting_checks():
+    d = Domain('d', 'd', [0, 1])
+    v1, v2 = Variable('v1', d), Variable('v2', d)
+    c1 = constraint_from_str('c1', 'v1 + v2', [v1, v2])
+    node = VariableComputationNode(v1, [c1])
+    comp_def = ComputationDef(node, AlgoDef('dsa', mode='min'))
+
+    computation = build_computation(comp_def, count_checks=True)
+    assert computation.nccc_clock is not None
+    assert all(isinstance(c, CountingRelation)
+               for c in computation.computation_def.node.constraints)
+    # the original definition is not modified
+    assert node.constraints == [c1]
+    assert not isinstance(node.constraints[0], CountingRelation)
+
+    computation = build_computation(comp_def)
+    assert computation.nccc_clock is None
+
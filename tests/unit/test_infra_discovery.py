@@ -503,6 +503,22 @@ def test_unsubscribe_computation_no_cb(directory_discovery):
     assert agt2.discovery.computation_agent('c1') == agt1.name
 
 
+def test_unsubscribe_computation_from_cb(directory_discovery):
+    agt_dir, agt1, agt2 = directory_discovery
+
+    def cb(evt, computation, agent):
+        agt2.discovery.unsubscribe_computation('c1', cb)
+    other_cb = MagicMock()
+    agt2.discovery.subscribe_computation('c1', cb)
+    agt2.discovery.subscribe_computation('c1', other_cb)
+
+    agt1.discovery.register_computation('c1')
+    wait_run()
+
+    # the callback after the unsubscribed one must still be called
+    other_cb.assert_called_once_with('computation_added', 'c1', agt1.name)
+
+
 def test_register_replica_for_unknown_replication_should_raise(
         directory_discovery):
     agt_dir, agt1, agt2 = directory_discovery
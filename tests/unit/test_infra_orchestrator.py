@@ -0,0 +1,150 @@
+# BSD-3-Clause License
+#
+# Copyright 2017 Orange
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+
+from queue import Queue
+from unittest.mock import MagicMock
+
+import pytest
+
+from pydcop.algorithms import AlgoDef
+from pydcop.computations_graph import constraints_hypergraph
+from pydcop.dcop.dcop import DCOP
+from pydcop.dcop.objects import Variable, VariableDomain, AgentDef
+from pydcop.infrastructure.orchestrator import AgentsMgt, \
+    ValueChangeMessage, DeployMessage, RunAgentMessage, ResumeMessage, \
+    Orchestrator
+
+
+def agents_mgt(collector, **kwargs):
+    d = VariableDomain('d', '', [0, 1, 2])
+    v1, v2 = Variable('v1', d), Variable('v2', d)
+    dcop = DCOP()
+    dcop += 'c1', 'v1 + 10 * v2', [v1, v2]
+    return AgentsMgt(MagicMock(), MagicMock(), MagicMock(), dcop,
+                     MagicMock(), MagicMock(), collector=collector, **kwargs)
+
+
+def value_change(computation, value):
+    return ValueChangeMessage('a1', computation, value, 0, 0,
+                              {'count_ext_msg': {}, 'size_ext_msg': {},
+                               'active': 0, 'idle': 1})
+
+
+def test_metrics_cost_is_updated_on_value_change():
+    collector = Queue()
+    mgt = agents_mgt(collector)
+
+    mgt._on_value_change_msg('a1', value_change('v1', 1), 0)
+    _, metrics = collector.get_nowait()
+    assert metrics['cost'] is None
+
+    mgt._on_value_change_msg('a1', value_change('v2', 2), 0.1)
+    _, metrics = collector.get_nowait()
+    assert metrics['cost'] == 21
+    assert metrics['violation'] == 0
+
+    mgt._on_value_change_msg('a1', value_change('v1', 0), 0.2)
+    _, metrics = collector.get_nowait()
+    assert metrics['cost'] == 20
+
+
+def test_metrics_max_rate():
+    collector = Queue()
+    mgt = agents_mgt(collector, metrics_max_rate=10)
+
+    mgt._on_value_change_msg('a1', value_change('v1', 1), 0)
+    mgt._on_value_change_msg('a1', value_change('v2', 1), 0.01)
+    mgt._on_value_change_msg('a1', value_change('v2', 2), 0.02)
+    assert collector.qsize() == 1
+
+    # delayed metrics are emitted when flushing, with the latest cost
+    mgt.flush_metrics()
+    assert collector.qsize() == 2
+    collector.get_nowait()
+    t, metrics = collector.get_nowait()
+    assert t == 0.02
+    assert metrics['cost'] == 21
+
+    mgt.flush_metrics()
+    assert collector.qsize() == 0
+
+    mgt._on_value_change_msg('a1', value_change('v1', 0), 0.2)
+    assert collector.qsize() == 1
+
+
+def test_invalid_repair_method():
+    with pytest.raises(ValueError):
+        Orchestrator(MagicMock(), MagicMock(), MagicMock(), MagicMock(),
+                     MagicMock(), repair='foo')
+
+
+def test_incremental_repair_redeploys_orphans():
+    d = VariableDomain('d', '', [0, 1, 2])
+    v1, v2, v3 = Variable('v1', d), Variable('v2', d), Variable('v3', d)
+    dcop = DCOP()
+    dcop += 'c1', 'v1 + v2', [v1, v2]
+    dcop += 'c2', 'v2 + v3', [v2, v3]
+    dcop.add_agents([AgentDef('a1'), AgentDef('a2'), AgentDef('a3')])
+    cg = constraints_hypergraph.build_computation_graph(dcop)
+    algo = AlgoDef('dsa', mode='min')
+
+    hosts = {'a1': ['v1'], 'a2': ['v2'], 'a3': ['v3']}
+    discovery = MagicMock()
+    discovery.agents.side_effect = lambda: list(hosts)
+    discovery.agent_computations.side_effect = lambda a: hosts[a]
+    orchestrator_agent = MagicMock()
+    orchestrator_agent.discovery = discovery
+
+    mgt = AgentsMgt(algo, cg, MagicMock(), dcop, orchestrator_agent,
+                    MagicMock(), repair='incremental')
+    mgt._send_mgt_msg = MagicMock()
+    mgt._dump_distribution = MagicMock()
+
+    mgt._incremental_repair(['a3'])
+
+    # v3 is re-deployed next to v2, its only neighbor
+    agt, msg = mgt._send_mgt_msg.call_args[0]
+    assert agt == 'a2'
+    assert isinstance(msg, DeployMessage)
+    assert msg.comp_def.node.name == 'v3'
+
+    mgt._send_mgt_msg.reset_mock()
+    del hosts['a3']
+    hosts['a2'].append('v3')
+    discovery.computation_agent.return_value = 'a2'
+    mgt._cb_redeployed_registration('computation_added', 'v3', 'a2')
+
+    sent = [c[0] for c in mgt._send_mgt_msg.call_args_list]
+    assert ('a2', RunAgentMessage(['v3'])) in sent
+    resumed = {a for a, m in sent if isinstance(m, ResumeMessage)}
+    assert resumed == {'a1', 'a2'}
+    discovery.unsubscribe_computation.assert_called_once_with(
+        'v3', mgt._cb_redeployed_registration)
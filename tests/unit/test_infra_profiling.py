@@ -0,0 +1,101 @@
+# BSD-3-Clause License
+#
+# Copyright 2017 Orange
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+
+import os
+import pstats
+import sys
+from time import sleep
+
+from pydcop.infrastructure.agents import Agent
+from pydcop.infrastructure.communication import InProcessCommunicationLayer
+from pydcop.infrastructure.computations import MessagePassingComputation, \
+    Message
+from pydcop.infrastructure.profiling import AgentProfiler, collapse_stack
+
+
+def test_handler_timers(tmpdir):
+    profiler = AgentProfiler('a1', str(tmpdir), sampling=False)
+
+    r = profiler.profile_handler('c1', 'test', lambda x: x * 2, 21)
+    profiler.profile_handler('c1', 'test', lambda: None)
+    profiler.profile_handler('c2', 'other', lambda: None)
+
+    assert r == 42
+    assert profiler.handler_times[('c1', 'test')][0] == 2
+    assert profiler.handler_times[('c2', 'other')][0] == 1
+    assert not profiler.busy
+
+
+def test_dump(tmpdir):
+    profiler = AgentProfiler('a1', str(tmpdir), sampling=False)
+    profiler.profile_handler('c1', 'test', sorted, [3, 1, 2])
+    profiler.stop()
+
+    assert os.path.exists(os.path.join(str(tmpdir), 'a1.pstats'))
+    stats = pstats.Stats(os.path.join(str(tmpdir), 'a1.pstats'))
+    assert stats.total_calls > 0
+
+    with open(os.path.join(str(tmpdir), 'a1_handlers.csv')) as f:
+        lines = f.readlines()
+    assert lines[0].startswith('computation,msg_type,count')
+    assert lines[1].startswith('c1,test,1,')
+
+
+def test_collapse_stack():
+    def inner():
+        return collapse_stack(sys._getframe())
+
+    stack = inner()
+    frames = stack.split(';')
+    assert frames[-1].startswith('test_infra_profiling.py:inner:')
+    assert frames[-2].startswith('test_infra_profiling.py:test_collapse_stack')
+
+
+def test_sampling_agent_profiling(tmpdir):
+    agent = Agent('agt1', InProcessCommunicationLayer(), profile=str(tmpdir))
+
+    c1 = MessagePassingComputation('c1')
+    c1._msg_handlers['test'] = lambda *args: sleep(0.1)
+    agent.add_computation(c1)
+    agent.start()
+    agent.run()
+
+    c1.post_msg('c1', Message('test'))
+    sleep(0.3)
+    agent.stop()
+    agent.join()
+
+    with open(os.path.join(str(tmpdir), 'agt1_handlers.csv')) as f:
+        assert 'c1,test,1,' in f.read()
+    with open(os.path.join(str(tmpdir), 'agt1.collapsed')) as f:
+        stacks = f.readlines()
+    assert stacks
+    assert any('profile_handler' in s for s in stacks)
@@ -0,0 +1,225 @@
+# BSD-3-Clause License
+#
+# Copyright 2017 Orange
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# 3. Neither the name of the copyright holder nor the names of its contributors
+#    may be used to endorse or promote products derived from this software
+#    without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+
+import csv
+import os
+
+import pytest
+
+from pydcop.infrastructure.computations import Message
+from pydcop.infrastructure.stats import Histogram, merge_msg_metrics, \
+    msg_metrics_summary, TraceSink, open_trace_sink, merge_nccc_metrics
+
+
+def test_histogram_buckets():
+    h = Histogram([1, 2, 4])
+    for v in [0.5, 1, 1.5, 3, 10]:
+        h.add(v)
+
+    assert h.counts == [2, 1, 1, 1]
+    assert h.count == 5
+    assert h.min == 0.5
+    assert h.max == 10
+    assert h.mean == pytest.approx(16 / 5)
+
+
+def test_histogram_percentile():
+    h = Histogram([1, 2, 4])
+    assert h.percentile(0.5) is None
+
+    for v in [0.5] * 98 + [3, 10]:
+        h.add(v)
+    assert h.percentile(0.5) == 1
+    assert h.percentile(0.99) == 4
+    assert h.percentile(1) == 10
+
+
+def test_histogram_merge():
+    h1, h2 = Histogram([1, 2]), Histogram([1, 2])
+    h1.add(0.5)
+    h2.add(1.5)
+    h2.add(5)
+    h1.merge(h2)
+
+    assert h1.counts == [1, 1, 1]
+    assert h1.min == 0.5
+    assert h1.max == 5
+
+
+def test_histogram_merge_different_buckets():
+    with pytest.raises(ValueError):
+        Histogram([1, 2]).merge(Histogram([1, 3]))
+
+
+def test_histogram_dict_round_trip():
+    h = Histogram()
+    h.add(0.001)
+    h.add(0.2)
+    h2 = Histogram.from_dict(h.to_dict())
+
+    assert h2.counts == h.counts
+    assert h2.total == h.total
+    assert (h2.min, h2.max) == (h.min, h.max)
+
+
+def test_merge_msg_metrics():
+    def agt_msg_metrics(comp, duration):
+        h = Histogram()
+        h.add(duration)
+        return {'msg_metrics': {
+            'queue_wait': h.to_dict(), 'send': Histogram().to_dict(),
+            'handling': {'foo': h.to_dict()},
+            'handling_computation': {comp: h.to_dict()}}}
+
+    merged = merge_msg_metrics([agt_msg_metrics('c1', 0.1),
+                                agt_msg_metrics('c2', 0.3),
+                                {'count_ext_msg': {}}])
+
+    assert merged['queue_wait']['count'] == 2
+    assert merged['handling']['foo']['count'] == 2
+    assert set(merged['handling_computation']) == {'c1', 'c2'}
+
+    summary = msg_metrics_summary(merged)
+    assert summary['handling_avg'] == pytest.approx(0.2)
+    assert summary['send_avg'] is None
+
+
+def test_merge_msg_metrics_not_collected():
+    assert merge_msg_metrics([{'count_ext_msg': {}}]) is None
+
+
+def read_trace(path):
+    with open(path) as f:
+        return list(csv.DictReader(f))
+
+
+def test_trace_buffer_drain(tmpdir):
+    sink = TraceSink(os.path.join(str(tmpdir), 'trace.csv'))
+    buffer = sink.buffer('a1')
+    buffer.record('c1', 'c2', Message('test'), 1, 0.1, None)
+    buffer.record('c1', 'c2', Message('test'), 2, 0.1, None)
+
+    assert len(buffer.drain()) == 2
+    assert buffer.drain() == []
+    sink.close()
+
+
+def test_trace_buffer_capacity(tmpdir):
+    sink = TraceSink(os.path.join(str(tmpdir), 'trace.csv'))
+    buffer = sink.buffer('a1', capacity=2)
+    for i in range(5):
+        buffer.record('c1', 'c2', Message('test'), i, 0.1, None)
+
+    records = buffer.drain()
+    assert len(records) == 2
+    assert buffer.dropped == 3
+    # the oldest records are dropped
+    assert records[0][2] == 3
+    sink.close()
+
+
+def test_trace_sink_writes_csv(tmpdir):
+    path = os.path.join(str(tmpdir), 'trace.csv')
+    sink = open_trace_sink(path)
+    buffer = sink.buffer('a1')
+    buffer.record('c1', 'c2', Message('test'), 1, 0.1,
+                  {'num_msg_out': 2, 'size_msg_out': 6, 'op_count': 12,
+                   'current_value': 'R'})
+    buffer.close()
+
+    rows = read_trace(path)
+    assert len(rows) == 1
+    assert rows[0]['agent'] == 'a1'
+    assert rows[0]['computation'] == 'c1'
+    assert rows[0]['sender'] == 'c2'
+    assert rows[0]['event_type'] == 'test'
+    assert rows[0]['num_msg_out'] == '2'
+    assert rows[0]['size_msg_out'] == '6'
+    assert rows[0]['op_count'] == '12'
+    assert rows[0]['current_value'] == 'R'
+
+
+def test_trace_sink_shared_by_path(tmpdir):
+    path = os.path.join(str(tmpdir), 'trace.csv')
+    sink = open_trace_sink(path)
+    assert open_trace_sink(path) is sink
+    b1, b2 = sink.buffer('a1'), sink.buffer('a2')
+    b1.close()
+    assert open_trace_sink(path) is sink
+    b2.close()
+    # the sink is closed when its last buffer is released
+    assert open_trace_sink(path) is not sink
+    open_trace_sink(path).close()
+
+
+def test_trace_constraint_checks(tmpdir):
+    path = os.path.join(str(tmpdir), 'trace.csv')
+    sink = TraceSink(path)
+    buffer = sink.buffer('a1')
+    buffer.record('c1', 'c0', Message('m'), 1, 1, None)
+    buffer.record('c1', 'c0', Message('m'), 2, 1, {'cc_count': 5, 'nccc': 12})
+    sink.close()
+
+    rows = read_trace(path)
+    # checks are not counted for the first step
+    assert rows[0]['cc_count'] == rows[0]['nccc'] == ''
+    assert rows[1]['cc_count'] == '5'
+    assert rows[1]['nccc'] == '12'
+
+
+def test_trace_parquet(tmpdir):
+    pq = pytest.importorskip('pyarrow.parquet')
+    path = os.path.join(str(tmpdir), 'trace.parquet')
+    sink = TraceSink(path)
+    buffer = sink.buffer('a1')
+    buffer.record('c1', 'c2', Message('test'), 1, 0.1,
+                  {'num_msg_out': 2, 'current_value': 1})
+    sink.close()
+
+    table = pq.read_table(path).to_pydict()
+    assert table['computation'] == ['c1']
+    assert table['num_msg_out'] == [2]
+    assert table['current_value'] == ['1']
+
+
+def test_merge_nccc_metrics():
+    merged = merge_nccc_metrics([
+        {'nccc': {'v1': 10, 'v2': 3},
+         'constraint_checks': {'v1': 7, 'v2': 3}},
+        {'nccc': {'v3': 12}, 'constraint_checks': {'v3': 2}},
+        {'active': 1}
+    ])
+    assert merged == {'nccc': 12, 'constraint_checks': 12}
+
+
+def test_merge_nccc_metrics_not_counted():
+    assert merge_nccc_metrics([{'active': 1}, {'active': 2}]) is None
+
@@ -29,10 +29,19 @@
 # POSSIBILITY OF SUCH DAMAGE.
 
 
+import json
 from unittest.mock import MagicMock
 
-from pydcop.replication.dist_ucs_hostingcosts import UCSReplication
+from pydcop.algorithms import ComputationDef
+from pydcop.algorithms.objects import AlgoDef
+from pydcop.computations_graph.constraints_hypergraph import \
+    VariableComputationNode
+from pydcop.dcop.objects import AgentDef, Variable
+from pydcop.replication.dist_ucs_hostingcosts import UCSReplication, \
+    ReplicationBatch, UCSReplicateMessage
 from pydcop.replication.dist_ucs_hostingcosts import ReplicationTracker
+from pydcop.replication.path_utils import Path, PathsTable
+from pydcop.utils.simple_repr import simple_repr, from_repr
 
 
 def test_tracker_add_computations():
@@ -82,4 +91,88 @@ def test_tracker_when_reaching_0_computation_is_removed():
     assert tracker.is_empty()
 
 
+def comp_def(name):
+    return ComputationDef(VariableComputationNode(Variable(name, [0, 1]), []),
+                          AlgoDef('dsa'))
 
+
+def replication_on(agent_def):
+    agent = MagicMock()
+    agent.name = agent_def.name
+    agent.agent_def = agent_def
+    agent.computations.return_value = []
+    return UCSReplication(agent, MagicMock(), k_target=1)
+
+
+def test_batch_accept_and_done():
+    batch = ReplicationBatch([comp_def('c1'), comp_def('c2')], [10, 20],
+                             [1, 2])
+    assert batch.names == ['c1', 'c2']
+    assert batch.pending() == [0, 1]
+    assert not batch.done
+
+    copied = batch.copy()
+    batch.accept(0, 'a2')
+    batch.accept(1, 'a2')
+    assert batch.pending() == [1]
+    assert batch.hosts == [['a2'], ['a2']]
+    batch.accept(1, 'a3')
+    assert batch.done
+
+    # copies are independent
+    assert copied.pending() == [0, 1]
+    assert copied.hosts == [[], []]
+
+
+def test_replicate_message_simple_repr():
+    batch = ReplicationBatch([comp_def('c1'), comp_def('c2')], [10, 20],
+                             [1, 2], [['a3'], []])
+    paths = PathsTable({Path('a1', 'a2'): 1, Path('a1', 'a3'): 2})
+    msg = UCSReplicateMessage('replicate_request', 3, 1, Path('a1', 'a2'),
+                              paths, ['a1'], batch)
+
+    obtained = from_repr(json.loads(json.dumps(simple_repr(msg))))
+    assert obtained == msg
+    assert obtained.paths == paths
+    assert obtained.batch.hosts == [['a3'], []]
+    assert obtained.batch.computation_defs[1].name == 'c2'
+
+
+def test_hosting_node_accepts_the_part_of_the_batch_that_fits():
+    replication = replication_on(AgentDef('a2', capacity=25))
+    batch = ReplicationBatch([comp_def('c1'), comp_def('c2'), comp_def('c3')],
+                             [10, 20, 10], [1, 1, 1])
+    paths = PathsTable({Path('a1', 'a2', '__hosting__'): 1})
+
+    forwarded = replication._visit_path(
+        5, 1, Path('a1', 'a2', '__hosting__'), paths, ['a1', 'a2'], batch)
+
+    assert not forwarded
+    assert set(replication.hosted_replicas) == {'c1', 'c3'}
+    assert batch.hosts == [['a2'], [], ['a2']]
+    assert batch.pending() == [1]
+    assert not paths
+
+
+def test_hosting_node_defers_computations_too_expensive_for_the_budget():
+    replication = replication_on(
+        AgentDef('a2', capacity=100, hosting_costs={'c2': 7}))
+    batch = ReplicationBatch([comp_def('c1'), comp_def('c2')], [10, 10],
+                             [1, 1])
+    paths = PathsTable({Path('a1', 'a2', '__hosting__'): 1})
+
+    replication._visit_path(
+        5, 1, Path('a1', 'a2', '__hosting__'), paths, ['a1', 'a2'], batch)
+
+    assert set(replication.hosted_replicas) == {'c1'}
+    # c2 will be offered again once the budget allows its hosting cost
+    assert paths == {Path('a1', 'a2', '__hosting__'): 8}
+
+
+def test_replicate_without_computations_is_done():
+    replication = replication_on(AgentDef('a1', capacity=100))
+    replication.replication_done = MagicMock()
+
+    replication.replicate(2)
+
+    replication.replication_done.assert_called_once_with({})
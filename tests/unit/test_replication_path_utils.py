@@ -29,10 +29,13 @@
 # POSSIBILITY OF SUCH DAMAGE.
 
 
+import json
+
 import pytest
 
 from pydcop.replication.path_utils import Path, path_starting_with, \
-    filter_missing_agents_paths
+    filter_missing_agents_paths, PathsTable, cheapest_path_to
+from pydcop.utils.simple_repr import simple_repr, from_repr
 
 
 def test_path_creation():
@@ -178,3 +181,77 @@ def test_filter_missing_agents_paths():
     filtered = filter_missing_agents_paths(paths, available)
 
     assert len(filtered) == 3
+
+
+def test_paths_table_as_dict():
+    table = PathsTable({Path('a1', 'a2'): 2, Path('a1', 'a3'): 1})
+    table[Path('a1', 'a2', 'a4')] = 5
+
+    assert len(table) == 3
+    assert table[Path('a1', 'a2')] == 2
+    assert Path('a1', 'a3') in table
+    assert list(table) == [Path('a1', 'a2'), Path('a1', 'a3'),
+                           Path('a1', 'a2', 'a4')]
+    assert table.pop(Path('a1', 'a2')) == 2
+    assert Path('a1', 'a2') not in table
+    assert table == {Path('a1', 'a3'): 1, Path('a1', 'a2', 'a4'): 5}
+
+    copied = table.copy()
+    copied.pop(Path('a1', 'a3'))
+    assert Path('a1', 'a3') in table
+
+
+def test_paths_table_removal_updates_prefix_index():
+    table = PathsTable({Path('a1', 'a2'): 2, Path('a1', 'a2', 'a4'): 5})
+
+    table.pop(Path('a1', 'a2', 'a4'))
+    assert path_starting_with(Path('a1'), table) == [(2, Path('a2'))]
+    table.pop(Path('a1', 'a2'))
+    assert path_starting_with(Path('a1'), table) == []
+    assert not table
+
+
+def test_cheapest_path_to():
+    table = PathsTable({Path('a1', 'a2', 'a4'): 5,
+                        Path('a1', 'a3', 'a4'): 3,
+                        Path('a1', 'a3'): 1})
+
+    assert cheapest_path_to('a4', table) == (3, Path('a1', 'a3', 'a4'))
+    assert cheapest_path_to('a5', table) == (float('inf'), Path())
+
+    table.pop(Path('a1', 'a3', 'a4'))
+    assert cheapest_path_to('a4', table) == (5, Path('a1', 'a2', 'a4'))
+    table[Path('a1', 'a2', 'a4')] = 7
+    assert cheapest_path_to('a4', table) == (7, Path('a1', 'a2', 'a4'))
+
+    # also works on plain dicts
+    assert cheapest_path_to('a3', {Path('a1', 'a3'): 1}) == \
+        (1, Path('a1', 'a3'))
+
+
+def test_paths_starting_with_ties_in_insertion_order():
+    table = PathsTable({Path('a1', 'a3'): 2, Path('a1', 'a2'): 2,
+                        Path('a1', 'a4'): 1})
+
+    assert path_starting_with(Path('a1'), table) == \
+        [(1, Path('a4')), (2, Path('a3')), (2, Path('a2'))]
+
+
+def test_paths_table_simple_repr_is_front_coded():
+    table = PathsTable({Path('a1', 'a2'): 2,
+                        Path('a1', 'a2', '__hosting__'): 3,
+                        Path('a1', 'a3'): 1})
+
+    r = simple_repr(table)
+    assert r['paths'] == [[0, ['a1', 'a2'], 2],
+                          [2, ['__hosting__'], 3],
+                          [1, ['a3'], 1]]
+
+    obtained = from_repr(json.loads(json.dumps(r)))
+    assert isinstance(obtained, PathsTable)
+    assert obtained == table
+
+
+def test_path_simple_repr():
+    path = Path('a1', 'a2')
+    assert from_repr(simple_repr(path)) == path